@@ -11,12 +11,16 @@ from sqlmodel import Session, select
 from db import get_session
 from models import User
 from schemas import TokenData
+from routers.module.user_cache import get_user_by_id_cached
 
 from dotenv import load_dotenv, find_dotenv
+import logging
 import os
 
 _ = load_dotenv(find_dotenv())
 
+logger = logging.getLogger(__name__)
+
 # 環境変数から読み込むのが望ましい
 SECRET_KEY = os.getenv("HS256_SECRET_KEY")
 ALGORITHM = "HS256"
@@ -57,9 +61,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
-    request: Request, session: Session = Depends(get_session)
-) -> User:
+def _decode_token_user_id(request: Request) -> int:
+    """X-App-Authorization の JWT を検証し、user_id を返す"""
     token = get_app_authorization_token(request)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,19 +76,44 @@ async def get_current_user(
         if username is None or user_id is None:
             raise credentials_exception
         token_data = TokenData(username=username, user_id=user_id)
-        print(f"[AUTH_DEBUG] JWT decoded - username: {username}, user_id: {user_id}")
+        logger.debug("JWT decoded - username: %s, user_id: %s", username, user_id)
     except JWTError:
         raise credentials_exception
+    return token_data.user_id
+
 
-    user = session.exec(select(User).where(User.id == token_data.user_id)).first()
+def _ensure_user(user: Optional[User], user_id: int) -> User:
     if user is None:
-        print(f"[AUTH_DEBUG] User not found for user_id: {token_data.user_id}")
-        raise credentials_exception
-    print(f"[AUTH_DEBUG] Retrieved user - id: {user.id}, username: {user.username}")
+        logger.info("User not found for user_id: %s", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    logger.debug("Retrieved user - id: %s, username: %s", user.id, user.username)
     return user
 
+async def get_current_user(
+    request: Request, session: Session = Depends(get_session)
+) -> User:
+    user_id = _decode_token_user_id(request)
+    # ポーリングなどで同じユーザーが繰り返し認証されるため、短い TTL のキャッシュから解決する
+    return _ensure_user(get_user_by_id_cached(session, user_id), user_id)
+
+async def get_current_user_fresh(
+    request: Request, session: Session = Depends(get_session)
+) -> User:
+    """キャッシュを使わずに DB からユーザーを読む（パスワード変更・アカウント削除・ユーザー情報の更新用）。
+    ユーザーキャッシュの無効化はプロセス内のみのため、他インスタンスで更新された値を元に判定・上書きしないようにする。"""
+    user_id = _decode_token_user_id(request)
+    return _ensure_user(session.exec(select(User).where(User.id == user_id)).first(), user_id)
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     # ここでユーザーが無効化されているかなどのチェックを追加できる
     # if current_user.disabled:
     #     raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_active_user_fresh(current_user: User = Depends(get_current_user_fresh)) -> User:
+    """get_current_active_user のキャッシュを使わない版"""
+    return current_user
@@ -0,0 +1,207 @@
+# backend/benchmarks/cases.py
+"""
+ベンチマークの計測対象（主要な読み書きパス）
+
+各ケースは FastAPI の TestClient 経由でエンドポイントを呼び出す（ルーティング・依存解決・
+レスポンスのシリアライズまで含めて計測するため）。認証だけはベンチマーク用ユーザーに差し替える。
+RAG の検索ツールはエンドポイントを持たないため、関数を直接呼び出す。
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from auth_utils import get_current_active_user
+from db import engine, get_session
+from models import User, UserPaperLink
+from routers import embeddings as embeddings_router
+from routers import papers as papers_router
+
+from benchmarks.synthetic_data import SyntheticDataset, arxiv_url_for
+
+
+class BenchmarkError(RuntimeError):
+    pass
+
+
+@dataclass
+class BenchmarkContext:
+    dataset: SyntheticDataset
+    client: TestClient
+    _vectors_ready: bool = False
+    _generation_cursor: int = 0
+
+    def check(self, response, expected_status: int = 200):
+        if response.status_code != expected_status:
+            raise BenchmarkError(f"HTTP {response.status_code}: {response.text[:300]}")
+        return response.json()
+
+    def ensure_vectors(self) -> None:
+        """推薦・RAG 検索の前提となるベクトルを用意する（計測対象外）"""
+        if self._vectors_ready:
+            return
+        self.check(self.client.post("/embeddings/rebuild", json={}))
+        self._vectors_ready = True
+
+    def next_generation_url(self) -> str:
+        """未要約の論文 URL を順に払い出す（既存要約の再利用で計測が短絡しないように）"""
+        ids = self.dataset.generation_arxiv_ids
+        if self._generation_cursor >= len(ids):
+            raise BenchmarkError("generation papers exhausted; increase generation_papers or reduce iterations")
+        url = arxiv_url_for(ids[self._generation_cursor])
+        self._generation_cursor += 1
+        return url
+
+
+@dataclass
+class BenchmarkCase:
+    name: str
+    run: Callable[[BenchmarkContext], Any]
+    iterations: int = 20
+    warmup: int = 1
+    setup: Optional[Callable[[BenchmarkContext], None]] = None        # ケース開始前に1回（計測対象外）
+    before_each: Optional[Callable[[BenchmarkContext], None]] = None  # 各回の前に実行（計測対象外）
+    description: str = ""
+
+
+CASES: List[BenchmarkCase] = []
+
+
+def benchmark(name: str, **options):
+    def decorator(fn: Callable[[BenchmarkContext], Any]):
+        CASES.append(BenchmarkCase(name=name, run=fn, description=(fn.__doc__ or "").strip(), **options))
+        return fn
+    return decorator
+
+
+def create_benchmark_client(user_id: int) -> TestClient:
+    """papers / embeddings ルーターだけを載せたアプリを作る（認証は bench_user 固定）"""
+    app = FastAPI()
+    app.include_router(papers_router.router)
+    app.include_router(embeddings_router.router)
+
+    def _bench_user(session: Session = Depends(get_session)) -> User:
+        return session.get(User, user_id)
+
+    app.dependency_overrides[get_current_active_user] = _bench_user
+    return TestClient(app)
+
+
+def _reset_recommended(ctx: BenchmarkContext) -> None:
+    """前回の推薦で付いた Recommended タグを外し、毎回同じ状態から推薦させる"""
+    with Session(engine) as session:
+        links = session.exec(
+            select(UserPaperLink)
+            .where(UserPaperLink.user_id == ctx.dataset.user_id)
+            .where(UserPaperLink.tags.contains("Recommended"))
+        ).all()
+        for link in links:
+            link.tags = ",".join(t for t in link.tags.split(",") if t and t != "Recommended")
+            session.add(link)
+        session.commit()
+
+
+# --- 論文一覧 -------------------------------------------------------------
+
+@benchmark("papers.list.default")
+def list_default(ctx: BenchmarkContext):
+    """GET /papers（既定の並び順・1ページ目）"""
+    return ctx.check(ctx.client.get("/papers", params={"page": 1, "size": 50}))
+
+
+@benchmark("papers.list.deep_page")
+def list_deep_page(ctx: BenchmarkContext):
+    """GET /papers（最終ページ付近。OFFSET が大きい場合）"""
+    last_page = max(1, ctx.dataset.papers // 50)
+    return ctx.check(ctx.client.get("/papers", params={"page": last_page, "size": 50}))
+
+
+@benchmark("papers.list.tags_and")
+def list_tags_and(ctx: BenchmarkContext):
+    """GET /papers（理解度タグ＋ドメインタグの AND 絞り込み）"""
+    return ctx.check(ctx.client.get("/papers", params={
+        "level_tags": ["後で読む"], "domain_tags": ["LLM"], "filter_mode": "AND", "size": 50,
+    }))
+
+
+@benchmark("papers.list.tags_or")
+def list_tags_or(ctx: BenchmarkContext):
+    """GET /papers（複数タグの OR 絞り込み・興味なしを除外・タイトル順）"""
+    return ctx.check(ctx.client.get("/papers", params={
+        "level_tags": ["お気に入り", "理解した"], "domain_tags": ["Diffusion", "Transformer"],
+        "filter_mode": "OR", "show_interest_none": False, "sort_by": "title", "sort_dir": "asc", "size": 50,
+    }))
+
+
+@benchmark("papers.list.keyword")
+def list_keyword(ctx: BenchmarkContext):
+    """GET /papers（キーワード検索）"""
+    return ctx.check(ctx.client.get("/papers", params={"search_keyword": "Diffusion Transformer", "size": 50}))
+
+
+# --- 推薦・RAG 検索 ---------------------------------------------------------
+
+@benchmark("papers.recommend", iterations=10,
+           setup=lambda ctx: ctx.ensure_vectors(), before_each=_reset_recommended)
+def recommend(ctx: BenchmarkContext):
+    """POST /papers/recommend（お気に入りのベクトルから類似論文を推薦）"""
+    return ctx.check(ctx.client.post("/papers/recommend"))
+
+
+@benchmark("rag.local_search", setup=lambda ctx: ctx.ensure_vectors())
+def rag_local_search(ctx: BenchmarkContext):
+    """local_rag_search_tool_impl（タグ指定なし）"""
+    from routers.module.rag_tools import local_rag_search_tool_impl
+
+    with Session(engine) as session:
+        return local_rag_search_tool_impl("efficient fine-tuning of diffusion transformers", ctx.dataset.user_id, session)
+
+
+@benchmark("rag.local_search.tags", setup=lambda ctx: ctx.ensure_vectors())
+def rag_local_search_tags(ctx: BenchmarkContext):
+    """local_rag_search_tool_impl（お気に入りタグで絞り込み）"""
+    from routers.module.rag_tools import local_rag_search_tool_impl
+
+    with Session(engine) as session:
+        return local_rag_search_tool_impl("retrieval augmented generation", ctx.dataset.user_id, session, tags="お気に入り")
+
+
+# --- 重複チェック・要約生成・ベクトル再構築 -----------------------------------
+
+@benchmark("papers.check_duplications", setup=lambda ctx: ctx.ensure_vectors())
+def check_duplications(ctx: BenchmarkContext):
+    """POST /papers/check_duplications（登録済み論文 50 件の URL）"""
+    urls = [arxiv_url_for(a) for a in ctx.dataset.sample_arxiv_ids]
+    return ctx.check(ctx.client.post("/papers/check_duplications", json={"urls": urls, "prompt_mode": "default"}))
+
+
+@benchmark("papers.generate_summaries", iterations=10, warmup=0)
+def generate_summaries(ctx: BenchmarkContext):
+    """POST /papers/generate_multiple_summaries_parallel（フェイク LLM で要約・タグ生成・ベクトル作成）"""
+    return ctx.check(ctx.client.post("/papers/generate_multiple_summaries_parallel", json={
+        "url": ctx.next_generation_url(),
+        "selected_prompts": [{"type": "default"}],
+        "create_embeddings": True,
+        "embedding_target": "default_only",
+    }))
+
+
+@benchmark("embeddings.rebuild", iterations=3, warmup=0)
+def rebuild_embeddings(ctx: BenchmarkContext):
+    """POST /embeddings/rebuild（ユーザーの全論文のベクトルを削除して再作成）"""
+    result = ctx.check(ctx.client.post("/embeddings/rebuild", json={}))
+    ctx._vectors_ready = True
+    return result
+
+
+def select_cases(only: Optional[List[str]] = None) -> List[BenchmarkCase]:
+    """名前の前方一致でケースを絞り込む"""
+    if not only:
+        return list(CASES)
+    return [c for c in CASES if any(c.name.startswith(o) for o in only)]
+
+
+def case_descriptions() -> Dict[str, str]:
+    return {c.name: c.description for c in CASES}
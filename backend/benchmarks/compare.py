@@ -0,0 +1,66 @@
+# backend/benchmarks/compare.py
+"""
+2つのベンチマーク結果（benchmarks.run の JSON）を比較し、回帰を検出する
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.compare base.json new.json                    # p50 が 20% 以上悪化したら終了コード1
+    python -m benchmarks.compare base.json new.json --metric p95_ms --threshold 0.3
+    python -m benchmarks.compare base.json new.json --metric db_queries --threshold 0   # SQL 発行数の増加（N+1）を検出
+"""
+import argparse
+import json
+import pathlib
+import sys
+
+
+def load(path: pathlib.Path):
+    """(ケース名 -> 結果, レポート全体) を返す"""
+    report = json.loads(path.read_text(encoding="utf-8"))
+    return {r["name"]: r for r in report.get("results", [])}, report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", type=pathlib.Path)
+    parser.add_argument("new", type=pathlib.Path)
+    parser.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "mean_ms", "min_ms", "max_ms", "db_queries", "db_ms"])
+    parser.add_argument("--threshold", type=float, default=0.2, help="回帰とみなす悪化率（0.2 = 20%%）")
+    args = parser.parse_args()
+
+    base_results, base_report = load(args.base)
+    new_results, new_report = load(args.new)
+    if base_report.get("scale") != new_report.get("scale"):
+        print(f"WARNING: scale differs ({base_report.get('scale')} vs {new_report.get('scale')})")
+
+    print(f"{'case':32} {'base':>10} {'new':>10} {'change':>9}")
+    regressions = []
+    for name in sorted(set(base_results) | set(new_results)):
+        base, new = base_results.get(name), new_results.get(name)
+        if not base or not new:
+            print(f"{name:32} {'-' if not base else base.get(args.metric, '-'):>10} {'-' if not new else new.get(args.metric, '-'):>10} {'n/a':>9}")
+            continue
+        if new.get("error"):
+            print(f"{name:32} {'':>10} {'ERROR':>10}")
+            regressions.append(name)
+            continue
+        if base.get("error") or base.get(args.metric) is None or new.get(args.metric) is None:
+            print(f"{name:32} {'ERROR' if base.get('error') else '-':>10} {new.get(args.metric, '-'):>10}")
+            continue
+        if base[args.metric]:
+            change = new[args.metric] / base[args.metric] - 1.0
+        else:
+            change = float("inf") if new[args.metric] else 0.0
+        mark = "  NG" if change > args.threshold else ""
+        print(f"{name:32} {base[args.metric]:10.1f} {new[args.metric]:10.1f} {change:+8.1%}{mark}")
+        if change > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\nNG: {len(regressions)} case(s) regressed by more than {args.threshold:.0%} ({args.metric}): {', '.join(regressions)}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
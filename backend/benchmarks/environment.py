@@ -0,0 +1,26 @@
+# backend/benchmarks/environment.py
+"""
+ベンチマーク用の環境変数を設定する（db・vectorstore などを import する前に呼ぶ）
+
+ローカルの SQLite / Chroma を作業ディレクトリに作り、LLM と埋め込みは決定的なフェイク
+（routers/module/fake_providers.py）に差し替えるため、ネットワークには接続しない。
+"""
+import os
+import pathlib
+
+
+def configure_environment(workdir: pathlib.Path, fake_llm_latency_ms: float = 0.0) -> None:
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.environ.update({
+        "DEPLOY": "local",
+        "SQLITE_DB_PATH": str(workdir / "benchmark.sqlite3"),
+        "SQLITE_ECHO": "false",
+        "LOCAL_VECTOR_STORE_DIR": str(workdir / "vector_db"),
+        "LLM_PROVIDER_OVERRIDE": "Fake",
+        "EMBEDDING_PROVIDER_OVERRIDE": "Fake",
+        "FAKE_LLM_LATENCY_MS": str(fake_llm_latency_ms),
+        "TRACING_EXPORTER": "none",
+        "ANONYMIZED_TELEMETRY": "False",   # Chroma のテレメトリ送信を止める
+    })
+    # rag_tools は import 時に Tavily のクライアントを生成する（ベンチマークでは呼び出さない）
+    os.environ.setdefault("TAVILY_API_KEY", "offline-benchmark")
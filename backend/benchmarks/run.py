@@ -0,0 +1,198 @@
+# backend/benchmarks/run.py
+"""
+オフラインのベンチマークを実行し、結果を JSON で保存する
+
+外部 API（LLM・埋め込み・arXiv）には接続しない。作業ディレクトリに SQLite と Chroma を作り、
+合成データを投入してから各ケースを計測する（routers/module/fake_providers.py 参照）。
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.run --scale 1k
+    python -m benchmarks.run --scale 10k --only papers.list rag --iterations 50
+    python -m benchmarks.run --scale 1k --fake-llm-latency-ms 300   # LLM の応答待ちを模擬する
+    python -m benchmarks.run --list
+
+比較:
+    python -m benchmarks.compare benchmarks/results/<base>.json benchmarks/results/<new>.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import pathlib
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+from typing import List, Optional
+
+from benchmarks.environment import configure_environment
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+SCHEMA_VERSION = 1
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples_ms: List[float]) -> dict:
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(_percentile(ordered, 0.95), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+        "stdev_ms": round(statistics.stdev(ordered), 3) if len(ordered) > 1 else 0.0,
+    }
+
+
+def run_case(case, ctx, iterations: Optional[int], quiet: bool) -> dict:
+    """1ケースを計測する（quiet の場合はアプリの print 出力と INFO 以下のログを捨てる）"""
+    from routers.module.query_stats import collect_query_stats
+
+    n = iterations or case.iterations
+    samples: List[float] = []
+    db_queries: List[int] = []
+    db_ms: List[float] = []
+    error = None
+    sink = open(os.devnull, "w") if quiet else None
+    if quiet:
+        logging.disable(logging.INFO)
+    try:
+        with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+            if case.setup:
+                case.setup(ctx)
+            for i in range(case.warmup + n):
+                if case.before_each:
+                    case.before_each(ctx)
+                with collect_query_stats() as query_stats:
+                    started = time.perf_counter()
+                    case.run(ctx)
+                    elapsed_ms = (time.perf_counter() - started) * 1000.0
+                if i >= case.warmup:
+                    samples.append(elapsed_ms)
+                    db_queries.append(query_stats.count)
+                    db_ms.append(query_stats.total_seconds * 1000.0)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if not quiet:
+            traceback.print_exc()
+    finally:
+        if sink:
+            sink.close()
+            logging.disable(logging.NOTSET)
+    result = {"name": case.name, "description": case.description, "iterations": len(samples), **summarize(samples)}
+    if db_queries:
+        # 1回あたりの SQL 発行数と DB 時間（N+1 の回帰は件数の増加として現れる）
+        result["db_queries"] = round(statistics.fmean(db_queries), 1)
+        result["db_ms"] = round(statistics.fmean(db_ms), 3)
+    return {**result, "error": error}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="1k", help="論文数（1k / 10k / 100k または整数）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", default=None, help="ケース名の前方一致で絞り込む")
+    parser.add_argument("--iterations", type=int, default=None, help="各ケースの計測回数（既定: ケースごとの値）")
+    parser.add_argument("--fake-llm-latency-ms", type=float, default=0.0, help="フェイク LLM の応答待ち（ミリ秒）")
+    parser.add_argument("--workdir", type=pathlib.Path, default=None, help="SQLite / Chroma の作成先（既定: 一時ディレクトリ）")
+    parser.add_argument("--keep", action="store_true", help="終了後も作業ディレクトリを残す")
+    parser.add_argument("--output", type=pathlib.Path, default=None, help="結果 JSON の保存先（既定: benchmarks/results/）")
+    parser.add_argument("--verbose", action="store_true", help="アプリのログ出力を表示する")
+    parser.add_argument("--list", action="store_true", help="ケース一覧を表示して終了")
+    args = parser.parse_args()
+
+    workdir = args.workdir or pathlib.Path(tempfile.mkdtemp(prefix="kp-bench-"))
+    if args.workdir and any(workdir.iterdir() if workdir.exists() else []):
+        raise SystemExit(f"workdir must be empty: {workdir}")
+    # db / vectorstore / LLM の設定は import 時に読まれるため、環境変数を先に設定する
+    configure_environment(workdir, args.fake_llm_latency_ms)
+
+    from benchmarks.synthetic_data import generate_dataset, parse_scale
+    from benchmarks import cases as bench_cases
+
+    if args.list:
+        for name, description in bench_cases.case_descriptions().items():
+            print(f"{name:32} {description}")
+        return 0
+
+    selected = bench_cases.select_cases(args.only)
+    if not selected:
+        raise SystemExit(f"no benchmark case matches: {args.only}")
+
+    from db import engine
+    from routers.module.query_stats import instrument_engine_query_stats
+
+    instrument_engine_query_stats(engine)
+
+    papers = parse_scale(args.scale)
+    try:
+        print(f"Generating synthetic data: {papers} papers (seed={args.seed}) in {workdir} ...")
+        dataset = generate_dataset(engine, papers, seed=args.seed)
+        print(f"  done in {dataset.seconds:.1f}s: {dataset.stats()}")
+
+        ctx = bench_cases.BenchmarkContext(dataset=dataset, client=bench_cases.create_benchmark_client(dataset.user_id))
+        results = []
+        for case in selected:
+            print(f"Running {case.name} ...", flush=True)
+            result = run_case(case, ctx, args.iterations, quiet=not args.verbose)
+            results.append(result)
+            if result["error"]:
+                print(f"  ERROR {result['error']}")
+            else:
+                print(f"  p50 {result['p50_ms']:.1f}ms  p95 {result['p95_ms']:.1f}ms  queries {result['db_queries']:.1f}  (n={result['iterations']})")
+    finally:
+        engine.dispose()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": papers,
+        "seed": args.seed,
+        "fake_llm_latency_ms": args.fake_llm_latency_ms,
+        "dataset": dataset.stats(),
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{args.scale}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n{'case':32} {'p50[ms]':>10} {'p95[ms]':>10} {'mean[ms]':>10} {'queries':>8} {'db[ms]':>8}")
+    for r in results:
+        if r["error"]:
+            print(f"{r['name']:32} {'ERROR':>10}")
+        else:
+            print(f"{r['name']:32} {r['p50_ms']:10.1f} {r['p95_ms']:10.1f} {r['mean_ms']:10.1f} {r['db_queries']:8.1f} {r['db_ms']:8.1f}")
+    print(f"\nSaved: {output}")
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
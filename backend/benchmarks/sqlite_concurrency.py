@@ -0,0 +1,188 @@
+# backend/benchmarks/sqlite_concurrency.py
+"""
+ローカル SQLite の同時書き込みスループットを、接続設定（PRAGMA・プール）ごとに比較する
+
+並列の要約生成やバックグラウンドタスクを模して、複数スレッドがそれぞれ Session(engine) を開き
+「リンクの取得 → 要約の INSERT → リンクの UPDATE → コミット」を繰り返す。同時に読み取りスレッドが
+論文一覧相当の SELECT を流し続ける。プロファイルごとに別の DB ファイルを作るため、互いに影響しない。
+
+- default: 変更前と同じ（SQLite / pysqlite の既定。ロールバックジャーナル、ロック待ちは 5 秒）
+- tuned:   config.yaml の sqlite の設定（WAL・synchronous=NORMAL・busy_timeout など）
+
+使い方（backend ディレクトリで実行）:
+    python -m benchmarks.sqlite_concurrency
+    python -m benchmarks.sqlite_concurrency --writers 16 --writes 100 --readers 4 --scale 10k
+"""
+import argparse
+import json
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.environment import configure_environment
+from benchmarks.run import RESULTS_DIR, _git_commit, _percentile
+
+# 変更前の create_engine(DATABASE_URL) と同じ挙動になる設定
+DEFAULT_PROFILE: Dict[str, object] = {
+    "journal_mode": None, "synchronous": None, "busy_timeout_ms": None, "cache_size_kb": None,
+    "mmap_size_mb": None, "temp_store": None, "foreign_keys": None,
+    "pool_size": None, "max_overflow": None, "pool_timeout": None,
+}
+
+
+def _run_profile(name: str, cfg: dict, workdir: pathlib.Path, args) -> dict:
+    from sqlmodel import Session, select
+
+    from benchmarks.synthetic_data import SUMMARY_MODEL, SUMMARY_PROVIDER, generate_dataset
+    from db import create_sqlite_engine
+    from models import GeneratedSummary, UserPaperLink
+
+    engine = create_sqlite_engine(str(workdir / f"{name}.sqlite3"), cfg=cfg)
+    dataset = generate_dataset(engine, args.scale, seed=args.seed, generation_papers=0)
+    with Session(engine) as session:
+        link_ids = list(session.exec(
+            select(UserPaperLink.id).where(UserPaperLink.user_id == dataset.user_id).order_by(UserPaperLink.id)
+        ).all())
+
+    summary_text = "要約" * (args.summary_chars // 2)
+    write_latencies: List[float] = []
+    read_count = 0
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    writers_done = threading.Event()
+
+    def writer(index: int) -> None:
+        for i in range(args.writes):
+            link_id = link_ids[(index * args.writes + i) % len(link_ids)]
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    link = session.get(UserPaperLink, link_id)
+                    summary = GeneratedSummary(
+                        paper_metadata_id=link.paper_metadata_id, llm_provider=SUMMARY_PROVIDER,
+                        llm_model_name=SUMMARY_MODEL, llm_abst=summary_text, character_role=f"w{index}",
+                    )
+                    session.add(summary)
+                    session.flush()
+                    link.selected_generated_summary_id = summary.id
+                    session.add(link)
+                    session.commit()
+            except Exception as e:
+                with lock:
+                    key = f"{type(e).__name__}: {str(e).splitlines()[0][:80]}"
+                    errors[key] = errors.get(key, 0) + 1
+                continue
+            with lock:
+                write_latencies.append((time.perf_counter() - started) * 1000.0)
+
+    def reader() -> None:
+        nonlocal read_count
+        offset = 0
+        while not writers_done.is_set():
+            try:
+                with Session(engine) as session:
+                    session.exec(
+                        select(UserPaperLink, GeneratedSummary)
+                        .join(GeneratedSummary, GeneratedSummary.id == UserPaperLink.selected_generated_summary_id, isouter=True)
+                        .where(UserPaperLink.user_id == dataset.user_id)
+                        .order_by(UserPaperLink.created_at.desc())
+                        .offset(offset).limit(50)
+                    ).all()
+            except Exception as e:
+                with lock:
+                    key = f"read {type(e).__name__}: {str(e).splitlines()[0][:80]}"
+                    errors[key] = errors.get(key, 0) + 1
+                continue
+            offset = (offset + 50) % max(1, len(link_ids))
+            with lock:
+                read_count += 1
+
+    readers = [threading.Thread(target=reader, daemon=True) for _ in range(args.readers)]
+    writers = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    started = time.perf_counter()
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    writers_done.set()
+    for t in readers:
+        t.join()
+    engine.dispose()
+
+    ordered = sorted(write_latencies)
+    return {
+        "profile": name,
+        "settings": cfg,
+        "seconds": round(elapsed, 3),
+        "writes_ok": len(ordered),
+        "writes_failed": sum(v for k, v in errors.items() if not k.startswith("read ")),
+        "writes_per_sec": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "reads_per_sec": round(read_count / elapsed, 1) if elapsed else 0.0,
+        "write_p50_ms": round(statistics.median(ordered), 3) if ordered else None,
+        "write_p95_ms": round(_percentile(ordered, 0.95), 3) if ordered else None,
+        "write_max_ms": round(ordered[-1], 3) if ordered else None,
+        "errors": errors,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="1k", help="論文数（1k / 10k / 100k または整数）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--writers", type=int, default=8, help="書き込みスレッド数")
+    parser.add_argument("--writes", type=int, default=50, help="スレッドごとの書き込みトランザクション数")
+    parser.add_argument("--readers", type=int, default=2, help="読み取りスレッド数")
+    parser.add_argument("--summary-chars", type=int, default=4000, help="INSERT する要約の文字数")
+    parser.add_argument("--profiles", nargs="*", default=["default", "tuned"], choices=["default", "tuned"])
+    parser.add_argument("--output", type=pathlib.Path, default=None, help="結果 JSON の保存先（既定: benchmarks/results/）")
+    args = parser.parse_args()
+
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="kp-sqlite-bench-"))
+    configure_environment(workdir)
+
+    from benchmarks.synthetic_data import parse_scale
+    from db import get_sqlite_config
+
+    args.scale = parse_scale(args.scale)
+    profiles = {"default": DEFAULT_PROFILE, "tuned": get_sqlite_config()}
+    results = []
+    try:
+        for name in args.profiles:
+            print(f"Running profile {name} ({args.writers} writers x {args.writes} writes, {args.readers} readers) ...", flush=True)
+            results.append(_run_profile(name, profiles[name], workdir, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "scale": args.scale,
+        "writers": args.writers,
+        "writes_per_writer": args.writes,
+        "readers": args.readers,
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-sqlite-concurrency.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n{'profile':10} {'writes/s':>10} {'reads/s':>10} {'p50[ms]':>10} {'p95[ms]':>10} {'max[ms]':>10} {'failed':>8}")
+    for r in results:
+        fmt = lambda v: f"{v:10.1f}" if v is not None else f"{'-':>10}"
+        print(f"{r['profile']:10} {r['writes_per_sec']:10.1f} {r['reads_per_sec']:10.1f} {fmt(r['write_p50_ms'])} "
+              f"{fmt(r['write_p95_ms'])} {fmt(r['write_max_ms'])} {r['writes_failed']:8d}")
+        for message, count in r["errors"].items():
+            print(f"  x{count} {message}")
+    print(f"\nSaved: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
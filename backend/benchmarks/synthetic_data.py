@@ -0,0 +1,197 @@
+# backend/benchmarks/synthetic_data.py
+"""
+ベンチマーク用の合成データを生成する（同じ seed なら同じデータになる）
+
+規模（--scale）は対象ユーザーのライブラリに入る論文数。
+- 対象ユーザー（bench_user）: 全論文を UserPaperLink で保持し、理解度タグ＋ドメインタグ 2〜4 個を付与
+- その他のユーザー: max(10, 論文数 / 100) 人。各自ランダムに 20 本ずつリンク（検索条件の選択性を現実に近づける）
+- GeneratedSummary: 論文ごとに 1 件（リンクの selected_generated_summary_id に設定）
+- 要約生成ベンチマーク用: 全文（full_text）付きで、どのユーザーにもリンクされていない論文を別途用意
+  （arXiv への取得をスキップできるため、オフラインで要約生成パスを計測できる）
+
+ORM を通さず Core の executemany で一括挿入する（10万件規模でも数十秒で作れるようにするため）。
+"""
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert
+from db import run_migrations
+
+from models import GeneratedSummary, PaperMetadata, User, UserPaperLink
+from routers.module.fake_providers import fake_text
+from routers.module.util import TAG_CATEGORIES
+
+SCALES: Dict[str, int] = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+BENCH_USERNAME = "bench_user"
+SUMMARY_PROVIDER = "Fake"
+SUMMARY_MODEL = "fake-deterministic"
+
+# 理解度タグの分布（お気に入りは推薦・RAG の入力になるため一定数必要）
+LEVEL_TAG_WEIGHTS = [
+    ("お気に入り", 5),
+    ("理解した", 15),
+    ("サラッと読んだ", 20),
+    ("後で読む", 35),
+    ("興味なし", 5),
+    ("", 20),   # 理解度タグなし
+]
+DOMAIN_TAGS = sorted({t for tags in TAG_CATEGORIES.values() for t in tags})
+
+NOISE_LINKS_PER_USER = 20
+INSERT_CHUNK_SIZE = 2_000
+
+
+def parse_scale(value: str) -> int:
+    """'1k' / '10k' / '100k' または整数を論文数に変換する"""
+    if value in SCALES:
+        return SCALES[value]
+    return int(value)
+
+
+def arxiv_id_for(index: int) -> str:
+    """連番から arXiv 形式の ID（YYMM.NNNNN）を作る"""
+    return f"24{index // 100_000 + 1:02d}.{index % 100_000:05d}"
+
+
+def arxiv_url_for(arxiv_id: str) -> str:
+    return f"https://arxiv.org/abs/{arxiv_id}"
+
+
+@dataclass
+class SyntheticDataset:
+    user_id: int
+    papers: int
+    users: int
+    links: int
+    summaries: int
+    seconds: float
+    sample_arxiv_ids: List[str] = field(default_factory=list)      # 対象ユーザーがリンク済みの論文（重複チェック用）
+    generation_arxiv_ids: List[str] = field(default_factory=list)  # 全文付き・未リンクの論文（要約生成用）
+
+    def stats(self) -> dict:
+        return {
+            "papers": self.papers,
+            "users": self.users,
+            "links": self.links,
+            "summaries": self.summaries,
+            "generation_papers": len(self.generation_arxiv_ids),
+            "setup_seconds": round(self.seconds, 3),
+        }
+
+
+def _insert_chunked(conn, model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        conn.execute(insert(model.__table__), rows[start:start + INSERT_CHUNK_SIZE])
+
+
+def _tags_for(rng: random.Random) -> str:
+    levels, weights = zip(*LEVEL_TAG_WEIGHTS)
+    level = rng.choices(levels, weights=weights, k=1)[0]
+    tags = rng.sample(DOMAIN_TAGS, k=rng.randint(2, 4))
+    if level:
+        tags.insert(0, level)
+    return ",".join(tags)
+
+
+def generate_dataset(engine, papers: int, seed: int = 42, generation_papers: int = 50) -> SyntheticDataset:
+    """空のデータベースに合成データを投入する"""
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    # 本番と同じインデックスで計測するため、create_all ではなくマイグレーションでスキーマを作る
+    run_migrations(engine)
+
+    now = datetime.utcnow()
+    user_count = max(10, papers // 100)
+    total_papers = papers + generation_papers
+
+    user_rows = [{
+        "id": 1,
+        "username": BENCH_USERNAME,
+        "email": f"{BENCH_USERNAME}@example.com",
+        "provider": "credentials",
+        "created_at": now,
+        "points": 0,
+        "sakura_affinity_level": 0,
+        "miyuki_affinity_level": 0,
+        "sakura_affinity_points": 0,
+        "miyuki_affinity_points": 0,
+    }]
+    for uid in range(2, user_count + 2):
+        user_rows.append({**user_rows[0], "id": uid, "username": f"bench_user_{uid}", "email": f"bench_user_{uid}@example.com"})
+
+    paper_rows: List[dict] = []
+    summary_rows: List[dict] = []
+    for i in range(total_papers):
+        arxiv_id = arxiv_id_for(i)
+        created = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        words = rng.sample(DOMAIN_TAGS, k=3)
+        paper_rows.append({
+            "id": i + 1,
+            "arxiv_id": arxiv_id,
+            "arxiv_url": arxiv_url_for(arxiv_id),
+            "title": f"{words[0]} meets {words[1]}: towards {words[2]} ({i})",
+            "authors": ", ".join(f"Author {rng.randint(1, 5000)}" for _ in range(rng.randint(1, 6))),
+            "published_date": date(2024, 1, 1) + timedelta(days=rng.randint(0, 600)),
+            "abstract": fake_text(f"abstract:{seed}:{i}", 900),
+            "full_text": fake_text(f"full_text:{seed}:{i}", 20_000) if i >= papers else None,
+            "created_at": created,
+            "updated_at": created,
+        })
+        if i < papers:
+            summary_rows.append({
+                "id": i + 1,
+                "paper_metadata_id": i + 1,
+                "llm_provider": SUMMARY_PROVIDER,
+                "llm_model_name": SUMMARY_MODEL,
+                "llm_abst": fake_text(f"summary:{seed}:{i}", 1500),
+                "one_point": fake_text(f"one_point:{seed}:{i}", 80),
+                "character_role": None,
+                "affinity_level": 0,
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    link_rows: List[dict] = []
+    for i in range(papers):
+        created = paper_rows[i]["created_at"] + timedelta(minutes=rng.randint(0, 60 * 24))
+        link_rows.append({
+            "user_id": 1,
+            "paper_metadata_id": i + 1,
+            "tags": _tags_for(rng),
+            "memo": fake_text(f"memo:{seed}:{i}", 60) if rng.random() < 0.1 else "",
+            "selected_generated_summary_id": i + 1,
+            "created_at": created,
+            "updated_at": created,
+        })
+    for uid in range(2, user_count + 2):
+        for paper_index in rng.sample(range(papers), k=min(NOISE_LINKS_PER_USER, papers)):
+            link_rows.append({
+                "user_id": uid,
+                "paper_metadata_id": paper_index + 1,
+                "tags": _tags_for(rng),
+                "memo": "",
+                "selected_generated_summary_id": paper_index + 1,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+    with engine.begin() as conn:
+        _insert_chunked(conn, User, user_rows)
+        _insert_chunked(conn, PaperMetadata, paper_rows)
+        _insert_chunked(conn, GeneratedSummary, summary_rows)
+        _insert_chunked(conn, UserPaperLink, link_rows)
+
+    return SyntheticDataset(
+        user_id=1,
+        papers=papers,
+        users=len(user_rows),
+        links=len(link_rows),
+        summaries=len(summary_rows),
+        seconds=time.perf_counter() - started,
+        sample_arxiv_ids=[arxiv_id_for(i) for i in rng.sample(range(papers), k=min(50, papers))],
+        generation_arxiv_ids=[arxiv_id_for(i) for i in range(papers, total_papers)],
+    )
@@ -1,10 +1,15 @@
 # uvicorn main:app --host 0.0.0.0 --port 8000 --reload
 
+# ログ設定は他のモジュールの import（basicConfig を呼ぶものがある）より先に行う
+from routers.module.logging_config import configure_logging
+configure_logging()
+
 from fastapi import FastAPI, Depends 
 from fastapi.middleware.cors import CORSMiddleware
 
 from db import init_db           # ★ 追加
 from db import get_session       # ★ 追加
+from db import engine, async_engine
 from models import User, RagSession, UserPaperLink, GeneratedSummary # ★ 追加
 from sqlmodel import Session, select  # ★ 追加
 from routers import papers as papers_router   # ★ 追加
@@ -17,6 +22,12 @@ from routers import system_prompts as system_prompts_router
 from routers import system_prompt_groups as system_prompt_groups_router
 from routers import images as images_router
 from routers import background_images as background_images_router
+from routers.module.research_worker import start_embedded_research_worker, stop_embedded_research_worker
+from routers.module.lazy_import import start_background_warmup
+from routers.module.perf_metrics import install_perf_metrics
+from routers.module.profiler import install_profiling
+from routers.module.query_stats import get_query_stats_config, install_query_stats, instrument_engine_query_stats
+from routers.module.tracing import install_tracing, instrument_engine_tracing, is_tracing_enabled, shutdown_tracing
 
 app = FastAPI(title="KnowledgePaper API")
 app.include_router(papers_router.router) 
@@ -37,10 +48,33 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# リクエスト・LLM・埋め込み・ベクトルストア・DB プールの計測と /metrics（Prometheus 形式）
+install_perf_metrics(app, engine)
+# リクエストごとの SQL 発行数・DB 時間（開発時は X-DB-* ヘッダー）と遅いクエリのログ
+install_query_stats(app, engine)
+# 分散トレーシング（config.yaml の tracing.exporter が none 以外の場合のみ）
+install_tracing(app, engine)
+# AsyncSession 経由の SQL も同じ集計・トレースに含める（イベントは sync_engine に登録する）
+if get_query_stats_config()["enabled"]:
+    instrument_engine_query_stats(async_engine.sync_engine)
+if is_tracing_enabled():
+    instrument_engine_tracing(async_engine.sync_engine)
+# オンデマンドのプロファイラ（profiling.enabled かつ PROFILING_TOKEN 設定時のみ。X-Profile ヘッダー・/debug/profiles）
+install_profiling(app)
 
 @app.on_event("startup")          # ★ 起動時に DB を初期化
 def on_startup():
     init_db()
+    # DeepResearch / DeepRAG ワーカー（research_worker.mode が inprocess の場合のみ起動）
+    start_embedded_research_worker()
+    # 重いライブラリ・クライアントはリクエストを受け付け始めた後にバックグラウンドで読み込む
+    start_background_warmup()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    stop_embedded_research_worker()
+    shutdown_tracing()
+    await async_engine.dispose()
 
 @app.get("/ping")
 def ping():
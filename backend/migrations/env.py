@@ -0,0 +1,77 @@
+# backend/migrations/env.py
+"""
+Alembic の実行環境（接続先・対象メタデータ）
+
+接続先は db.py のエンジン（DEPLOY=local なら SQLite、それ以外は Supabase / PostgreSQL）。
+-x url=... を指定した場合はその URL を使う（例: alembic -x url=postgresql://... upgrade head --sql）。
+SQLite は ALTER TABLE の機能が限られるため、batch モード（テーブルの作り直し）で変更する。
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlmodel import SQLModel
+
+import models  # noqa: F401  全テーブルを SQLModel.metadata に登録する
+
+config = context.config
+
+# init_db() から呼ばれる場合はアプリのログ設定（routers/module/logging_config.py）を上書きしない
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+def _url_override():
+    return context.get_x_argument(as_dictionary=True).get("url") or config.get_main_option("sqlalchemy.url")
+
+
+def run_migrations_offline() -> None:
+    """DB に接続せず SQL を出力する（alembic upgrade head --sql）"""
+    url = _url_override()
+    if url is None:
+        import db
+        url = db.DATABASE_URL
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        compare_type=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # 呼び出し側が接続を渡した場合（init_db・scripts/check_query_plans.py）はそれを使う
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+    url = _url_override()
+    if url is not None:
+        from sqlalchemy import create_engine
+        connectable = create_engine(url)
+    else:
+        import db
+        connectable = db.engine
+    with connectable.connect() as connection:
+        _run_with_connection(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
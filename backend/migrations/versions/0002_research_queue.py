@@ -0,0 +1,128 @@
+"""research queue, checkpoints, web tool cache and rag history summary
+
+Revision ID: 0002_research_queue
+Revises: 0001_baseline
+Create Date: 2026-10-18 22:32:56.419421
+
+DeepResearch / DeepRAG のジョブキュー・LangGraph のチェックポイント・Web ツールのキャッシュ・
+RAG 履歴のローリング要約。マイグレーション導入前に create_all で一部が作成済みの DB があるため、
+テーブル・列・インデックスは存在しない場合のみ作成する。
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_research_queue'
+down_revision: Union[str, None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table_name: str, column_name: str) -> bool:
+    # --sql（オフライン）では DB を参照できない。researchjob は直前の CREATE TABLE IF NOT EXISTS に
+    # 列が含まれるため作成済み、ragsession の列は未作成として扱う
+    if context.is_offline_mode():
+        return table_name == 'researchjob'
+    return any(c["name"] == column_name for c in sa.inspect(op.get_bind()).get_columns(table_name))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('graphcheckpoint',
+    sa.Column('thread_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('checkpoint_ns', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('checkpoint_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('parent_checkpoint_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('checkpoint_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('checkpoint', sa.LargeBinary(), nullable=False),
+    sa.Column('metadata_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('checkpoint_metadata', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id'),
+    if_not_exists=True
+    )
+    op.create_table('graphcheckpointwrite',
+    sa.Column('thread_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('checkpoint_ns', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('checkpoint_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('task_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('idx', sa.Integer(), nullable=False),
+    sa.Column('channel', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('value_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('task_path', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx'),
+    if_not_exists=True
+    )
+    op.create_table('webtoolcache',
+    sa.Column('cache_key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('tool_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('result_json', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('cache_key'),
+    if_not_exists=True
+    )
+    op.create_index('ix_webtoolcache_expires_at', 'webtoolcache', ['expires_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_webtoolcache_tool_name', 'webtoolcache', ['tool_name'], unique=False, if_not_exists=True)
+
+    op.create_table('researchjob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rag_session_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('params_json', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('worker_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('resume_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['rag_session_id'], ['ragsession.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    # researchjob の再開用の列は後から追加されたため、先に作成済みのテーブルには列だけ足す
+    with op.batch_alter_table('researchjob', schema=None) as batch_op:
+        if not _has_column('researchjob', 'heartbeat_at'):
+            batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+        if not _has_column('researchjob', 'resume_count'):
+            batch_op.add_column(sa.Column('resume_count', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_researchjob_rag_session_id', 'researchjob', ['rag_session_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_researchjob_status', 'researchjob', ['status'], unique=False, if_not_exists=True)
+    op.create_index('ix_researchjob_user_id', 'researchjob', ['user_id'], unique=False, if_not_exists=True)
+
+    op.create_index('ix_ragmessage_session_id_id', 'ragmessage', ['session_id', 'id'], unique=False, if_not_exists=True)
+
+    with op.batch_alter_table('ragsession', schema=None) as batch_op:
+        if not _has_column('ragsession', 'history_summary'):
+            batch_op.add_column(sa.Column('history_summary', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+        if not _has_column('ragsession', 'history_summary_until_id'):
+            batch_op.add_column(sa.Column('history_summary_until_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('ragsession', schema=None) as batch_op:
+        batch_op.drop_column('history_summary_until_id')
+        batch_op.drop_column('history_summary')
+
+    op.drop_index('ix_ragmessage_session_id_id', table_name='ragmessage')
+
+    op.drop_index('ix_researchjob_user_id', table_name='researchjob')
+    op.drop_index('ix_researchjob_status', table_name='researchjob')
+    op.drop_index('ix_researchjob_rag_session_id', table_name='researchjob')
+    op.drop_table('researchjob')
+
+    op.drop_index('ix_webtoolcache_tool_name', table_name='webtoolcache')
+    op.drop_index('ix_webtoolcache_expires_at', table_name='webtoolcache')
+    op.drop_table('webtoolcache')
+    op.drop_table('graphcheckpointwrite')
+    op.drop_table('graphcheckpoint')
@@ -0,0 +1,52 @@
+"""summary lookup indexes
+
+Revision ID: 0003_summary_lookup_indexes
+Revises: 0002_research_queue
+Create Date: 2026-10-18 22:33:26.578266
+
+要約の検索条件に合わせた複合インデックス・部分インデックス。
+- generatedsummary: 論文ごとの一覧（created_at 順）と、キャラクターなし要約の最新（部分インデックス）
+- custom_generated_summary: ユーザー×論文の一覧・キャラクター別・プロンプト別
+PostgreSQL では書き込みを止めないよう CREATE INDEX CONCURRENTLY で作成する（トランザクション外で実行）。
+editedsummary は (user_id, generated_summary_id) / (user_id, custom_generated_summary_id) の
+一意制約のインデックスが検索に使われるため追加しない（scripts/check_query_plans.py で確認）。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_summary_lookup_indexes'
+down_revision: Union[str, None] = '0002_research_queue'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NO_CHARACTER = sa.text('character_role IS NULL')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_generatedsummary_paper_created', 'generatedsummary', ['paper_metadata_id', 'created_at'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_generatedsummary_paper_created_no_character', 'generatedsummary', ['paper_metadata_id', 'created_at'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=True,
+                        sqlite_where=NO_CHARACTER, postgresql_where=NO_CHARACTER)
+        op.create_index('ix_custom_summary_user_paper_created', 'custom_generated_summary', ['user_id', 'paper_metadata_id', 'created_at'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_custom_summary_user_paper_character', 'custom_generated_summary', ['user_id', 'paper_metadata_id', 'character_role', 'id'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_custom_summary_paper_prompt_created', 'custom_generated_summary', ['paper_metadata_id', 'system_prompt_id', 'created_at'],
+                        unique=False, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_custom_summary_paper_prompt_created', table_name='custom_generated_summary')
+    op.drop_index('ix_custom_summary_user_paper_character', table_name='custom_generated_summary')
+    op.drop_index('ix_custom_summary_user_paper_created', table_name='custom_generated_summary')
+    op.drop_index('ix_generatedsummary_paper_created_no_character', table_name='generatedsummary')
+    op.drop_index('ix_generatedsummary_paper_created', table_name='generatedsummary')
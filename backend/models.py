@@ -2,7 +2,7 @@
 from datetime import date as Date, datetime
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship # Relationship をインポート
-from sqlalchemy import UniqueConstraint # UniqueConstraint をインポート
+from sqlalchemy import Index, UniqueConstraint, text # UniqueConstraint をインポート
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -74,8 +74,14 @@ class GeneratedSummary(SQLModel, table=True):
     edited_summaries: List["EditedSummary"] = Relationship(back_populates="generated_summary")
 
 
-    # Unique constraint
-    __table_args__ = (UniqueConstraint("paper_metadata_id", "llm_provider", "llm_model_name", "character_role", "affinity_level", name="uq_summary_paper_llm_character_affinity"),)
+    # Unique constraint（論文・モデル・キャラクター・好感度の完全一致での重複チェックにも使われる）
+    # 論文ごとの要約一覧は created_at 順、タグ生成はキャラクターなし要約の最新を優先して読む
+    __table_args__ = (
+        UniqueConstraint("paper_metadata_id", "llm_provider", "llm_model_name", "character_role", "affinity_level", name="uq_summary_paper_llm_character_affinity"),
+        Index("ix_generatedsummary_paper_created", "paper_metadata_id", "created_at"),
+        Index("ix_generatedsummary_paper_created_no_character", "paper_metadata_id", "created_at",
+              sqlite_where=text("character_role IS NULL"), postgresql_where=text("character_role IS NULL")),
+    )
 
 class SystemPrompt(SQLModel, table=True):
     """
@@ -163,7 +169,13 @@ class CustomGeneratedSummary(SQLModel, table=True):
     edited_summaries: List["EditedSummary"] = Relationship(back_populates="custom_generated_summary")
 
     # Unique constraint: 同一ユーザー・論文・プロンプト・モデル・キャラクター・好感度レベルで1つまで
-    __table_args__ = (UniqueConstraint("user_id", "paper_metadata_id", "system_prompt_id", "llm_provider", "llm_model_name", "character_role", "affinity_level", name="uq_custom_summary_user_paper_prompt_llm_character_affinity"),)
+    # ユーザー×論文の一覧（created_at 順）・キャラクター別の検索（id 順）・プロンプト別の生成結果の取得用インデックス
+    __table_args__ = (
+        UniqueConstraint("user_id", "paper_metadata_id", "system_prompt_id", "llm_provider", "llm_model_name", "character_role", "affinity_level", name="uq_custom_summary_user_paper_prompt_llm_character_affinity"),
+        Index("ix_custom_summary_user_paper_created", "user_id", "paper_metadata_id", "created_at"),
+        Index("ix_custom_summary_user_paper_character", "user_id", "paper_metadata_id", "character_role", "id"),
+        Index("ix_custom_summary_paper_prompt_created", "paper_metadata_id", "system_prompt_id", "created_at"),
+    )
 
 class UserPaperLink(SQLModel, table=True):
     __tablename__ = "userpaperlink" # 明示的にテーブル名を指定
@@ -240,6 +252,8 @@ class RagSession(SQLModel, table=True):
     title: str = Field(default="", description="会話履歴の自動生成タイトル")
     processing_status: Optional[str] = Field(default=None, description="例: pending, planning, agent_running, summarizing, completed, failed")
     last_updated: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
+    history_summary: Optional[str] = Field(default=None, nullable=True, description="トークン予算外になった古い会話のローリング要約")
+    history_summary_until_id: Optional[int] = Field(default=None, nullable=True, description="history_summary に含まれる最後の RagMessage.id")
 
     # Relationship
     user: Optional[User] = Relationship(back_populates="rag_sessions")
@@ -248,6 +262,8 @@ class RagSession(SQLModel, table=True):
 
 class RagMessage(SQLModel, table=True):
     __tablename__ = "ragmessage"
+    # セッション内の履歴を id 順（末尾から）に読むためのインデックス
+    __table_args__ = (Index("ix_ragmessage_session_id_id", "session_id", "id"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: int = Field(foreign_key="ragsession.id", index=True)
     role: str
@@ -260,6 +276,62 @@ class RagMessage(SQLModel, table=True):
     session: Optional[RagSession] = Relationship(back_populates="messages")
 
 
+class ResearchJob(SQLModel, table=True):
+    """DeepResearch / DeepRAG の実行キュー（ワーカーが queued のジョブを取得して実行する）"""
+    __tablename__ = "researchjob"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    rag_session_id: int = Field(foreign_key="ragsession.id", index=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    kind: str = Field(description="deepresearch または deeprag")
+    params_json: Optional[str] = Field(default=None, description="実行パラメータ（JSON）")
+    status: str = Field(default="queued", index=True, description="例: queued, running, completed, failed, cancelled")
+    cancel_requested: bool = Field(default=False)
+    worker_id: Optional[str] = Field(default=None, nullable=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(default=None, nullable=True)
+    finished_at: Optional[datetime] = Field(default=None, nullable=True)
+    heartbeat_at: Optional[datetime] = Field(default=None, nullable=True, description="実行中ワーカーの生存確認時刻")
+    resume_count: int = Field(default=0, description="停止したワーカーから再開した回数")
+
+
+class GraphCheckpoint(SQLModel, table=True):
+    """LangGraph のチェックポイント（DeepResearch / DeepRAG の実行途中状態）"""
+    __tablename__ = "graphcheckpoint"
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(default="", primary_key=True)
+    checkpoint_id: str = Field(primary_key=True)
+    parent_checkpoint_id: Optional[str] = Field(default=None, nullable=True)
+    checkpoint_type: str
+    checkpoint: bytes
+    metadata_type: str
+    checkpoint_metadata: bytes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class GraphCheckpointWrite(SQLModel, table=True):
+    """LangGraph のチェックポイントに紐づくノードの書き込み（ノード途中で停止した場合の再開用）"""
+    __tablename__ = "graphcheckpointwrite"
+    thread_id: str = Field(primary_key=True)
+    checkpoint_ns: str = Field(default="", primary_key=True)
+    checkpoint_id: str = Field(primary_key=True)
+    task_id: str = Field(primary_key=True)
+    idx: int = Field(primary_key=True)
+    channel: str
+    value_type: str
+    value: bytes
+    task_path: str = Field(default="")
+
+
+class WebToolCache(SQLModel, table=True):
+    """Web 検索・抽出ツール（Tavily）の結果キャッシュ（プロセス再起動後・インスタンス間で共有する場合に使う）"""
+    __tablename__ = "webtoolcache"
+    cache_key: str = Field(primary_key=True, description="ツール名と正規化した引数のハッシュ")
+    tool_name: str = Field(index=True)
+    result_json: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+
 
 
 class EditedSummary(SQLModel, table=True):
@@ -15,6 +15,7 @@ from auth_utils import (
     get_password_hash,
     verify_password,
     get_current_active_user,
+    get_current_active_user_fresh,
 )
 from db import get_session
 # ★ 削除に必要なすべてのモデルをインポート
@@ -24,6 +25,10 @@ from models import (
 )
 from schemas import Token, UserCreate, UserRead, PasswordChangeRequest, ColorThemeUpdateRequest, DisplayNameUpdateRequest, BackgroundImagesUpdateRequest, AvailableBackgroundImagesResponse, CharacterSelectionUpdateRequest, AffinityLevelUpdateRequest
 from vectorstore.manager import delete_vectors_by_metadata
+from routers.module.prompt_cache import bump_user_snapshot_version
+from routers.module.user_cache import invalidate_cached_user
+from routers.module.profiler import profile_task
+from routers.module.tracing import wrap_with_context
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -132,7 +137,7 @@ async def login_for_access_token(
 @router.post("/change-password", status_code=status.HTTP_204_NO_CONTENT)
 async def change_password(
     payload: PasswordChangeRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     if not current_user.hashed_password:
@@ -153,11 +158,12 @@ async def change_password(
     # current_user.updated_at = datetime.utcnow() # ★ この行を削除
     session.add(current_user)
     session.commit()
+    invalidate_cached_user(current_user.id)
     return
 
 @router.delete("/delete-account", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_account(
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     user_id_to_delete = current_user.id
@@ -219,6 +225,7 @@ async def delete_account(
     # 4. 変更をコミット
     try:
         session.commit()
+        invalidate_cached_user(user_id_to_delete)
         print(f"--- Account deletion successful for user_id: {user_id_to_delete} ---")
     except Exception as e:
         print(f"--- CRITICAL: Final commit failed during account deletion for user_id: {user_id_to_delete} ---")
@@ -231,14 +238,14 @@ async def delete_account(
     return
 
 @router.get("/me", response_model=UserRead)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_active_user_fresh)):
     """現在のユーザー情報を取得"""
     return current_user
 
 @router.put("/color-theme", response_model=UserRead)
 async def update_color_theme(
     payload: ColorThemeUpdateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     """ユーザーのカラーテーマを更新"""
@@ -255,13 +262,14 @@ async def update_color_theme(
     
     session.add(current_user)
     session.commit()
+    invalidate_cached_user(current_user.id)
     session.refresh(current_user)
     return current_user
 
 @router.put("/display-name", response_model=UserRead)
 async def update_display_name(
     payload: DisplayNameUpdateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     """ユーザーの表示名を更新"""
@@ -271,13 +279,15 @@ async def update_display_name(
     
     session.add(current_user)
     session.commit()
+    invalidate_cached_user(current_user.id)
+    bump_user_snapshot_version(current_user.id)
     session.refresh(current_user)
     return current_user
 
 @router.put("/character-selection", response_model=UserRead)
 async def update_character_selection(
     payload: CharacterSelectionUpdateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     """ユーザーの選択キャラクターを更新"""
@@ -299,13 +309,15 @@ async def update_character_selection(
     
     session.add(current_user)
     session.commit()
+    invalidate_cached_user(current_user.id)
+    bump_user_snapshot_version(current_user.id)
     session.refresh(current_user)
     return current_user
 
 @router.put("/affinity-level", response_model=UserRead)
 async def update_affinity_level(
     payload: AffinityLevelUpdateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     """ユーザーのキャラクター好感度レベルを更新"""
@@ -329,13 +341,14 @@ async def update_affinity_level(
     
     session.add(current_user)
     session.commit()
+    invalidate_cached_user(current_user.id)
     session.refresh(current_user)
     return current_user
 
 @router.put("/background-images", response_model=UserRead)
 async def update_background_images(
     payload: BackgroundImagesUpdateRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     """ユーザーの背景画像設定を更新"""
@@ -374,12 +387,13 @@ async def update_background_images(
     
     session.add(current_user)
     session.commit()
+    invalidate_cached_user(current_user.id)
     session.refresh(current_user)
     return current_user
 
 @router.get("/available-background-images", response_model=AvailableBackgroundImagesResponse)
 async def get_available_background_images(
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
 ):
     """現在のユーザーのテーマ設定とポイントで利用可能な背景画像を取得"""
     from utils.backend_image_manager import get_available_images_for_user
@@ -443,6 +457,7 @@ async def serve_backend_image(
         }
     )
 
+@profile_task("bulk_character_update")   # /debug/profiles/arm で予約されている場合のみプロファイルする
 def bulk_update_character_selections_background(user_id: int, selected_character: Optional[str]):
     """バックグラウンドで一括更新を実行する関数"""
     from models import UserPaperLink, GeneratedSummary, CustomGeneratedSummary
@@ -639,7 +654,7 @@ def bulk_update_character_selections_background(user_id: int, selected_character
 
 @router.put("/character-selection-bulk-update", response_model=UserRead)
 async def bulk_update_character_selections(
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
     session: Session = Depends(get_session),
 ):
     """キャラクター変更時に関連するUserPaperLinkの選択要約を一括更新"""
@@ -813,7 +828,7 @@ async def bulk_update_character_selections(
 
 @router.put("/character-selection-bulk-update-async")
 async def bulk_update_character_selections_async(
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_active_user_fresh),
 ):
     """キャラクター変更時の一括更新をバックグラウンドで開始"""
     
@@ -831,7 +846,7 @@ async def bulk_update_character_selections_async(
     
     # バックグラウンドで一括更新を開始
     thread = threading.Thread(
-        target=bulk_update_character_selections_background,
+        target=wrap_with_context(bulk_update_character_selections_background),
         args=(current_user.id, current_user.selected_character)
     )
     thread.daemon = True
@@ -1,5 +1,5 @@
 # backend/routers/deeprag.py
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, Request
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, Query, Request
 from sqlmodel import Session, select
 from langchain_core.messages import AIMessage, HumanMessage, AnyMessage, SystemMessage
 from google import genai
@@ -11,9 +11,11 @@ from schemas import (
     DeepRagStartRequest,
     DeepResearchStartResponse as DeepRagStartResponse,
     DeepResearchStatusResponse as DeepRagStatusResponse,
+    DeepResearchCancelResponse as DeepRagCancelResponse,
     RagMessageRead
 )
-from .deeprag_core import run_deep_rag_graph_async # Changed from deepresearch_core
+from routers.module.status_notifier import long_poll_status, rag_session_status_key, MAX_LONG_POLL_SECONDS
+from routers.module.research_worker import ensure_research_capacity, enqueue_research_job, request_research_cancel, research_updates_are_external
 from auth_utils import get_current_active_user
 
 from dotenv import load_dotenv, find_dotenv
@@ -75,7 +77,6 @@ def make_title_from_query_deeprag(query: str, db: Session, user_id: int) -> str:
 async def start_deeprag_task(
     payload: DeepRagStartRequest, # ★ Use the specific DeepRagStartRequest
     request: Request,             # ★ FastAPI Request object
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -93,6 +94,9 @@ async def start_deeprag_task(
     if not query.strip():
         raise HTTPException(status_code=422, detail="Query cannot be empty.")
 
+    # ワーカーの実行枠とキューが埋まっている場合はセッションを作る前に 429 を返す
+    ensure_research_capacity(db)
+
     rag_session_for_task: RagSession | None = None
     if rag_session_id_payload:
         rag_session_for_task = db.get(RagSession, rag_session_id_payload)
@@ -114,29 +118,19 @@ async def start_deeprag_task(
     tags_str_for_graph = ",".join(tags_for_graph) if tags_for_graph else ""
     base_url_origin_for_graph = request.headers.get("origin", "http://localhost:3000") # ★ Get origin
 
-    def run_graph_task_wrapper(session_id_for_task: int, initial_query: str, user_id_for_task: int, tags_for_task: str, base_url: str, system_prompt_group_id_for_task: int | None = None, use_character_prompt_for_task: bool = True): # Added base_url, system_prompt_group_id and use_character_prompt
-        with Session(engine) as task_db_session:
-            # ... (message fetching logic) ...
-            msgs_stmt = (select(RagMessage).where(RagMessage.session_id == session_id_for_task).order_by(RagMessage.created_at))
-            msgs_from_db = task_db_session.exec(msgs_stmt).all()
-            lc_messages_dr: list[AnyMessage] = []
-            for m_db in msgs_from_db:
-                if m_db.role == "user": lc_messages_dr.append(HumanMessage(content=m_db.content))
-                elif m_db.role == "assistant" or m_db.role == "system_step": lc_messages_dr.append(AIMessage(content=m_db.content))
-                elif m_db.role == "system": lc_messages_dr.append(SystemMessage(content=m_db.content))
-
-            run_deep_rag_graph_async(
-                initial_messages=lc_messages_dr,
-                db_session=task_db_session,
-                rag_session_id=session_id_for_task,
-                user_id=user_id_for_task,
-                tags=tags_for_task,
-                base_url_origin=base_url, # ★ Pass base_url_origin
-                system_prompt_group_id=system_prompt_group_id_for_task,  # ★ Pass system_prompt_group_id
-                use_character_prompt=use_character_prompt_for_task  # ★ Pass use_character_prompt
-            )
-
-    background_tasks.add_task(run_graph_task_wrapper, final_rag_session_id, query, current_user.id, tags_str_for_graph, base_url_origin_for_graph, payload.system_prompt_group_id, payload.use_character_prompt) # ★ Pass base_url_origin, system_prompt_group_id and use_character_prompt
+    # 実行は専用ワーカーに任せる（Web ワーカーのスレッドを長時間占有しない）
+    enqueue_research_job(
+        db,
+        kind="deeprag",
+        rag_session_id=final_rag_session_id,
+        user_id=current_user.id,
+        params={
+            "tags": tags_str_for_graph,
+            "base_url_origin": base_url_origin_for_graph,
+            "system_prompt_group_id": payload.system_prompt_group_id,
+            "use_character_prompt": payload.use_character_prompt
+        }
+    )
 
     return DeepRagStartResponse(
         session_id=final_rag_session_id,
@@ -145,27 +139,57 @@ async def start_deeprag_task(
 
 
 @router.get("/sessions/{session_id}/status", response_model=DeepRagStatusResponse)
-def get_deeprag_session_status( # Renamed function
+async def get_deeprag_session_status( # Renamed function
+    session_id: int,
+    since_id: Optional[int] = Query(None, description="このメッセージIDより後のメッセージのみ返す（増分取得）"),
+    wait: float = Query(0, ge=0, le=MAX_LONG_POLL_SECONDS, description="変化がない場合に待機する最大秒数（ロングポーリング）"),
+    known_status: Optional[str] = Query(None, description="クライアントが最後に受け取ったステータス"),
+    current_user: User = Depends(get_current_active_user)
+):
+    def load_snapshot() -> DeepRagStatusResponse:
+        # 待機中にリクエストスコープの接続を保持しないよう、取得ごとにセッションを開く
+        with Session(engine) as db:
+            rag_session_status = db.get(RagSession, session_id)
+            if not rag_session_status or rag_session_status.user_id != current_user.id:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DeepRAG session not found or not authorized.") # Changed message
+
+            messages_stmt_status = select(RagMessage).where(RagMessage.session_id == session_id)
+            if since_id is not None:
+                messages_stmt_status = messages_stmt_status.where(RagMessage.id > since_id)
+            messages_from_db_status = db.exec(messages_stmt_status.order_by(RagMessage.created_at)).all()
+
+            messages_for_response_status = [RagMessageRead.model_validate(msg) for msg in messages_from_db_status]
+
+            return DeepRagStatusResponse(
+                session_id=rag_session_status.id,
+                status=rag_session_status.processing_status,
+                messages=messages_for_response_status,
+                last_updated=rag_session_status.last_updated,
+                last_message_id=max((m.id for m in messages_for_response_status), default=since_id)
+            )
+
+    return await long_poll_status(
+        rag_session_status_key(session_id), load_snapshot, wait_seconds=wait, known_status=known_status,
+        external_updates=research_updates_are_external()
+    )
+
+
+@router.post("/sessions/{session_id}/cancel", response_model=DeepRagCancelResponse)
+def cancel_deeprag_task(
     session_id: int,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
-    rag_session_status = db.get(RagSession, session_id)
-    if not rag_session_status or rag_session_status.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DeepRAG session not found or not authorized.") # Changed message
-
-    messages_stmt_status = (
-        select(RagMessage)
-        .where(RagMessage.session_id == session_id)
-        .order_by(RagMessage.created_at)
+    rag_session = db.get(RagSession, session_id)
+    if not rag_session or rag_session.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DeepRAG session not found or not authorized.")
+
+    cancel_status = request_research_cancel(db, session_id)
+    if cancel_status is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No running DeepRAG task for this session.")
+
+    return DeepRagCancelResponse(
+        session_id=session_id,
+        status=cancel_status,
+        message="DeepRAG task cancelled." if cancel_status == "cancelled" else "Cancellation requested."
     )
-    messages_from_db_status = db.exec(messages_stmt_status).all()
-    
-    messages_for_response_status = [RagMessageRead.model_validate(msg) for msg in messages_from_db_status]
-
-    return DeepRagStatusResponse(
-        session_id=rag_session_status.id,
-        status=rag_session_status.processing_status,
-        messages=messages_for_response_status,
-        last_updated=rag_session_status.last_updated
-    )
\ No newline at end of file
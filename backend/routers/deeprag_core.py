@@ -1,6 +1,6 @@
 # backend/routers/deeprag_core.py
 import os
-import time
+import uuid
 import operator
 import json
 from typing import Literal, List, Any, Dict
@@ -10,20 +10,19 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, AnyMessage, BaseMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.tools import Tool
+from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel as LangchainBaseModel, Field as LangchainField
 
 import langgraph
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
-from langgraph.types import Command
+from langgraph.types import Command, Send
 
 from sqlmodel import Session
 from models import RagSession, RagMessage
 from datetime import datetime
 
-import time
-import concurrent.futures
-from typing import Union # Python 3.9+ であれば int | float のように書けます
+from typing import Union, Optional, Callable # Python 3.9+ であれば int | float のように書けます
 import logging
 
 from .module.rag_tools import local_rag_search_tool_impl
@@ -37,6 +36,22 @@ from .module.prompt_manager import (
     get_deeprag_summary_prompt_with_character
 )
 from .module.prompt_group_resolver import resolve_prompt_group
+from .module.graph_registry import get_compiled_graph, get_run_chain_cache, new_run_configurable, llm_cache_key
+from .module.research_worker import ResearchRunCancelled
+from .module.llm_retry import invoke_validated, invoke_with_retry
+from .module.graph_checkpointer import get_graph_checkpointer, has_checkpoint
+from .module.run_message_writer import get_run_message_writer, open_run_message_writer, close_run_message_writer
+from .module.parallel_research import (
+    get_parallel_research_config,
+    branch_results_reducer,
+    select_parallel_tasks,
+    latest_user_question,
+    branch_input_messages,
+    branch_db_session,
+    run_branch_agent_loop,
+    branch_result,
+    merge_branch_results,
+)
 from routers.module.util import initialize_llm
 
 logger = logging.getLogger(__name__)
@@ -84,19 +99,21 @@ class GraphState(TypedDict):
     messages: list[AnyMessage]
     history: list[AnyMessage]
     agent_temp_message: list[AnyMessage]
-    db_session: Session
     rag_session_id: int
     user_id: int
     tags: str # Comma-separated tags string
     base_url_origin: str
     system_prompt_group_id: int | None  # プロンプトグループID
     use_character_prompt: bool  # ★ 追加: キャラクタープロンプト使用フラグ
+    branch_results: Annotated[list, branch_results_reducer]  # 並列サブタスクの結果（merge_branches で結合）
+    deferred_tasks: list[str]  # max_branches を超えて今回は実行しない並列タスク（merge_branches で Supervisor に差し戻す）
 
 class RouterSchema(LangchainBaseModel):
     reasoning: str = LangchainField(description="LLMの思考過程")
     planning: str = LangchainField(description="LLMの再立案した戦略")
     next_action: str = LangchainField(description="次のノードで期待する役割（RAGの場合は検索クエリ）")
     next: Literal["agent", "summary"] = LangchainField(description="次のノードの遷移先")
+    parallel_actions: List[str] = LangchainField(default_factory=list, description="next が agent の場合に、互いに独立して同時に実行できる検索タスクの一覧。独立したタスクが2件以上ある場合のみ、単独で実行できる具体的な指示（検索クエリ）として列挙する")
 
 class CoordinatorRouterSchema(LangchainBaseModel):
     reasoning: str = LangchainField(description="LLMの思考過程")
@@ -316,6 +333,11 @@ def _save_message_to_db(db: Session, rag_session_id: int, role: str, content: An
         msg_content = str(content)
 
     if msg_content:
+        writer = get_run_message_writer(rag_session_id)
+        if writer is not None:
+            # グラフ実行中はバッファに積み、ノード境界またはタイマーでまとめて書き込む
+            writer.add_message(role, msg_content, is_step, metadata)
+            return
         db_msg = RagMessage(
             session_id=rag_session_id,
             role=role,
@@ -329,6 +351,10 @@ def _save_message_to_db(db: Session, rag_session_id: int, role: str, content: An
 
 
 def _update_rag_session_status(db: Session, rag_session_id: int, status: str):
+    writer = get_run_message_writer(rag_session_id)
+    if writer is not None:
+        writer.set_status(status)
+        return
     rag_session = db.get(RagSession, rag_session_id)
     if rag_session:
         rag_session.processing_status = status
@@ -340,132 +366,68 @@ def _update_rag_session_status(db: Session, rag_session_id: int, status: str):
 #                      グラフ生成（チェーンは動的に作成）
 # -----------------------------------------------------------------
 
-def create_deeprag_graph(initial_state_for_tool: GraphState):
-
-    # Tool definition for ToolNode
-    # The actual execution will happen within the func, using db_session, user_id, tags from initial_state_for_tool
-    # This is a way to make state available to the tool via closure, though not ideal for dynamic state.
-    # A better way for dynamic state is to pass it explicitly if the tool func could accept it.
-    # Since ToolNode calls func(query), we use the initial_state_for_tool captured at graph creation.
-    # This implies that db_session, user_id, tags, base_url_origin are fixed for the graph's lifetime once created.
-    # This is generally acceptable for user_id, tags, and base_url_origin for a given session.
-    # db_session might be problematic if it needs to be fresh per call, but for a single graph invocation, it's often fine.
-
-    _db_session = initial_state_for_tool["db_session"]
-    _user_id = initial_state_for_tool["user_id"]
-    _tags = initial_state_for_tool["tags"]
-
-    def bound_local_rag_search_tool_func(query: str) -> List[Dict[str, Any]]:
-        # This function is called by ToolNode. It uses the captured state.
-        return local_rag_search_tool_impl(
-            query=query,
-            user_id=_user_id,
-            db_session=_db_session,
-            tags=_tags,
-            deep_agents=True
-        )
+def _local_rag_search_tool_func(query: str, config: RunnableConfig) -> List[Dict[str, Any]]:
+    # グラフは全実行で共有するため、ユーザーID・DBセッション・タグは実行ごとの config から受け取る
+    run_context = config["configurable"]
+    return local_rag_search_tool_impl(
+        query=query,
+        user_id=run_context["user_id"],
+        db_session=run_context["db_session"],
+        tags=run_context["tags"],
+        deep_agents=True
+    )
+
+local_rag_tool_for_node = Tool(
+    name="local_rag_search_tool",
+    func=_local_rag_search_tool_func,
+    description="ユーザーの知識ベース（登録された論文の要約）内を検索します。引数として `query` (検索クエリ文字列) と`user_id`と`tag`を指定してください。",
+    args_schema=RagSearchInputSchema
+)
+
 
-    local_rag_tool_for_node = Tool(
-        name="local_rag_search_tool",
-        func=bound_local_rag_search_tool_func,
-        description="ユーザーの知識ベース（登録された論文の要約）内を検索します。引数として `query` (検索クエリ文字列) と`user_id`と`tag`を指定してください。",
-        args_schema=RagSearchInputSchema
+def _resolve_prompt_ids(state: GraphState, config: RunnableConfig):
+    """プロンプトグループから個別プロンプトIDを解決する（同一実行内では初回のみDB参照）"""
+    return get_run_chain_cache(config).get_or_create(
+        ("prompt_ids", state.get("system_prompt_group_id")),
+        lambda: resolve_prompt_group(config["configurable"]["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deeprag")
     )
+
+
+def create_deeprag_graph():
+
     tool_node = ToolNode([local_rag_tool_for_node])
 
     def prediction_agent_with_retry(
         chain: Any,  # LangChainのChainオブジェクトなどを想定
         message_payload: Any,
-        timeout_seconds: Union[int, float] = 300,
-        max_retries: int = 3,
-        retry_delay_seconds: Union[int, float] = 61
+        timeout_seconds: Optional[Union[int, float]] = None,
+        max_retries: Optional[int] = None
     ) -> Any:
         """
         LLMチェーンの呼び出しをタイムアウトとリトライ処理付きで実行します。
 
-        この関数は `chain.invoke(message_payload)` の呼び出しを試みます。
-        指定された `timeout_seconds` 内に呼び出しが完了しない場合 (TimeoutError)、
-        または呼び出し中にその他の例外が発生した場合にリトライを行います。
-        リトライは `max_retries` 回まで行われ、各リトライ前には 
-        `retry_delay_seconds` だけ待機します。
+        呼び出しは llm_retry の専用イベントループ上で `chain.ainvoke` として実行され、
+        タイムアウトした呼び出しはキャンセルされます（スレッドが残り続けることはありません）。
+        リトライ間隔は指数バックオフ＋ジッターで、プロバイダが Retry-After を返した場合はそれに従います。
 
         Args:
-            chain: `invoke`メソッドを持つオブジェクト (例: LangChainのChain)。
-            message_payload: `chain.invoke`に渡すペイロード。
-            timeout_seconds: `chain.invoke`の呼び出し1回あたりのタイムアウト時間（秒）。
-            max_retries: 最大リトライ回数。初回実行はこれに含まれません。
-                        (例: max_retries=5 の場合、初回 + 5回リトライ = 合計6回試行)
-            retry_delay_seconds: リトライ間の待機時間（秒）。
+            chain: `ainvoke`メソッドを持つオブジェクト (例: LangChainのChain)。
+            message_payload: `chain.ainvoke`に渡すペイロード。
+            timeout_seconds: 1回あたりのタイムアウト時間（秒）。省略時は config.yaml の llm_retry.timeout_seconds。
+            max_retries: 最大リトライ回数。初回実行はこれに含まれません。省略時は llm_retry.max_retries。
 
         Returns:
-            `chain.invoke`が成功した場合のレスポンス。
+            `chain.ainvoke`が成功した場合のレスポンス。
 
         Raises:
-            Exception: `max_retries`回リトライしても成功しなかった場合、
-                    最後に発生した例外（TimeoutErrorまたは`chain.invoke`からの例外）を再送出します。
-
-        注意点:
-        - このタイムアウト機構は `chain.invoke` の実行を別スレッドで行います。
-        タイムアウトが発生した場合、メインの処理はリトライに進みますが、
-        バックグラウンドスレッドで実行されていた `chain.invoke` の処理を
-        強制的に中断することはできません。そのため、タイムアウト後も元の処理が
-        リソースを消費し続ける可能性があります。
-        - 可能であれば、使用しているLLMライブラリ自体が提供するタイムアウト設定
-        （例: APIクライアントのrequest_timeoutパラメータ）の利用も検討してください。
-        そちらの方がより適切にリソースを管理できる場合があります。
+            Exception: `max_retries`回リトライしても成功しなかった場合は最後に発生した例外、
+                    モデルのサーキットブレーカーが開いている場合は LLMCircuitOpenError。
         """
-        error_cnt = 0  # これまでの試行で発生したエラーの回数 (0から始まる)
-        last_exception: Union[Exception, None] = None  # 最後に発生した例外を保持
+        return invoke_with_retry(chain, message_payload, timeout_seconds=timeout_seconds, max_retries=max_retries)
 
-        # error_cnt が 0 から max_retries までの間、ループを実行 (合計 max_retries + 1 回の試行)
-        while error_cnt <= max_retries:
-            attempt_number = error_cnt + 1
-            try:
-                # ThreadPoolExecutorを使用してタイムアウト付きで実行
-                # max_workers=1 は、この関数呼び出し内で一度に1つの chain.invoke のみ実行されることを保証
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    # chain.invoke を executor にサブミットし、Futureオブジェクトを取得
-                    future = executor.submit(chain.invoke, message_payload)
-                    
-                    print(f"Attempt {attempt_number}/{max_retries + 1}: Invoking LLM chain... Waiting for response up to {timeout_seconds} seconds.")
-                    
-                    # future.result() で結果を待つ。
-                    # - 指定時間内に完了すれば結果を返す。
-                    # - 指定時間内に完了しなければ concurrent.futures.TimeoutError を送出。
-                    # - chain.invoke 内で発生した例外は、future.result() によってここで再送出される。
-                    response = future.result(timeout=timeout_seconds)
-                    return response  # 成功したらレスポンスを返し、ループを抜ける
-
-            except concurrent.futures.TimeoutError as te:
-                # タイムアウトが発生した場合
-                print(f"Attempt {attempt_number}/{max_retries + 1}: LLM call timed out after {timeout_seconds} seconds.")
-                last_exception = te
-            
-            except Exception as e:
-                # chain.invoke内で発生したAPIエラー (RateLimitErrorなど) やその他の予期せぬ例外
-                print(f"Attempt {attempt_number}/{max_retries + 1}: Error occurred during LLM call: {e.__class__.__name__}: {e}")
-                last_exception = e
-
-            # --- リトライ処理 ---
-            if error_cnt < max_retries:
-                # まだリトライ回数が残っている場合
-                error_cnt += 1 # 次の試行のためにエラーカウントを増やす
-                print(f"Retrying in {retry_delay_seconds} seconds... (Next attempt: {error_cnt + 1}/{max_retries + 1})")
-                time.sleep(retry_delay_seconds)
-            else:
-                # リトライ回数上限に達した場合
-                print(f"Max retries ({max_retries}) reached. Last error: {last_exception.__class__.__name__}: {last_exception if last_exception else 'N/A'}")
-                if last_exception:
-                    raise last_exception  # 最後に補足した例外を再送出
-                else:
-                    # このフォールバックは、上記のロジックでは通常到達しないはず
-                    raise Exception(f"Max retries ({max_retries}) reached, but no specific exception was recorded.")
-        
-        # ループが正常に終了することは想定していない (常にreturnするかraiseするため)
-        # 万が一ここに到達した場合のフェイルセーフ
-        if last_exception:
-            raise last_exception
-        raise Exception("Prediction agent failed after all retries without a specific exception.")
+    def _validate_ai_message(response: Any):
+        if not isinstance(response, AIMessage):
+            raise ValueError(f"Expected AIMessage but got {type(response)}")
 
     def should_continue_after_agent(state: GraphState):
         last_message = state["history"][-1]
@@ -473,78 +435,64 @@ def create_deeprag_graph(initial_state_for_tool: GraphState):
             return "tools"
         return "supervisor"
 
-    def call_coordinator(state: GraphState):
+    def call_coordinator(state: GraphState, config: RunnableConfig):
         # (Implementation from previous response, ensure db_session and rag_id are from state)
-        _update_rag_session_status(state["db_session"], state["rag_session_id"], "coordinator")
+        _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "coordinator")
 
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(state["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deeprag")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        coordinator_chain = get_coordinator_chain(state["db_session"], state["user_id"], prompt_ids.coordinator, state["use_character_prompt"])
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        coordinator_chain = get_run_chain_cache(config).get_or_create(
+            ("coordinator", prompt_ids.coordinator, llm_cache_key(coordinator_llm), state["use_character_prompt"]),
+            lambda: get_coordinator_chain(config["configurable"]["db_session"], state["user_id"], prompt_ids.coordinator, state["use_character_prompt"])
+        )
         
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを呼び出し、応答を取得
-                response: CoordinatorRouterSchema = prediction_agent_with_retry(coordinator_chain, {"history": state["history"]})
-                if response.next not in ["planner", "END"]:
-                    raise ValueError(f"Unexpected next node: {response.next}. Expected 'planner' or 'END'.")
-                break  # 成功したらループを抜ける
-            except Exception as e:
-                error_cnt += 1
-                logger.error(f"Coordinator chain execution failed: {e}")
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for coordinator chain. Exiting.")
-                    break
+        def validate(response: CoordinatorRouterSchema):
+            if response.next not in ["planner", "END"]:
+                raise ValueError(f"Unexpected next node: {response.next}. Expected 'planner' or 'END'.")
+
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: CoordinatorRouterSchema = invoke_validated(prediction_agent_with_retry, coordinator_chain, {"history": state["history"]}, validate, "coordinator")
 
         print(f"Coordinator response: {response}")
 
         if response.next == "planner": 
             goto = "planner"
-            _save_message_to_db(state["db_session"], state["rag_session_id"], "system_step", response.response, is_step=True, metadata={"step_name": "coordinator_output"})
+            _save_message_to_db(config["configurable"]["db_session"], state["rag_session_id"], "system_step", response.response, is_step=True, metadata={"step_name": "coordinator_output"})
 
         elif response.next == "END":
             goto = END
-            _save_message_to_db(state["db_session"], state["rag_session_id"], "assistant", response.response, is_step=True, metadata={"step_name": "coordinator_output"})
-            _update_rag_session_status(state["db_session"], state["rag_session_id"], "completed")
+            _save_message_to_db(config["configurable"]["db_session"], state["rag_session_id"], "assistant", response.response, is_step=True, metadata={"step_name": "coordinator_output"})
+            _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "completed")
 
         return Command(goto=goto)
 
 
-    def call_planner(state: GraphState):
+    def call_planner(state: GraphState, config: RunnableConfig):
         # (Implementation from previous response)
-        _update_rag_session_status(state["db_session"], state["rag_session_id"], "planning")
+        _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "planning")
         
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(state["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deeprag")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        planner_chain = get_planner_chain(state["db_session"], state["user_id"], prompt_ids.planner)
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        planner_chain = get_run_chain_cache(config).get_or_create(
+            ("planner", prompt_ids.planner, llm_cache_key(planner_llm)),
+            lambda: get_planner_chain(config["configurable"]["db_session"], state["user_id"], prompt_ids.planner)
+        )
         
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを呼び出し、応答を取得
-                response: AIMessage = prediction_agent_with_retry(planner_chain, {"history": state["history"]})
-                if not isinstance(response, AIMessage):
-                    raise ValueError(f"Expected AIMessage but got {type(response)}")
-                break  # 成功したらループを抜ける
-            except Exception as e:
-                error_cnt += 1
-                logger.error(f"Planner chain execution failed: {e}")
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for planner chain. Exiting.")
-                    break
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: AIMessage = invoke_validated(prediction_agent_with_retry, planner_chain, {"history": state["history"]}, _validate_ai_message, "planner")
 
         print(f"Planner response: {response}")
 
-        _save_message_to_db(state["db_session"], state["rag_session_id"], "system_step", response, is_step=True, metadata={"step_name": "planner_output"})
+        _save_message_to_db(config["configurable"]["db_session"], state["rag_session_id"], "system_step", response, is_step=True, metadata={"step_name": "planner_output"})
         return {"history": state["history"]+[response], "messages": []}
 
 
-    def call_supervisor(state: GraphState):
-        _update_rag_session_status(state["db_session"], state["rag_session_id"], "supervising")
+    def call_supervisor(state: GraphState, config: RunnableConfig):
+        _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "supervising")
 
         history = state["history"]
 
@@ -559,36 +507,45 @@ def create_deeprag_graph(initial_state_for_tool: GraphState):
             else:
                 new_messages.append(msg)
 
-        supervisor_decision_content = ""
-        sv_error_cnt = 0
-        
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(state["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deeprag")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        supervisor_chain = get_supervisor_chain(state["db_session"], state["user_id"], prompt_ids.supervisor)
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        supervisor_chain = get_run_chain_cache(config).get_or_create(
+            ("supervisor", prompt_ids.supervisor, llm_cache_key(supervisor_llm)),
+            lambda: get_supervisor_chain(config["configurable"]["db_session"], state["user_id"], prompt_ids.supervisor)
+        )
         
-        while True:
-            try:
-                response_router: RouterSchema = prediction_agent_with_retry(supervisor_chain, {"history": new_messages})
-                print(f"Supervisor response: {response_router}")
+        def validate(response_router: RouterSchema):
+            if response_router.next not in ["agent", "summary"]:
+                raise ValueError(f"Unexpected next node: {response_router.next}. Expected 'agent' or 'summary'.")
 
-                supervisor_decision_content = f" **Supervisor Decision: Next -> {response_router.next}.** \n\n **Reasoning:** \n{response_router.reasoning}. \n\n **Planning:** \n{response_router.planning}. \n\n **Next Action:** \n{response_router.next_action}"
-                break
-            except Exception as e:
-                sv_error_cnt += 1
-                if sv_error_cnt >= 5:
-                    print(f"Supervisor decision failed after {sv_error_cnt} attempts: {e}")
-                    raise e
-                # エラーが発生した場合は、少し待ってから再試行
-                print(f"Error in supervisor decision: {e}. Retrying...")
-                time.sleep(5)
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response_router: RouterSchema = invoke_validated(prediction_agent_with_retry, supervisor_chain, {"history": new_messages}, validate, "supervisor")
+        print(f"Supervisor response: {response_router}")
+
+        supervisor_decision_content = f" **Supervisor Decision: Next -> {response_router.next}.** \n\n **Reasoning:** \n{response_router.reasoning}. \n\n **Planning:** \n{response_router.planning}. \n\n **Next Action:** \n{response_router.next_action}"
 
-        _save_message_to_db(state["db_session"], state["rag_session_id"], "system_step", supervisor_decision_content, is_step=True, metadata={"step_name": "supervisor_decision"})
+        _save_message_to_db(config["configurable"]["db_session"], state["rag_session_id"], "system_step", supervisor_decision_content, is_step=True, metadata={"step_name": "supervisor_decision"})
 
         
         ai_message_for_next_node = AIMessage(content=response_router.next_action, name=f"supervisor_instruction")
 
+        # 独立したタスクが複数ある場合は、ブランチに振り分けて同時に実行する
+        parallel_tasks, deferred_tasks = select_parallel_tasks(response_router.parallel_actions) if response_router.next == "agent" else ([], [])
+        if parallel_tasks:
+            logger.debug("Dispatching %d parallel DeepRAG branches", len(parallel_tasks))
+            _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "agent_running")
+            return Command(
+                goto=[Send("research_branch", {**state, "branch_index": i, "branch_task": task}) for i, task in enumerate(parallel_tasks)],
+                update={
+                    "messages": [],
+                    "history": new_messages+[ai_message_for_next_node],
+                    "agent_temp_message": [],
+                    "deferred_tasks": deferred_tasks,
+                    }
+            )
+
         return Command(
                 goto=response_router.next,
                 update={
@@ -599,21 +556,24 @@ def create_deeprag_graph(initial_state_for_tool: GraphState):
             )
 
 
-    def call_agent(state: GraphState):
-        _update_rag_session_status(state["db_session"], state["rag_session_id"], "agent_running")
+    def call_agent(state: GraphState, config: RunnableConfig):
+        _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "agent_running")
         
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(state["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deeprag")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        current_agent_chain = get_agent_chain(
-            state["db_session"], 
-            state["user_id"], 
-            state["user_id"], 
-            state["tags"], 
-            state["base_url_origin"], 
-            local_rag_tool_for_node,
-            prompt_ids.agent
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        current_agent_chain = get_run_chain_cache(config).get_or_create(
+            ("agent", prompt_ids.agent, llm_cache_key(agent_llm)),
+            lambda: get_agent_chain(
+                config["configurable"]["db_session"], 
+                state["user_id"], 
+                state["user_id"], 
+                state["tags"], 
+                state["base_url_origin"], 
+                local_rag_tool_for_node,
+                prompt_ids.agent
+            )
         )
         
 
@@ -647,60 +607,72 @@ def create_deeprag_graph(initial_state_for_tool: GraphState):
         input_messages_for_agent[0] = HumanMessage(content=input_messages_for_agent[0].content)
         print("Agentへの入力メッセージ:", input_messages_for_agent)
 
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを呼び出し、応答を取得
-                response_ai_message: AIMessage = prediction_agent_with_retry(current_agent_chain, {"history": input_messages_for_agent})
-                if not isinstance(response_ai_message, AIMessage):
-                    raise ValueError(f"Expected AIMessage but got {type(response_ai_message)}")
-                break  # 成功したらループを抜ける
-            except Exception as e:
-                error_cnt += 1
-                logger.error(f"Agent chain execution failed: {e}")
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for agent chain. Exiting.")
-                    break
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response_ai_message: AIMessage = invoke_validated(prediction_agent_with_retry, current_agent_chain, {"history": input_messages_for_agent}, _validate_ai_message, "agent")
 
-        _save_message_to_db(state["db_session"], state["rag_session_id"], "system_step", response_ai_message, is_step=True, metadata={"step_name": "agent_output"})
+        _save_message_to_db(config["configurable"]["db_session"], state["rag_session_id"], "system_step", response_ai_message, is_step=True, metadata={"step_name": "agent_output"})
         return {"history": state["history"]+[response_ai_message], "agent_temp_message": all_inputs+[response_ai_message], "messages": [response_ai_message]}
 
-    def call_summary(state: GraphState):
+    def call_summary(state: GraphState, config: RunnableConfig):
         # (Implementation from previous response, ensure base_url_origin is from state)
-        _update_rag_session_status(state["db_session"], state["rag_session_id"], "summarizing")
+        _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "summarizing")
 
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(state["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deeprag")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        current_summary_chain = get_summary_chain(state["db_session"], state["user_id"], state["base_url_origin"], prompt_ids.summary, state["use_character_prompt"])
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        current_summary_chain = get_run_chain_cache(config).get_or_create(
+            ("summary", prompt_ids.summary, llm_cache_key(summary_llm), state["use_character_prompt"]),
+            lambda: get_summary_chain(config["configurable"]["db_session"], state["user_id"], state["base_url_origin"], prompt_ids.summary, state["use_character_prompt"])
+        )
 
         history = state["history"]
         history[-1] = HumanMessage(content=history[-1].content)
 
         print("all inputs message:", history)
 
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを呼び出し、応答を取得
-                response: AIMessage = prediction_agent_with_retry(current_summary_chain, {"history": history})
-                if not isinstance(response, AIMessage):
-                    raise ValueError(f"Expected AIMessage but got {type(response)}")
-                break  # 成功したらループを抜ける
-            except Exception as e:
-                error_cnt += 1
-                logger.error(f"Summary chain execution failed: {e}")
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for summary chain. Exiting.")
-                    break
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: AIMessage = invoke_validated(prediction_agent_with_retry, current_summary_chain, {"history": history}, _validate_ai_message, "summary")
 
-        _save_message_to_db(state["db_session"], state["rag_session_id"], "assistant", response, is_step=False)
-        _update_rag_session_status(state["db_session"], state["rag_session_id"], "completed")
+        _save_message_to_db(config["configurable"]["db_session"], state["rag_session_id"], "assistant", response, is_step=False)
+        _update_rag_session_status(config["configurable"]["db_session"], state["rag_session_id"], "completed")
 
         return {"history": state["history"]+[response], "messages": state["history"]+[response], "agent_temp_message": []}
 
 
+    def call_research_branch(branch_state: dict, config: RunnableConfig):
+        # ブランチは並列に実行されるため、専用の DB セッションを使う（ツールにも branch_config で渡る）
+        with branch_db_session(config) as branch_config:
+            db = branch_config["configurable"]["db_session"]
+            prompt_ids = _resolve_prompt_ids(branch_state, branch_config)
+            agent_chain = get_run_chain_cache(branch_config).get_or_create(
+                ("agent", prompt_ids.agent, llm_cache_key(agent_llm)),
+                lambda: get_agent_chain(
+                    db,
+                    branch_state["user_id"],
+                    branch_state["user_id"],
+                    branch_state["tags"],
+                    branch_state["base_url_origin"],
+                    local_rag_tool_for_node,
+                    prompt_ids.agent
+                )
+            )
+            task = branch_state["branch_task"]
+            messages = branch_input_messages(latest_user_question(branch_state["history"]), task)
+            try:
+                response = run_branch_agent_loop(prediction_agent_with_retry, agent_chain, tool_node, messages, "history", branch_config)
+            except Exception as e:
+                logger.error(f"DeepRAG branch {branch_state['branch_index']} failed: {e}")
+                response = AIMessage(content=f"このタスクの検索中にエラーが発生しました: {e}")
+            logger.debug("Branch %s response: %s", branch_state["branch_index"], response)
+            _save_message_to_db(db, branch_state["rag_session_id"], "system_step", response, is_step=True, metadata={"step_name": "parallel_agent_output", "branch_index": branch_state["branch_index"], "branch_task": task})
+        return {"branch_results": [branch_result(branch_state["branch_index"], task, response)]}
+
+    def call_merge_branches(state: GraphState, config: RunnableConfig):
+        # 完了順によらずタスク番号順に結合して Supervisor に渡す
+        merged = merge_branch_results(state.get("branch_results", []), state.get("deferred_tasks"))
+        return {"history": state["history"]+[merged], "branch_results": None, "deferred_tasks": []}
+
     workflow = StateGraph(GraphState)
     workflow.add_node("coordinator", call_coordinator)
     workflow.add_node("planner", call_planner)
@@ -708,14 +680,19 @@ def create_deeprag_graph(initial_state_for_tool: GraphState):
     workflow.add_node("agent", call_agent)
     workflow.add_node("tools", tool_node) # Use ToolNode
     workflow.add_node("summary", call_summary)
+    workflow.add_node("research_branch", call_research_branch)
+    workflow.add_node("merge_branches", call_merge_branches)
 
     workflow.add_edge(START, "coordinator")
     workflow.add_edge("planner", "supervisor")
     workflow.add_conditional_edges("agent", should_continue_after_agent, {"tools": "tools", "supervisor": "supervisor"})
     workflow.add_edge("tools", "agent")
+    workflow.add_edge("research_branch", "merge_branches")
+    workflow.add_edge("merge_branches", "supervisor")
     workflow.add_edge("summary", END)
 
-    return workflow.compile()
+    # ノードが完了するたびに状態を保存し、実行が途中で止まっても続きから再開できるようにする
+    return workflow.compile(checkpointer=get_graph_checkpointer())
 
 
 def run_deep_rag_graph_async(
@@ -726,13 +703,14 @@ def run_deep_rag_graph_async(
     tags: str,
     base_url_origin: str, # ★ Add base_url_origin
     system_prompt_group_id: int | None = None,  # ★ 変更: system_prompt_group_id
-    use_character_prompt: bool = True  # ★ 追加: use_character_prompt
+    use_character_prompt: bool = True,  # ★ 追加: use_character_prompt
+    should_cancel: Optional[Callable[[], bool]] = None,  # 中断要求の確認（各ステップ間で呼ばれる）
+    checkpoint_thread_id: Optional[str] = None  # チェックポイントの thread_id（保存済みなら続きから再開）
 ) -> None:
     initial_state = GraphState(
         messages=[],
         history=initial_messages,
         agent_temp_message=[],
-        db_session=db_session,
         rag_session_id=rag_session_id,
         user_id=user_id,
         tags=tags,
@@ -741,19 +719,48 @@ def run_deep_rag_graph_async(
         use_character_prompt=use_character_prompt  # ★ 追加: use_character_prompt
     )
     
-    # Create graph instance with the initial state for tool binding
-    graph = create_deeprag_graph(initial_state)
+    # トポロジは共通のため、コンパイル済みグラフを使い回す（ツール用の値は configurable で渡す）
+    graph = get_compiled_graph("deeprag", create_deeprag_graph)
     
-    graph_config = {"recursion_limit": 20000} 
+    # max_concurrency: 並列サブタスク（research_branch）の同時実行数の上限
+    graph_config = {"recursion_limit": 20000, "max_concurrency": int(get_parallel_research_config()["max_concurrency"])}
+    thread_id = checkpoint_thread_id or f"user_{user_id}_session_{rag_session_id}_deeprag_{uuid.uuid4().hex}"
     
+    # ステップメッセージとステータス更新はまとめて書き込む（終了時は finally で必ず書き込む）
+    writer = open_run_message_writer(rag_session_id)
     try:
-        graph.invoke(initial_state, config={**graph_config, "configurable": {"thread_id": f"user_{user_id}_session_{rag_session_id}_deeprag"}})
-        
+        run_config = {**graph_config, "configurable": new_run_configurable(
+            thread_id=thread_id,
+            user_id=user_id,
+            db_session=db_session,
+            tags=tags,
+            run_message_writer=writer
+        )}
+        # 途中状態が保存されている場合は、最後に完了したノードの続きから再開する
+        graph_input = None if has_checkpoint(thread_id) else initial_state
+        if graph_input is None:
+            print(f"Resuming DeepRAG graph for session {rag_session_id} from checkpoint (thread_id={thread_id})")
+        # ステップごとに中断要求を確認できるよう invoke ではなく stream で実行する
+        for _ in graph.stream(graph_input, config=run_config, stream_mode="updates"):
+            if should_cancel is not None and should_cancel():
+                raise ResearchRunCancelled()
+            if writer is not None:
+                writer.flush_if_due()
+    
+        if writer is not None:
+            writer.flush()
+        db_session.expire_all()  # 別セッションで書き込んだステータスを読み直す
         current_session_status_after_graph = db_session.get(RagSession, rag_session_id).processing_status
         if current_session_status_after_graph not in ["completed", "failed"]:
              _update_rag_session_status(db_session, rag_session_id, "unknown_completion")
 
+    except ResearchRunCancelled:
+        print(f"DeepRAG graph execution cancelled for session {rag_session_id}, user {user_id}")
+        _update_rag_session_status(db_session, rag_session_id, "cancelled")
+        _save_message_to_db(db_session, rag_session_id, "system_step", "ユーザーの操作により処理を中断しました。", is_step=True, metadata={"step_name": "cancelled"})
     except Exception as e:
         print(f"Error during DeepRAG graph execution for session {rag_session_id}, user {user_id}: {e}")
         _update_rag_session_status(db_session, rag_session_id, "failed")
-        _save_message_to_db(db_session, rag_session_id, "system_error", f"Graph execution failed: {str(e)}", is_step=True)
\ No newline at end of file
+        _save_message_to_db(db_session, rag_session_id, "system_error", f"Graph execution failed: {str(e)}", is_step=True)
+    finally:
+        close_run_message_writer(writer)
\ No newline at end of file
@@ -1,5 +1,5 @@
 # backend/routers/deepresearch.py
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, Query
 from sqlmodel import Session, select
 from langchain_core.messages import AIMessage, HumanMessage, AnyMessage, SystemMessage
 from google import genai
@@ -9,9 +9,10 @@ from db import get_session, engine
 from models import RagSession, RagMessage, User # User をインポート
 from schemas import (
     DeepResearchStartRequest, DeepResearchStartResponse,
-    DeepResearchStatusResponse, RagMessageRead
+    DeepResearchStatusResponse, DeepResearchCancelResponse, RagMessageRead
 )
-from .deepresearch_core import run_deep_research_graph_async, tools # toolsもインポート
+from routers.module.status_notifier import long_poll_status, rag_session_status_key, MAX_LONG_POLL_SECONDS
+from routers.module.research_worker import ensure_research_capacity, enqueue_research_job, request_research_cancel, research_updates_are_external
 from auth_utils import get_current_active_user # 認証用
 
 from dotenv import load_dotenv, find_dotenv
@@ -73,7 +74,6 @@ def make_title_from_query(query: str, db: Session, user_id: int) -> str:
 @router.post("/start", response_model=DeepResearchStartResponse, status_code=status.HTTP_202_ACCEPTED)
 async def start_deepresearch_task(
     payload: DeepResearchStartRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user) # ★ 認証ユーザー
 ):
@@ -83,6 +83,9 @@ async def start_deepresearch_task(
     if not query.strip():
         raise HTTPException(status_code=422, detail="Query cannot be empty.")
 
+    # ワーカーの実行枠とキューが埋まっている場合はセッションを作る前に 429 を返す
+    ensure_research_capacity(db)
+
     rag_session_for_task: Optional[RagSession] = None # 変数名変更
     if rag_session_id_payload:
         rag_session_for_task = db.get(RagSession, rag_session_id_payload)
@@ -117,37 +120,17 @@ async def start_deepresearch_task(
     db.commit()
     # db.refresh(user_msg_dr) # run_graph_task_wrapper で再取得するので不要かも
 
-    # バックグラウンドタスクのラッパー関数 (user_id と system_prompt_group_id と use_character_prompt を渡すように変更)
-    def run_graph_task_wrapper(session_id_for_task: int, initial_query: str, user_id_for_task: int, system_prompt_group_id_for_task: int | None = None, use_character_prompt_for_task: bool = True):
-        with Session(engine) as task_db_session:
-            msgs_stmt = (
-                select(RagMessage)
-                .where(RagMessage.session_id == session_id_for_task)
-                .order_by(RagMessage.created_at)
-            )
-            msgs_from_db = task_db_session.exec(msgs_stmt).all()
-
-            lc_messages_dr: list[AnyMessage] = [] # 変数名変更
-            for m_db in msgs_from_db: # 変数名変更
-                if m_db.role == "user":
-                    lc_messages_dr.append(HumanMessage(content=m_db.content))
-                elif m_db.role == "assistant" or m_db.role == "system_step":
-                    lc_messages_dr.append(AIMessage(content=m_db.content))
-                elif m_db.role == "system":
-                    lc_messages_dr.append(SystemMessage(content=m_db.content))
-            
-            # GraphState に user_id を含める
-            # deepresearch_core.py の GraphState と run_deep_research_graph_async の修正が必要
-            run_deep_research_graph_async(
-                initial_messages=lc_messages_dr,
-                db_session=task_db_session,
-                rag_session_id=session_id_for_task,
-                user_id=user_id_for_task, # ★ user_id を渡す
-                system_prompt_group_id=system_prompt_group_id_for_task,  # ★ system_prompt_group_id を渡す
-                use_character_prompt=use_character_prompt_for_task  # ★ use_character_prompt を渡す
-            )
-
-    background_tasks.add_task(run_graph_task_wrapper, final_rag_session_id, query, current_user.id, payload.system_prompt_group_id, payload.use_character_prompt) # ★ user_id と system_prompt_group_id と use_character_prompt を渡す
+    # 実行は専用ワーカーに任せる（Web ワーカーのスレッドを長時間占有しない）
+    enqueue_research_job(
+        db,
+        kind="deepresearch",
+        rag_session_id=final_rag_session_id,
+        user_id=current_user.id,
+        params={
+            "system_prompt_group_id": payload.system_prompt_group_id,
+            "use_character_prompt": payload.use_character_prompt
+        }
+    )
 
     return DeepResearchStartResponse(
         session_id=final_rag_session_id,
@@ -156,27 +139,57 @@ async def start_deepresearch_task(
 
 
 @router.get("/sessions/{session_id}/status", response_model=DeepResearchStatusResponse)
-def get_deepresearch_session_status(
+async def get_deepresearch_session_status(
     session_id: int,
-    db: Session = Depends(get_session),
+    since_id: Optional[int] = Query(None, description="このメッセージIDより後のメッセージのみ返す（増分取得）"),
+    wait: float = Query(0, ge=0, le=MAX_LONG_POLL_SECONDS, description="変化がない場合に待機する最大秒数（ロングポーリング）"),
+    known_status: Optional[str] = Query(None, description="クライアントが最後に受け取ったステータス"),
     current_user: User = Depends(get_current_active_user) # ★ 認証ユーザー
 ):
-    rag_session_status = db.get(RagSession, session_id) # 変数名変更
-    if not rag_session_status or rag_session_status.user_id != current_user.id: # ★ ユーザー所有確認
+    def load_snapshot() -> DeepResearchStatusResponse:
+        # 待機中にリクエストスコープの接続を保持しないよう、取得ごとにセッションを開く
+        with Session(engine) as db:
+            rag_session_status = db.get(RagSession, session_id)
+            if not rag_session_status or rag_session_status.user_id != current_user.id: # ★ ユーザー所有確認
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DeepResearch session not found or not authorized.")
+
+            messages_stmt_status = select(RagMessage).where(RagMessage.session_id == session_id)
+            if since_id is not None:
+                messages_stmt_status = messages_stmt_status.where(RagMessage.id > since_id)
+            messages_from_db_status = db.exec(messages_stmt_status.order_by(RagMessage.created_at)).all()
+
+            messages_for_response_status = [RagMessageRead.model_validate(msg) for msg in messages_from_db_status]
+
+            return DeepResearchStatusResponse(
+                session_id=rag_session_status.id,
+                status=rag_session_status.processing_status,
+                messages=messages_for_response_status,
+                last_updated=rag_session_status.last_updated,
+                last_message_id=max((m.id for m in messages_for_response_status), default=since_id)
+            )
+
+    return await long_poll_status(
+        rag_session_status_key(session_id), load_snapshot, wait_seconds=wait, known_status=known_status,
+        external_updates=research_updates_are_external()
+    )
+
+
+@router.post("/sessions/{session_id}/cancel", response_model=DeepResearchCancelResponse)
+def cancel_deepresearch_task(
+    session_id: int,
+    db: Session = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    rag_session = db.get(RagSession, session_id)
+    if not rag_session or rag_session.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="DeepResearch session not found or not authorized.")
 
-    messages_stmt_status = ( # 変数名変更
-        select(RagMessage)
-        .where(RagMessage.session_id == session_id)
-        .order_by(RagMessage.created_at)
+    cancel_status = request_research_cancel(db, session_id)
+    if cancel_status is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No running DeepResearch task for this session.")
+
+    return DeepResearchCancelResponse(
+        session_id=session_id,
+        status=cancel_status,
+        message="DeepResearch task cancelled." if cancel_status == "cancelled" else "Cancellation requested."
     )
-    messages_from_db_status = db.exec(messages_stmt_status).all() # 変数名変更
-    
-    messages_for_response_status = [RagMessageRead.model_validate(msg) for msg in messages_from_db_status] # 変数名変更
-
-    return DeepResearchStatusResponse(
-        session_id=rag_session_status.id,
-        status=rag_session_status.processing_status,
-        messages=messages_for_response_status,
-        last_updated=rag_session_status.last_updated
-    )
\ No newline at end of file
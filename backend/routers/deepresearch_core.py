@@ -1,19 +1,21 @@
 import os
 import time
+import uuid
 import operator
 import json
 from typing import Literal
-from typing import Annotated, List, Generator
+from typing import Annotated, List, Generator, Callable, Optional
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, AnyMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 from langchain_tavily import TavilySearch, TavilyExtract
 
 import langgraph
-from langgraph.types import Command
+from langgraph.types import Command, Send
 from langgraph.prebuilt import ToolNode
 from langgraph.graph import StateGraph, START, END
 
@@ -33,6 +35,23 @@ from routers.module.prompt_manager import (
     get_deepresearch_summary_prompt_with_character
 )
 from routers.module.prompt_group_resolver import resolve_prompt_group
+from routers.module.graph_registry import get_compiled_graph, get_run_chain_cache, new_run_configurable, llm_cache_key
+from routers.module.research_worker import ResearchRunCancelled
+from routers.module.llm_retry import invoke_validated, invoke_with_retry
+from routers.module.graph_checkpointer import get_graph_checkpointer, has_checkpoint
+from routers.module.run_message_writer import get_run_message_writer, open_run_message_writer, close_run_message_writer
+from routers.module.web_tool_cache import cached_web_tool
+from routers.module.parallel_research import (
+    get_parallel_research_config,
+    branch_results_reducer,
+    select_parallel_tasks,
+    latest_user_question,
+    branch_input_messages,
+    branch_db_session,
+    run_branch_agent_loop,
+    branch_result,
+    merge_branch_results,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -138,11 +157,12 @@ search_results = 10
 
 class GraphState(TypedDict):
     messages: Annotated[list[AnyMessage], operator.add]
-    db_session: Session
     rag_session_id: int
     user_id: int      # ★ 追加: 認証されたユーザーのID
     system_prompt_group_id: int | None  # ★ 変更: プロンプトグループID
     use_character_prompt: bool  # ★ 追加: キャラクタープロンプト使用フラグ
+    branch_results: Annotated[list, branch_results_reducer]  # 並列サブタスクの結果（merge_branches で結合）
+    deferred_tasks: list[str]  # max_branches を超えて今回は実行しない並列タスク（merge_branches で Supervisor に差し戻す）
 
 
 class Router(BaseModel):
@@ -150,6 +170,7 @@ class Router(BaseModel):
     planning: str = Field(..., description="LLMの再立案した戦略")
     next_action: str = Field(..., description="次のノードで期待する役割")
     next: Literal["agent", "summary"] = Field(..., description="次のノードの遷移先")
+    parallel_actions: List[str] = Field(default_factory=list, description="next が agent の場合に、互いに独立して同時に実行できる調査タスクの一覧。独立したタスクが2件以上ある場合のみ、単独で実行できる具体的な指示として列挙する")
 
 class Coordinator_Router(BaseModel):
     reasoning: str = Field(..., description="LLMの思考過程")
@@ -157,8 +178,8 @@ class Coordinator_Router(BaseModel):
     next: Literal["planner", "END"] = Field(..., description="次のノードの遷移先")
 
 # ────────────────────────── ツール定義 ──────────────────────────
-tavily_search_tool = TavilySearch(max_results=search_results, topic="general")
-tavily_extract_tool = TavilyExtract()
+tavily_search_tool = cached_web_tool(TavilySearch(max_results=search_results, topic="general"), kind="search")
+tavily_extract_tool = cached_web_tool(TavilyExtract(), kind="extract")
 tools = [tavily_search_tool, tavily_extract_tool]
 
 #本日の日付を取得する
@@ -183,6 +204,11 @@ def _save_message_to_db(db: Session, rag_session_id: int, role: str, content: An
         msg_content = str(content)
 
     if msg_content:
+        writer = get_run_message_writer(rag_session_id)
+        if writer is not None:
+            # グラフ実行中はバッファに積み、ノード境界またはタイマーでまとめて書き込む
+            writer.add_message(role, msg_content, is_step, metadata)
+            return
         db_msg = RagMessage(
             session_id=rag_session_id,
             role=role,
@@ -196,6 +222,10 @@ def _save_message_to_db(db: Session, rag_session_id: int, role: str, content: An
 
 
 def _update_rag_session_status(db: Session, rag_session_id: int, status: str):
+    writer = get_run_message_writer(rag_session_id)
+    if writer is not None:
+        writer.set_status(status)
+        return
     rag_session = db.get(RagSession, rag_session_id)
     if rag_session:
         rag_session.processing_status = status
@@ -459,24 +489,32 @@ def get_summary_chain(db: Session, user_id: int, summary_prompt_id: int | None =
         return summary_prompt | summary_llm
 
 
+def _resolve_prompt_ids(state: GraphState, config: RunnableConfig):
+    """プロンプトグループから個別プロンプトIDを解決する（同一実行内では初回のみDB参照）"""
+    return get_run_chain_cache(config).get_or_create(
+        ("prompt_ids", state.get("system_prompt_group_id")),
+        lambda: resolve_prompt_group(config["configurable"]["db_session"], state.get("system_prompt_group_id"), state["user_id"], "deepresearch")
+    )
+
+
 def create_graph_with_db_persistence(tools_list: List):
     
     def prediction_agent(chain, message):
         #geminiはrate limitによるエラーが発生することがあるので、リトライ処理を追加
-        error_cnt = 0
-        while True:
-            try:
-                response = chain.invoke(message)
-                break
-            except Exception as e:
-                print("Error occurred:", e)
-                if error_cnt >= 3:
-                    print("Max retries reached. Exiting.")
-                    raise e
-                error_cnt += 1
-                print(f"Retrying... Attempt {error_cnt}/3")
-                time.sleep(61)
-        return response
+        # （指数バックオフ＋Retry-After 優先、モデル単位のサーキットブレーカー付き）
+        return invoke_with_retry(chain, message)
+
+    def _validate_message_response(response: AnyMessage):
+        if not isinstance(response, BaseMessage):
+            raise ValueError(f"Invalid response type: {type(response)}. Expected BaseMessage.")
+        if not response.content:
+            raise ValueError("Response content is empty.")
+
+    def _validate_agent_response(response: AnyMessage):
+        # ツール呼び出しのみの応答は本文が空でも有効
+        if isinstance(response, AIMessage) and response.tool_calls:
+            return
+        _validate_message_response(response)
 
     def should_continue(state: GraphState):
         last_message = state["messages"][-1]
@@ -484,32 +522,27 @@ def create_graph_with_db_persistence(tools_list: List):
             return "tools"
         return "supervisor"
     
-    def call_coordinator(state: GraphState):
-        db = state["db_session"]
+    def call_coordinator(state: GraphState, config: RunnableConfig):
+        db = config["configurable"]["db_session"]
         rag_id = state["rag_session_id"]
         _update_rag_session_status(db, rag_id, "coordinator")
         
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(db, state.get("system_prompt_group_id"), state["user_id"], "deepresearch")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        coordinator_chain = get_coordinator_chain(db, state["user_id"], prompt_ids.coordinator, state["use_character_prompt"])
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        coordinator_chain = get_run_chain_cache(config).get_or_create(
+            ("coordinator", prompt_ids.coordinator, llm_cache_key(coordinator_llm), state["use_character_prompt"]),
+            lambda: get_coordinator_chain(db, state["user_id"], prompt_ids.coordinator, state["use_character_prompt"])
+        )
         
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを実行
-                response: Coordinator_Router = prediction_agent(coordinator_chain, {"messages": state["messages"]})
-                print(f"Coordinator response: {response.next}")
-                if response.next not in ["planner", "END"]:
-                    raise ValueError(f"Invalid next node: {response.next}. Expected 'planner' or 'END'.")
-                break
-            except Exception as e:
-                error_cnt += 1
-                logger.error(f"Coordinator chain execution failed: {e}")
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for coordinator chain. Exiting.")
-                    break
+        def validate(response: Coordinator_Router):
+            if response.next not in ["planner", "END"]:
+                raise ValueError(f"Invalid next node: {response.next}. Expected 'planner' or 'END'.")
+
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: Coordinator_Router = invoke_validated(prediction_agent, coordinator_chain, {"messages": state["messages"]}, validate, "coordinator")
+        print(f"Coordinator response: {response.next}")
 
         if response.next == "planner":
             goto = "planner"
@@ -523,67 +556,51 @@ def create_graph_with_db_persistence(tools_list: List):
             goto=goto
         )
 
-    def call_planner(state: GraphState):
-        db = state["db_session"]
+    def call_planner(state: GraphState, config: RunnableConfig):
+        db = config["configurable"]["db_session"]
         rag_id = state["rag_session_id"]
         _update_rag_session_status(db, rag_id, "planning")
         
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(db, state.get("system_prompt_group_id"), state["user_id"], "deepresearch")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        planner_chain = get_planner_chain(db, state["user_id"], prompt_ids.planner)
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        planner_chain = get_run_chain_cache(config).get_or_create(
+            ("planner", prompt_ids.planner, llm_cache_key(planner_llm)),
+            lambda: get_planner_chain(db, state["user_id"], prompt_ids.planner)
+        )
         
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを実行
-                response: AnyMessage = prediction_agent(planner_chain, {"messages": state["messages"]})
-                if not isinstance(response, BaseMessage):
-                    raise ValueError(f"Invalid response type: {type(response)}. Expected BaseMessage.")
-                if not response.content:
-                    raise ValueError("Response content is empty.")
-                break
-            except Exception as e:
-                logger.error(f"Planner chain execution failed: {e}")
-                error_cnt += 1
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for planner chain. Exiting.")
-                    break
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: AnyMessage = invoke_validated(prediction_agent, planner_chain, {"messages": state["messages"]}, _validate_message_response, "planner")
 
         print(f"Planner response: {response}")
         _save_message_to_db(db, rag_id, "system_step", response, is_step=True, metadata={"step_name": "planner_output"})
         return {"messages": [response]}
 
-    def call_supervisor(state: GraphState):
-        db = state["db_session"]
+    def call_supervisor(state: GraphState, config: RunnableConfig):
+        db = config["configurable"]["db_session"]
         rag_id = state["rag_session_id"]
         _update_rag_session_status(db, rag_id, "supervising")
 
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(db, state.get("system_prompt_group_id"), state["user_id"], "deepresearch")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        supervisor_chain = get_supervisor_chain(db, state["user_id"], prompt_ids.supervisor)
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        supervisor_chain = get_run_chain_cache(config).get_or_create(
+            ("supervisor", prompt_ids.supervisor, llm_cache_key(supervisor_llm)),
+            lambda: get_supervisor_chain(db, state["user_id"], prompt_ids.supervisor)
+        )
 
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを実行
-                response_router: Router = prediction_agent(supervisor_chain, {"messages": state["messages"]})
-                if not isinstance(response_router, Router):
-                    raise ValueError(f"Invalid response type: {type(response_router)}. Expected Router.")
-                if not response_router.reasoning or not response_router.planning or not response_router.next_action:
-                    raise ValueError("Response fields 'reasoning', 'planning', or 'next_action' are empty.")
-                if response_router.next not in ["agent", "summary"]:
-                    raise ValueError(f"Invalid next node: {response_router.next}. Expected 'agent' or 'summary'.")
-                break
-            except Exception as e:
-                logger.error(f"Supervisor chain execution failed: {e}")
-                error_cnt += 1
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for supervisor chain. Exiting.")
-                    break
+        def validate(response_router: Router):
+            if not isinstance(response_router, Router):
+                raise ValueError(f"Invalid response type: {type(response_router)}. Expected Router.")
+            if not response_router.reasoning or not response_router.planning or not response_router.next_action:
+                raise ValueError("Response fields 'reasoning', 'planning', or 'next_action' are empty.")
+            if response_router.next not in ["agent", "summary"]:
+                raise ValueError(f"Invalid next node: {response_router.next}. Expected 'agent' or 'summary'.")
+
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response_router: Router = invoke_validated(prediction_agent, supervisor_chain, {"messages": state["messages"]}, validate, "supervisor")
 
         print(f"Supervisor response: {response_router}")
         
@@ -591,52 +608,51 @@ def create_graph_with_db_persistence(tools_list: List):
         _save_message_to_db(db, rag_id, "system_step", supervisor_decision_content, is_step=True, metadata={"step_name": "supervisor_decision", "router_output": response_router.dict()})
         
         ai_message_for_next_node = AIMessage(content=response_router.next_action, name="supervisor_instruction")
+
+        # 独立したタスクが複数ある場合は、ブランチに振り分けて同時に実行する
+        parallel_tasks, deferred_tasks = select_parallel_tasks(response_router.parallel_actions) if response_router.next == "agent" else ([], [])
+        if parallel_tasks:
+            logger.debug("Dispatching %d parallel research branches", len(parallel_tasks))
+            _update_rag_session_status(db, rag_id, "agent_running")
+            return Command(
+                goto=[Send("research_branch", {**state, "branch_index": i, "branch_task": task}) for i, task in enumerate(parallel_tasks)],
+                update={"messages": [ai_message_for_next_node], "deferred_tasks": deferred_tasks}
+            )
         
         return Command(
             goto=response_router.next,
             update={"messages": [ai_message_for_next_node]}
         )
 
-    def call_summary(state: GraphState):
-        db = state["db_session"]
+    def call_summary(state: GraphState, config: RunnableConfig):
+        db = config["configurable"]["db_session"]
         rag_id = state["rag_session_id"]
         _update_rag_session_status(db, rag_id, "summarizing")
 
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(db, state.get("system_prompt_group_id"), state["user_id"], "deepresearch")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
 
-        summary_chain = get_summary_chain(db, state["user_id"], prompt_ids.summary, state["use_character_prompt"])
+        summary_chain = get_run_chain_cache(config).get_or_create(
+            ("summary", prompt_ids.summary, llm_cache_key(summary_llm), state["use_character_prompt"]),
+            lambda: get_summary_chain(db, state["user_id"], prompt_ids.summary, state["use_character_prompt"])
+        )
 
         messages = state["messages"]
         messages[-1] = HumanMessage(content=messages[-1].content)
 
         print("all inputs message:", messages)
         
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを実行
-                response: AnyMessage = prediction_agent(summary_chain, {"messages": messages})
-                if not isinstance(response, BaseMessage):
-                    raise ValueError(f"Invalid response type: {type(response)}. Expected BaseMessage.")
-                if not response.content:
-                    raise ValueError("Response content is empty.")
-                break
-            except Exception as e:
-                logger.error(f"Summary chain execution failed: {e}")
-                error_cnt += 1
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for summary chain. Exiting.")
-                    break
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: AnyMessage = invoke_validated(prediction_agent, summary_chain, {"messages": messages}, _validate_message_response, "summary")
 
         _save_message_to_db(db, rag_id, "assistant", response, is_step=False)
         _update_rag_session_status(db, rag_id, "completed")
         return {"messages": [response]}
 
-    def call_agent(state: GraphState):
-        db = state["db_session"]
+    def call_agent(state: GraphState, config: RunnableConfig):
+        db = config["configurable"]["db_session"]
         rag_id = state["rag_session_id"]
         messages = state["messages"]
         _update_rag_session_status(db, rag_id, "agent_running")
@@ -667,27 +683,16 @@ def create_graph_with_db_persistence(tools_list: List):
         print("Agentへの入力メッセージ:", input_messages_for_agent)
 
         # プロンプトグループから個別プロンプトIDを解決
-        prompt_ids = resolve_prompt_group(db, state.get("system_prompt_group_id"), state["user_id"], "deepresearch")
+        prompt_ids = _resolve_prompt_ids(state, config)
         
-        # 動的チェーン生成
-        agent_chain = get_agent_chain(db, state["user_id"], prompt_ids.agent)
+        # 動的チェーン生成（同一実行内ではメモ化済みのチェーンを再利用）
+        agent_chain = get_run_chain_cache(config).get_or_create(
+            ("agent", prompt_ids.agent, llm_cache_key(agent_llm)),
+            lambda: get_agent_chain(db, state["user_id"], prompt_ids.agent)
+        )
 
-        error_cnt = 0
-        while True:
-            try:
-                # チェーンを実行
-                response: AnyMessage = prediction_agent(agent_chain, {"messages": input_messages_for_agent})
-                if not isinstance(response, BaseMessage):
-                    raise ValueError(f"Invalid response type: {type(response)}. Expected BaseMessage.")
-                if not response.content:
-                    raise ValueError("Response content is empty.")
-                break
-            except Exception as e:
-                logger.error(f"Agent chain execution failed: {e}")
-                error_cnt += 1
-                if error_cnt >= 3:
-                    logger.error("Max retries reached for agent chain. Exiting.")
-                    break
+        # 一時的な障害のリトライは llm_retry に任せ、応答が不正な場合のみ1回問い合わせ直す
+        response: AnyMessage = invoke_validated(prediction_agent, agent_chain, {"messages": input_messages_for_agent}, _validate_agent_response, "agent")
 
         print(f"Agent response: {response}")
     
@@ -695,6 +700,31 @@ def create_graph_with_db_persistence(tools_list: List):
         _save_message_to_db(db, rag_id, "system_step", response, is_step=True, metadata={"step_name": "agent_output"})
         return {"messages": [response]}
 
+    def call_research_branch(branch_state: dict, config: RunnableConfig):
+        # ブランチは並列に実行されるため、専用の DB セッションを使う
+        with branch_db_session(config) as branch_config:
+            db = branch_config["configurable"]["db_session"]
+            prompt_ids = _resolve_prompt_ids(branch_state, branch_config)
+            agent_chain = get_run_chain_cache(branch_config).get_or_create(
+                ("agent", prompt_ids.agent, llm_cache_key(agent_llm)),
+                lambda: get_agent_chain(db, branch_state["user_id"], prompt_ids.agent)
+            )
+            task = branch_state["branch_task"]
+            messages = branch_input_messages(latest_user_question(branch_state["messages"]), task)
+            try:
+                response = run_branch_agent_loop(prediction_agent, agent_chain, tool_node, messages, "messages", branch_config)
+            except Exception as e:
+                logger.error(f"Research branch {branch_state['branch_index']} failed: {e}")
+                response = AIMessage(content=f"このタスクの調査中にエラーが発生しました: {e}")
+            logger.debug("Branch %s response: %s", branch_state["branch_index"], response)
+            _save_message_to_db(db, branch_state["rag_session_id"], "system_step", response, is_step=True, metadata={"step_name": "parallel_agent_output", "branch_index": branch_state["branch_index"], "branch_task": task})
+        return {"branch_results": [branch_result(branch_state["branch_index"], task, response)]}
+
+    def call_merge_branches(state: GraphState, config: RunnableConfig):
+        # 完了順によらずタスク番号順に結合して Supervisor に渡す
+        merged = merge_branch_results(state.get("branch_results", []), state.get("deferred_tasks"))
+        return {"messages": [merged], "branch_results": None, "deferred_tasks": []}
+
     tool_node = ToolNode(tools_list)
 
     workflow = StateGraph(GraphState)
@@ -704,11 +734,15 @@ def create_graph_with_db_persistence(tools_list: List):
     workflow.add_node("summary", call_summary)
     workflow.add_node("agent", call_agent)
     workflow.add_node("tools", tool_node)
+    workflow.add_node("research_branch", call_research_branch)
+    workflow.add_node("merge_branches", call_merge_branches)
 
     workflow.add_edge(START, "coordinator")
     workflow.add_edge("planner", "supervisor")
     workflow.add_conditional_edges("agent", should_continue, {"tools": "tools", "supervisor": "supervisor"})
     workflow.add_edge("tools", "agent")
+    workflow.add_edge("research_branch", "merge_branches")
+    workflow.add_edge("merge_branches", "supervisor")
     workflow.add_edge("summary", END)
     #workflow.add_conditional_edges(
     #    "supervisor",
@@ -716,7 +750,8 @@ def create_graph_with_db_persistence(tools_list: List):
     #    {"agent": "agent", "summary": "summary"} # This is effectively controlled by Command(goto=...)
     #)
 
-    return workflow.compile()
+    # ノードが完了するたびに状態を保存し、実行が途中で止まっても続きから再開できるようにする
+    return workflow.compile(checkpointer=get_graph_checkpointer())
 
 
 def run_deep_research_graph_async(
@@ -725,34 +760,59 @@ def run_deep_research_graph_async(
     rag_session_id: int,
     user_id: int, # ★ user_id を引数に追加
     system_prompt_group_id: int | None = None,  # ★ 変更: system_prompt_group_id を引数に追加
-    use_character_prompt: bool = True  # ★ 追加: use_character_prompt を引数に追加
+    use_character_prompt: bool = True,  # ★ 追加: use_character_prompt を引数に追加
+    should_cancel: Optional[Callable[[], bool]] = None,  # 中断要求の確認（各ステップ間で呼ばれる）
+    checkpoint_thread_id: Optional[str] = None  # チェックポイントの thread_id（保存済みなら続きから再開）
 ) -> None:
-    graph = create_graph_with_db_persistence(tools)
+    # トポロジは共通のため、コンパイル済みグラフを使い回す
+    graph = get_compiled_graph("deepresearch", lambda: create_graph_with_db_persistence(tools))
 
     initial_state = GraphState(
         messages=initial_messages,
-        db_session=db_session,
         rag_session_id=rag_session_id,
         user_id=user_id, # ★ GraphState に user_id を設定
         system_prompt_group_id=system_prompt_group_id,  # ★ 変更: GraphState に system_prompt_group_id を設定
         use_character_prompt=use_character_prompt  # ★ 追加: GraphState に use_character_prompt を設定
     )
     
-    graph_config = {"recursion_limit": 20000}
+    # max_concurrency: 並列サブタスク（research_branch）の同時実行数の上限
+    graph_config = {"recursion_limit": 20000, "max_concurrency": int(get_parallel_research_config()["max_concurrency"])}
+    thread_id = checkpoint_thread_id or f"user_{user_id}_session_{rag_session_id}_{uuid.uuid4().hex}"
     
+    # ステップメッセージとステータス更新はまとめて書き込む（終了時は finally で必ず書き込む）
+    writer = open_run_message_writer(rag_session_id)
     try:
-        graph.invoke(initial_state, config={**graph_config, "configurable": {"thread_id": f"user_{user_id}_session_{rag_session_id}"}})
+        run_config = {**graph_config, "configurable": new_run_configurable(thread_id=thread_id, db_session=db_session, run_message_writer=writer)}
+        # 途中状態が保存されている場合は、最後に完了したノードの続きから再開する
+        graph_input = None if has_checkpoint(thread_id) else initial_state
+        if graph_input is None:
+            print(f"Resuming DeepResearch graph for session {rag_session_id} from checkpoint (thread_id={thread_id})")
+        # ステップごとに中断要求を確認できるよう invoke ではなく stream で実行する
+        for _ in graph.stream(graph_input, config=run_config, stream_mode="updates"):
+            if should_cancel is not None and should_cancel():
+                raise ResearchRunCancelled()
+            if writer is not None:
+                writer.flush_if_due()
         # Check if the last message indicates completion, otherwise mark as unknown
         # The summary node should already set status to "completed"
         # This is a fallback
+        if writer is not None:
+            writer.flush()
+        db_session.expire_all()  # 別セッションで書き込んだステータスを読み直す
         current_session_status_after_graph = db_session.get(RagSession, rag_session_id).processing_status
         if current_session_status_after_graph not in ["completed", "failed"]:
              _update_rag_session_status(db_session, rag_session_id, "unknown_completion")
 
+    except ResearchRunCancelled:
+        print(f"DeepResearch graph execution cancelled for session {rag_session_id}, user {user_id}")
+        _update_rag_session_status(db_session, rag_session_id, "cancelled")
+        _save_message_to_db(db_session, rag_session_id, "system_step", "ユーザーの操作により処理を中断しました。", is_step=True, metadata={"step_name": "cancelled"})
     except Exception as e:
         print(f"Error during DeepResearch graph execution for session {rag_session_id}, user {user_id}: {e}")
         _update_rag_session_status(db_session, rag_session_id, "failed")
         _save_message_to_db(db_session, rag_session_id, "system_error", f"Graph execution failed: {e}", is_step=True)
+    finally:
+        close_run_message_writer(writer)
 
 
 if __name__ == "__main__":
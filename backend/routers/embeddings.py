@@ -12,7 +12,9 @@ from vectorstore.manager import (
 )
 from auth_utils import get_current_active_user
 from typing import Optional # Optional をインポート
+import logging
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/embeddings", tags=["embeddings"])
 
@@ -33,10 +35,10 @@ def rebuild_embeddings(
     current_user: User = Depends(get_current_active_user) # ★ 認証ユーザーを取得
 ):
     user_id_str = str(current_user.id)
-    print(f"Rebuilding embeddings for user_id: {user_id_str}...")
+    logger.info("Rebuilding embeddings for user_id: %s...", user_id_str)
 
     # 1. 現在のユーザーに関連する既存のベクトルデータを削除
-    print(f"Deleting existing vector data for user_id: {user_id_str}...")
+    logger.info("Deleting existing vector data for user_id: %s...", user_id_str)
     delete_vectors_by_metadata(metadata_filter={"user_id": user_id_str})
     # 注意: delete_vectors_by_metadata が ChromaDB 以外のストアで未実装の場合、
     # ここでの削除は限定的になる可能性があります。
@@ -50,11 +52,15 @@ def rebuild_embeddings(
     ).all()
 
     if not user_paper_links:
-        print(f"No papers found in the library for user_id: {user_id_str}. Rebuild finished.")
+        logger.info("No papers found in the library for user_id: %s. Rebuild finished.", user_id_str)
         return {"message": "No papers found in your library to rebuild embeddings for."}
 
     # ベクトルデータ準備関数をインポート
     from routers.papers import _prepare_paper_vector_data
+    from routers.paper_util import _PreloadedSummaryLookup
+
+    # 要約・編集済み要約はライブラリ全体分をまとめて読み込む（論文ごとの問い合わせをしない）
+    summary_lookup = _PreloadedSummaryLookup(session, current_user.id)
 
     # 3. 各論文のベクトルデータを準備（一括処理用）
     vector_data_list = []
@@ -62,13 +68,13 @@ def rebuild_embeddings(
     
     for link in user_paper_links:
         if not link.paper_metadata_id or not link.paper_metadata:
-            print(f"Skipping link id {link.id} for user {current_user.id}: PaperMetadata or its ID not found.")
+            logger.debug("Skipping link id %s for user %s: PaperMetadata or its ID not found.", link.id, current_user.id)
             failed_rebuilds += 1
             continue
         
         arxiv_id_val = link.paper_metadata.arxiv_id
         if not arxiv_id_val:
-            print(f"Skipping link id {link.id} for user {current_user.id}: Arxiv ID not found in PaperMetadata.")
+            logger.debug("Skipping link id %s for user %s: Arxiv ID not found in PaperMetadata.", link.id, current_user.id)
             failed_rebuilds += 1
             continue
 
@@ -80,17 +86,18 @@ def rebuild_embeddings(
                 link.id, 
                 session,
                 preferred_summary_type=payload.preferred_summary_type,
-                preferred_system_prompt_id=payload.preferred_system_prompt_id
+                preferred_system_prompt_id=payload.preferred_system_prompt_id,
+                summary_lookup=summary_lookup
             )
             
             if vector_data:
                 vector_data_list.append(vector_data)
-                print(f"Prepared vector data for paper {arxiv_id_val} (link_id: {link.id})")
+                logger.debug("Prepared vector data for paper %s (link_id: %s)", arxiv_id_val, link.id)
             else:
-                print(f"No valid summary found for paper {arxiv_id_val} (link_id: {link.id})")
+                logger.debug("No valid summary found for paper %s (link_id: %s)", arxiv_id_val, link.id)
                 failed_rebuilds += 1
         except Exception as e:
-            print(f"Failed to prepare vector data for paper {arxiv_id_val} (link_id: {link.id}): {e}")
+            logger.warning("Failed to prepare vector data for paper %s (link_id: %s): %s", arxiv_id_val, link.id, e)
             failed_rebuilds += 1
     
     # 4. 全ベクトルを一括追加（効率化）
@@ -115,12 +122,12 @@ def rebuild_embeddings(
                 manager_add_texts(texts=texts, metadatas=metadatas)
             
             successful_rebuilds = len(vector_data_list)
-            print(f"Successfully added {successful_rebuilds} vectors in batch for user {current_user.id}")
+            logger.info("Successfully added %s vectors in batch for user %s", successful_rebuilds, current_user.id)
             
         except Exception as e:
-            print(f"Failed to add vectors in batch for user {current_user.id}: {e}")
+            logger.error("Failed to add vectors in batch for user %s: %s", current_user.id, e)
             failed_rebuilds += len(vector_data_list)
             successful_rebuilds = 0
 
-    print(f"Rebuild completed for user_id: {user_id_str}. Success: {successful_rebuilds}, Failed: {failed_rebuilds}")
+    logger.info("Rebuild completed for user_id: %s. Success: %s, Failed: %s", user_id_str, successful_rebuilds, failed_rebuilds)
     return {"message": f"Vector store rebuild process finished for user {current_user.username}. Successfully rebuilt {successful_rebuilds} papers, {failed_rebuilds} failed."}
\ No newline at end of file
@@ -1,31 +1,110 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import os
+import threading
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
 import yaml
 from pathlib import Path
 
+from routers.module.lazy_import import lazy_object, register_warmup
+from routers.module.perf_metrics import EMBEDDING_LATENCY, EMBEDDING_TEXTS, timed
+
 # 直接 backend/config.yaml を読む
 _cfg_path = Path(__file__).parent.parent.parent / "config.yaml"
 _cfg      = yaml.safe_load(_cfg_path.read_text(encoding="utf-8")).get("vector_store", {})
 
-if _cfg.get("provider", "Google") != "Google":
-    raise NotImplementedError(f"Unsupported embedding provider: {_cfg.get('provider')}")
+# 環境変数 EMBEDDING_PROVIDER_OVERRIDE=Fake でオフラインのベンチマーク用の決定的な埋め込みを使う
+_provider = os.getenv("EMBEDDING_PROVIDER_OVERRIDE") or _cfg.get("provider", "Google")
+if _provider not in ("Google", "Fake"):
+    raise NotImplementedError(f"Unsupported embedding provider: {_provider}")
+
+
+class _LazyEmbeddings(Embeddings):
+    """最初の埋め込み呼び出しで GoogleGenerativeAIEmbeddings を生成する（import 時にはクライアントを作らない）
+
+    Embeddings のサブクラスなので、Chroma / BigQueryVectorStore の embedding 引数にそのまま渡せる。
+    """
+
+    def __init__(self):
+        self._model: Optional[Embeddings] = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _get(self) -> Embeddings:
+        if self._model is None:
+            with self._lock:
+                if self._model is None and _provider == "Fake":
+                    from routers.module.fake_providers import create_fake_embeddings
+                    self._model = create_fake_embeddings()
+                if self._model is None:
+                    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+                    try:
+                        self._model = GoogleGenerativeAIEmbeddings(
+                            model=_cfg.get("embedding_model", "models/text-embedding-004")
+                        )
+                        self._failed = False
+                        print("Embedding model (EMBED) initialized successfully.")
+                    except Exception as e:
+                        self._failed = True
+                        print(f"CRITICAL ERROR: Failed to initialize Embedding model (EMBED): {e}")
+                        raise
+        return self._model
+
+    def is_available(self) -> bool:
+        """埋め込みモデルを初期化できるか（未初期化なら初期化を試みる）"""
+        try:
+            self._get()
+            return True
+        except Exception:
+            return False
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        model = self._get()
+        EMBEDDING_TEXTS.inc(len(texts), op="embed_documents")
+        with timed(EMBEDDING_LATENCY, op="embed_documents"):
+            return model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        model = self._get()
+        EMBEDDING_TEXTS.inc(op="embed_query")
+        with timed(EMBEDDING_LATENCY, op="embed_query"):
+            return model.embed_query(text)
 
-try:
-    EMBED = GoogleGenerativeAIEmbeddings(
-        model=_cfg.get("embedding_model", "models/text-embedding-004")
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        model = self._get()
+        EMBEDDING_TEXTS.inc(len(texts), op="embed_documents")
+        with timed(EMBEDDING_LATENCY, op="embed_documents"):
+            return await model.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        model = self._get()
+        EMBEDDING_TEXTS.inc(op="embed_query")
+        with timed(EMBEDDING_LATENCY, op="embed_query"):
+            return await model.aembed_query(text)
+
+    def __getattr__(self, name: str):
+        # model などの属性参照は実体に委譲する
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._get(), name)
+
+
+EMBED = _LazyEmbeddings()
+register_warmup(EMBED.is_available)
+
+
+def _create_text_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    # チャンク設定: 2000 chars / overlap 200
+    return RecursiveCharacterTextSplitter(
+        chunk_size=2000,
+        chunk_overlap=200,
+        separators=[
+            "\n\n", "\n", " ", ".", ",",
+            "\u3002", "\u3001", "\uff0e", "\uff0c", "\u200b", ""
+        ],
     )
-    print("Embedding model (EMBED) initialized successfully.")
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to initialize Embedding model (EMBED): {e}")
-    # アプリケーションの起動を中止するか、EMBEDをNoneにして後続処理でハンドリングする
-    EMBED = None # または raise SystemExit("Failed to initialize embedding model")
-
-# チャンク設定: 2000 chars / overlap 200
-TEXT_SPLITTER = RecursiveCharacterTextSplitter(
-    chunk_size=2000,
-    chunk_overlap=200,
-    separators=[
-        "\n\n", "\n", " ", ".", ",",
-        "\u3002", "\u3001", "\uff0e", "\uff0c", "\u200b", ""
-    ],
-)
+
+
+TEXT_SPLITTER = lazy_object("TEXT_SPLITTER", _create_text_splitter)
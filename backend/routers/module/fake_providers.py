@@ -0,0 +1,114 @@
+# backend/routers/module/fake_providers.py
+"""
+オフライン実行用の決定的な LLM・埋め込みプロバイダ（benchmarks/ から使う）
+
+- initialize_llm(name="Fake") または環境変数 LLM_PROVIDER_OVERRIDE=Fake で DeterministicFakeChatModel を使う
+- EMBED は環境変数 EMBEDDING_PROVIDER_OVERRIDE=Fake で DeterministicFakeEmbedding（langchain_core）を使う
+
+応答は入力メッセージのハッシュから生成するため、同じ入力には常に同じ応答を返す。
+FAKE_LLM_LATENCY_MS でプロバイダ側の応答時間を模擬でき（既定 0）、
+並列化の効果（要約の同時生成など）を I/O 待ちを含めて計測できる。
+"""
+import asyncio
+import hashlib
+import os
+import time
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FAKE_PROVIDER_NAME = "Fake"
+
+_VOCABULARY = (
+    "Transformer", "LLM", "Diffusion", "Retrieval-Augmented", "Reinforcement-Learning", "Multimodal",
+    "Benchmark", "Pre-training", "Fine-tuning", "Agent", "Reasoning", "Efficiency", "Evaluation",
+    "データセット", "提案手法", "実験", "精度", "推論", "学習", "評価",
+)
+
+
+def fake_text(seed_text: str, length: int) -> str:
+    """seed_text のハッシュから length 文字程度の決定的なテキストを作る"""
+    digest = hashlib.sha256(seed_text.encode("utf-8")).digest()
+    words: List[str] = []
+    size = 0
+    i = 0
+    while size < length:
+        word = _VOCABULARY[digest[i % len(digest)] % len(_VOCABULARY)]
+        words.append(word)
+        size += len(word) + 1
+        i += 1
+        if i % len(digest) == 0:
+            digest = hashlib.sha256(digest).digest()
+    return " ".join(words)
+
+
+class DeterministicFakeChatModel(BaseChatModel):
+    """入力に対して決定的な応答を返すチャットモデル（ネットワークに接続しない）"""
+
+    model_name: str = "fake-deterministic"
+    response_chars: int = 1200
+    latency_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-deterministic"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name}
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        content = fake_text(f"{self.model_name}\0{prompt}", self.response_chars)
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return self._result(messages)
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        # ツールは呼び出さず、常にテキストで応答する
+        return self
+
+
+def create_fake_chat_model(model_name: str) -> DeterministicFakeChatModel:
+    return DeterministicFakeChatModel(
+        model_name=model_name or "fake-deterministic",
+        response_chars=int(os.getenv("FAKE_LLM_RESPONSE_CHARS", "1200")),
+        latency_seconds=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000.0,
+    )
+
+
+def create_fake_embeddings():
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    return DeterministicFakeEmbedding(size=int(os.getenv("FAKE_EMBEDDING_DIM", "768")))
@@ -0,0 +1,312 @@
+# backend/routers/module/graph_checkpointer.py
+"""
+既存の SQL エンジン（ローカルは SQLite、クラウドは Postgres）に LangGraph のチェックポイントを保存する
+
+DeepResearch / DeepRAG のグラフはノードが完了するたびにここへ状態を書き込む。
+インスタンスの再起動などで実行が途中で止まった場合、ワーカーは同じ thread_id でグラフを再実行し、
+最後に完了したノードの続きから処理する（完了済みノードの LLM 呼び出しは繰り返さない）。
+状態を保存する前に、同じ実行のバッファ済みステップメッセージ（RunMessageWriter）を書き込むため、
+再開時に完了済みノードのメッセージが失われることはない。
+"""
+import asyncio
+import functools
+import pathlib
+import random
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Dict, Optional
+
+import yaml
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from db import engine
+from models import GraphCheckpoint, GraphCheckpointWrite
+
+
+@functools.lru_cache(maxsize=1)
+def get_graph_checkpoint_config() -> dict:
+    """config.yaml からグラフのチェックポイント設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    checkpoint_cfg = cfg.get("graph_checkpoint", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "delete_on_finish": True,  # ジョブ終了後にチェックポイントを削除する
+    }
+    return {**defaults, **checkpoint_cfg}
+
+
+def _flush_run_messages(config: RunnableConfig) -> None:
+    """configurable に run_message_writer があれば、チェックポイント保存前に書き込む"""
+    writer = config["configurable"].get("run_message_writer")
+    if writer is not None:
+        writer.flush()
+
+
+class SQLCheckpointSaver(BaseCheckpointSaver[str]):
+    """graphcheckpoint / graphcheckpointwrite テーブルを使うチェックポインタ（同期API。非同期APIはスレッドで実行）"""
+
+    def __init__(self, sql_engine, serde=None):
+        super().__init__(serde=serde)
+        self.engine = sql_engine
+
+    # --- 読み込み ---
+
+    def _to_tuple(self, db: Session, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = db.exec(
+            select(GraphCheckpointWrite)
+            .where(
+                GraphCheckpointWrite.thread_id == row.thread_id,
+                GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                GraphCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            )
+            .order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+        ).all()
+        sends = []
+        if row.parent_checkpoint_id:
+            sends = db.exec(
+                select(GraphCheckpointWrite)
+                .where(
+                    GraphCheckpointWrite.thread_id == row.thread_id,
+                    GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                    GraphCheckpointWrite.checkpoint_id == row.parent_checkpoint_id,
+                    GraphCheckpointWrite.channel == TASKS,
+                )
+                .order_by(GraphCheckpointWrite.task_path, GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+            ).all()
+
+        checkpoint: Checkpoint = self.serde.loads_typed((row.checkpoint_type, row.checkpoint))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "pending_sends": [self.serde.loads_typed((w.value_type, w.value)) for w in sends],
+            },
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            pending_writes=[(w.task_id, w.channel, self.serde.loads_typed((w.value_type, w.value))) for w in writes],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with Session(self.engine) as db:
+            query = select(GraphCheckpoint).where(
+                GraphCheckpoint.thread_id == thread_id,
+                GraphCheckpoint.checkpoint_ns == checkpoint_ns,
+            )
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+            else:
+                # checkpoint_id は時刻順に単調増加する（uuid6）
+                query = query.order_by(GraphCheckpoint.checkpoint_id.desc()).limit(1)
+            row = db.exec(query).first()
+            return self._to_tuple(db, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with Session(self.engine) as db:
+            query = select(GraphCheckpoint)
+            if config:
+                query = query.where(GraphCheckpoint.thread_id == config["configurable"]["thread_id"])
+                checkpoint_ns = config["configurable"].get("checkpoint_ns")
+                if checkpoint_ns is not None:
+                    query = query.where(GraphCheckpoint.checkpoint_ns == checkpoint_ns)
+                if checkpoint_id := get_checkpoint_id(config):
+                    query = query.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+            if before and (before_id := get_checkpoint_id(before)):
+                query = query.where(GraphCheckpoint.checkpoint_id < before_id)
+            query = query.order_by(GraphCheckpoint.checkpoint_id.desc())
+
+            results = []
+            for row in db.exec(query):
+                if limit is not None and len(results) >= limit:
+                    break
+                checkpoint_tuple = self._to_tuple(db, row)
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(checkpoint_tuple)
+        yield from results
+
+    # --- 書き込み ---
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        _flush_run_messages(config)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # type: ignore[misc]
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(c)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with Session(self.engine) as db:
+            db.merge(GraphCheckpoint(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                checkpoint_type=checkpoint_type,
+                checkpoint=checkpoint_blob,
+                metadata_type=metadata_type,
+                checkpoint_metadata=metadata_blob,
+            ))
+            db.commit()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        _flush_run_messages(config)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with Session(self.engine) as db:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                key = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx)
+                # 通常の書き込みは最初のものを保持し、特殊チャンネル（エラー等）は上書きする
+                if write_idx >= 0 and db.get(GraphCheckpointWrite, key) is not None:
+                    continue
+                value_type, value_blob = self.serde.dumps_typed(value)
+                db.merge(GraphCheckpointWrite(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint_id,
+                    task_id=task_id,
+                    idx=write_idx,
+                    channel=channel,
+                    value_type=value_type,
+                    value=value_blob,
+                    task_path=task_path,
+                ))
+            db.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with Session(self.engine) as db:
+            db.exec(delete(GraphCheckpointWrite).where(GraphCheckpointWrite.thread_id == thread_id))
+            db.exec(delete(GraphCheckpoint).where(GraphCheckpoint.thread_id == thread_id))
+            db.commit()
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- 非同期API（グラフを astream で実行する場合用） ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_checkpointer: Optional[SQLCheckpointSaver] = None
+
+
+def get_graph_checkpointer() -> Optional[SQLCheckpointSaver]:
+    """DeepResearch / DeepRAG のグラフに渡すチェックポインタ（無効化されている場合は None）"""
+    global _checkpointer
+    if not get_graph_checkpoint_config()["enabled"]:
+        return None
+    if _checkpointer is None:
+        _checkpointer = SQLCheckpointSaver(engine)
+    return _checkpointer
+
+
+def has_checkpoint(thread_id: str) -> bool:
+    """thread_id の途中状態が保存されているか"""
+    checkpointer = get_graph_checkpointer()
+    if checkpointer is None:
+        return False
+    return checkpointer.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}) is not None
+
+
+def research_job_thread_id(job_id: int) -> str:
+    """ResearchJob 1件分のグラフ実行に使う thread_id（同じセッションの別の質問とは状態を共有しない）"""
+    return f"research_job_{job_id}"
@@ -0,0 +1,69 @@
+# backend/routers/module/graph_registry.py
+"""
+LangGraph のコンパイル済みグラフのレジストリと、1回のグラフ実行内でのチェーンのメモ化
+
+グラフのトポロジ（ノードとエッジ）はリクエストによらず同じため、各グラフは初回利用時に一度だけ
+コンパイルして使い回す。ユーザー・ツール・プロンプトIDなど実行ごとに変わる値は
+state または config["configurable"] で各ノードに渡す。
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+_compiled_graphs: Dict[str, Any] = {}
+_registry_lock = threading.Lock()
+
+
+def get_compiled_graph(name: str, builder: Callable[[], Any]) -> Any:
+    """name に対応するコンパイル済みグラフを返す。未登録の場合は builder() で一度だけコンパイルする。"""
+    graph = _compiled_graphs.get(name)
+    if graph is not None:
+        return graph
+    with _registry_lock:
+        graph = _compiled_graphs.get(name)
+        if graph is None:
+            graph = builder()
+            _compiled_graphs[name] = graph
+            logger.info("Compiled graph '%s'", name)
+    return graph
+
+
+class RunChainCache:
+    """1回のグラフ実行内で、チェーンやプロンプト解決結果をキー単位でメモ化する
+
+    キーは (ノード名, プロンプトID, モデル名, ...) のタプルを想定。
+    同一実行内で同じノードが何度呼ばれても、プロンプトのDB取得と initialize_llm 由来の
+    チェーン構築は初回のみになる。
+    """
+
+    def __init__(self):
+        self._items: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                return self._items[key]
+        value = factory()
+        with self._lock:
+            return self._items.setdefault(key, value)
+
+
+def new_run_configurable(**values: Any) -> Dict[str, Any]:
+    """グラフ実行用の configurable を作成する（チェーンキャッシュを含む）"""
+    return {"chain_cache": RunChainCache(), **values}
+
+
+def get_run_chain_cache(config: Optional[RunnableConfig]) -> RunChainCache:
+    """config から実行単位のチェーンキャッシュを取り出す。未設定の場合はメモ化しない使い捨てを返す。"""
+    cache = ((config or {}).get("configurable") or {}).get("chain_cache")
+    return cache if cache is not None else RunChainCache()
+
+
+def llm_cache_key(llm: Any) -> str:
+    """チェーンキャッシュのキーに使うモデル識別子"""
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__)
@@ -0,0 +1,171 @@
+# backend/routers/module/lazy_import.py
+"""
+重いライブラリ・クライアントの遅延初期化（Cloud Run のコールドスタート短縮用）
+
+main.py の import 時に chromadb・BigQuery・sklearn・PyPDF2・arxiv などを読み込み、
+埋め込みモデルや LLM クライアントを生成していたため、/ping が応答するまでに数秒かかっていた。
+
+- lazy_module("chromadb") はモジュールの代わりに置けるプロキシで、最初の属性アクセスで import する
+- lazy_attr("langchain_chroma", "Chroma") はクラス・関数の代わりに置けるプロキシ。
+  呼び出し・属性アクセス・isinstance の第2引数として使える
+- lazy_object(factory) は最初のアクセスで factory() を呼んでインスタンスを生成する
+- サーバーの起動後に start_background_warmup() を呼ぶと、登録済みのプロキシと warm-up 関数を
+  バックグラウンドスレッドで読み込む（最初のリクエストの待ち時間を減らす）
+
+読み込みにかかった時間は get_lazy_import_timings() で確認できる。
+"""
+import functools
+import importlib
+import logging
+import pathlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_cold_start_config() -> dict:
+    """config.yaml からコールドスタート（遅延初期化・warm-up）の設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    cold_start_cfg = cfg.get("cold_start", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "warmup_enabled": True,
+        "warmup_delay_seconds": 1.0,   # 起動直後のリクエスト処理と競合しないよう少し待ってから始める
+        "warmup_modules": [],          # warm-up で import するモジュール（DeepResearch / DeepRAG のグラフ定義など）
+        "import_time_budget_seconds": 3.0,
+    }
+    return {**defaults, **cold_start_cfg}
+
+
+_registry: List["_LazyBase"] = []
+_warmup_functions: List[Callable[[], Any]] = []
+_timings: Dict[str, float] = {}
+_registry_lock = threading.Lock()
+
+
+class _LazyBase:
+    """最初のアクセスで _factory() を1回だけ実行して結果を保持する"""
+
+    __slots__ = ("_lazy_name", "_lazy_factory", "_lazy_value", "_lazy_lock")
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_value", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+        with _registry_lock:
+            _registry.append(self)
+
+    def _lazy_resolve(self) -> Any:
+        value = object.__getattribute__(self, "_lazy_value")
+        if value is not None:
+            return value
+        with object.__getattribute__(self, "_lazy_lock"):
+            value = object.__getattribute__(self, "_lazy_value")
+            if value is None:
+                name = object.__getattribute__(self, "_lazy_name")
+                started = time.perf_counter()
+                value = object.__getattribute__(self, "_lazy_factory")()
+                elapsed = time.perf_counter() - started
+                with _registry_lock:
+                    _timings[name] = elapsed
+                logger.debug("%s loaded in %.2fs", name, elapsed)
+                object.__setattr__(self, "_lazy_value", value)
+        return value
+
+    def _lazy_is_loaded(self) -> bool:
+        return object.__getattribute__(self, "_lazy_value") is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_resolve(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._lazy_resolve()(*args, **kwargs)
+
+    def __instancecheck__(self, instance: Any) -> bool:
+        return isinstance(instance, self._lazy_resolve())
+
+    def __subclasscheck__(self, subclass: Any) -> bool:
+        return issubclass(subclass, self._lazy_resolve())
+
+    def __repr__(self) -> str:
+        name = object.__getattribute__(self, "_lazy_name")
+        state = "loaded" if self._lazy_is_loaded() else "not loaded"
+        return f"<lazy {name} ({state})>"
+
+
+def lazy_module(module_name: str) -> Any:
+    """import module_name の代わりに使う（例: chromadb = lazy_module("chromadb")）"""
+    return _LazyBase(module_name, lambda: importlib.import_module(module_name))
+
+
+def lazy_attr(module_name: str, attr_name: str) -> Any:
+    """from module_name import attr_name の代わりに使う（例: Chroma = lazy_attr("langchain_chroma", "Chroma")）"""
+    return _LazyBase(f"{module_name}.{attr_name}", lambda: getattr(importlib.import_module(module_name), attr_name))
+
+
+def lazy_object(name: str, factory: Callable[[], Any]) -> Any:
+    """モジュール読み込み時に生成していたインスタンスの代わりに使う"""
+    return _LazyBase(name, factory)
+
+
+def register_warmup(function: Callable[[], Any]) -> Callable[[], Any]:
+    """warm-up で実行する初期化関数を登録する（デコレータとしても使える）"""
+    with _registry_lock:
+        _warmup_functions.append(function)
+    return function
+
+
+def get_lazy_import_timings() -> Dict[str, float]:
+    """読み込み済みのプロキシと所要秒数を返す"""
+    with _registry_lock:
+        return dict(_timings)
+
+
+def warm_up() -> None:
+    """登録済みのプロキシ・warm-up 関数・warmup_modules をすべて読み込む（失敗しても最初の利用時に再試行される）"""
+    started = time.perf_counter()
+    for module_name in get_cold_start_config()["warmup_modules"] or []:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning("Warm-up import failed for %s: %s", module_name, e)
+    with _registry_lock:
+        targets = list(_registry)
+        functions = list(_warmup_functions)
+    for target in targets:
+        try:
+            target._lazy_resolve()
+        except Exception as e:
+            logger.warning("Warm-up failed for %s: %s", object.__getattribute__(target, "_lazy_name"), e)
+    for function in functions:
+        try:
+            function()
+        except Exception as e:
+            logger.warning("Warm-up function %s failed: %s", getattr(function, "__name__", function), e)
+    logger.info("Warm-up finished in %.2fs", time.perf_counter() - started)
+
+
+_warmup_thread: Optional[threading.Thread] = None
+
+
+def start_background_warmup() -> None:
+    """サーバーがリクエストを受け付け始めた後に呼ぶ。warmup_enabled が false の場合は何もしない"""
+    global _warmup_thread
+    cfg = get_cold_start_config()
+    if not cfg["warmup_enabled"] or _warmup_thread is not None:
+        return
+
+    def _run() -> None:
+        time.sleep(float(cfg["warmup_delay_seconds"]))
+        warm_up()
+
+    _warmup_thread = threading.Thread(target=_run, name="lazy-import-warmup", daemon=True)
+    _warmup_thread.start()
@@ -0,0 +1,371 @@
+# backend/routers/module/llm_retry.py
+"""
+LLM 呼び出しの共通リトライ実行（DeepResearch / DeepRAG / Simple RAG）
+
+- ainvoke を asyncio.wait_for で実行するため、タイムアウトした呼び出しは実際にキャンセルされる
+- リトライ間隔は指数バックオフ＋ジッター。プロバイダが Retry-After（retry_delay）を返した場合はそれを優先する
+- モデルごとのサーキットブレーカーで、連続失敗中のモデルへの呼び出しを一定時間即時失敗させる
+- 試行・リトライ・タイムアウト・失敗の回数をモデル単位で集計する（get_llm_retry_metrics）
+
+同期コード（グラフのノード）からは invoke_with_retry を使う。呼び出しは専用のイベントループスレッドで
+実行されるため、呼び出しごとにスレッドを作らず、タイムアウト後にスレッドが残り続けることもない。
+応答内容を検証するノードは invoke_validated を使い、検証に失敗した場合だけ1回問い合わせ直す。
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import pathlib
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+import yaml
+
+from routers.module.graph_registry import llm_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_retry_config() -> dict:
+    """config.yaml から LLM 呼び出しのリトライ設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    retry_cfg = cfg.get("llm_retry", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "timeout_seconds": 300,
+        "max_retries": 3,
+        "base_delay_seconds": 2.0,
+        "max_delay_seconds": 60.0,
+        "circuit_failure_threshold": 5,
+        "circuit_reset_seconds": 60.0,
+    }
+    return {**defaults, **retry_cfg}
+
+
+class LLMCircuitOpenError(RuntimeError):
+    """サーキットブレーカーが開いているため呼び出しを行わなかった場合に送出する"""
+
+    def __init__(self, model_key: str, retry_after: float):
+        super().__init__(f"Circuit breaker is open for model '{model_key}'. Retry after {retry_after:.1f}s.")
+        self.model_key = model_key
+        self.retry_after = retry_after
+
+
+# -----------------------------------------------------------------
+#                      サーキットブレーカー
+# -----------------------------------------------------------------
+
+class CircuitBreaker:
+    """連続失敗が閾値に達したら reset_seconds の間 open にし、経過後は1件だけ試行を通す（half-open）"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def before_call(self) -> Optional[float]:
+        """呼び出し可能なら None、open 中なら残り秒数を返す"""
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self._trial_in_flight:
+                return self.reset_seconds
+            self._trial_in_flight = True
+            return None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """失敗を記録する。この失敗で open になった場合は True を返す"""
+        with self._lock:
+            self._failures += 1
+            was_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if was_trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _get_breaker(model_key: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(model_key)
+        if breaker is None:
+            cfg = get_llm_retry_config()
+            breaker = CircuitBreaker(int(cfg["circuit_failure_threshold"]), float(cfg["circuit_reset_seconds"]))
+            _breakers[model_key] = breaker
+        return breaker
+
+
+# -----------------------------------------------------------------
+#                      メトリクス
+# -----------------------------------------------------------------
+
+_metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+_metrics_lock = threading.Lock()
+
+
+def _count(model_key: str, name: str) -> None:
+    with _metrics_lock:
+        _metrics[model_key][name] += 1
+
+
+def get_llm_retry_metrics() -> Dict[str, Dict[str, int]]:
+    """モデルごとの {attempts, successes, retries, timeouts, failures, circuit_open, circuit_rejected} を返す"""
+    with _metrics_lock:
+        return {model: dict(counts) for model, counts in _metrics.items()}
+
+
+# -----------------------------------------------------------------
+#                      エラー分類とバックオフ
+# -----------------------------------------------------------------
+
+_NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+_RETRY_DELAY_PATTERNS = [
+    re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),      # google.rpc.RetryInfo
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),                     # "Please retry in 12.3s"
+    re.compile(r"retry[- ]after[\"':\s]*([\d.]+)", re.IGNORECASE),
+]
+
+
+def _status_code_of(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if callable(value):
+            try:
+                value = value()
+            except Exception:
+                value = None
+        if isinstance(value, int):
+            return value
+        # grpc.StatusCode などの列挙型
+        if value is not None and isinstance(getattr(value, "value", None), tuple):
+            code_name = getattr(value, "name", "")
+            if code_name == "RESOURCE_EXHAUSTED":
+                return 429
+            if code_name in ("UNAVAILABLE", "DEADLINE_EXCEEDED"):
+                return 503
+            if code_name in ("INVALID_ARGUMENT", "PERMISSION_DENIED", "UNAUTHENTICATED", "NOT_FOUND"):
+                return 400
+    response = getattr(exc, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _retry_after_hint(exc: BaseException) -> Optional[float]:
+    """例外からプロバイダ指定の待機秒数（Retry-After / RetryInfo）を取り出す"""
+    value = getattr(exc, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            header_value = headers.get("retry-after")
+        except Exception:
+            header_value = None
+        if header_value:
+            try:
+                return float(header_value)
+            except ValueError:
+                pass
+    message = str(exc)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    code = _status_code_of(exc)
+    return code not in _NON_RETRYABLE_STATUS
+
+
+def _backoff_delay(retry_number: int, hint: Optional[float], cfg: dict) -> float:
+    """retry_number 回目のリトライまでの待機秒数（exp/2〜exp のジッター付き。ヒントがあればヒントに従う）"""
+    max_delay = float(cfg["max_delay_seconds"])
+    if hint is not None:
+        # 同時に待機した呼び出しが一斉に再送しないよう、ヒントにも少しジッターを加える
+        return min(hint, max_delay) + random.uniform(0, 1.0)
+    exp = min(max_delay, float(cfg["base_delay_seconds"]) * (2 ** (retry_number - 1)))
+    return random.uniform(exp / 2, exp)
+
+
+def _model_key_for(runnable: Any) -> str:
+    """チェーン（prompt | llm | parser など）に含まれるモデル名を探してブレーカーのキーにする"""
+    stack = [runnable]
+    seen = 0
+    while stack and seen < 20:
+        node = stack.pop(0)
+        seen += 1
+        if getattr(node, "model_name", None) or getattr(node, "model", None):
+            return llm_cache_key(node)
+        for attr in ("bound", "first", "middle", "last", "steps"):
+            child = getattr(node, attr, None)
+            if isinstance(child, list):
+                stack.extend(child)
+            elif child is not None and not isinstance(child, (str, dict)):
+                stack.append(child)
+    return "default"
+
+
+# -----------------------------------------------------------------
+#                      呼び出し
+# -----------------------------------------------------------------
+
+async def ainvoke_with_retry(
+    chain: Any,
+    payload: Any,
+    model_key: Optional[str] = None,
+    timeout_seconds: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    **invoke_kwargs: Any
+) -> Any:
+    """chain.ainvoke をタイムアウト・リトライ・サーキットブレーカー付きで実行する。
+
+    Args:
+        chain: ainvoke を持つ Runnable
+        payload: ainvoke に渡す入力
+        model_key: ブレーカーとメトリクスのキー（省略時はチェーンから推定）
+        timeout_seconds: 1回あたりのタイムアウト秒数（省略時は config.yaml の llm_retry.timeout_seconds）
+        max_retries: 最大リトライ回数（初回を含まない。省略時は llm_retry.max_retries）
+
+    Raises:
+        LLMCircuitOpenError: ブレーカーが open の場合
+        Exception: リトライ上限に達した場合は最後の例外（タイムアウトは asyncio.TimeoutError）
+    """
+    cfg = get_llm_retry_config()
+    model_key = model_key or _model_key_for(chain)
+    timeout_seconds = float(timeout_seconds if timeout_seconds is not None else cfg["timeout_seconds"])
+    max_retries = int(max_retries if max_retries is not None else cfg["max_retries"])
+    breaker = _get_breaker(model_key)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = breaker.before_call()
+        if remaining is not None:
+            _count(model_key, "circuit_rejected")
+            raise LLMCircuitOpenError(model_key, remaining)
+
+        _count(model_key, "attempts")
+        try:
+            response = await asyncio.wait_for(chain.ainvoke(payload, **invoke_kwargs), timeout=timeout_seconds)
+            breaker.record_success()
+            _count(model_key, "successes")
+            return response
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                _count(model_key, "timeouts")
+                logger.warning("%s: attempt %s/%s timed out after %ss", model_key, attempt, max_retries + 1, timeout_seconds)
+            else:
+                logger.warning("%s: attempt %s/%s failed: %s: %s", model_key, attempt, max_retries + 1, e.__class__.__name__, e)
+
+            retryable = _is_retryable(e)
+            if not retryable:
+                # リクエスト内容起因のエラーはモデル側の障害として数えない
+                breaker.record_success()
+            elif breaker.record_failure():
+                _count(model_key, "circuit_open")
+                logger.error("%s: circuit breaker opened", model_key)
+            if not retryable or attempt > max_retries:
+                _count(model_key, "failures")
+                raise
+
+            delay = _backoff_delay(attempt, _retry_after_hint(e), cfg)
+            _count(model_key, "retries")
+            logger.info("%s: retrying in %.1fs", model_key, delay)
+            await asyncio.sleep(delay)
+
+
+# 同期コードからの呼び出し用の専用イベントループ
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-retry-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+async def _run_in_context(coroutine: Any, context: contextvars.Context) -> Any:
+    # create_task(context=...) は Python 3.11 以降のため、context 内で作成してコピーを引き継がせる
+    return await context.run(asyncio.get_running_loop().create_task, coroutine)
+
+
+def invoke_with_retry(chain: Any, payload: Any, **kwargs: Any) -> Any:
+    """ainvoke_with_retry の同期版。グラフのノードなど、イベントループ外のスレッドから呼び出す。
+
+    呼び出し元の contextvars（トレースのコンテキスト・LangChain の親 run）を引き継いで実行する。
+    """
+    coroutine = _run_in_context(ainvoke_with_retry(chain, payload, **kwargs), contextvars.copy_context())
+    future = asyncio.run_coroutine_threadsafe(coroutine, _get_background_loop())
+    return future.result()
+
+
+class LLMResponseValidationError(ValueError):
+    """応答が期待する形式を満たさず、再問い合わせをしても解消しなかった場合に送出する"""
+
+
+def invoke_validated(
+    invoke: Callable[[Any, Any], Any],
+    chain: Any,
+    payload: Any,
+    validate: Callable[[Any], None],
+    node_name: str,
+    max_reasks: int = 1,
+) -> Any:
+    """invoke(chain, payload) の応答を validate で検証して返す（グラフのノード用）。
+
+    一時的な障害のリトライは invoke（invoke_with_retry）に任せ、ここでは応答内容の検証失敗
+    （validate が ValueError を送出した場合）に限り max_reasks 回まで問い合わせ直す。
+    呼び出し自体の失敗（リトライ上限・LLMCircuitOpenError）は問い合わせ直さずにそのまま送出する。
+
+    Raises:
+        LLMResponseValidationError: 再問い合わせ後も応答が不正な場合
+    """
+    last_error: Optional[ValueError] = None
+    for attempt in range(1, max_reasks + 2):
+        try:
+            response = invoke(chain, payload)
+        except Exception as e:
+            logger.error("%s: LLM call failed: %s: %s", node_name, e.__class__.__name__, e)
+            raise
+        try:
+            validate(response)
+            return response
+        except ValueError as e:
+            last_error = e
+            logger.warning("%s: invalid response (attempt %s/%s): %s", node_name, attempt, max_reasks + 1, e)
+    raise LLMResponseValidationError(
+        f"{node_name}: invalid LLM response after {max_reasks + 1} attempts: {last_error}"
+    ) from last_error
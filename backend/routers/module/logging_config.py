@@ -0,0 +1,124 @@
+# backend/routers/module/logging_config.py
+"""
+アプリ全体のログ設定（標準の logging を使い、各モジュールは logging.getLogger(__name__) で出力する）
+
+- レベル: logging.level（環境変数 LOG_LEVEL）。ロガー名ごとに logging.levels（LOG_LEVELS="name=LEVEL,..."）
+- 形式: text（開発時）/ json（1行1レコード。Cloud Logging が severity・message を解釈する）
+  logger.info("...", extra={"user_id": 1}) の extra は json の場合フィールドとして出力する
+- サンプリング: logging.sampling のロガーは DEBUG 行を指定の割合だけ出す（行ごとの高頻度ログ向け）
+
+ホットパスでは f-string ではなく logger.debug("... %s", value) の形で書き、無効なレベルでは
+文字列の組み立て自体を行わない。引数の計算が重い場合は logger.isEnabledFor(logging.DEBUG) で囲む。
+"""
+import functools
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+import yaml
+
+
+@functools.lru_cache(maxsize=1)
+def get_logging_config() -> dict:
+    """config.yaml からログの設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    logging_cfg = cfg.get("logging", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "level": "INFO",
+        "format": None,        # text / json（None の場合は DEPLOY=local なら text、それ以外は json）
+        "levels": {},          # ロガー名 -> レベル（例: {"vectorstore.manager": "DEBUG"}）
+        "sampling": {},        # ロガー名 -> DEBUG 行を出す割合（0.0〜1.0）
+    }
+    merged = {**defaults, **logging_cfg}
+    merged["levels"] = dict(merged.get("levels") or {})
+    merged["sampling"] = dict(merged.get("sampling") or {})
+
+    if os.getenv("LOG_LEVEL"):
+        merged["level"] = os.environ["LOG_LEVEL"]
+    if os.getenv("LOG_FORMAT"):
+        merged["format"] = os.environ["LOG_FORMAT"]
+    if not merged["format"]:
+        merged["format"] = "text" if os.getenv("DEPLOY", "cloud") == "local" else "json"
+    for item in (os.getenv("LOG_LEVELS") or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            merged["levels"][name.strip()] = level.strip()
+    return merged
+
+
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行の JSON にする（Cloud Logging の構造化ログ形式）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "severity": record.levelname,
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """DEBUG 以下のレコードを、出力箇所（ファイル・行）ごとに 1/N 件だけ通す"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1.0 / rate)) if rate > 0 else 0
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_logging(force: bool = False) -> None:
+    """main.py / worker.py の先頭で呼ぶ（他のモジュールの basicConfig より先に root を設定する）"""
+    global _configured
+    with _configure_lock:
+        if _configured and not force:
+            return
+        cfg = get_logging_config()
+        handler = logging.StreamHandler(sys.stdout)
+        if cfg["format"] == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+        logging.basicConfig(level=str(cfg["level"]).upper(), handlers=[handler], force=True)
+
+        for name, level in cfg["levels"].items():
+            logging.getLogger(name).setLevel(str(level).upper())
+        for name, rate in cfg["sampling"].items():
+            target = logging.getLogger(name)
+            for existing in [f for f in target.filters if isinstance(f, DebugSamplingFilter)]:
+                target.removeFilter(existing)
+            target.addFilter(DebugSamplingFilter(float(rate)))
+        _configured = True
@@ -0,0 +1,198 @@
+# backend/routers/module/paper_chunk_index.py
+"""
+論文チャット用のチャンク単位検索インデックス
+
+PaperMetadata.full_text を TEXT_SPLITTER で分割し、EMBED で埋め込みを作成して
+論文ごとに一度だけインデックスを構築する（プロセス内LRUキャッシュ）。
+チャットの各ターンでは質問に関連する上位 top_k チャンクのみをコンテキストとして渡す。
+短い論文や埋め込みが利用できない場合は、従来通り全文コンテキストにフォールバックする。
+"""
+import asyncio
+import functools
+import logging
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from routers.module.embeddings import EMBED, TEXT_SPLITTER
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_paper_chat_retrieval_config() -> dict:
+    """config.yaml から論文チャットのチャンク検索設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    retrieval_cfg = cfg.get("paper_chat_retrieval", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "full_context_max_chars": 30000,  # これ以下の論文は全文コンテキストで回答する
+        "fallback_max_chars": 90000,      # 全文コンテキスト時の切り詰め文字数（従来値）
+        "top_k": 8,
+        "max_cached_papers": 64,
+        "embed_batch_size": 100,
+    }
+    return {**defaults, **retrieval_cfg}
+
+
+class PaperChunkIndex:
+    """1論文分のチャンクと正規化済み埋め込み行列を保持する"""
+
+    def __init__(self, paper_metadata_id: int, chunks: List[str], embeddings: np.ndarray):
+        self.paper_metadata_id = paper_metadata_id
+        self.chunks = chunks
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.embeddings = embeddings / norms
+
+    def top_k(self, query_embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        """クエリとのコサイン類似度が高い順に (チャンク番号, スコア) を返す"""
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vec)
+        if query_norm == 0:
+            return []
+        scores = self.embeddings @ (query_vec / query_norm)
+        k = min(k, len(self.chunks))
+        top_indices = np.argpartition(-scores, k - 1)[:k]
+        return sorted(((int(i), float(scores[i])) for i in top_indices), key=lambda x: -x[1])
+
+
+# paper_metadata_id -> (full_text の長さ, PaperChunkIndex)
+_index_cache: "OrderedDict[int, Tuple[int, PaperChunkIndex]]" = OrderedDict()
+_cache_lock = threading.Lock()
+# 同一論文のインデックスを同時に二重構築しないためのロック
+# paper_metadata_id -> [asyncio.Lock, 待機中を含む利用数]（利用数が 0 になったら削除し、辞書が増え続けないようにする）
+_build_locks: Dict[int, list] = {}
+
+
+def _get_cached_index(paper_metadata_id: int, text_length: int) -> Optional[PaperChunkIndex]:
+    with _cache_lock:
+        entry = _index_cache.get(paper_metadata_id)
+        if entry is None:
+            return None
+        cached_length, index = entry
+        if cached_length != text_length:
+            # 本文が更新された場合は作り直す
+            del _index_cache[paper_metadata_id]
+            return None
+        _index_cache.move_to_end(paper_metadata_id)
+        return index
+
+
+def _put_cached_index(paper_metadata_id: int, text_length: int, index: PaperChunkIndex) -> None:
+    max_cached = int(get_paper_chat_retrieval_config().get("max_cached_papers", 64))
+    with _cache_lock:
+        _index_cache[paper_metadata_id] = (text_length, index)
+        _index_cache.move_to_end(paper_metadata_id)
+        while len(_index_cache) > max_cached:
+            _index_cache.popitem(last=False)
+
+
+def invalidate_paper_chunk_index(paper_metadata_id: int) -> None:
+    """論文本文を更新した場合などにインデックスを破棄する"""
+    with _cache_lock:
+        _index_cache.pop(paper_metadata_id, None)
+
+
+async def get_or_build_paper_chunk_index(paper_metadata_id: int, full_text: str) -> PaperChunkIndex:
+    """論文のチャンクインデックスを取得する。未構築の場合は一度だけ構築する。"""
+    cached = _get_cached_index(paper_metadata_id, len(full_text))
+    if cached is not None:
+        return cached
+
+    lock_entry = _build_locks.get(paper_metadata_id)
+    if lock_entry is None:
+        lock_entry = _build_locks[paper_metadata_id] = [asyncio.Lock(), 0]
+    lock_entry[1] += 1
+    try:
+        async with lock_entry[0]:
+            cached = _get_cached_index(paper_metadata_id, len(full_text))
+            if cached is not None:
+                return cached
+
+            chunks = [c for c in TEXT_SPLITTER.split_text(full_text) if c.strip()]
+            batch_size = int(get_paper_chat_retrieval_config().get("embed_batch_size", 100))
+            vectors: List[List[float]] = []
+            for start in range(0, len(chunks), batch_size):
+                vectors.extend(await EMBED.aembed_documents(chunks[start:start + batch_size]))
+
+            index = PaperChunkIndex(paper_metadata_id, chunks, np.asarray(vectors, dtype=np.float32))
+            _put_cached_index(paper_metadata_id, len(full_text), index)
+            logger.info("Built index for paper %s: %s chunks", paper_metadata_id, len(chunks))
+            return index
+    finally:
+        lock_entry[1] -= 1
+        if lock_entry[1] == 0 and _build_locks.get(paper_metadata_id) is lock_entry:
+            del _build_locks[paper_metadata_id]
+
+
+async def build_paper_chat_context(
+    paper_metadata_id: int,
+    title: str,
+    abstract: str,
+    full_text: Optional[str],
+    question: str
+) -> Tuple[str, Optional[str]]:
+    """論文チャット1ターン分のコンテキストテキストを作成する。
+
+    コンテキストキャッシュのプレフィックスがターンごとに変わらないよう、
+    論文ごとに不変な部分（全文またはタイトル・概要）と、質問ごとに変わる抜粋部分を分けて返す。
+
+    Args:
+        paper_metadata_id: 論文メタデータID（インデックスのキャッシュキー）
+        title: 論文タイトル
+        abstract: 論文概要
+        full_text: 論文全文（None の場合はタイトルと概要のみ）
+        question: 今回のユーザー質問（チャンク検索のクエリ）
+
+    Returns:
+        Tuple[str, Optional[str]]: (キャッシュ対象の固定コンテキスト, 質問ごとの抜粋コンテキスト or None)
+    """
+    cfg = get_paper_chat_retrieval_config()
+    fallback_max_chars = int(cfg.get("fallback_max_chars", 90000))
+
+    if not full_text:
+        context_text = "この論文の全文テキスト情報が利用できません。タイトルと概要に基づいて回答します。\n"
+        context_text += f"Title: {title}\n"
+        context_text += f"Abstract: {abstract}"
+        return context_text, None
+
+    # 短い論文・検索無効時・埋め込み未初期化時は全文コンテキスト
+    if (
+        not cfg.get("enabled", True)
+        or len(full_text) <= int(cfg.get("full_context_max_chars", 30000))
+        or not EMBED.is_available()
+        or not question.strip()
+    ):
+        return full_text[:fallback_max_chars], None
+
+    try:
+        index = await get_or_build_paper_chunk_index(paper_metadata_id, full_text)
+        if not index.chunks:
+            return full_text[:fallback_max_chars], None
+        query_embedding = await EMBED.aembed_query(question)
+        hits = index.top_k(query_embedding, int(cfg.get("top_k", 8)))
+    except Exception as e:
+        logger.warning("Chunk retrieval failed for paper %s, falling back to full text: %s", paper_metadata_id, e)
+        return full_text[:fallback_max_chars], None
+
+    # 固定部分はタイトルと概要のみ（質問によらず同一なのでキャッシュキーが安定する）
+    stable_text = "\n\n".join([
+        "以下は論文全文のうち、質問に関連する部分を抜粋したものです。",
+        f"Title: {title}",
+        f"Abstract: {abstract}",
+    ])
+    # 論文内の出現順に並べて渡す（文脈の前後関係を保つ）
+    selected = sorted(idx for idx, _ in hits)
+    excerpt_parts = [
+        f"--- 抜粋 (チャンク {idx + 1}/{len(index.chunks)}) ---\n{index.chunks[idx]}"
+        for idx in selected
+    ]
+    return stable_text, "\n\n".join(excerpt_parts)
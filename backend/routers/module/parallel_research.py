@@ -0,0 +1,139 @@
+# backend/routers/module/parallel_research.py
+"""
+DeepResearch / DeepRAG の並列サブタスク実行
+
+Supervisor が互いに独立した調査タスク（parallel_actions）を複数返した場合、各タスクを
+LangGraph の Send で research_branch ノードに振り分けて同時に実行する。
+各ブランチは「エージェント → ツール」のループを単独で回して結果をまとめ、merge_branches ノードが
+タスク番号順に結合して Supervisor に戻す（実行完了順によらず結果の並びは決定的）。
+同時実行数は config["max_concurrency"] で上限を設ける。
+1回に振り分けるタスク数は config["max_branches"] までとし、超えた分は結合結果に未実行タスクとして
+記載して Supervisor に再計画させる。
+"""
+import functools
+import logging
+import pathlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from sqlmodel import Session
+
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_parallel_research_config() -> dict:
+    """config.yaml から並列サブタスク実行の設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    parallel_cfg = cfg.get("parallel_research", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "max_concurrency": 3,   # 同時に実行するブランチ数の上限
+        "max_branches": 5,      # 1回の振り分けで実行するタスク数の上限（超えた分は Supervisor に差し戻す）
+        "max_tool_rounds": 4,   # 1ブランチ内でのツール呼び出しの最大往復数
+    }
+    return {**defaults, **parallel_cfg}
+
+
+def branch_results_reducer(current: Optional[List[Dict[str, Any]]], update: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """GraphState.branch_results 用のリデューサ。None を書き込むと空に戻す。"""
+    if update is None:
+        return []
+    return (current or []) + update
+
+
+def select_parallel_tasks(parallel_actions: Optional[List[str]]) -> Tuple[List[str], List[str]]:
+    """(並列実行するタスク, 上限を超えて今回は実行しないタスク) を返す
+
+    無効化されている場合や独立タスクが2件未満の場合は ([], [])。
+    """
+    cfg = get_parallel_research_config()
+    tasks = [t.strip() for t in (parallel_actions or []) if t and t.strip()]
+    if not cfg["enabled"] or len(tasks) < 2:
+        return [], []
+    max_branches = int(cfg["max_branches"])
+    selected, deferred = tasks[:max_branches], tasks[max_branches:]
+    if deferred:
+        logger.info("Parallel tasks exceed max_branches=%d; deferring %d task(s) to the supervisor: %s", max_branches, len(deferred), deferred)
+    return selected, deferred
+
+
+def latest_user_question(messages: List[AnyMessage]) -> str:
+    """履歴から最新のユーザー質問を取り出す（ブランチに渡す背景情報）"""
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage) and getattr(msg, "name", None) is None:
+            return msg.content if isinstance(msg.content, str) else str(msg.content)
+    return ""
+
+
+def branch_input_messages(question: str, task: str) -> List[AnyMessage]:
+    content = f"ユーザーの質問:\n{question}\n\n調査タスク:\n{task}" if question else task
+    return [HumanMessage(content=content)]
+
+
+@contextmanager
+def branch_db_session(config: RunnableConfig) -> Iterator[RunnableConfig]:
+    """ブランチ専用の DB セッションを持つ config を返す（SQLAlchemy の Session はスレッド間で共有できないため）"""
+    with Session(engine) as db:
+        yield {**config, "configurable": {**config.get("configurable", {}), "db_session": db}}
+
+
+def run_branch_agent_loop(
+    invoke: Callable[[Any, Any], Any],
+    agent_chain: Any,
+    tool_node: Any,
+    messages: List[AnyMessage],
+    payload_key: str,
+    config: RunnableConfig,
+) -> AIMessage:
+    """エージェントとツールの往復を1ブランチ内で実行し、最後のエージェント応答を返す
+
+    Args:
+        invoke: リトライ付きのチェーン呼び出し関数（prediction_agent など）
+        agent_chain: ツールをバインドしたエージェントチェーン
+        tool_node: ToolNode（{"messages": [...]} を受け取り ToolMessage を返す）
+        messages: ブランチの入力メッセージ
+        payload_key: エージェントチェーンのプロンプト変数名（"messages" / "history"）
+        config: ブランチ用の config（ツールに db_session などを渡す）
+    """
+    max_tool_rounds = int(get_parallel_research_config()["max_tool_rounds"])
+    conversation = list(messages)
+    response: AIMessage = invoke(agent_chain, {payload_key: conversation})
+    rounds = 0
+    while isinstance(response, AIMessage) and response.tool_calls and rounds < max_tool_rounds:
+        rounds += 1
+        tool_output = tool_node.invoke({"messages": [response]}, config)
+        conversation = conversation + [response] + list(tool_output["messages"])
+        response = invoke(agent_chain, {payload_key: conversation})
+    return response
+
+
+def branch_result(index: int, task: str, response: Any) -> Dict[str, Any]:
+    content = getattr(response, "content", response)
+    if not isinstance(content, str):
+        content = str(content)
+    return {"index": index, "task": task, "content": content}
+
+
+def merge_branch_results(branch_results: List[Dict[str, Any]], deferred_tasks: Optional[List[str]] = None) -> AIMessage:
+    """ブランチの結果をタスク番号順に1つのメッセージに結合する
+
+    deferred_tasks（max_branches を超えて実行しなかったタスク）があれば末尾に列挙し、
+    Supervisor が次の指示で改めて割り当てられるようにする。
+    """
+    ordered = sorted(branch_results or [], key=lambda r: r["index"])
+    parts = ["以下は独立した調査タスクを並列に実行した結果です。"]
+    for result in ordered:
+        parts.append(f"### タスク {result['index'] + 1}: {result['task']}\n\n{result['content']}")
+    if deferred_tasks:
+        pending = "\n".join(f"- {task}" for task in deferred_tasks)
+        parts.append(f"### 未実行のタスク\n\n同時に振り分けられるタスク数の上限を超えたため、以下のタスクはまだ実行していません。必要であれば改めて指示してください。\n\n{pending}")
+    return AIMessage(content="\n\n".join(parts), name="parallel_agent_results")
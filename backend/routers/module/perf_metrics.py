@@ -0,0 +1,480 @@
+# backend/routers/module/perf_metrics.py
+"""
+リクエスト単位の性能計測と Prometheus 形式の /metrics エンドポイント
+
+- ASGI ミドルウェアでルート（パステンプレート）ごとのレイテンシのヒストグラム・処理中の件数・
+  ステータスコード別の件数を記録する（SSE などのストリーミング応答にも影響しない純粋な ASGI 実装）
+- LLM 呼び出しは LangChain のコールバック（全チェーンに自動で付与）で provider / model ごとの
+  レイテンシ・トークン数・エラー数を記録する。リトライ回数は llm_retry の集計値を出力する
+- 埋め込み呼び出し（embeddings.EMBED）、ベクトルストア操作（vectorstore.manager）、
+  DB コネクションプールの取得待ち時間も記録する
+- Web ツール・プロンプト・認証ユーザーの各キャッシュのヒット数も出力する
+
+prometheus_client には依存せず、テキスト形式（version 0.0.4）をここで組み立てる。
+メトリクスは API プロセス内の値で、research_worker を別プロセスで動かす場合はその分を含まない。
+"""
+import functools
+import hmac
+import logging
+import math
+import os
+import pathlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import yaml
+
+from routers.module.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_perf_metrics_config() -> dict:
+    """config.yaml から性能計測の設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    metrics_cfg = cfg.get("perf_metrics", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "endpoint_path": "/metrics",
+        "auth_token_env": "METRICS_TOKEN",   # この環境変数が設定されている場合は Bearer トークンを要求する
+        "exclude_paths": ["/metrics", "/ping"],
+        "latency_buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300],
+    }
+    return {**defaults, **metrics_cfg}
+
+
+# -----------------------------------------------------------------
+#                      メトリクスの型
+# -----------------------------------------------------------------
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Optional[Sequence[float]] = None):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets or get_perf_metrics_config()["latency_buckets"])) + (math.inf,)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*s[0]], s[1], s[2])) for k, s in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', _format_value(upper)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+_registry: Dict[str, _Metric] = {}
+_collectors: List[Callable[[], Iterable[str]]] = []
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, help_text: str, label_names: Sequence[str], **kwargs: Any):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help_text, label_names, **kwargs)
+        return metric
+
+
+def counter(name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+    return _get_or_create(Counter, name, help_text, label_names)
+
+
+def gauge(name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+    return _get_or_create(Gauge, name, help_text, label_names)
+
+
+def histogram(name: str, help_text: str, label_names: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> Histogram:
+    return _get_or_create(Histogram, name, help_text, label_names, buckets=buckets)
+
+
+def register_collector(collector: Callable[[], Iterable[str]]) -> None:
+    """/metrics の出力時に呼ばれ、Prometheus 形式の行を返す関数を登録する"""
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+def render_prometheus() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+        collectors = list(_collectors)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            logger.warning("Collector %s failed: %s", getattr(collector, "__name__", collector), e)
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------------------------------------------
+#                      アプリケーションのメトリクス
+# -----------------------------------------------------------------
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route and status code", ("method", "route", "status"))
+HTTP_LATENCY = histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests currently being processed", ("method",))
+
+LLM_LATENCY = histogram("llm_call_duration_seconds", "LLM call latency", ("provider", "model"))
+LLM_CALLS = counter("llm_calls_total", "LLM calls by outcome", ("provider", "model", "outcome"))
+LLM_TOKENS = counter("llm_tokens_total", "LLM tokens by direction", ("provider", "model", "direction"))
+
+EMBEDDING_LATENCY = histogram("embedding_call_duration_seconds", "Embedding call latency", ("op",))
+EMBEDDING_TEXTS = counter("embedding_texts_total", "Texts sent to the embedding model", ("op",))
+
+VECTOR_STORE_LATENCY = histogram("vector_store_operation_duration_seconds", "Vector store operation latency", ("backend", "op"))
+VECTOR_STORE_ERRORS = counter("vector_store_operation_errors_total", "Vector store operations that raised", ("backend", "op"))
+
+DB_POOL_WAIT = histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a DB connection from the pool", (),
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30],
+)
+
+
+class timed:
+    """with timed(HISTOGRAM, label=value): ... で経過時間を記録する"""
+
+    def __init__(self, metric: Histogram, **labels: Any):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self) -> "timed":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.metric.observe(time.perf_counter() - self._started, **self.labels)
+
+
+def observe_vector_store(op: str, backend: Callable[[], str]):
+    """ベクトルストア操作の関数に付けるデコレータ（backend は呼び出し時に解決する）。トレーシングのスパンも作る"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                backend_name = backend()
+            except Exception:
+                backend_name = "unknown"
+            started = time.perf_counter()
+            try:
+                with start_span(f"vectorstore.{op}", {"vectorstore.backend": backend_name}):
+                    return function(*args, **kwargs)
+            except Exception:
+                VECTOR_STORE_ERRORS.inc(backend=backend_name, op=op)
+                raise
+            finally:
+                VECTOR_STORE_LATENCY.observe(time.perf_counter() - started, backend=backend_name, op=op)
+        return wrapper
+    return decorator
+
+
+# -----------------------------------------------------------------
+#                      LLM 呼び出し（LangChain コールバック）
+# -----------------------------------------------------------------
+
+def llm_labels(serialized: Optional[dict], metadata: Optional[dict], kwargs: dict) -> Tuple[str, str]:
+    """LangChain のコールバック引数から (provider, model) を取り出す"""
+    metadata = metadata or {}
+    params = kwargs.get("invocation_params") or {}
+    provider = metadata.get("ls_provider") or ((serialized or {}).get("id") or ["unknown"])[-1]
+    model = metadata.get("ls_model_name") or params.get("model_name") or params.get("model") or "unknown"
+    return str(provider), str(model)
+
+
+def llm_token_usage(response: Any) -> Tuple[int, int]:
+    """LLMResult から (入力トークン数, 出力トークン数) を取り出す"""
+    input_tokens = output_tokens = 0
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            input_tokens += int(usage.get("input_tokens") or 0)
+            output_tokens += int(usage.get("output_tokens") or 0)
+    if not (input_tokens or output_tokens):
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = int(token_usage.get("prompt_tokens") or 0)
+        output_tokens = int(token_usage.get("completion_tokens") or 0)
+    return input_tokens, output_tokens
+
+
+def _build_llm_metrics_handler():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsCallbackHandler(BaseCallbackHandler):
+        """すべての LLM 呼び出しの開始・終了を記録する"""
+
+        run_inline = True
+
+        def __init__(self):
+            self._runs: Dict[Any, Tuple[float, str, str]] = {}
+            self._lock = threading.Lock()
+
+        def _start(self, run_id: Any, serialized: Optional[dict], metadata: Optional[dict], kwargs: dict) -> None:
+            provider, model = llm_labels(serialized, metadata, kwargs)
+            with self._lock:
+                self._runs[run_id] = (time.perf_counter(), provider, model)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+            self._start(run_id, serialized, metadata, kwargs)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+            self._start(run_id, serialized, metadata, kwargs)
+
+        def _finish(self, run_id: Any) -> Optional[Tuple[str, str]]:
+            with self._lock:
+                run = self._runs.pop(run_id, None)
+            if run is None:
+                return None
+            started, provider, model = run
+            LLM_LATENCY.observe(time.perf_counter() - started, provider=provider, model=model)
+            return provider, model
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            labels = self._finish(run_id)
+            if labels is None:
+                return
+            provider, model = labels
+            LLM_CALLS.inc(provider=provider, model=model, outcome="success")
+            input_tokens, output_tokens = llm_token_usage(response)
+            if input_tokens:
+                LLM_TOKENS.inc(input_tokens, provider=provider, model=model, direction="input")
+            if output_tokens:
+                LLM_TOKENS.inc(output_tokens, provider=provider, model=model, direction="output")
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            labels = self._finish(run_id)
+            if labels is not None:
+                LLM_CALLS.inc(provider=labels[0], model=labels[1], outcome="error")
+
+    return LLMMetricsCallbackHandler()
+
+
+_llm_handler_var: Optional[ContextVar] = None
+
+
+def install_llm_metrics_callback() -> None:
+    """すべての LangChain 実行に LLM 計測用コールバックを付与する（ContextVar の既定値として登録する）"""
+    global _llm_handler_var
+    if _llm_handler_var is not None:
+        return
+    from langchain_core.tracers.context import register_configure_hook
+
+    _llm_handler_var = ContextVar("perf_metrics_llm_handler", default=_build_llm_metrics_handler())
+    register_configure_hook(_llm_handler_var, inheritable=True)
+
+
+# -----------------------------------------------------------------
+#                      DB コネクションプール
+# -----------------------------------------------------------------
+
+def instrument_engine(engine: Any) -> None:
+    """engine.pool.connect を包み、コネクション取得までの待ち時間を記録する"""
+    pool = engine.pool
+    if getattr(pool, "_perf_metrics_instrumented", False):
+        return
+    original_connect = pool.connect
+
+    def connect():
+        started = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+    pool.connect = connect
+    pool._perf_metrics_instrumented = True
+
+    def collect_pool() -> List[str]:
+        lines = [
+            "# HELP db_pool_connections DB connection pool state",
+            "# TYPE db_pool_connections gauge",
+        ]
+        for state, method in (("checked_out", "checkedout"), ("checked_in", "checkedin"), ("size", "size"), ("overflow", "overflow")):
+            if hasattr(pool, method):
+                lines.append(f'db_pool_connections{{state="{state}"}} {_format_value(getattr(pool, method)())}')
+        return lines
+
+    register_collector(collect_pool)
+
+
+# -----------------------------------------------------------------
+#                      既存の集計値（リトライ・キャッシュ）
+# -----------------------------------------------------------------
+
+def _collect_llm_retry() -> List[str]:
+    from routers.module.llm_retry import get_llm_retry_metrics
+
+    lines = ["# HELP llm_retry_events_total LLM retry engine events by model", "# TYPE llm_retry_events_total counter"]
+    for model, counts in sorted(get_llm_retry_metrics().items()):
+        for event, value in sorted(counts.items()):
+            lines.append(f'llm_retry_events_total{{model="{_escape(model)}",event="{_escape(event)}"}} {value}')
+    return lines
+
+
+def _collect_caches() -> List[str]:
+    from routers.module.prompt_cache import get_prompt_cache_metrics
+    from routers.module.user_cache import get_user_cache_metrics
+    from routers.module.web_tool_cache import get_web_tool_cache_metrics
+
+    lines = ["# HELP cache_events_total Cache lookups by cache and result", "# TYPE cache_events_total counter"]
+    for tool, counts in sorted(get_web_tool_cache_metrics().items()):
+        if tool.startswith("_"):
+            continue
+        for result in ("hits", "db_hits", "misses"):
+            lines.append(f'cache_events_total{{cache="web_tool:{_escape(tool)}",result="{result}"}} {counts.get(result, 0)}')
+    for name, value in sorted(get_prompt_cache_metrics().items()):
+        kind, _, result = name.rpartition("_")
+        lines.append(f'cache_events_total{{cache="prompt:{kind}",result="{result}"}} {value}')
+    user_metrics = get_user_cache_metrics()
+    for result in ("hits", "misses"):
+        lines.append(f'cache_events_total{{cache="user",result="{result}"}} {user_metrics.get(result, 0)}')
+    return lines
+
+
+# -----------------------------------------------------------------
+#                      ミドルウェアとエンドポイント
+# -----------------------------------------------------------------
+
+class PerfMetricsMiddleware:
+    """HTTP リクエストのレイテンシ・処理中件数・ステータスコードを記録する ASGI ミドルウェア"""
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.exclude_paths = set(get_perf_metrics_config()["exclude_paths"] or [])
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        status_code = 500
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(method=method)
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(method=method)
+            # ルートのパステンプレート（/papers/{id} など）をラベルにし、未定義のパスはまとめる
+            route = getattr(scope.get("route"), "path", None) or "__unmatched__"
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
+
+
+def install_perf_metrics(app: Any, engine: Any) -> None:
+    """main.py から呼ぶ。ミドルウェア・/metrics・LLM コールバック・DB プールの計測を有効にする"""
+    cfg = get_perf_metrics_config()
+    if not cfg["enabled"]:
+        return
+    from fastapi import HTTPException, Request, status
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(PerfMetricsMiddleware)
+    install_llm_metrics_callback()
+    instrument_engine(engine)
+    register_collector(_collect_llm_retry)
+    register_collector(_collect_caches)
+
+    token_env = cfg.get("auth_token_env")
+
+    @app.get(cfg["endpoint_path"], include_in_schema=False)
+    def metrics(request: Request):
+        token = os.getenv(token_env) if token_env else None
+        # トークンの比較は一致位置で処理時間が変わらないよう定数時間で行う
+        if token and not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,409 @@
+# backend/routers/module/profiler.py
+"""
+本番で遅いリクエスト・バックグラウンド処理をその場でプロファイルする（オプトイン）
+
+- リクエスト: `X-Profile: <PROFILING_TOKEN の値>` ヘッダー付きのリクエストを 1 件だけプロファイルする
+  （`X-Profile-Mode: cprofile | sampler` で方式を指定。レスポンスの X-Profile-Id が保存先のファイル名）
+- バックグラウンド処理: POST /debug/profiles/arm で名前付きタスク（PROFILED_TASKS）の次の N 回を予約する。
+  別プロセスのワーカーでは config.yaml の profiling.tasks（環境変数 PROFILE_TASKS）で常時有効にできる
+- 保存先: profiling.output_dir（cProfile は .pstats、サンプラーは speedscope 形式の .speedscope.json）。
+  GET /debug/profiles で一覧、GET /debug/profiles/{name} でダウンロードする（ファイルはインスタンスごと）
+
+計測はスレッド単位で、対象のスレッドだけを記録する。非同期エンドポイントはイベントループのスレッドを
+記録するため、同時に処理中の他のリクエストのコルーチンも含まれる（同期エンドポイントはスレッドプールの
+該当スレッドのみ）。profiling.enabled が false の場合はミドルウェアもラッパーも組み込まない。
+"""
+import asyncio
+import contextlib
+import cProfile
+import functools
+import hmac
+import json
+import logging
+import os
+import pathlib
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_profiling_config() -> dict:
+    """config.yaml からプロファイリングの設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    profiling_cfg = cfg.get("profiling", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": False,
+        "token_env": "PROFILING_TOKEN",     # この環境変数が未設定の場合はリクエストのプロファイルも API も無効
+        "output_dir": "./profiles",
+        "default_mode": "sampler",          # cprofile / sampler
+        "sample_interval_ms": 5,
+        "max_profiles": 100,                # 古いものから削除する
+        "tasks": [],                        # 常にプロファイルするタスク名（環境変数 PROFILE_TASKS でカンマ区切り指定も可）
+    }
+    merged = {**defaults, **profiling_cfg}
+    env_enabled = os.getenv("PROFILING_ENABLED")
+    if env_enabled is not None:
+        merged["enabled"] = env_enabled.lower() == "true"
+    env_tasks = os.getenv("PROFILE_TASKS")
+    if env_tasks is not None:
+        merged["tasks"] = [t.strip() for t in env_tasks.split(",") if t.strip()]
+    return merged
+
+
+PROFILE_MODES = ("cprofile", "sampler")
+PROFILED_TASKS = ("research_job.deepresearch", "research_job.deeprag", "bulk_character_update")
+_PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.(pstats|speedscope\.json)$")
+
+
+def _output_dir() -> pathlib.Path:
+    raw_dir = pathlib.Path(get_profiling_config()["output_dir"])
+    return raw_dir if raw_dir.is_absolute() else pathlib.Path(__file__).parent.parent.parent / raw_dir
+
+
+# -----------------------------------------------------------------
+#                      サンプラー
+# -----------------------------------------------------------------
+
+class _StackSampler(threading.Thread):
+    """登録されたスレッドのスタックを一定間隔で採取する"""
+
+    def __init__(self, interval_seconds: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval_seconds = interval_seconds
+        self.thread_ids: Dict[int, str] = {}
+        self.thread_names: Dict[int, str] = {}
+        self.samples: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    def add_thread(self, thread_id: int, name: str) -> None:
+        with self._lock:
+            self.thread_ids[thread_id] = name
+            self.thread_names[thread_id] = name
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self.thread_ids.pop(thread_id, None)
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            with self._lock:
+                targets = list(self.thread_ids)
+            for thread_id in targets:
+                frame = frames.get(thread_id)
+                stack: List[Tuple[str, str, int]] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if stack:
+                    self.samples.setdefault(thread_id, Counter())[tuple(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=5)
+        self.finished_at = time.perf_counter()
+
+    def to_speedscope(self, name: str) -> dict:
+        """speedscope の sampled 形式（https://www.speedscope.app/file-format-schema.json）"""
+        frame_index: Dict[Tuple[str, str, int], int] = {}
+        frames: List[dict] = []
+        profiles = []
+        interval_ms = self.interval_seconds * 1000.0
+        for thread_id, counter in self.samples.items():
+            samples, weights = [], []
+            for stack, count in counter.most_common():
+                indexes = []
+                for key in stack:
+                    if key not in frame_index:
+                        frame_index[key] = len(frames)
+                        frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                    indexes.append(frame_index[key])
+                samples.append(indexes)
+                weights.append(count * interval_ms)
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} [{self.thread_names.get(thread_id) or thread_id}]",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": name,
+            "exporter": "knowledgepaper-profiler",
+        }
+
+
+# -----------------------------------------------------------------
+#                      プロファイルのセッション
+# -----------------------------------------------------------------
+
+_thread_state = threading.local()   # 同じスレッドで二重にプロファイルしないためのフラグ
+
+
+class ProfileSession:
+    """1 件のリクエスト・タスクのプロファイル。thread() の中で実行されたスレッドを記録する"""
+
+    def __init__(self, kind: str, name: str, mode: str):
+        cfg = get_profiling_config()
+        self.kind = kind
+        self.name = name
+        self.mode = mode if mode in PROFILE_MODES else cfg["default_mode"]
+        slug = re.sub(r"[^\w.-]+", "_", name).strip("_")[:60] or kind
+        extension = "pstats" if self.mode == "cprofile" else "speedscope.json"
+        self.file_name = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{kind}-{slug}-{uuid.uuid4().hex[:6]}.{extension}"
+        self.started_at = time.perf_counter()
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._sampler: Optional[_StackSampler] = None
+        if self.mode == "sampler":
+            self._sampler = _StackSampler(float(cfg["sample_interval_ms"]) / 1000.0)
+            self._sampler.start()
+
+    @contextlib.contextmanager
+    def thread(self) -> Iterator[None]:
+        """現在のスレッドをこのプロファイルの対象にする"""
+        if getattr(_thread_state, "active", False):
+            yield
+            return
+        _thread_state.active = True
+        try:
+            if self._sampler is not None:
+                thread_id = threading.get_ident()
+                self._sampler.add_thread(thread_id, threading.current_thread().name)
+                try:
+                    yield
+                finally:
+                    self._sampler.remove_thread(thread_id)
+            else:
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    with self._lock:
+                        self._profiles.append(profile)
+        finally:
+            _thread_state.active = False
+
+    def finish(self) -> Optional[pathlib.Path]:
+        """プロファイルをファイルに保存し、そのパスを返す"""
+        elapsed = time.perf_counter() - self.started_at
+        output_dir = _output_dir()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / self.file_name
+        try:
+            if self._sampler is not None:
+                self._sampler.stop()
+                path.write_text(json.dumps(self._sampler.to_speedscope(f"{self.kind} {self.name}")), encoding="utf-8")
+            else:
+                with self._lock:
+                    profiles = list(self._profiles)
+                if not profiles:
+                    return None
+                stats = pstats.Stats(profiles[0])
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                stats.dump_stats(str(path))
+        except Exception as e:
+            logger.warning("Failed to save profile %s: %s", self.file_name, e)
+            return None
+        logger.info("Saved %s profile of %s '%s' (%.2fs): %s", self.mode, self.kind, self.name, elapsed, path)
+        _prune_profiles(output_dir)
+        return path
+
+
+def _prune_profiles(output_dir: pathlib.Path) -> None:
+    max_profiles = int(get_profiling_config()["max_profiles"])
+    files = sorted((p for p in output_dir.iterdir() if _PROFILE_NAME_RE.match(p.name)), key=lambda p: p.stat().st_mtime)
+    for path in files[:-max_profiles] if max_profiles > 0 else []:
+        with contextlib.suppress(OSError):
+            path.unlink()
+
+
+_current_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+# -----------------------------------------------------------------
+#                      バックグラウンドタスク
+# -----------------------------------------------------------------
+
+_armed_tasks: Dict[str, List[Any]] = {}   # タスク名 -> [mode, 残り回数]
+_armed_lock = threading.Lock()
+
+
+def arm_task_profile(task: str, mode: Optional[str] = None, count: int = 1) -> None:
+    """名前付きタスクの次の count 回をプロファイルする（このプロセス内のみ）"""
+    with _armed_lock:
+        _armed_tasks[task] = [mode or get_profiling_config()["default_mode"], max(1, count)]
+
+
+def armed_task_profiles() -> Dict[str, dict]:
+    with _armed_lock:
+        return {task: {"mode": mode, "remaining": remaining} for task, (mode, remaining) in _armed_tasks.items()}
+
+
+def _claim_task_mode(task: str) -> Optional[str]:
+    with _armed_lock:
+        armed = _armed_tasks.get(task)
+        if armed is not None:
+            armed[1] -= 1
+            if armed[1] <= 0:
+                del _armed_tasks[task]
+            return armed[0]
+    if task in get_profiling_config()["tasks"]:
+        return get_profiling_config()["default_mode"]
+    return None
+
+
+@contextlib.contextmanager
+def profile_task(task: str, label: str = "") -> Iterator[None]:
+    """with profile_task("research_job.deepresearch", label="job-12"): で囲んだ処理を、予約されていればプロファイルする"""
+    mode = _claim_task_mode(task) if get_profiling_config()["enabled"] else None
+    if mode is None:
+        yield
+        return
+    session = ProfileSession("task", f"{task}-{label}" if label else task, mode)
+    token = _current_session.set(session)
+    try:
+        with session.thread():
+            yield
+    finally:
+        _current_session.reset(token)
+        session.finish()
+
+
+# -----------------------------------------------------------------
+#                      リクエスト
+# -----------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """X-Profile ヘッダーにトークンが付いたリクエストだけをプロファイルする ASGI ミドルウェア"""
+
+    def __init__(self, app: Any, token: str):
+        self.app = app
+        self.token = token.encode()
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        # トークンの比較は一致位置で処理時間が変わらないよう定数時間で行う
+        if not hmac.compare_digest(headers.get(b"x-profile", b""), self.token):
+            await self.app(scope, receive, send)
+            return
+
+        mode = headers.get(b"x-profile-mode", b"").decode() or get_profiling_config()["default_mode"]
+        session = ProfileSession("request", f"{scope.get('method', 'GET')} {scope.get('path', '')}", mode)
+
+        async def send_wrapper(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", session.file_name.encode())]
+            await send(message)
+
+        token = _current_session.set(session)
+        try:
+            with session.thread():
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_session.reset(token)
+            # 保存（pstats の集計・JSON 化）はイベントループを止めないようにスレッドで行う
+            await asyncio.get_running_loop().run_in_executor(None, session.finish)
+
+
+def _wrap_sync_endpoint(function: Callable) -> Callable:
+    """同期エンドポイントはスレッドプールで実行されるため、そのスレッドもプロファイル対象にする"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        session = _current_session.get()
+        if session is None:
+            return function(*args, **kwargs)
+        with session.thread():
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def _instrument_routes(app: Any) -> None:
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+            route.dependant.call = _wrap_sync_endpoint(route.dependant.call)
+
+
+def install_profiling(app: Any) -> None:
+    """main.py から（全ルーターを登録した後に）呼ぶ。無効時は何も組み込まない"""
+    cfg = get_profiling_config()
+    token = os.getenv(cfg["token_env"]) if cfg.get("token_env") else None
+    if not cfg["enabled"] or not token:
+        return
+    from fastapi import Body, HTTPException, Request, status
+    from fastapi.responses import FileResponse
+
+    _instrument_routes(app)
+    app.add_middleware(ProfilingMiddleware, token=token)
+
+    def check_token(request: Request) -> None:
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid profiling token")
+
+    @app.get("/debug/profiles", include_in_schema=False)
+    def list_profiles(request: Request):
+        check_token(request)
+        output_dir = _output_dir()
+        files = sorted(output_dir.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True) if output_dir.exists() else []
+        return {
+            "profiles": [
+                {"name": p.name, "bytes": p.stat().st_size, "created_at": datetime.utcfromtimestamp(p.stat().st_mtime).isoformat()}
+                for p in files if _PROFILE_NAME_RE.match(p.name)
+            ],
+            "armed_tasks": armed_task_profiles(),
+        }
+
+    @app.get("/debug/profiles/{name}", include_in_schema=False)
+    def download_profile(name: str, request: Request):
+        check_token(request)
+        path = _output_dir() / name
+        if not _PROFILE_NAME_RE.match(name) or not path.is_file():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+        return FileResponse(path, filename=name)
+
+    @app.post("/debug/profiles/arm", include_in_schema=False)
+    def arm_profile(
+        request: Request,
+        task: str = Body(..., embed=True),
+        mode: Optional[str] = Body(None, embed=True),
+        count: int = Body(1, embed=True),
+    ):
+        check_token(request)
+        if task not in PROFILED_TASKS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown task. Available: {', '.join(PROFILED_TASKS)}")
+        if mode is not None and mode not in PROFILE_MODES:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown mode. Available: {', '.join(PROFILE_MODES)}")
+        arm_task_profile(task, mode, count)
+        return {"armed_tasks": armed_task_profiles()}
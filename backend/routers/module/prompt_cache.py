@@ -0,0 +1,226 @@
+# backend/routers/module/prompt_cache.py
+"""
+プロンプト解決用のキャッシュ
+
+要約生成・RAG・DeepResearch / DeepRAG の各ノードは1リクエスト中に何度もプロンプトを組み立て、
+そのたびに SystemPrompt・SystemPromptGroup・User（{name} やキャラクター設定）を読み込んでいた。
+ここではそれらの読み取り結果をプロセス内の LRU に保持し、プロンプト組み立て時の DB アクセスをなくす。
+
+- キャッシュキーにはユーザーごとのバージョン番号を含める。system_prompts / system_prompt_groups の
+  書き込みエンドポイントが bump_prompt_cache_version を呼ぶと、そのユーザーの古いエントリは参照されなくなる
+- 表示名・キャラクター設定の変更時は bump_user_snapshot_version を呼ぶ
+- 複数インスタンスで動かす場合に他インスタンスでの更新を反映するため、エントリには TTL を設ける
+- 見つからなかった結果（無効化済みのプロンプトなど）も TTL の間はキャッシュする
+"""
+import functools
+import pathlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+import yaml
+from sqlmodel import Session, select
+
+from models import SystemPrompt, SystemPromptGroup, User
+
+
+@functools.lru_cache(maxsize=1)
+def get_prompt_cache_config() -> dict:
+    """config.yaml からプロンプト解決キャッシュの設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    cache_cfg = cfg.get("prompt_cache", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "max_entries": 2048,
+        "ttl_seconds": 300,   # 他インスタンスでの更新が反映されるまでの最大遅延
+    }
+    return {**defaults, **cache_cfg}
+
+
+class SystemPromptSnapshot(NamedTuple):
+    """プロンプト組み立てに必要な SystemPrompt の内容"""
+    id: int
+    prompt: str
+    name: str
+    description: Optional[str]
+    category: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+
+class PromptGroupSnapshot(NamedTuple):
+    """SystemPromptGroup のエージェントごとのプロンプトID"""
+    name: str
+    coordinator_prompt_id: Optional[int]
+    planner_prompt_id: Optional[int]
+    supervisor_prompt_id: Optional[int]
+    agent_prompt_id: Optional[int]
+    summary_prompt_id: Optional[int]
+
+
+class UserPromptSnapshot(NamedTuple):
+    """自動変数（{name}）とキャラクター選択に使うユーザー情報"""
+    name: str
+    selected_character: Optional[str]
+
+
+class _TTLCache:
+    """TTL 付き LRU。値が None（見つからなかった結果）の場合もキャッシュする"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[_TTLCache] = None
+_prompt_versions: Dict[int, int] = defaultdict(int)
+_user_versions: Dict[int, int] = defaultdict(int)
+_metrics: Dict[str, int] = defaultdict(int)
+_state_lock = threading.Lock()
+
+
+def _get_cache() -> Optional[_TTLCache]:
+    global _cache
+    cfg = get_prompt_cache_config()
+    if not cfg["enabled"]:
+        return None
+    with _state_lock:
+        if _cache is None:
+            _cache = _TTLCache(int(cfg["max_entries"]), float(cfg["ttl_seconds"]))
+        return _cache
+
+
+def _cached(kind: str, key: Hashable, load):
+    cache = _get_cache()
+    if cache is None:
+        return load()
+    found, value = cache.get((kind,) + key)
+    with _state_lock:
+        _metrics[f"{kind}_hits" if found else f"{kind}_misses"] += 1
+    if found:
+        return value
+    value = load()
+    cache.put((kind,) + key, value)
+    return value
+
+
+def bump_prompt_cache_version(user_id: int) -> None:
+    """ユーザーの SystemPrompt / SystemPromptGroup を書き込んだ後に呼ぶ"""
+    with _state_lock:
+        _prompt_versions[user_id] += 1
+
+
+def bump_user_snapshot_version(user_id: int) -> None:
+    """ユーザーの表示名・キャラクター設定を変更した後に呼ぶ"""
+    with _state_lock:
+        _user_versions[user_id] += 1
+
+
+def get_prompt_cache_metrics() -> Dict[str, int]:
+    """{system_prompt,prompt_group,user}_{hits,misses} を返す"""
+    with _state_lock:
+        return dict(_metrics)
+
+
+# -----------------------------------------------------------------
+#                      読み取り
+# -----------------------------------------------------------------
+
+def get_system_prompt_snapshot(db: Session, system_prompt_id: int, user_id: int) -> Optional[SystemPromptSnapshot]:
+    """ユーザーの有効なカスタムプロンプトを返す（存在しない・無効化済みの場合は None）"""
+    def load() -> Optional[SystemPromptSnapshot]:
+        row = db.exec(
+            select(SystemPrompt).where(
+                SystemPrompt.id == system_prompt_id,
+                SystemPrompt.user_id == user_id,
+                SystemPrompt.is_active == True
+            )
+        ).first()
+        if row is None:
+            return None
+        return SystemPromptSnapshot(
+            id=row.id,
+            prompt=row.prompt,
+            name=row.name,
+            description=row.description,
+            category=row.category,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+        )
+
+    with _state_lock:
+        version = _prompt_versions[user_id]
+    return _cached("system_prompt", (user_id, version, system_prompt_id), load)
+
+
+def get_prompt_group_snapshot(db: Session, system_prompt_group_id: int, user_id: int, category: str) -> Optional[PromptGroupSnapshot]:
+    """ユーザーの有効なプロンプトグループを返す（存在しない・カテゴリ不一致の場合は None）"""
+    def load() -> Optional[PromptGroupSnapshot]:
+        group = db.exec(
+            select(SystemPromptGroup).where(
+                SystemPromptGroup.id == system_prompt_group_id,
+                SystemPromptGroup.user_id == user_id,
+                SystemPromptGroup.category == category,
+                SystemPromptGroup.is_active == True
+            )
+        ).first()
+        if group is None:
+            return None
+        return PromptGroupSnapshot(
+            name=group.name,
+            coordinator_prompt_id=group.coordinator_prompt_id,
+            planner_prompt_id=group.planner_prompt_id,
+            supervisor_prompt_id=group.supervisor_prompt_id,
+            agent_prompt_id=group.agent_prompt_id,
+            summary_prompt_id=group.summary_prompt_id,
+        )
+
+    with _state_lock:
+        version = _prompt_versions[user_id]
+    return _cached("prompt_group", (user_id, version, system_prompt_group_id, category), load)
+
+
+def get_user_prompt_snapshot(db: Session, user_id: int) -> Optional[UserPromptSnapshot]:
+    """{name} 変数とキャラクター選択に使うユーザー情報を返す（ユーザーが存在しない場合は None）"""
+    def load() -> Optional[UserPromptSnapshot]:
+        user = db.exec(select(User).where(User.id == user_id)).first()
+        if user is None:
+            return None
+        return UserPromptSnapshot(
+            name=user.display_name or str(user.username),
+            selected_character=user.selected_character,
+        )
+
+    with _state_lock:
+        version = _user_versions[user_id]
+    return _cached("user", (user_id, version), load)
@@ -9,6 +9,7 @@
 from typing import Optional, Dict, Any, NamedTuple
 from sqlmodel import Session, select
 from models import SystemPromptGroup
+from routers.module.prompt_cache import get_prompt_group_snapshot
 import logging
 
 logger = logging.getLogger(__name__)
@@ -50,15 +51,8 @@ def resolve_prompt_group(
         return AgentPromptIds()
     
     try:
-        # プロンプトグループを取得
-        group = db.exec(
-            select(SystemPromptGroup).where(
-                SystemPromptGroup.id == system_prompt_group_id,
-                SystemPromptGroup.user_id == user_id,
-                SystemPromptGroup.category == category,
-                SystemPromptGroup.is_active == True
-            )
-        ).first()
+        # プロンプトグループを取得（prompt_cache 経由。ノードごとの呼び出しでも DB には問い合わせない）
+        group = get_prompt_group_snapshot(db, system_prompt_group_id, user_id, category)
         
         if not group:
             logger.warning(f"プロンプトグループが見つかりません（ID: {system_prompt_group_id}, ユーザー: {user_id}, カテゴリ: {category}）。デフォルトプロンプトを使用します。")
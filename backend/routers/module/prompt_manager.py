@@ -15,6 +15,7 @@ import re
 from datetime import datetime
 
 from models import SystemPrompt, User
+from routers.module.prompt_cache import get_system_prompt_snapshot, get_user_prompt_snapshot
 from routers.module.default_prompts import (
     PromptType, get_default_prompt, format_prompt as original_format_prompt # format_promptをリネームしてインポート
 )
@@ -38,14 +39,14 @@ def _get_automatic_variables(db: Session, user_id: Optional[int] = None) -> Dict
     
     # {today} 変数: 現在の日付
     variables['today'] = datetime.now().strftime('%Y年%m月%d日')
-    print(f"DEBUG: USER ID: {user_id}, 今日の日付: {variables['today']}")
+    logger.debug("USER ID: %s, 今日の日付: %s", user_id, variables['today'])
     
     # {name} 変数: ユーザーの表示名またはユーザーID
     if user_id:
         try:
-            user = db.exec(select(User).where(User.id == user_id)).first()
-            if user:
-                variables['name'] = user.display_name or str(user.username)
+            user_snapshot = get_user_prompt_snapshot(db, user_id)
+            if user_snapshot:
+                variables['name'] = user_snapshot.name
             else:
                 variables['name'] = str(user_id)
         except Exception as e:
@@ -79,11 +80,10 @@ def _apply_automatic_variables(prompt_content: str, db: Session, user_id: Option
     # {today} と {name} を安全に置換（存在しない場合はそのまま）
     result = prompt_content
     for var_name, var_value in auto_vars.items():
-        print(f"DEBUG: 変数 {var_name} の値: {var_value}")
         pattern = f"{{{var_name}}}"
         if pattern in result:
             result = result.replace(pattern, var_value)
-            logger.debug(f"変数 {pattern} を '{var_value}' に置換しました")
+            logger.debug("変数 %s を '%s' に置換しました", pattern, var_value)
     
     #print(f"DEBUG: プロンプト内容に自動変数を適用後の結果: {result}")
     
@@ -118,16 +118,8 @@ def get_effective_prompt_content(
     
     try:
         if user_id and system_prompt_id:
-            # ユーザーのカスタムプロンプトをIDで検索
-            custom_prompt_model = db.exec(
-                select(SystemPrompt).where(
-                    and_(
-                        SystemPrompt.id == system_prompt_id,
-                        SystemPrompt.user_id == user_id,
-                        SystemPrompt.is_active == True
-                    )
-                )
-            ).first()
+            # ユーザーのカスタムプロンプトをIDで検索（prompt_cache 経由）
+            custom_prompt_model = get_system_prompt_snapshot(db, system_prompt_id, user_id)
 
             if custom_prompt_model:
                 prompt_to_process = custom_prompt_model.prompt
@@ -138,7 +130,10 @@ def get_effective_prompt_content(
             default_data = get_default_prompt(prompt_type)
             prompt_to_process = default_data["prompt"]
 
-        print(f"DEBUG: 有効なプロンプトを取得しました（タイプ: {prompt_type.value}, ユーザー: {user_id if user_id else 'N/A'}, カスタム: {is_custom}, プロンプトid: {system_prompt_id if system_prompt_id else 'N/A'}）")
+        logger.debug(
+            "有効なプロンプトを取得しました（タイプ: %s, ユーザー: %s, カスタム: %s, プロンプトid: %s）",
+            prompt_type.value, user_id if user_id else 'N/A', is_custom, system_prompt_id if system_prompt_id else 'N/A',
+        )
 
         # 1. まず自動変数（{today}, {name}）を適用
         prompt_to_process = _apply_automatic_variables(prompt_to_process, db, user_id)
@@ -170,7 +165,7 @@ def get_effective_prompt_content(
                 raise
         else:
             # format_kwargs が空の場合、自動変数適用済みのプロンプトを返す
-            print(f"プロンプトをフォーマットせずに返します（タイプ: {prompt_type.value}, ユーザー: {user_id if user_id else 'N/A'}, プロンプトid: {system_prompt_id if system_prompt_id else 'N/A'}）")
+            logger.debug("プロンプトをフォーマットせずに返します（タイプ: %s, ユーザー: %s, プロンプトid: %s）", prompt_type.value, user_id if user_id else 'N/A', system_prompt_id if system_prompt_id else 'N/A')
             return prompt_to_process
             
     except Exception as e:
@@ -199,19 +194,11 @@ def get_effective_prompt_raw(
             - metadata: その他のメタデータ
     """
 
-    print(f"get_effective_prompt_raw called with prompt_type: {prompt_type}, user_id: {user_id}, system_prompt_id: {system_prompt_id}")
+    logger.debug("get_effective_prompt_raw called with prompt_type: %s, user_id: %s, system_prompt_id: %s", prompt_type, user_id, system_prompt_id)
     try:
         # ユーザーのカスタムプロンプトを検索
         if user_id and system_prompt_id:
-            custom_prompt = db.exec(
-                select(SystemPrompt).where(
-                    and_(
-                        SystemPrompt.id == system_prompt_id,
-                        SystemPrompt.user_id == user_id,
-                        SystemPrompt.is_active == True
-                    )
-                )
-            ).first()
+            custom_prompt = get_system_prompt_snapshot(db, system_prompt_id, user_id)
 
             if custom_prompt:
                 return {
@@ -349,7 +336,7 @@ def get_deepresearch_title_prompt(db: Session, user_id: Optional[int] = None, **
     """DeepResearchのタイトル生成プロンプトを取得"""
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_rag_no_tool_system_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_rag_no_tool_system_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.DEEPRESEARCH_TITLE_GENERATION, user_id, system_prompt_id=system_prompt_id, **kwargs
         )
@@ -422,7 +409,7 @@ def get_deeprag_title_prompt(db: Session, user_id: Optional[int] = None, **kwarg
     """DeepRAGのタイトル生成プロンプトを取得"""
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_deeprag_title_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_deeprag_title_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.DEEPRAG_TITLE_GENERATION, user_id, system_prompt_id=system_prompt_id, **kwargs
         )
@@ -497,7 +484,7 @@ def get_paper_summary_initial_prompt(db: Session, user_id: Optional[int] = None,
     # kwargsにsystem_prompt_idが含まれているなら取得する
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_paper_summary_initial_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_paper_summary_initial_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.PAPER_SUMMARY_INITIAL, user_id, system_prompt_id=system_prompt_id
         )
@@ -511,7 +498,7 @@ def get_paper_summary_refinement_prompt(db: Session, user_id: Optional[int] = No
     # このプロンプトは変数置換が不要なので、kwargsを渡さない
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_paper_summary_refinement_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_paper_summary_refinement_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.PAPER_SUMMARY_REFINEMENT, user_id, system_prompt_id=system_prompt_id
         )
@@ -525,7 +512,7 @@ def get_paper_summary_second_stage_prompt(db: Session, user_id: Optional[int] =
     # このプロンプトは {documents} と {summary} を期待する
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_paper_summary_second_stage_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_paper_summary_second_stage_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.PAPER_SUMMARY_SECOND_STAGE, user_id, system_prompt_id=system_prompt_id, **kwargs
         )
@@ -542,7 +529,7 @@ def get_rag_base_system_prompt(db: Session, user_id: Optional[int] = None, **kwa
     """
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_rag_base_system_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_rag_base_system_prompt called with system_prompt_id: %s", system_prompt_id)
         prompt_data = get_effective_prompt_raw(
             db, PromptType.RAG_BASE_SYSTEM_TEMPLATE, user_id, system_prompt_id=system_prompt_id
         )
@@ -556,7 +543,7 @@ def get_rag_no_tool_system_prompt(db: Session, user_id: Optional[int] = None, **
     # このプロンプトは変数置換が不要なので、kwargsを渡さない
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_rag_no_tool_system_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_rag_no_tool_system_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.RAG_NO_TOOL_SYSTEM_TEMPLATE, user_id, system_prompt_id=system_prompt_id
         )
@@ -570,7 +557,7 @@ def get_rag_tool_prompt_parts(db: Session, user_id: Optional[int] = None, **kwar
     # このプロンプトは {base_url_origin} を期待する
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_rag_tool_prompt_parts called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_rag_tool_prompt_parts called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.RAG_TOOL_PROMPT_PARTS, user_id, system_prompt_id=system_prompt_id, **kwargs
         )
@@ -583,7 +570,7 @@ def get_rag_title_generation_prompt(db: Session, user_id: Optional[int] = None,
     """RAGタイトル生成プロンプトを取得"""
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_rag_title_generation_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_rag_title_generation_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.RAG_TITLE_GENERATION, user_id, system_prompt_id=system_prompt_id, **kwargs
         )
@@ -598,11 +585,11 @@ def get_paper_chat_system_prompt(db: Session, user_id: Optional[int] = None, **k
     # このプロンプトは変数置換が不要なので、kwargsを渡さない
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_paper_chat_system_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_paper_chat_system_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.PAPER_CHAT_SYSTEM_PROMPT, user_id, system_prompt_id=system_prompt_id
         )
-    print(f"get_paper_chat_system_prompt called with user_id: {user_id}")
+    logger.debug("get_paper_chat_system_prompt called with user_id: %s", user_id)
     return get_effective_prompt_content(
         db, PromptType.PAPER_CHAT_SYSTEM_PROMPT, user_id
     )
@@ -613,7 +600,7 @@ def get_paper_tag_selection_system_prompt(db: Session, user_id: Optional[int] =
     # このプロンプトは変数置換が不要なので、kwargsを渡さない
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_paper_tag_selection_system_prompt called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_paper_tag_selection_system_prompt called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.PAPER_TAG_SELECTION_SYSTEM_PROMPT, user_id, system_prompt_id=system_prompt_id
         )
@@ -627,7 +614,7 @@ def get_paper_tag_selection_question_template(db: Session, user_id: Optional[int
     # このプロンプトは {cats_text} と {summary} を期待する
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_paper_tag_selection_question_template called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_paper_tag_selection_question_template called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.PAPER_TAG_SELECTION_QUESTION_TEMPLATE, user_id, system_prompt_id=system_prompt_id, **kwargs
         )
@@ -641,7 +628,7 @@ def get_tag_categories_config(db: Session, user_id: Optional[int] = None, **kwar
     # このプロンプトは変数置換が不要
     if "system_prompt_id" in kwargs:
         system_prompt_id = kwargs.pop("system_prompt_id")
-        print(f"get_tag_categories_config called with system_prompt_id: {system_prompt_id}")
+        logger.debug("get_tag_categories_config called with system_prompt_id: %s", system_prompt_id)
         return get_effective_prompt_content(
             db, PromptType.TAG_CATEGORIES_CONFIG, user_id, system_prompt_id=system_prompt_id
         )
@@ -665,26 +652,26 @@ def get_character_prompt(db: Session, user_id: Optional[int] = None, affinity_le
     Returns:
         Optional[str]: キャラクタープロンプト文字列（キャラクターが選択されていない場合はNone）
     """
-    print(f"[DEBUG] get_character_prompt called with user_id={user_id}, character_override={character_override}")
+    logger.debug("get_character_prompt called with user_id=%s, character_override=%s", user_id, character_override)
     selected_character = character_override
     
     # キャラクター上書きがない場合、ユーザー設定を確認
     if selected_character is None and user_id:
         try:
-            user = db.exec(select(User).where(User.id == user_id)).first()
-            print(f"[DEBUG] User found: {user}")
+            user = get_user_prompt_snapshot(db, user_id)
+            logger.debug("User found: %s", user)
             if user and user.selected_character:
                 selected_character = user.selected_character
-                print(f"[DEBUG] Selected character from user: {selected_character}")
+                logger.debug("Selected character from user: %s", selected_character)
             else:
-                print(f"[DEBUG] No user found or no selected_character set")
+                logger.debug("No user found or no selected_character set")
         except Exception as e:
             logger.error(f"ユーザー情報取得中にエラーが発生しました (user_id: {user_id}): {e}")
             return None
     
-    print(f"[DEBUG] Final selected_character: {selected_character}")
+    logger.debug("Final selected_character: %s", selected_character)
     if not selected_character:
-        print(f"[DEBUG] No character selected, returning None")
+        logger.debug("No character selected, returning None")
         return None
         
     try:
@@ -692,12 +679,12 @@ def get_character_prompt(db: Session, user_id: Optional[int] = None, affinity_le
         character_prompt_type = None
         if selected_character == "sakura":
             character_prompt_type = PromptType.CHARACTER_SAKURA
-            print(f"[DEBUG] Set character_prompt_type to CHARACTER_SAKURA")
+            logger.debug("Set character_prompt_type to CHARACTER_SAKURA")
         elif selected_character == "miyuki":
             character_prompt_type = PromptType.CHARACTER_MIYUKI
-            print(f"[DEBUG] Set character_prompt_type to CHARACTER_MIYUKI")
+            logger.debug("Set character_prompt_type to CHARACTER_MIYUKI")
         else:
-            print(f"[DEBUG] Unknown character: {selected_character}")
+            logger.debug("Unknown character: %s", selected_character)
             logger.warning(f"未知のキャラクター選択: {selected_character}")
             return None
             
@@ -706,14 +693,14 @@ def get_character_prompt(db: Session, user_id: Optional[int] = None, affinity_le
             logger.info(f"好感度レベル {affinity_level} が指定されましたが、現在はレベル0のみサポートしています")
             
         # キャラクタープロンプトを取得
-        print(f"[DEBUG] Getting effective prompt content for {character_prompt_type}")
+        logger.debug("Getting effective prompt content for %s", character_prompt_type)
         character_prompt = get_effective_prompt_content(
             db=db,
             prompt_type=character_prompt_type,
             user_id=user_id
         )
         
-        print(f"[DEBUG] Retrieved character_prompt: {character_prompt[:100] if character_prompt else 'None'}...")
+        logger.debug("Retrieved character_prompt: %s...", character_prompt[:100] if character_prompt else 'None')
         return character_prompt
         
     except Exception as e:
@@ -736,12 +723,12 @@ def combine_prompts_with_character(db: Session, base_prompt: str, user_id: Optio
     Returns:
         str: キャラクタープロンプトが結合されたプロンプト
     """
-    print(f"[DEBUG] combine_prompts_with_character called with user_id={user_id}, task_type={task_type}")
+    logger.debug("combine_prompts_with_character called with user_id=%s, task_type=%s", user_id, task_type)
     character_prompt = get_character_prompt(db, user_id, affinity_level, character_override)
     
-    print(f"[DEBUG] Got character_prompt: {character_prompt[:100] if character_prompt else 'None'}...")
+    logger.debug("Got character_prompt: %s...", character_prompt[:100] if character_prompt else 'None')
     if not character_prompt:
-        print(f"[DEBUG] No character prompt, returning base prompt only")
+        logger.debug("No character prompt, returning base prompt only")
         return base_prompt
     
     # タスク別指示を取得（task_typeが指定されている場合）
@@ -750,7 +737,7 @@ def combine_prompts_with_character(db: Session, base_prompt: str, user_id: Optio
         selected_character = character_override
         if selected_character is None and user_id:
             try:
-                user = db.exec(select(User).where(User.id == user_id)).first()
+                user = get_user_prompt_snapshot(db, user_id)
                 if user and user.selected_character:
                     selected_character = user.selected_character
             except Exception as e:
@@ -763,12 +750,12 @@ def combine_prompts_with_character(db: Session, base_prompt: str, user_id: Optio
                 # タスク別指示を追加（{name}変数を適用）
                 task_instruction = _apply_automatic_variables(task_instruction, db, user_id)
                 character_prompt = character_prompt + "\n\n" + task_instruction
-                print(f"[DEBUG] Added task instruction for {task_type.value}")
+                logger.debug("Added task instruction for %s", task_type.value)
         
     # キャラクタープロンプトをベースプロンプトの前に結合
     combined_prompt = character_prompt + "\n\nここまでがあなたの振る舞いを定義する内容です\n\n以降はあなたが実施しなければならないタスクです\n\n" + base_prompt
     
-    print(f"[DEBUG] Combined prompt created (length: {len(combined_prompt)})")
+    logger.debug("Combined prompt created (length: %s)", len(combined_prompt))
     logger.debug(f"キャラクタープロンプトをベースプロンプトと結合しました (user_id: {user_id}, character: {character_override or 'user_setting'}, affinity_level: {affinity_level}, task_type: {task_type})")
     
     return combined_prompt
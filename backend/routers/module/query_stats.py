@@ -0,0 +1,223 @@
+# backend/routers/module/query_stats.py
+"""
+リクエスト単位の SQL 計測（発行数・DB 時間・遅いクエリ）
+
+SQLAlchemy の before/after_cursor_execute イベントで全 SQL の実行時間を測り、
+- ASGI ミドルウェアが設定した ContextVar のスコープ（= 1 リクエスト）ごとに件数・合計時間・遅い文を集計する
+- レスポンスヘッダー（X-DB-Query-Count / X-DB-Time-Ms / X-DB-Slowest-Ms）で返す（開発時）
+- /metrics にはルートごとの SQL 発行数・DB 時間のヒストグラムと、SQL 種別ごとの実行時間を出す（本番）
+- slow_query_ms 以上かかった SQL は 1 件ずつログに出す
+- 1 リクエストの発行数や同じ SQL 文の繰り返し回数が閾値を超えたら N+1 の疑いとして警告する
+
+同期エンドポイント（スレッドプール）や wrap_with_context を通したスレッドは ContextVar が引き継がれるため
+同じリクエストに集計される。リクエスト外（ワーカーなど）の SQL は遅いクエリのログとメトリクスのみ。
+"""
+import contextlib
+import functools
+import heapq
+import logging
+import os
+import pathlib
+import threading
+import time
+from collections import Counter as _StatementCounter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import yaml
+
+from routers.module import perf_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_query_stats_config() -> dict:
+    """config.yaml から SQL 計測の設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    stats_cfg = cfg.get("query_stats", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "slow_query_ms": 200,
+        "response_headers": None,          # None の場合は DEPLOY=local のときだけ返す（環境変数 QUERY_STATS_HEADERS で上書き可）
+        "top_statements": 3,
+        "statement_max_length": 300,
+        "warn_statement_count": 50,        # 1 リクエストの SQL 発行数がこれを超えたら警告
+        "warn_repeated_statement": 20,     # 同じ SQL 文（パラメータ違い）の繰り返しがこれを超えたら警告
+        "exclude_paths": ["/metrics", "/ping"],
+    }
+    merged = {**defaults, **stats_cfg}
+    env_headers = os.getenv("QUERY_STATS_HEADERS")
+    if env_headers is not None:
+        merged["response_headers"] = env_headers.lower() == "true"
+    elif merged["response_headers"] is None:
+        merged["response_headers"] = os.getenv("DEPLOY", "cloud") == "local"
+    return merged
+
+
+DB_QUERY_DURATION = perf_metrics.histogram(
+    "db_query_duration_seconds", "SQL statement execution time by operation", ("operation",),
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10],
+)
+DB_SLOW_QUERIES = perf_metrics.counter("db_slow_queries_total", "SQL statements slower than query_stats.slow_query_ms", ("operation",))
+DB_QUERIES_PER_REQUEST = perf_metrics.histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request", ("method", "route"),
+    buckets=[0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000],
+)
+DB_TIME_PER_REQUEST = perf_metrics.histogram("http_request_db_seconds", "Total SQL time per HTTP request", ("method", "route"))
+
+
+def _operation(statement: str) -> str:
+    return (statement.lstrip().split(None, 1) or ["SQL"])[0].upper()
+
+
+@dataclass
+class QueryStats:
+    """1 スコープ（リクエストなど）の SQL 集計。スレッドから同時に記録されるためロックで保護する"""
+
+    parent: Optional["QueryStats"] = None
+    count: int = 0
+    total_seconds: float = 0.0
+    slowest: List[Tuple[float, str]] = field(default_factory=list)    # 実行時間の上位（min-heap）
+    statements: _StatementCounter = field(default_factory=_StatementCounter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, statement: str, seconds: float) -> None:
+        top_n = int(get_query_stats_config()["top_statements"])
+        stats: Optional[QueryStats] = self
+        while stats is not None:
+            with stats._lock:
+                stats.count += 1
+                stats.total_seconds += seconds
+                stats.statements[statement] += 1
+                if len(stats.slowest) < top_n:
+                    heapq.heappush(stats.slowest, (seconds, statement))
+                elif stats.slowest and seconds > stats.slowest[0][0]:
+                    heapq.heapreplace(stats.slowest, (seconds, statement))
+            stats = stats.parent
+
+    def slowest_statements(self) -> List[Tuple[float, str]]:
+        with self._lock:
+            return sorted(self.slowest, reverse=True)
+
+    def most_repeated(self) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            return self.statements.most_common(1)[0] if self.statements else None
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextlib.contextmanager
+def collect_query_stats() -> Iterator[QueryStats]:
+    """with collect_query_stats() as stats: の中で発行された SQL を集計する（外側のスコープにも加算される）"""
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _shorten(statement: str) -> str:
+    max_length = int(get_query_stats_config()["statement_max_length"])
+    text = " ".join(statement.split())
+    return text if len(text) <= max_length else text[:max_length] + "..."
+
+
+def instrument_engine_query_stats(engine: Any) -> None:
+    """全 SQL の実行時間を計測し、現在のスコープへの加算・メトリクス・遅いクエリのログを行う"""
+    if getattr(engine, "_query_stats_instrumented", False):
+        return
+    from sqlalchemy import event
+
+    slow_seconds = float(get_query_stats_config()["slow_query_ms"]) / 1000.0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_stats_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_stats_started", None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        operation = _operation(statement)
+        DB_QUERY_DURATION.observe(seconds, operation=operation)
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, seconds)
+        if slow_seconds and seconds >= slow_seconds:
+            DB_SLOW_QUERIES.inc(operation=operation)
+            rows = "executemany" if executemany else f"rowcount={cursor.rowcount}"
+            logger.warning("Slow query %.1fms (%s): %s", seconds * 1000, rows, _shorten(statement))
+
+    engine._query_stats_instrumented = True
+
+
+class QueryStatsMiddleware:
+    """リクエストごとに SQL を集計し、ヘッダー・メトリクス・N+1 の警告を出す ASGI ミドルウェア"""
+
+    def __init__(self, app: Any, response_headers: Optional[bool] = None):
+        cfg = get_query_stats_config()
+        self.app = app
+        self.response_headers = cfg["response_headers"] if response_headers is None else response_headers
+        self.exclude_paths = set(cfg["exclude_paths"] or [])
+        self.warn_statement_count = int(cfg["warn_statement_count"])
+        self.warn_repeated_statement = int(cfg["warn_repeated_statement"])
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: dict) -> None:
+            if message["type"] == "http.response.start" and self.response_headers:
+                slowest = stats.slowest_statements()
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.total_seconds * 1000:.1f}".encode()),
+                    (b"x-db-slowest-ms", f"{slowest[0][0] * 1000:.1f}".encode() if slowest else b"0"),
+                ]
+            await send(message)
+
+        with collect_query_stats() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._finish(scope, stats)
+
+    def _finish(self, scope: dict, stats: QueryStats) -> None:
+        method = scope.get("method", "GET")
+        route = getattr(scope.get("route"), "path", None) or "__unmatched__"
+        DB_QUERIES_PER_REQUEST.observe(stats.count, method=method, route=route)
+        DB_TIME_PER_REQUEST.observe(stats.total_seconds, method=method, route=route)
+
+        repeated = stats.most_repeated()
+        too_many = self.warn_statement_count and stats.count > self.warn_statement_count
+        too_repeated = self.warn_repeated_statement and repeated and repeated[1] > self.warn_repeated_statement
+        if too_many or too_repeated:
+            logger.warning(
+                "%s %s: %s queries, %.1fms in DB (possible N+1; most repeated x%s: %s)",
+                method, route, stats.count, stats.total_seconds * 1000, repeated[1], _shorten(repeated[0])
+            )
+            for seconds, statement in stats.slowest_statements():
+                logger.warning("  %.1fms: %s", seconds * 1000, _shorten(statement))
+
+
+def install_query_stats(app: Any, engine: Any) -> None:
+    """main.py から呼ぶ。SQL の計測とリクエスト単位の集計を有効にする"""
+    if not get_query_stats_config()["enabled"]:
+        return
+    instrument_engine_query_stats(engine)
+    app.add_middleware(QueryStatsMiddleware)
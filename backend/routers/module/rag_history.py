@@ -0,0 +1,266 @@
+# backend/routers/module/rag_history.py
+"""
+RAG セッションの会話履歴をトークン予算内で読み込み、古い部分はローリング要約として保持する
+
+- 新しい順に (session_id, id) インデックスでメッセージを読み、推定トークン数が token_budget に
+  収まる範囲（末尾）だけを LLM に渡す
+- 予算外になった古いメッセージは要約 LLM で RagSession.history_summary に畳み込み、
+  history_summary_until_id までを要約済みとして記録する。要約は応答後にバックグラウンドで更新する
+- 毎ターンの DB 読み込み量・JSON パース・プロンプトトークンはセッションの長さによらずほぼ一定になる
+- async def の処理からは AsyncSession を受け取る load_rag_history_async を使う（イベントループを止めない）
+"""
+import asyncio
+import functools
+import json
+import logging
+import pathlib
+from typing import List, Optional, Tuple
+
+import yaml
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from db import async_session_scope
+from models import RagMessage, RagSession
+from routers.module.util import initialize_llm
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ROLES = ("user", "assistant", "tool")
+
+
+@functools.lru_cache(maxsize=1)
+def get_rag_history_config() -> dict:
+    """config.yaml から RAG 会話履歴の読み込み設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    history_cfg = cfg.get("rag_history", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "token_budget": 8000,             # LLM に渡す直近履歴の推定トークン数の上限
+        "chars_per_token": 3,             # トークン数推定用の平均文字数（日英混在を想定）
+        "fetch_batch_size": 20,           # 末尾から読み込む際の1回あたりの件数
+        "summary_enabled": True,
+        "summary_min_tokens": 2000,       # 未要約の古いメッセージがこれを超えたら要約を更新する
+        "summary_max_chars": 4000,        # 要約の最大文字数
+        "summary_llm": {
+            "provider": "VertexAI",
+            "model_name": "gemini-2.0-flash-lite-001",
+            "temperature": 0.1,
+            "top_p": 0.95,
+            "max_retries": 2,
+        },
+    }
+    merged = {**defaults, **history_cfg}
+    merged["summary_llm"] = {**defaults["summary_llm"], **(history_cfg.get("summary_llm") or {})}
+    return merged
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text or "") // max(1, int(get_rag_history_config()["chars_per_token"])))
+
+
+def _to_langchain_message(m_hist: RagMessage) -> Optional[AnyMessage]:
+    if m_hist.role == "user":
+        return HumanMessage(content=m_hist.content)
+    if m_hist.role == "assistant":
+        return AIMessage(content=m_hist.content)
+    if m_hist.role == "tool":
+        tool_call_id = "unknown"
+        if m_hist.metadata_json:
+            try:
+                tool_call_id = json.loads(m_hist.metadata_json).get("tool_call_id", "")
+            except Exception:
+                pass
+        return ToolMessage(content=m_hist.content, tool_call_id=tool_call_id)
+    return None
+
+
+def _tail_batch_query(session_id: int, after_id: int, cursor_id: Optional[int], batch_size: int):
+    query = select(RagMessage).where(
+        RagMessage.session_id == session_id,
+        RagMessage.id > after_id,
+        RagMessage.role.in_(HISTORY_ROLES),
+    )
+    if cursor_id is not None:
+        query = query.where(RagMessage.id < cursor_id)
+    return query.order_by(RagMessage.id.desc()).limit(batch_size)
+
+
+def _take_within_budget(batch: List[RagMessage], tail: List[RagMessage], used_tokens: int, token_budget: int) -> Tuple[int, bool]:
+    """新しい順のバッチを予算内で tail に追加する。戻り値は (使用トークン数, 予算を超えたか)"""
+    for m_hist in batch:
+        cost = estimate_tokens(m_hist.content)
+        # 最新のメッセージ（今回の質問）は予算を超えても必ず含める
+        if tail and used_tokens + cost > token_budget:
+            return used_tokens, True
+        tail.append(m_hist)
+        used_tokens += cost
+    return used_tokens, False
+
+
+def _load_tail(db: Session, session_id: int, after_id: int, token_budget: int) -> Tuple[List[RagMessage], bool]:
+    """after_id より後のメッセージを新しい順に読み、予算内に収まる末尾を古い順で返す
+
+    Returns:
+        (末尾のメッセージ, 予算外の古いメッセージが残っているか)
+    """
+    batch_size = int(get_rag_history_config()["fetch_batch_size"])
+    tail: List[RagMessage] = []
+    used_tokens = 0
+    cursor_id: Optional[int] = None
+    while True:
+        batch = db.exec(_tail_batch_query(session_id, after_id, cursor_id, batch_size)).all()
+        if not batch:
+            return list(reversed(tail)), False
+        used_tokens, over_budget = _take_within_budget(batch, tail, used_tokens, token_budget)
+        if over_budget:
+            return list(reversed(tail)), True
+        cursor_id = batch[-1].id
+        if len(batch) < batch_size:
+            return list(reversed(tail)), False
+
+
+async def _load_tail_async(db: AsyncSession, session_id: int, after_id: int, token_budget: int) -> Tuple[List[RagMessage], bool]:
+    """_load_tail の AsyncSession 版"""
+    batch_size = int(get_rag_history_config()["fetch_batch_size"])
+    tail: List[RagMessage] = []
+    used_tokens = 0
+    cursor_id: Optional[int] = None
+    while True:
+        batch = (await db.exec(_tail_batch_query(session_id, after_id, cursor_id, batch_size))).all()
+        if not batch:
+            return list(reversed(tail)), False
+        used_tokens, over_budget = _take_within_budget(batch, tail, used_tokens, token_budget)
+        if over_budget:
+            return list(reversed(tail)), True
+        cursor_id = batch[-1].id
+        if len(batch) < batch_size:
+            return list(reversed(tail)), False
+
+
+def _build_history(summary: Optional[str], tail: List[RagMessage]) -> List[AnyMessage]:
+    history: List[AnyMessage] = []
+    if summary:
+        history.append(HumanMessage(content=f"（これまでの会話の要約）\n{summary}"))
+    for m_hist in tail:
+        message = _to_langchain_message(m_hist)
+        # 先頭が対応する呼び出しのないツール結果にならないようにする
+        if not history and isinstance(message, ToolMessage):
+            continue
+        if message is not None:
+            history.append(message)
+    return history
+
+
+def load_rag_history(db: Session, session_id: int) -> List[AnyMessage]:
+    """LLM に渡す会話履歴（要約 + トークン予算内の直近メッセージ）を返す"""
+    cfg = get_rag_history_config()
+    rag_session = db.get(RagSession, session_id)
+    summary = rag_session.history_summary if rag_session else None
+    summary_until_id = (rag_session.history_summary_until_id if rag_session else None) or 0
+
+    tail, _ = _load_tail(db, session_id, summary_until_id, int(cfg["token_budget"]))
+    return _build_history(summary, tail)
+
+
+async def load_rag_history_async(db: AsyncSession, session_id: int) -> List[AnyMessage]:
+    """load_rag_history の AsyncSession 版"""
+    cfg = get_rag_history_config()
+    rag_session = await db.get(RagSession, session_id)
+    summary = rag_session.history_summary if rag_session else None
+    summary_until_id = (rag_session.history_summary_until_id if rag_session else None) or 0
+
+    tail, _ = await _load_tail_async(db, session_id, summary_until_id, int(cfg["token_budget"]))
+    return _build_history(summary, tail)
+
+
+def _format_for_summary(messages: List[RagMessage]) -> str:
+    role_labels = {"user": "ユーザー", "assistant": "アシスタント", "tool": "ツール結果"}
+    return "\n\n".join(f"{role_labels.get(m.role, m.role)}: {m.content}" for m in messages)
+
+
+async def refresh_history_summary(session_id: int) -> None:
+    """予算外になった未要約メッセージが一定量を超えていれば、要約に畳み込んで保存する"""
+    cfg = get_rag_history_config()
+    if not cfg["summary_enabled"]:
+        return
+
+    async def _collect() -> Tuple[Optional[str], List[RagMessage]]:
+        async with async_session_scope() as db:
+            rag_session = await db.get(RagSession, session_id)
+            if rag_session is None:
+                return None, []
+            summary_until_id = rag_session.history_summary_until_id or 0
+            tail, has_older = await _load_tail_async(db, session_id, summary_until_id, int(cfg["token_budget"]))
+            if not has_older or not tail:
+                return rag_session.history_summary, []
+            older = (await db.exec(
+                select(RagMessage)
+                .where(
+                    RagMessage.session_id == session_id,
+                    RagMessage.id > summary_until_id,
+                    RagMessage.id < tail[0].id,
+                    RagMessage.role.in_(HISTORY_ROLES),
+                )
+                .order_by(RagMessage.id)
+            )).all()
+            return rag_session.history_summary, list(older)
+
+    previous_summary, older = await _collect()
+    if not older or sum(estimate_tokens(m.content) for m in older) < int(cfg["summary_min_tokens"]):
+        return
+
+    llm_cfg = cfg["summary_llm"]
+    llm = initialize_llm(
+        name=llm_cfg["provider"],
+        model_name=llm_cfg["model_name"],
+        temperature=llm_cfg["temperature"],
+        top_p=llm_cfg["top_p"],
+        llm_max_retries=llm_cfg["max_retries"],
+    )
+    max_chars = int(cfg["summary_max_chars"])
+    prompt = f"""以下は RAG チャットの過去の会話です。既存の要約と新しい会話を統合し、今後の質問に答えるために必要な
+事実・ユーザーの関心・参照した論文やURL・未解決の論点を、{max_chars}文字以内の日本語で箇条書きに要約してください。
+
+# 既存の要約
+{previous_summary or "（なし）"}
+
+# 新しい会話
+{_format_for_summary(older)}"""
+    try:
+        response = await llm.ainvoke(prompt)
+        new_summary = str(response.content).strip()[:max_chars]
+    except Exception as e:
+        logger.warning("Failed to update history summary for session %s: %s", session_id, e)
+        return
+
+    async with async_session_scope() as db:
+        rag_session = await db.get(RagSession, session_id)
+        if rag_session is None:
+            return
+        # 並行して更新された場合は、より新しい範囲を要約した方を残す
+        if (rag_session.history_summary_until_id or 0) >= older[-1].id:
+            return
+        rag_session.history_summary = new_summary
+        rag_session.history_summary_until_id = older[-1].id
+        db.add(rag_session)
+        await db.commit()
+    logger.info("Session %s: summarized %s message(s) up to id %s", session_id, len(older), older[-1].id)
+
+
+# 実行中の要約タスク（ガベージコレクションで中断されないよう参照を保持する）
+_summary_tasks: set = set()
+
+
+def schedule_history_summary_refresh(session_id: int) -> None:
+    """応答を返した後に要約を更新する（呼び出し元の処理時間には含めない）"""
+    try:
+        task = asyncio.get_running_loop().create_task(refresh_history_summary(session_id))
+    except RuntimeError:
+        # イベントループ外から呼ばれた場合は何もしない（次のターンで更新される）
+        return
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
@@ -11,13 +11,18 @@ from models import UserPaperLink, PaperMetadata
 from routers.module.embeddings import EMBED # EMBED をインポート
 from vectorstore.manager import load_vector_cfg, search_by_vector # manager_search_by_vector を search_by_vector に修正
 from fastapi import HTTPException, status
+from routers.module.web_tool_cache import cached_web_tool
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 
 # --- DeepResearchから持ってきたツール ---
 # search_results の値はconfigなどから取得できるようにすると良い
-tavily_web_search = TavilySearch(max_results=10, name="web_search_tool")
-tavily_web_extract = TavilyExtract(name="web_extract_tool")
+# 同一クエリ・同一URLの再取得はキャッシュから返す（web_tool_cache.py）
+tavily_web_search = cached_web_tool(TavilySearch(max_results=10, name="web_search_tool"), kind="search")
+tavily_web_extract = cached_web_tool(TavilyExtract(name="web_extract_tool"), kind="extract")
 
 
 def create_tag_exact_match_condition(tag_column, tag):
@@ -55,7 +60,7 @@ def local_rag_search_tool_impl(
     ユーザーの知識ベース（登録された論文の要約）内を検索します。
     ユーザーの質問、タグ、ユーザーIDに基づいて関連する論文情報を取得します。
     """
-    print(f"Tool 'local_rag_search_tool_impl' called with query: '{query}', user_id: {user_id}, tags: '{tags}'")
+    logger.debug("Tool 'local_rag_search_tool_impl' called with query: '%s', user_id: %s, tags: '%s'", query, user_id, tags)
     
     # 1. Fetch UserPaperLinks based on user_id and optional tags
     user_paper_links_query = select(UserPaperLink).where(UserPaperLink.user_id == user_id)
@@ -70,9 +75,9 @@ def local_rag_search_tool_impl(
 
     if not relevant_user_paper_links:
         if tags:
-            print(f"User {user_id}: No UserPaperLinks found matching tags: {tags}")
+            logger.info("User %s: No UserPaperLinks found matching tags: %s", user_id, tags)
         else:
-            print(f"User {user_id}: No UserPaperLinks found.")
+            logger.info("User %s: No UserPaperLinks found.", user_id)
         return []
 
     # 2. Collect unique paper_metadata_ids from these links
@@ -81,7 +86,7 @@ def local_rag_search_tool_impl(
     ))
 
     if not paper_metadata_ids:
-        print(f"User {user_id}: No valid paper_metadata_ids found from the user's paper links.")
+        logger.info("User %s: No valid paper_metadata_ids found from the user's paper links.", user_id)
         return []
 
     # 3. Build allowed_metadata_filters using user_id + paper_metadata_id (1論文1ベクトル設計)
@@ -97,35 +102,27 @@ def local_rag_search_tool_impl(
         })
 
     if not allowed_metadata_filters:
-        print(f"User {user_id}: No valid paper_metadata_ids found from the user's paper links.")
+        logger.info("User %s: No valid paper_metadata_ids found from the user's paper links.", user_id)
         return []
     
     vector_cfg = load_vector_cfg()
     store_type = vector_cfg.get("type")
     filter_for_vector_search = None
 
-    print(f"allowed_metadata_filters: {allowed_metadata_filters}")
+    # フィルターは論文数に比例して大きくなるため、件数のみ出力する
+    logger.debug("User %s: %d allowed metadata filters", user_id, len(allowed_metadata_filters))
 
     if store_type == "chroma":
         if not allowed_metadata_filters: 
-            print(f"User {user_id}: No valid metadata filters for ChromaDB") # Should be caught by earlier check
+            logger.info("User %s: No valid metadata filters for ChromaDB", user_id) # Should be caught by earlier check
             return []
         
-        chroma_or_conditions = []
-        for cond_set in allowed_metadata_filters:
-            and_clauses = []
-            for field, value in cond_set.items():
-               and_clauses.append({field: {"$eq": value}})
-            if and_clauses: chroma_or_conditions.append({"$and": and_clauses})
-        
-        if not chroma_or_conditions:
-             print(f"User {user_id}: No valid conditions derived for ChromaDB $or clause.")
-             return []
-        
-        if len(chroma_or_conditions) == 1: 
-            filter_for_vector_search = chroma_or_conditions[0]
-        else: 
-            filter_for_vector_search = {"$or": chroma_or_conditions}
+        # 論文ごとの $and を $or で並べると論文数に比例して条件がネストし、
+        # 数百件を超えると Chroma 側で RecursionError になるため $in でまとめる（同じ絞り込み結果）
+        filter_for_vector_search = {"$and": [
+            {"user_id": {"$eq": str(user_id)}},
+            {"paper_metadata_id": {"$in": sorted({f["paper_metadata_id"] for f in allowed_metadata_filters})}},
+        ]}
         
     elif store_type == "bigquery_vector_search":
         if allowed_metadata_filters:
@@ -138,14 +135,14 @@ def local_rag_search_tool_impl(
                 conditions.append(f"({cond})")
             filter_for_vector_search = " OR ".join(conditions)
         else:
-            print(f"User {user_id}: No valid metadata filters for BigQuery") 
+            logger.info("User %s: No valid metadata filters for BigQuery", user_id)
             return []
     else:
         if not allowed_metadata_filters:
-            print(f"User {user_id}: No valid metadata filters for vector search (non-Chroma/BQ path)")
+            logger.info("User %s: No valid metadata filters for vector search (non-Chroma/BQ path)", user_id)
             return []
         filter_for_vector_search = {"user_id": str(user_id)}
-        print(f"Warning: Vector store type '{store_type}' does not have specific multi-condition filter logic. Filtering by user_id only for vector search.")
+        logger.warning("Vector store type '%s' does not have specific multi-condition filter logic. Filtering by user_id only for vector search.", store_type)
 
     emb = EMBED.embed_query(query)
     hits_with_scores = search_by_vector(
@@ -210,7 +207,7 @@ def local_rag_search_tool_impl(
             "text_summary_chunk": returned_doc_chunk,
             "score": float(score)
         })
-    print(f"User {user_id}: Found {len(results_for_llm)} results for query: '{query}'")
+    logger.debug("User %s: Found %d results for query: '%s'", user_id, len(results_for_llm), query)
     return results_for_llm
 
 # 利用可能なツールとその実装をマッピング
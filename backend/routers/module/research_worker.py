@@ -0,0 +1,501 @@
+# backend/routers/module/research_worker.py
+"""
+DeepResearch / DeepRAG の実行サブシステム
+
+開始APIは ResearchJob をキューに積むだけで、実行はワーカーが担当する。
+- mode: inprocess の場合は API プロセス内の専用スレッドプール（FastAPI のスレッドプールとは別）で実行する
+- mode: external の場合は `python worker.py` を別プロセスで起動し、API とは独立にスケールさせる
+同時実行数とキューの上限を超えた開始リクエストには 429（Retry-After 付き）を返す。
+実行中のジョブはグラフの各ステップ間で中断要求を確認し、"cancelled" で終了する。
+ワーカーは実行中ジョブのハートビートを記録し、ハートビートが途絶えたジョブ（インスタンス停止など）は
+キューに戻す。再実行時はグラフのチェックポイントから続きを処理する。
+"""
+import functools
+import json
+import logging
+import os
+import pathlib
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import yaml
+from fastapi import HTTPException, status
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage
+from sqlalchemy import and_, insert, literal, or_, text, update
+from sqlmodel import Session, select, func
+
+from db import engine
+from models import RagMessage, RagSession, ResearchJob
+from routers.module.graph_checkpointer import get_graph_checkpoint_config, get_graph_checkpointer, research_job_thread_id
+from routers.module.profiler import profile_task
+from routers.module.tracing import inject_trace_context, start_span, use_trace_context
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+# ジョブの受付・取得を直列化する Postgres のアドバイザリロックキー（任意の固定値）
+_CLAIM_ADVISORY_LOCK_KEY = 72310431
+
+
+@functools.lru_cache(maxsize=1)
+def get_research_worker_config() -> dict:
+    """config.yaml から DeepResearch / DeepRAG ワーカー設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    worker_cfg = cfg.get("research_worker", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "mode": "inprocess",
+        "max_concurrent_runs": 2,
+        "max_total_running_runs": None,  # 全ワーカー合計の実行中ジョブ上限（None の場合は max_concurrent_runs）
+        "max_queue_size": 8,
+        "retry_after_seconds": 60,
+        "poll_interval_seconds": 2.0,
+        "heartbeat_interval_seconds": 30.0,
+        "stale_after_seconds": 180.0,  # ハートビートがこの秒数途絶えた実行中ジョブを停止とみなす
+        "max_resume_attempts": 3,
+    }
+    merged = {**defaults, **worker_cfg}
+    # 環境変数での上書き（ワーカープロセスだけ設定を変える場合など）
+    if os.getenv("RESEARCH_WORKER_MODE"):
+        merged["mode"] = os.getenv("RESEARCH_WORKER_MODE")
+    if os.getenv("RESEARCH_WORKER_CONCURRENCY"):
+        merged["max_concurrent_runs"] = int(os.getenv("RESEARCH_WORKER_CONCURRENCY"))
+    return merged
+
+
+def get_max_total_running_runs(cfg: Optional[dict] = None) -> int:
+    """全ワーカー合計で running にできるジョブ数の上限"""
+    cfg = cfg or get_research_worker_config()
+    return int(cfg.get("max_total_running_runs") or cfg["max_concurrent_runs"])
+
+
+def research_updates_are_external() -> bool:
+    """ジョブが別プロセスのワーカーで実行され、APIプロセスに変更通知が届かない構成か"""
+    return get_research_worker_config()["mode"] == "external"
+
+
+class ResearchRunCancelled(Exception):
+    """ユーザーの中断要求によりグラフ実行を打ち切る場合に送出する"""
+
+
+# -----------------------------------------------------------------
+#                      キュー操作（API側）
+# -----------------------------------------------------------------
+
+def _research_capacity(cfg: dict) -> int:
+    """実行中＋実行待ちとして受け付けるジョブ数の上限"""
+    return get_max_total_running_runs(cfg) + int(cfg["max_queue_size"])
+
+
+def _research_busy_error(cfg: dict) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Research workers are busy. Please retry later.",
+        headers={"Retry-After": str(int(cfg["retry_after_seconds"]))}
+    )
+
+
+def ensure_research_capacity(db: Session) -> None:
+    """実行中＋実行待ちのジョブが上限に達している場合は 429 を送出する
+
+    セッション作成前の事前チェック。上限の厳密な判定は enqueue_research_job で行う。
+    """
+    cfg = get_research_worker_config()
+    active_count = db.exec(
+        select(func.count(ResearchJob.id)).where(ResearchJob.status.in_(ACTIVE_JOB_STATUSES))
+    ).one()
+    if active_count >= _research_capacity(cfg):
+        raise _research_busy_error(cfg)
+
+
+def enqueue_research_job(db: Session, kind: str, rag_session_id: int, user_id: int, params: Dict[str, Any]) -> ResearchJob:
+    """ジョブをキューに追加する。inprocess モードの場合は組み込みワーカーを起こす。
+
+    件数の確認と追加を1つの INSERT ... SELECT で行い、同時に受け付けたリクエストが上限を超えて
+    積まれないようにする。上限に達していた場合はセッションを failed にして 429 を送出する。
+    """
+    cfg = get_research_worker_config()
+    columns = ResearchJob.__table__.c
+    # 開始リクエストのトレースを引き継ぐ（ワーカーが別プロセスでも同じトレースになる）
+    params_json = json.dumps({**params, "_trace_context": inject_trace_context()}, ensure_ascii=False)
+    values = {
+        "rag_session_id": rag_session_id,
+        "user_id": user_id,
+        "kind": kind,
+        "params_json": params_json,
+        "status": "queued",
+        "cancel_requested": False,
+        "created_at": datetime.utcnow(),
+        "resume_count": 0,
+    }
+    active_count = (
+        select(func.count(ResearchJob.id))
+        .where(ResearchJob.status.in_(ACTIVE_JOB_STATUSES))
+        .scalar_subquery()
+    )
+    guarded_insert = (
+        insert(ResearchJob)
+        .from_select(
+            list(values),
+            select(*[literal(value, columns[name].type) for name, value in values.items()])
+            .where(active_count < _research_capacity(cfg)),
+        )
+        .returning(columns.id)
+    )
+    if engine.dialect.name == "postgresql":
+        # READ COMMITTED では並行トランザクションの追加が件数に反映されないため、受付をジョブ取得と同じロックで直列化する
+        db.connection().execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CLAIM_ADVISORY_LOCK_KEY})
+    job_id = db.exec(guarded_insert).scalar_one_or_none()
+    if job_id is None:
+        db.rollback()
+        rag_session = db.get(RagSession, rag_session_id)
+        if rag_session:
+            rag_session.processing_status = "failed"
+            rag_session.last_updated = datetime.utcnow()
+            db.add(rag_session)
+            db.commit()
+        raise _research_busy_error(cfg)
+    db.commit()
+    job = db.get(ResearchJob, job_id)
+    if _embedded_worker is not None:
+        _embedded_worker.wake()
+    return job
+
+
+def request_research_cancel(db: Session, rag_session_id: int) -> Optional[str]:
+    """セッションの実行中／実行待ちジョブに中断を要求する。
+
+    Returns:
+        "cancelled"（実行待ちだったため即時中断）/ "cancelling"（実行中のため次のステップで中断）/
+        None（対象ジョブなし）
+    """
+    job = db.exec(
+        select(ResearchJob)
+        .where(ResearchJob.rag_session_id == rag_session_id, ResearchJob.status.in_(ACTIVE_JOB_STATUSES))
+        .order_by(ResearchJob.id.desc())
+    ).first()
+    if job is None:
+        return None
+
+    if job.status == "queued":
+        # ワーカーが取得する前に状態を確定させる（取得側は status='queued' を条件に更新する）
+        result = db.exec(
+            update(ResearchJob)
+            .where(ResearchJob.id == job.id, ResearchJob.status == "queued")
+            .values(status="cancelled", cancel_requested=True, finished_at=datetime.utcnow())
+        )
+        if result.rowcount == 1:
+            rag_session = db.get(RagSession, rag_session_id)
+            if rag_session:
+                rag_session.processing_status = "cancelled"
+                rag_session.last_updated = datetime.utcnow()
+                db.add(rag_session)
+            db.commit()
+            return "cancelled"
+        db.rollback()
+        db.refresh(job)
+
+    job.cancel_requested = True
+    db.add(job)
+    db.commit()
+    return "cancelling"
+
+
+def requeue_stranded_research_jobs() -> int:
+    """ハートビートが途絶えた running のジョブをキューに戻す（再開上限を超えたものは failed にする）
+
+    Returns:
+        キューに戻したジョブ数
+    """
+    cfg = get_research_worker_config()
+    cutoff = datetime.utcnow() - timedelta(seconds=float(cfg["stale_after_seconds"]))
+    max_resume_attempts = int(cfg["max_resume_attempts"])
+    is_stranded = and_(
+        ResearchJob.status == "running",
+        or_(
+            ResearchJob.heartbeat_at < cutoff,
+            and_(ResearchJob.heartbeat_at.is_(None), ResearchJob.started_at < cutoff),
+        ),
+    )
+    with Session(engine) as db:
+        exhausted = db.exec(
+            select(ResearchJob).where(is_stranded, ResearchJob.resume_count >= max_resume_attempts)
+        ).all()
+        for job in exhausted:
+            logger.warning("Job %s stranded too many times; marking as failed", job.id)
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            db.add(job)
+            rag_session = db.get(RagSession, job.rag_session_id)
+            if rag_session:
+                rag_session.processing_status = "failed"
+                rag_session.last_updated = datetime.utcnow()
+                db.add(rag_session)
+        result = db.exec(
+            update(ResearchJob)
+            .where(is_stranded, ResearchJob.resume_count < max_resume_attempts)
+            .values(status="queued", worker_id=None, resume_count=ResearchJob.resume_count + 1)
+        )
+        db.commit()
+        if result.rowcount:
+            logger.info("Requeued %s stranded job(s) for resume", result.rowcount)
+        return result.rowcount or 0
+
+
+def is_cancel_requested(job_id: int) -> bool:
+    with Session(engine) as db:
+        job = db.get(ResearchJob, job_id)
+        return bool(job and job.cancel_requested)
+
+
+# -----------------------------------------------------------------
+#                      ジョブ実行（ワーカー側）
+# -----------------------------------------------------------------
+
+def _load_initial_messages(db: Session, rag_session_id: int) -> List[AnyMessage]:
+    msgs_from_db = db.exec(
+        select(RagMessage)
+        .where(RagMessage.session_id == rag_session_id)
+        .order_by(RagMessage.created_at)
+    ).all()
+
+    lc_messages: List[AnyMessage] = []
+    for m_db in msgs_from_db:
+        if m_db.role == "user":
+            lc_messages.append(HumanMessage(content=m_db.content))
+        elif m_db.role == "assistant" or m_db.role == "system_step":
+            lc_messages.append(AIMessage(content=m_db.content))
+        elif m_db.role == "system":
+            lc_messages.append(SystemMessage(content=m_db.content))
+    return lc_messages
+
+
+def execute_research_job(job_id: int) -> None:
+    """取得済み（running）のジョブを1件実行し、終了状態を記録する"""
+    final_status = "failed"
+    try:
+        with Session(engine) as task_db_session:
+            job = task_db_session.get(ResearchJob, job_id)
+            if job is None:
+                return
+            params = json.loads(job.params_json or "{}")
+            initial_messages = _load_initial_messages(task_db_session, job.rag_session_id)
+
+            def should_cancel() -> bool:
+                return is_cancel_requested(job_id)
+
+            span_attributes = {"research_job.id": job_id, "research_job.kind": job.kind, "rag_session.id": job.rag_session_id}
+            with use_trace_context(params.get("_trace_context")), start_span(f"research_job {job.kind}", span_attributes), \
+                    profile_task(f"research_job.{job.kind}", label=f"job-{job_id}"):
+                logger.info("Job %s (%s) started for session %s", job_id, job.kind, job.rag_session_id)
+                if job.kind == "deepresearch":
+                    from routers.deepresearch_core import run_deep_research_graph_async
+                    run_deep_research_graph_async(
+                        initial_messages=initial_messages,
+                        db_session=task_db_session,
+                        rag_session_id=job.rag_session_id,
+                        user_id=job.user_id,
+                        system_prompt_group_id=params.get("system_prompt_group_id"),
+                        use_character_prompt=params.get("use_character_prompt", True),
+                        should_cancel=should_cancel,
+                        checkpoint_thread_id=research_job_thread_id(job_id)
+                    )
+                elif job.kind == "deeprag":
+                    from routers.deeprag_core import run_deep_rag_graph_async
+                    run_deep_rag_graph_async(
+                        initial_messages=initial_messages,
+                        db_session=task_db_session,
+                        rag_session_id=job.rag_session_id,
+                        user_id=job.user_id,
+                        tags=params.get("tags", ""),
+                        base_url_origin=params.get("base_url_origin", ""),
+                        system_prompt_group_id=params.get("system_prompt_group_id"),
+                        use_character_prompt=params.get("use_character_prompt", True),
+                        should_cancel=should_cancel,
+                        checkpoint_thread_id=research_job_thread_id(job_id)
+                    )
+                else:
+                    raise ValueError(f"Unknown research job kind: {job.kind}")
+
+            task_db_session.expire_all()  # 実行中に別セッションで更新されたステータスを読み直す
+            rag_session = task_db_session.get(RagSession, job.rag_session_id)
+            session_status = rag_session.processing_status if rag_session else None
+            final_status = session_status if session_status in ("completed", "failed", "cancelled") else "completed"
+    except Exception as e:
+        logger.error("Job %s failed: %s", job_id, e)
+        final_status = "failed"
+    finally:
+        with Session(engine) as db:
+            job = db.get(ResearchJob, job_id)
+            if job:
+                job.status = final_status
+                job.finished_at = datetime.utcnow()
+                db.add(job)
+                db.commit()
+        logger.info("Job %s finished with status '%s'", job_id, final_status)
+        checkpointer = get_graph_checkpointer()
+        if checkpointer is not None and get_graph_checkpoint_config()["delete_on_finish"]:
+            try:
+                checkpointer.delete_thread(research_job_thread_id(job_id))
+            except Exception as e:
+                logger.warning("Failed to delete checkpoints for job %s: %s", job_id, e)
+
+
+class ResearchWorker:
+    """queued のジョブを取得し、専用スレッドプールで最大 max_concurrent_runs 件まで同時実行する"""
+
+    def __init__(
+        self,
+        max_concurrent_runs: int,
+        poll_interval_seconds: float,
+        heartbeat_interval_seconds: float = 30.0,
+        worker_id: Optional[str] = None
+    ):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.poll_interval_seconds = poll_interval_seconds
+        self.heartbeat_interval_seconds = heartbeat_interval_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_runs, thread_name_prefix="research-worker")
+        self._slots = threading.Semaphore(max_concurrent_runs)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _claim_next_job(self) -> Optional[int]:
+        # 実行中件数の確認と取得を1つの UPDATE で行い、複数ワーカーが同時に上限を超えて取得しないようにする
+        running_count = (
+            select(func.count(ResearchJob.id))
+            .where(ResearchJob.status == "running")
+            .scalar_subquery()
+        )
+        max_total_running = get_max_total_running_runs()
+        with Session(engine) as db:
+            candidate_ids = db.exec(
+                select(ResearchJob.id)
+                .where(ResearchJob.status == "queued")
+                .order_by(ResearchJob.id)
+                .limit(5)
+            ).all()
+            for job_id in candidate_ids:
+                if engine.dialect.name == "postgresql":
+                    # READ COMMITTED では並行トランザクションの取得が件数に反映されないため、取得処理をDB全体で直列化する
+                    db.connection().execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CLAIM_ADVISORY_LOCK_KEY})
+                # 複数ワーカーが同じジョブを取得しないよう、status='queued' を条件に更新する
+                result = db.exec(
+                    update(ResearchJob)
+                    .where(ResearchJob.id == job_id, ResearchJob.status == "queued", running_count < max_total_running)
+                    .values(status="running", worker_id=self.worker_id, started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                if result.rowcount == 1:
+                    return job_id
+        return None
+
+    def _heartbeat_loop(self) -> None:
+        """実行中ジョブの生存を記録し、停止したワーカーのジョブを回収する（起動直後にも1回実行）"""
+        while not self._stop.is_set():
+            try:
+                with Session(engine) as db:
+                    db.exec(
+                        update(ResearchJob)
+                        .where(ResearchJob.worker_id == self.worker_id, ResearchJob.status == "running")
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    db.commit()
+                if requeue_stranded_research_jobs():
+                    self.wake()
+            except Exception as e:
+                logger.warning("Heartbeat failed: %s", e)
+            self._stop.wait(self.heartbeat_interval_seconds)
+
+    def _start_heartbeat(self) -> None:
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="research-worker-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _run_and_release(self, job_id: int) -> None:
+        try:
+            execute_research_job(job_id)
+        finally:
+            self._slots.release()
+            self.wake()
+
+    def _loop(self) -> None:
+        logger.info("Worker %s started (max_concurrent_runs=%s)", self.worker_id, self.max_concurrent_runs)
+        while not self._stop.is_set():
+            # 空きスロットができるまで待機
+            if not self._slots.acquire(timeout=self.poll_interval_seconds):
+                continue
+            try:
+                job_id = self._claim_next_job()
+            except Exception as e:
+                logger.warning("Failed to claim job: %s", e)
+                job_id = None
+            if job_id is None:
+                self._slots.release()
+                self._wakeup.wait(self.poll_interval_seconds)
+                self._wakeup.clear()
+                continue
+            self._executor.submit(self._run_and_release, job_id)
+        logger.info("Worker %s stopped", self.worker_id)
+
+    def start(self) -> None:
+        self._start_heartbeat()
+        self._thread = threading.Thread(target=self._loop, name="research-worker-dispatcher", daemon=True)
+        self._thread.start()
+
+    def run_forever(self) -> None:
+        self._start_heartbeat()
+        self._loop()
+
+    def stop(self, wait: bool = False) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_embedded_worker: Optional[ResearchWorker] = None
+
+
+def _create_worker_from_config() -> ResearchWorker:
+    cfg = get_research_worker_config()
+    return ResearchWorker(
+        max_concurrent_runs=int(cfg["max_concurrent_runs"]),
+        poll_interval_seconds=float(cfg["poll_interval_seconds"]),
+        heartbeat_interval_seconds=float(cfg["heartbeat_interval_seconds"])
+    )
+
+
+def start_embedded_research_worker() -> None:
+    """mode: inprocess の場合のみ、APIプロセス内でワーカーを起動する（アプリ起動時に呼び出す）"""
+    global _embedded_worker
+    if get_research_worker_config()["mode"] != "inprocess" or _embedded_worker is not None:
+        return
+    _embedded_worker = _create_worker_from_config()
+    _embedded_worker.start()
+
+
+def stop_embedded_research_worker() -> None:
+    global _embedded_worker
+    if _embedded_worker is not None:
+        _embedded_worker.stop(wait=False)
+        _embedded_worker = None
+
+
+def run_research_worker_forever() -> None:
+    """独立したワーカープロセスのエントリポイント（worker.py から呼び出す）"""
+    worker = _create_worker_from_config()
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop(wait=False)
@@ -0,0 +1,178 @@
+# backend/routers/module/run_message_writer.py
+"""
+DeepResearch / DeepRAG のグラフ実行中に保存するステップメッセージとステータス更新のバッファ
+
+ノードごとに add + commit していたメッセージ保存とステータス更新を実行単位でまとめ、
+flush_interval_seconds ごと（バックグラウンドスレッド）またはバッファが max_buffered_messages に
+達したノード境界で、1トランザクションで書き込む。同じステータスへの連続した更新は1回にまとめる。
+グラフのチェックポイントが有効な場合は、チェックポインタがノードの状態を保存する直前に必ず書き込む
+（configurable の run_message_writer 経由。保存後に停止しても再開時にメッセージが欠落しない）。
+実行終了時（完了・失敗・中断）は close() で必ず残りを書き込む。
+"""
+import functools
+import json
+import logging
+import pathlib
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import yaml
+from sqlmodel import Session
+
+from db import engine
+from models import RagMessage, RagSession
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_run_message_writer_config() -> dict:
+    """config.yaml からグラフ実行メッセージのバッファ設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    writer_cfg = cfg.get("run_message_writer", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "flush_interval_seconds": 2.0,   # ステータス・メッセージが画面に反映されるまでの最大遅延
+        "max_buffered_messages": 20,
+    }
+    return {**defaults, **writer_cfg}
+
+
+class RunMessageWriter:
+    """1回のグラフ実行（1つの RagSession）分のメッセージとステータスをまとめて書き込む"""
+
+    def __init__(self, rag_session_id: int, flush_interval_seconds: float, max_buffered_messages: int):
+        self.rag_session_id = rag_session_id
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffered_messages = max_buffered_messages
+        self.commit_count = 0
+        self._messages: List[Dict[str, Any]] = []
+        self._pending_status: Optional[str] = None
+        self._last_status: Optional[str] = None
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 書き込み順序（ステータスの前後関係）を保つ
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_message(self, role: str, content: str, is_step: bool, metadata: Optional[dict]) -> None:
+        # created_at は書き込み時ではなく追加時点の時刻にする（まとめて書き込んでも表示順・時刻がずれないように）
+        created_at = datetime.utcnow()
+        with self._lock:
+            self._messages.append({
+                "role": role,
+                "content": content,
+                "is_deep_research_step": is_step,
+                "metadata_json": json.dumps(metadata) if metadata else None,
+                "created_at": created_at,
+            })
+
+    def set_status(self, status: str) -> None:
+        with self._lock:
+            if status == (self._pending_status or self._last_status):
+                return
+            self._pending_status = status
+
+    def flush_if_due(self) -> None:
+        """ノード境界で呼ぶ。バッファが上限に達しているか、前回の書き込みから間隔が空いていれば書き込む"""
+        with self._lock:
+            due = (
+                len(self._messages) >= self.max_buffered_messages
+                or (time.monotonic() - self._last_flush >= self.flush_interval_seconds)
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, []
+                status, self._pending_status = self._pending_status, None
+                self._last_flush = time.monotonic()
+            if not messages and status is None:
+                return
+            try:
+                with Session(engine) as db:
+                    for message in messages:
+                        db.add(RagMessage(session_id=self.rag_session_id, **message))
+                    if status is not None:
+                        rag_session = db.get(RagSession, self.rag_session_id)
+                        if rag_session:
+                            rag_session.processing_status = status
+                            rag_session.last_updated = datetime.utcnow()
+                            db.add(rag_session)
+                    db.commit()
+                self.commit_count += 1
+                if status is not None:
+                    self._last_status = status
+            except Exception:
+                # 書き込みに失敗した分はバッファに戻し、次回の flush で再試行する
+                with self._lock:
+                    self._messages = messages + self._messages
+                    if self._pending_status is None:
+                        self._pending_status = status
+                raise
+
+    def _run_timer(self) -> None:
+        while not self._closed.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Periodic flush failed for session %s: %s", self.rag_session_id, e)
+
+    def start(self) -> "RunMessageWriter":
+        self._thread = threading.Thread(target=self._run_timer, name=f"run-message-writer-{self.rag_session_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """タイマーを止めて残りをすべて書き込む"""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval_seconds + 5)
+        self.flush()
+        logger.debug("Session %s: %s commit(s)", self.rag_session_id, self.commit_count)
+
+
+# rag_session_id -> 実行中の RunMessageWriter
+_active_writers: Dict[int, RunMessageWriter] = {}
+_active_writers_lock = threading.Lock()
+
+
+def open_run_message_writer(rag_session_id: int) -> Optional[RunMessageWriter]:
+    """グラフ実行の開始時に呼ぶ。無効化されている場合は None（従来どおり都度コミット）"""
+    cfg = get_run_message_writer_config()
+    if not cfg["enabled"]:
+        return None
+    writer = RunMessageWriter(
+        rag_session_id,
+        flush_interval_seconds=float(cfg["flush_interval_seconds"]),
+        max_buffered_messages=int(cfg["max_buffered_messages"]),
+    ).start()
+    with _active_writers_lock:
+        _active_writers[rag_session_id] = writer
+    return writer
+
+
+def close_run_message_writer(writer: Optional[RunMessageWriter]) -> None:
+    """グラフ実行の終了時（完了・失敗・中断いずれも）に呼び、残りを書き込む"""
+    if writer is None:
+        return
+    with _active_writers_lock:
+        if _active_writers.get(writer.rag_session_id) is writer:
+            del _active_writers[writer.rag_session_id]
+    try:
+        writer.close()
+    except Exception as e:
+        logger.error("Final flush failed for session %s: %s", writer.rag_session_id, e)
+
+
+def get_run_message_writer(rag_session_id: int) -> Optional[RunMessageWriter]:
+    """実行中のグラフのバッファを返す（_save_message_to_db / _update_rag_session_status から参照）"""
+    with _active_writers_lock:
+        return _active_writers.get(rag_session_id)
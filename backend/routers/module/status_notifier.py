@@ -0,0 +1,185 @@
+# backend/routers/module/status_notifier.py
+"""
+RAG/DeepResearch/DeepRAG/論文チャットのステータスAPI向けの変更通知とロングポーリング
+
+SQLAlchemy のセッションイベントで RagSession / RagMessage / PaperChatSession / ChatMessage の
+コミットを検知し、セッション単位のバージョン番号を進めて待機中のリクエストを起こす。
+ステータスAPIは since_id カーソル以降のメッセージだけを返し、変化がなければ wait 秒まで待機するため、
+クライアントが短い間隔で全履歴を再取得する必要がなくなる。
+通知はプロセス内のみのため、別プロセス（mode: external のリサーチワーカー）が更新しうるセッションに限り
+待機中も EXTERNAL_RECHECK_SECONDS ごとにDBを再読込する。それ以外は通知を待ち、
+通知の取りこぼしに備えて FALLBACK_RECHECK_SECONDS ごとにだけ再読込する。
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession
+
+from models import RagSession, RagMessage, PaperChatSession, ChatMessage
+
+# ロングポーリングの最大待機秒数（プロキシのタイムアウトより短くする）
+MAX_LONG_POLL_SECONDS = 30.0
+# 別プロセスが更新しうるセッションで、待機中にDBを再読込する間隔
+EXTERNAL_RECHECK_SECONDS = 3.0
+# プロセス内で更新されるセッションの再読込間隔（通知の取りこぼし対策のみ。通常は待機1回につき再読込しない）
+FALLBACK_RECHECK_SECONDS = 30.0
+# これらのステータスに達したセッションは待機せずに即時応答する
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+T = TypeVar("T")
+
+
+def rag_session_status_key(session_id: int) -> str:
+    """RagSession（SimpleRAG / DeepResearch / DeepRAG 共通）の通知キー"""
+    return f"rag_session:{session_id}"
+
+
+def paper_chat_status_key(session_id: int) -> str:
+    """論文チャットセッションの通知キー"""
+    return f"paper_chat:{session_id}"
+
+
+class StatusNotifier:
+    """キーごとのバージョン番号と待機者を管理する。任意のスレッドから notify できる。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def notify(self, key: str) -> None:
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            waiters = self._waiters.pop(key, [])
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_future, future)
+            except RuntimeError:
+                # イベントループが既に終了している
+                pass
+
+    async def wait(self, key: str, since_version: int, timeout: float) -> bool:
+        """since_version から変化があれば True、timeout 秒変化がなければ False を返す"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._versions.get(key, 0) != since_version:
+                return True
+            self._waiters.setdefault(key, []).append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key)
+                if waiters:
+                    self._waiters[key] = [w for w in waiters if w[1] is not future]
+                    if not self._waiters[key]:
+                        del self._waiters[key]
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+status_notifier = StatusNotifier()
+
+
+# --- SQLAlchemy セッションイベント: コミットされた変更を通知する ---
+
+_NOTIFY_KEYS_INFO = "status_notifier_keys"
+
+
+def _status_key_for(obj) -> Optional[str]:
+    if isinstance(obj, RagMessage):
+        return rag_session_status_key(obj.session_id) if obj.session_id is not None else None
+    if isinstance(obj, RagSession):
+        return rag_session_status_key(obj.id) if obj.id is not None else None
+    if isinstance(obj, ChatMessage):
+        return paper_chat_status_key(obj.paper_chat_session_id) if obj.paper_chat_session_id is not None else None
+    if isinstance(obj, PaperChatSession):
+        return paper_chat_status_key(obj.id) if obj.id is not None else None
+    return None
+
+
+@event.listens_for(SASession, "after_flush")
+def _collect_status_keys(session, flush_context) -> None:
+    keys: Set[str] = session.info.setdefault(_NOTIFY_KEYS_INFO, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        key = _status_key_for(obj)
+        if key:
+            keys.add(key)
+
+
+@event.listens_for(SASession, "after_commit")
+def _notify_committed_status_keys(session) -> None:
+    keys = session.info.pop(_NOTIFY_KEYS_INFO, None)
+    for key in keys or ():
+        status_notifier.notify(key)
+
+
+@event.listens_for(SASession, "after_rollback")
+def _discard_status_keys(session) -> None:
+    session.info.pop(_NOTIFY_KEYS_INFO, None)
+
+
+async def long_poll_status(
+    key: str,
+    load_snapshot: Callable[[], T],
+    wait_seconds: float = 0.0,
+    known_status: Optional[str] = None,
+    external_updates: bool = False
+) -> T:
+    """ステータスのスナップショットを返す。変化がなければ wait_seconds まで待ってから再取得する。
+
+    Args:
+        key: 通知キー（rag_session_status_key / paper_chat_status_key）
+        load_snapshot: DBからステータス応答を組み立てる同期関数（messages, status 属性を持つこと）
+        wait_seconds: 変化がない場合の最大待機秒数（0 の場合は従来通り即時応答）
+        known_status: クライアントが最後に受け取ったステータス（異なれば即時応答）
+        external_updates: 別プロセスのワーカーがセッションを更新しうる場合 True（待機中に短い間隔でDBを再読込する）
+
+    Returns:
+        load_snapshot の戻り値
+    """
+    # 取得前にバージョンを控えておき、取得中の更新を取りこぼさないようにする
+    version = status_notifier.version(key)
+    snapshot = await asyncio.to_thread(load_snapshot)
+
+    if wait_seconds <= 0 or _has_update(snapshot, known_status):
+        return snapshot
+    known_status = snapshot.status
+
+    recheck_seconds = EXTERNAL_RECHECK_SECONDS if external_updates else FALLBACK_RECHECK_SECONDS
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(wait_seconds, MAX_LONG_POLL_SECONDS)
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            # 変化なし: 空の増分を返す
+            return snapshot
+        changed = await status_notifier.wait(key, version, min(remaining, recheck_seconds))
+        if not changed and deadline - loop.time() <= 0:
+            # 最後の待機でも通知がなければ再読込せずに空の増分を返す（次のポーリングで取得される）
+            return snapshot
+        version = status_notifier.version(key)
+        snapshot = await asyncio.to_thread(load_snapshot)
+        # プロセス内通知がなくても、別プロセスの更新（や通知の取りこぼし）はDB再読込で検知する
+        if changed or _has_update(snapshot, known_status):
+            return snapshot
+
+
+def _has_update(snapshot, known_status: Optional[str]) -> bool:
+    """クライアントに即時返すべき変化（新規メッセージ・終了状態・ステータス変化）があるか"""
+    if snapshot.messages or snapshot.status in TERMINAL_STATUSES:
+        return True
+    return known_status is not None and snapshot.status != known_status
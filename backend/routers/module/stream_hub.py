@@ -0,0 +1,176 @@
+# backend/routers/module/stream_hub.py
+"""
+バックグラウンド処理からSSEエンドポイントへトークンを中継するプロセス内 Pub/Sub
+
+バックグラウンドタスク（論文チャット・SimpleRAG・要約生成）は LLM の astream で得たトークンを
+チャンネルに publish し、SSE エンドポイントはチャンネルを subscribe してクライアントへ送る。
+遅れて接続したクライアントのために、チャンネルは送信済みイベントを保持してリプレイする。
+別インスタンスで処理が動いている場合はトークンが届かないため、SSE 側は DB のステータスで完了を検知する。
+"""
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+# 要約生成など、呼び出し階層の深い処理にストリーム先チャンネル名を渡すためのコンテキスト変数
+current_stream_channel: ContextVar[Optional[str]] = ContextVar("current_stream_channel", default=None)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # プロキシでのバッファリングを無効化
+}
+
+
+class _StreamChannel:
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self.last_activity = time.time()
+        self._wakeup = asyncio.Event()
+
+    def append(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        self.last_activity = time.time()
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def wait(self, timeout: float) -> None:
+        wakeup = self._wakeup
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class StreamHub:
+    """チャンネル名 → イベント列 を保持する。同一イベントループ内での利用を前提とする。"""
+
+    def __init__(self, retention_seconds: float = 120.0, idle_timeout_seconds: float = 3600.0):
+        self.retention_seconds = retention_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self._channels: Dict[str, _StreamChannel] = {}
+
+    def _cleanup(self) -> None:
+        now = time.time()
+        for name in [
+            n for n, ch in self._channels.items()
+            if (ch.closed and now - ch.closed_at > self.retention_seconds)
+            # 別インスタンスで処理され publish されなかったチャンネルも回収する
+            or (not ch.closed and now - ch.last_activity > self.idle_timeout_seconds)
+        ]:
+            del self._channels[name]
+
+    def has_channel(self, name: str) -> bool:
+        return name in self._channels
+
+    def reset(self, name: str) -> None:
+        """新しい処理の開始前に呼び、前回処理のイベントを破棄する"""
+        self._cleanup()
+        self._channels[name] = _StreamChannel()
+
+    def _get(self, name: str) -> _StreamChannel:
+        channel = self._channels.get(name)
+        if channel is None:
+            self._cleanup()
+            channel = _StreamChannel()
+            self._channels[name] = channel
+        return channel
+
+    def publish(self, name: str, event: str, data: Any) -> None:
+        channel = self._get(name)
+        if channel.closed:
+            return
+        channel.append({"event": event, "data": data})
+
+    def close(self, name: str) -> None:
+        channel = self._channels.get(name)
+        if channel is None or channel.closed:
+            return
+        channel.closed = True
+        channel.closed_at = time.time()
+        channel.append({"event": "_closed", "data": None})
+
+    async def subscribe(self, name: str, poll_timeout: float = 2.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """イベントを順に返す。poll_timeout 秒イベントがない場合は None を返す（呼び出し側でDB確認用）。
+        チャンネルが close されると終了する。"""
+        channel = self._get(name)
+        cursor = 0
+        while True:
+            while cursor < len(channel.events):
+                event = channel.events[cursor]
+                cursor += 1
+                if event["event"] == "_closed":
+                    return
+                yield event
+            await channel.wait(poll_timeout)
+            if cursor >= len(channel.events):
+                yield None
+
+
+stream_hub = StreamHub()
+
+
+def format_sse(event: str, data: Any) -> str:
+    """SSE 形式の1イベント分の文字列を返す"""
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, default=str)
+    lines = "\n".join(f"data: {line}" for line in payload.split("\n"))
+    return f"event: {event}\n{lines}\n\n"
+
+
+def chunk_text(content: Any) -> str:
+    """AIMessageChunk.content（文字列またはパートのリスト）からテキストを取り出す"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and isinstance(part.get("text"), str):
+                parts.append(part["text"])
+        return "".join(parts)
+    return ""
+
+
+async def relay_channel_as_sse(
+    channel: str,
+    load_terminal_event: Callable[[], Optional[Dict[str, Any]]],
+    poll_timeout: float = 2.0
+) -> AsyncIterator[str]:
+    """チャンネルのイベントを SSE 文字列として返す非同期ジェネレータ。
+
+    load_terminal_event は DB を参照し、処理が終了済みなら {"event": ..., "data": ...} を、
+    処理中なら None を返す同期関数。チャンネルにイベントが届かない間（別インスタンスで処理中など）は
+    poll_timeout ごとにこれを呼んで完了を検知する。
+    """
+    if not stream_hub.has_channel(channel):
+        terminal = await asyncio.to_thread(load_terminal_event)
+        if terminal is not None:
+            yield format_sse(terminal["event"], terminal["data"])
+            return
+
+    async for event in stream_hub.subscribe(channel, poll_timeout=poll_timeout):
+        if event is None:
+            terminal = await asyncio.to_thread(load_terminal_event)
+            if terminal is not None:
+                yield format_sse(terminal["event"], terminal["data"])
+                return
+            yield ": keep-alive\n\n"
+            continue
+        yield format_sse(event["event"], event["data"])
+        if event["event"] in ("done", "error"):
+            return
+
+
+async def astream_and_publish(runnable, inputs: Any, channel: str, variant: Optional[str] = None, **kwargs):
+    """runnable を astream で実行し、トークンをチャンネルに publish しながら結合済みの出力を返す"""
+    aggregated = None
+    async for chunk in runnable.astream(inputs, **kwargs):
+        aggregated = chunk if aggregated is None else aggregated + chunk
+        text = chunk_text(getattr(chunk, "content", chunk))
+        if text:
+            stream_hub.publish(channel, "token", {"variant": variant, "text": text} if variant else {"text": text})
+    return aggregated
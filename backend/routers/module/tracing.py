@@ -0,0 +1,418 @@
+# backend/routers/module/tracing.py
+"""
+OpenTelemetry による分散トレーシング
+
+論文要約の一括生成（arXiv 取得・要約・タグ生成・埋め込み・ベクトル登録）や DeepRAG の各ノードで
+どこに時間がかかっているかを、1つのトレースとして確認できるようにする。
+
+- HTTP リクエスト: opentelemetry-instrumentation-fastapi のサーバースパン（traceparent ヘッダーも引き継ぐ）
+- LLM / ツール / LangGraph のノード: LangChain のコールバック（全チェーンに自動で付与）でスパンを作る。
+  ノード内で作るスパン（SQL・ベクトルストア操作など）は、LangChain の実行中 run からノードのスパンを探して親にする
+- SQL: SQLAlchemy の cursor_execute イベントで1文ごとにスパンを作る
+- ベクトルストア操作（perf_metrics.observe_vector_store）と utils/fulltext の取得処理は traced / start_span で囲む
+- バックグラウンド処理: スレッド・executor には wrap_with_context で contextvars を引き継ぎ、
+  ResearchJob には W3C traceparent を params_json に保存してワーカー（別プロセスでも可）で復元する
+
+エクスポーターは config.yaml の tracing.exporter（環境変数 TRACING_EXPORTER で上書き可）で選ぶ。
+none の場合はトレーサーを設定しないため、スパンの作成は OpenTelemetry API の no-op になる。
+- console: 1スパン1行の JSON を標準出力に書く
+- jsonl: jsonl_path のファイルに 1スパン1行の JSON を追記する（オフラインでの解析用）
+- otlp: OTLP/gRPC で送信する（otlp_endpoint または OTEL_EXPORTER_OTLP_ENDPOINT）
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import pathlib
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+
+import yaml
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+_tracer = trace.get_tracer("knowledgepaper")
+_langchain_handler_var: Optional[ContextVar] = None   # install_langchain_tracing で設定する
+
+
+@functools.lru_cache(maxsize=1)
+def get_tracing_config() -> dict:
+    """config.yaml からトレーシングの設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    tracing_cfg = cfg.get("tracing", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "exporter": "none",                      # none / console / jsonl / otlp
+        "service_name": "knowledgepaper-api",
+        "jsonl_path": "./traces/spans.jsonl",
+        "otlp_endpoint": None,                   # 未設定の場合は OTEL_EXPORTER_OTLP_ENDPOINT（既定 localhost:4317）
+        "sample_ratio": 1.0,
+        "sql_statement_max_length": 1000,
+        "excluded_urls": ["/metrics", "/ping"],
+    }
+    merged = {**defaults, **tracing_cfg}
+    merged["exporter"] = os.getenv("TRACING_EXPORTER", merged["exporter"]).lower()
+    return merged
+
+
+def is_tracing_enabled() -> bool:
+    return get_tracing_config()["exporter"] != "none"
+
+
+# -----------------------------------------------------------------
+#                      スパンの作成
+# -----------------------------------------------------------------
+
+def _langchain_run_span() -> Any:
+    """実行中の LangChain run（ノード・ツールなど）のスパンを返す"""
+    if _langchain_handler_var is None:
+        return None
+    from langchain_core.runnables.config import var_child_runnable_config
+
+    config = var_child_runnable_config.get()
+    parent_run_id = getattr((config or {}).get("callbacks"), "parent_run_id", None)
+    entry = _langchain_handler_var.get()._runs.get(parent_run_id) if parent_run_id is not None else None
+    return entry[0] if entry else None
+
+
+def _parent_context() -> Any:
+    """新しいスパンの親のコンテキスト（None の場合は現在のコンテキスト）
+
+    LangGraph はノードの開始と終了のコールバックを別の asyncio タスクから呼ぶため、ノードのスパンを
+    現在のコンテキストに設定できない。代わりに実行中の run のスパンと現在のスパンのうち、
+    後に開始した方（より内側）を親にする。
+    """
+    run_span = _langchain_run_span()
+    if run_span is None:
+        return None
+    current = trace.get_current_span()
+    if current.is_recording() and getattr(current, "start_time", 0) >= getattr(run_span, "start_time", 0):
+        return None
+    return trace.set_span_in_context(run_span)
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: SpanKind = SpanKind.INTERNAL):
+    """with start_span("name", {...}): ... で現在の処理の子スパンを作る"""
+    return _tracer.start_as_current_span(name, context=_parent_context(), kind=kind, attributes=attributes)
+
+
+def traced(name: Optional[str] = None, *, record_args: Sequence[str] = ()):
+    """関数全体をスパンで囲むデコレータ（同期・非同期どちらにも使える）
+
+    record_args に指定した引数は code.arg.<名前> 属性として記録する。
+    """
+    def decorator(function: Callable) -> Callable:
+        span_name = name or f"{function.__module__}.{function.__qualname__}"
+        signature = inspect.signature(function) if record_args else None
+
+        def _attributes(args: tuple, kwargs: dict) -> Dict[str, str]:
+            if signature is None:
+                return {}
+            try:
+                bound = signature.bind_partial(*args, **kwargs)
+            except TypeError:
+                return {}
+            return {f"code.arg.{key}": str(value) for key, value in bound.arguments.items() if key in record_args}
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name, _attributes(args, kwargs)):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, _attributes(args, kwargs)):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -----------------------------------------------------------------
+#                      コンテキストの引き継ぎ
+# -----------------------------------------------------------------
+
+def wrap_with_context(function: Callable) -> Callable:
+    """呼び出し時点の contextvars（トレースのコンテキストを含む）で function を実行するラッパーを返す
+
+    スレッド・run_in_executor・ThreadPoolExecutor.submit に渡す関数に使う。
+    同じ Context は同時に1スレッドでしか実行できないため、ラッパーは submit ごとに作ること。
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return context.run(function, *args, **kwargs)
+    return wrapper
+
+
+def inject_trace_context() -> Dict[str, str]:
+    """現在のトレースのコンテキストを W3C traceparent 形式の dict で返す（ジョブのパラメータなどに保存する）"""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+@contextlib.contextmanager
+def use_trace_context(carrier: Optional[Dict[str, str]]) -> Iterator[None]:
+    """inject_trace_context で保存したコンテキストを親として処理を実行する"""
+    if not carrier:
+        yield
+        return
+    token = otel_context.attach(propagate.extract(carrier))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+# -----------------------------------------------------------------
+#                      LangChain / LangGraph
+# -----------------------------------------------------------------
+
+def _build_langchain_tracing_handler():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    from routers.module.perf_metrics import llm_labels, llm_token_usage
+
+    class LangChainTracingHandler(BaseCallbackHandler):
+        """LLM・ツール・LangGraph のノード・最上位のチェーンをスパンにする
+
+        親子関係は parent_run_id で辿る。スパンにしないチェーン（RunnableSequence など）は
+        最も近い祖先のスパンを引き継ぐ。最上位の run は現在のコンテキスト（HTTP リクエストなど）の子になる。
+        """
+
+        run_inline = True
+
+        def __init__(self):
+            # run_id -> (スパン, このハンドラーが作ったか)
+            self._runs: Dict[Any, tuple] = {}
+
+        def _open(self, run_id: Any, parent_run_id: Any, name: str, attributes: Dict[str, Any]) -> None:
+            entry = self._runs.get(parent_run_id) if parent_run_id is not None else None
+            context = trace.set_span_in_context(entry[0]) if entry else None
+            self._runs[run_id] = (_tracer.start_span(name, context=context, attributes=attributes), True)
+
+        def _inherit(self, run_id: Any, parent_run_id: Any) -> None:
+            entry = self._runs.get(parent_run_id) if parent_run_id is not None else None
+            if entry:
+                self._runs[run_id] = (entry[0], False)
+
+        def _close(self, run_id: Any, error: Optional[BaseException] = None, attributes: Optional[Dict[str, Any]] = None) -> None:
+            entry = self._runs.pop(run_id, None)
+            if entry is None or not entry[1]:
+                return
+            span = entry[0]
+            if attributes:
+                span.set_attributes(attributes)
+            if error is not None:
+                span.record_exception(error)
+                span.set_status(Status(StatusCode.ERROR, f"{type(error).__name__}: {error}"))
+            span.end()
+
+        # チェーン（LangGraph のノード・最上位の実行）
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+            name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+            metadata = metadata or {}
+            if metadata.get("langgraph_node") == name:
+                attributes = {"langgraph.node": name}
+                if metadata.get("langgraph_step") is not None:
+                    attributes["langgraph.step"] = int(metadata["langgraph_step"])
+                self._open(run_id, parent_run_id, f"langgraph.node {name}", attributes)
+            elif parent_run_id is None:
+                self._open(run_id, None, f"chain {name}", {})
+            else:
+                self._inherit(run_id, parent_run_id)
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._close(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._close(run_id, error)
+
+        # LLM
+        def _open_llm(self, serialized, run_id, parent_run_id, metadata, kwargs) -> None:
+            provider, model = llm_labels(serialized, metadata, kwargs)
+            self._open(run_id, parent_run_id, f"llm {model}", {"gen_ai.system": provider, "gen_ai.request.model": model})
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+            self._open_llm(serialized, run_id, parent_run_id, metadata, kwargs)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+            self._open_llm(serialized, run_id, parent_run_id, metadata, kwargs)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            input_tokens, output_tokens = llm_token_usage(response)
+            self._close(run_id, attributes={"gen_ai.usage.input_tokens": input_tokens, "gen_ai.usage.output_tokens": output_tokens})
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._close(run_id, error)
+
+        # ツール
+        def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+            name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+            self._open(run_id, parent_run_id, f"tool {name}", {"tool.name": name})
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._close(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._close(run_id, error)
+
+    return LangChainTracingHandler()
+
+
+
+def install_langchain_tracing() -> None:
+    """すべての LangChain 実行にトレーシング用コールバックを付与する"""
+    global _langchain_handler_var
+    if _langchain_handler_var is not None:
+        return
+    from langchain_core.tracers.context import register_configure_hook
+
+    _langchain_handler_var = ContextVar("tracing_langchain_handler", default=_build_langchain_tracing_handler())
+    register_configure_hook(_langchain_handler_var, inheritable=True)
+
+
+# -----------------------------------------------------------------
+#                      SQL
+# -----------------------------------------------------------------
+
+def instrument_engine_tracing(engine: Any) -> None:
+    """SQL 文ごとにスパンを作る（db.system / db.statement 属性付き）"""
+    if getattr(engine, "_tracing_instrumented", False):
+        return
+    from sqlalchemy import event
+
+    system = engine.dialect.name
+    max_length = int(get_tracing_config()["sql_statement_max_length"])
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is None:
+            return
+        operation = (statement.lstrip().split(None, 1) or ["SQL"])[0].upper()
+        context._trace_span = _tracer.start_span(
+            f"sql {operation}",
+            context=_parent_context(),
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": system, "db.operation": operation, "db.statement": statement[:max_length]},
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.end()
+            context._trace_span = None
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.set_status(Status(StatusCode.ERROR, str(exception_context.original_exception)))
+            span.end()
+            context._trace_span = None
+
+    engine._tracing_instrumented = True
+
+
+# -----------------------------------------------------------------
+#                      エクスポーターとセットアップ
+# -----------------------------------------------------------------
+
+def _span_json_line(span: Any) -> str:
+    return span.to_json(indent=None) + os.linesep
+
+
+def _build_exporter(cfg: dict):
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SpanExportResult, SpanExporter
+
+    exporter = cfg["exporter"]
+    if exporter == "console":
+        return ConsoleSpanExporter(formatter=_span_json_line)
+    if exporter == "jsonl":
+        class JsonLinesSpanExporter(SpanExporter):
+            """1スパン1行の JSON をファイルに追記する"""
+
+            def __init__(self, path: str):
+                self.path = pathlib.Path(path)
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._lock = threading.Lock()
+
+            def export(self, spans):
+                try:
+                    with self._lock, self.path.open("a", encoding="utf-8") as f:
+                        for span in spans:
+                            f.write(json.dumps(json.loads(span.to_json(indent=None)), ensure_ascii=False) + "\n")
+                    return SpanExportResult.SUCCESS
+                except OSError as e:
+                    logger.warning("Failed to write spans to %s: %s", self.path, e)
+                    return SpanExportResult.FAILURE
+
+        return JsonLinesSpanExporter(cfg["jsonl_path"])
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=cfg["otlp_endpoint"]) if cfg["otlp_endpoint"] else OTLPSpanExporter()
+    raise ValueError(f"Unsupported tracing exporter: {exporter}")
+
+
+_provider: Any = None
+_setup_lock = threading.Lock()
+
+
+def setup_tracing(engine: Any = None, service_name: Optional[str] = None) -> bool:
+    """TracerProvider を設定し、LangChain と SQL の計測を有効にする。exporter が none の場合は何もしない"""
+    global _provider
+    cfg = get_tracing_config()
+    if not is_tracing_enabled():
+        return False
+    with _setup_lock:
+        if _provider is None:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+            provider = TracerProvider(
+                resource=Resource.create({"service.name": service_name or cfg["service_name"]}),
+                sampler=ParentBased(TraceIdRatioBased(float(cfg["sample_ratio"]))),
+            )
+            provider.add_span_processor(BatchSpanProcessor(_build_exporter(cfg)))
+            trace.set_tracer_provider(provider)
+            _provider = provider
+            install_langchain_tracing()
+            logger.info("Tracing enabled (exporter=%s)", cfg["exporter"])
+    if engine is not None:
+        instrument_engine_tracing(engine)
+    return True
+
+
+def install_tracing(app: Any, engine: Any) -> None:
+    """main.py から呼ぶ。FastAPI のサーバースパンも有効にする"""
+    if not setup_tracing(engine):
+        return
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    # excluded_urls は URL に対する正規表現のため、パスの末尾で一致させる
+    excluded = ",".join(f"{path}$" for path in get_tracing_config()["excluded_urls"] or [])
+    FastAPIInstrumentor.instrument_app(app, excluded_urls=excluded or None)
+
+
+def shutdown_tracing() -> None:
+    """未送信のスパンを送信する（シャットダウン時に呼ぶ）"""
+    if _provider is not None:
+        _provider.shutdown()
@@ -0,0 +1,109 @@
+# backend/routers/module/user_cache.py
+"""
+JWT 認証時のユーザー解決キャッシュ（get_current_user 用）
+
+ステータスのポーリングや画像配信など、認証付きリクエストのたびに User を SELECT していたのを、
+user_id ＋ バージョン番号をキーにした短い TTL の LRU で置き換える。
+
+- キャッシュするのは列の値のみ。リクエストごとに make_transient_to_detached ＋ session.merge(load=False)
+  でそのリクエストのセッションに結び付けたインスタンスを返すため、エンドポイント側で
+  current_user を更新して commit する既存の処理はそのまま動く（SELECT は発行しない）
+- auth ルーターのユーザー更新エンドポイント（表示名・テーマ・キャラクター・好感度・背景画像・
+  パスワード・アカウント削除）は invalidate_cached_user を呼び、バージョンを進める
+- invalidate_cached_user の効果はプロセス内のみ。他インスタンスでの更新は ttl_seconds（既定5秒）の間は反映されないため、
+  パスワード変更・アカウント削除・ユーザー情報の更新など古い値で判定・上書きしてはならない処理は
+  auth_utils.get_current_active_user_fresh（キャッシュを使わない）で認証する
+"""
+import functools
+import pathlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session, select
+
+from models import User
+
+
+@functools.lru_cache(maxsize=1)
+def get_user_cache_config() -> dict:
+    """config.yaml から認証ユーザーキャッシュの設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    cache_cfg = cfg.get("user_cache", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "ttl_seconds": 5,
+        "max_entries": 1024,
+    }
+    return {**defaults, **cache_cfg}
+
+
+_entries: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_versions: Dict[int, int] = defaultdict(int)
+_metrics: Dict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+def _user_columns(user: User) -> Dict[str, Any]:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+def _attach(session: Session, values: Dict[str, Any]) -> User:
+    """キャッシュした列の値から、このセッションに属する User を作る（DB には問い合わせない）"""
+    user = User(**values)
+    make_transient_to_detached(user)
+    return session.merge(user, load=False)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """ユーザー情報を更新・削除した後に呼ぶ"""
+    with _lock:
+        _versions[user_id] += 1
+        for key in [k for k in _entries if k[0] == user_id]:
+            del _entries[key]
+
+
+def get_user_cache_metrics() -> Dict[str, int]:
+    """{hits, misses, entries} を返す"""
+    with _lock:
+        return {**_metrics, "entries": len(_entries)}
+
+
+def get_user_by_id_cached(session: Session, user_id: int) -> Optional[User]:
+    """user_id のユーザーを返す。キャッシュにない場合のみ SELECT する"""
+    cfg = get_user_cache_config()
+    if not cfg["enabled"]:
+        return session.exec(select(User).where(User.id == user_id)).first()
+
+    with _lock:
+        key = (user_id, _versions[user_id])
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _entries.move_to_end(key)
+            _metrics["hits"] += 1
+            values = entry[1]
+        else:
+            if entry is not None:
+                del _entries[key]
+            _metrics["misses"] += 1
+            values = None
+    if values is not None:
+        return _attach(session, values)
+
+    user = session.exec(select(User).where(User.id == user_id)).first()
+    if user is None:
+        return None
+    with _lock:
+        # 読み込み中に無効化された場合は古い値を保存しない
+        if _versions[user_id] == key[1]:
+            _entries[key] = (time.monotonic() + float(cfg["ttl_seconds"]), _user_columns(user))
+            _entries.move_to_end(key)
+            while len(_entries) > int(cfg["max_entries"]):
+                _entries.popitem(last=False)
+    return user
@@ -3,10 +3,21 @@ import requests
 from bs4 import BeautifulSoup
 from datetime import date, timedelta
 import concurrent.futures
-import arxiv
+from routers.module.lazy_import import lazy_module
+arxiv = lazy_module("arxiv")
 import os
 import io
-import PyPDF2   # PDF抽出用に追加
+PyPDF2 = lazy_module("PyPDF2")   # PDF抽出用に追加
+import asyncio
+import hashlib
+import threading
+import time
+import functools
+import pathlib
+import yaml
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 from dotenv import load_dotenv, find_dotenv
 
 # ==============================
@@ -15,6 +26,7 @@ from dotenv import load_dotenv, find_dotenv
 #from dotenv import load_dotenv
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
 from pydantic import BaseModel, Field
 
 _ = load_dotenv(find_dotenv())
@@ -157,6 +169,10 @@ def extract_model_name(full_model_name: str) -> str:
         return model_name
     return full_model_name
 
+def effective_llm_provider(name: str) -> str:
+    """環境変数 LLM_PROVIDER_OVERRIDE（例: ベンチマーク用の "Fake"）が設定されていればそれを返す"""
+    return os.getenv("LLM_PROVIDER_OVERRIDE") or name
+
 def initialize_llm(name: str, model_name: str, temperature: float, top_p: float = None, cache_dir: str = None, llm_max_retries: int = 3):
     """
     指定されたパラメータを用いて LLM を初期化する関数。
@@ -164,8 +180,14 @@ def initialize_llm(name: str, model_name: str, temperature: float, top_p: float
     llm = None
 
     model_name = extract_model_name(model_name)  # モデル名を抽出
+    name = effective_llm_provider(name)
+
+    if name == "Fake":
+        # オフラインのベンチマーク用（ネットワークに接続しない決定的なモデル）
+        from routers.module.fake_providers import create_fake_chat_model
+        llm = create_fake_chat_model(model_name)
 
-    if name == "Azure":
+    elif name == "Azure":
         api_key = os.getenv("AZURE_OPENAI_API_KEY")
         api_version = os.getenv("OPENAI_API_VERSION") # AzureではAPIバージョンも必要
         azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -362,6 +384,285 @@ def initialize_llm(name: str, model_name: str, temperature: float, top_p: float
 
     return llm
 
+##############################################################################
+# コンテキストキャッシュ: 同一論文の長いプレフィックスをプロバイダ側にキャッシュ
+##############################################################################
+@functools.lru_cache(maxsize=1)
+def get_context_cache_config() -> dict:
+    """config.yaml からコンテキストキャッシュ設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    cache_cfg = cfg.get("context_cache", {}) or {}
+    defaults = {
+        "backend": "auto",          # auto / local / disabled
+        "ttl_seconds": 3600,
+        "max_entries": 128,
+        "min_prefix_chars": 8000,   # これより短いプレフィックスはキャッシュしない（プロバイダの最小トークン数対策）
+    }
+    return {**defaults, **cache_cfg}
+
+
+@dataclass
+class ContextCacheHandle:
+    """登録済みプレフィックスのハンドル。cached_content_name はプロバイダ側のキャッシュ名（ローカル代替実装では None）"""
+    scope_key: str
+    provider: str
+    model_name: str
+    prefix_hash: str
+    cached_content_name: Optional[str]
+    expires_at: float
+    hits: int = 0
+
+    @property
+    def is_remote(self) -> bool:
+        return self.cached_content_name is not None
+
+
+class LocalContextCacheBackend:
+    """プロバイダAPIを使わないローカル代替実装（テストやキャッシュ非対応プロバイダ用）。
+    ハンドルの登録・TTL・退避のみを行い、LLMへは従来通りプレフィックスを含めて送信する。"""
+    name = "local"
+
+    def supports(self, provider: str, model_name: str) -> bool:
+        return True
+
+    def create(self, provider: str, model_name: str, system_text: str, context_text: str, ttl_seconds: int) -> Optional[str]:
+        return None
+
+    def delete(self, provider: str, model_name: str, cached_content_name: str) -> None:
+        return None
+
+
+class GoogleGenAIContextCacheBackend:
+    """google-genai の cached contents API を使うバックエンド（Google / VertexAI の Gemini モデル）"""
+    name = "google_genai"
+
+    def supports(self, provider: str, model_name: str) -> bool:
+        return provider in ("Google", "VertexAI") and "gemini" in extract_model_name(model_name)
+
+    def _client(self, provider: str, model_name: str):
+        from google import genai
+        if provider == "Google":
+            return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        import google.auth
+        _, project = google.auth.default()
+        # initialize_llm と同じロケーションを使う（preview モデルは global）
+        location = "global" if "preview" in model_name else os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+        return genai.Client(vertexai=True, project=project, location=location)
+
+    def create(self, provider: str, model_name: str, system_text: str, context_text: str, ttl_seconds: int) -> Optional[str]:
+        from google.genai import types
+        model_name = extract_model_name(model_name)
+        client = self._client(provider, model_name)
+        cached = client.caches.create(
+            model=model_name,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_text or None,
+                contents=[types.Content(role="user", parts=[types.Part(text=context_text)])],
+                ttl=f"{int(ttl_seconds)}s",
+            ),
+        )
+        return cached.name
+
+    def delete(self, provider: str, model_name: str, cached_content_name: str) -> None:
+        try:
+            self._client(provider, model_name).caches.delete(name=cached_content_name)
+        except Exception as e:
+            print(f"[context_cache] Failed to delete cached content {cached_content_name}: {e}")
+
+
+class ContextCache:
+    """(スコープ, プロバイダ, モデル, プレフィックス) 単位でキャッシュハンドルを保持するレジストリ。
+    TTL切れのエントリと max_entries を超えた古いエントリはプロバイダ側からも削除する。"""
+
+    def __init__(self, remote_backend=None, ttl_seconds: int = 3600, max_entries: int = 128, min_prefix_chars: int = 8000):
+        self.remote_backend = remote_backend
+        self.local_backend = LocalContextCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.min_prefix_chars = min_prefix_chars
+        self._entries: "OrderedDict[tuple, ContextCacheHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._creating: Dict[tuple, threading.Event] = {}
+        self.creation_wait_seconds = 30.0
+        self.hits = 0
+        self.misses = 0
+
+    def _backend_for(self, provider: str, model_name: str):
+        if self.remote_backend is not None and self.remote_backend.supports(effective_llm_provider(provider), model_name):
+            return self.remote_backend
+        return self.local_backend
+
+    def _release(self, handle: ContextCacheHandle) -> None:
+        if handle.is_remote:
+            self._backend_for(handle.provider, handle.model_name).delete(handle.provider, handle.model_name, handle.cached_content_name)
+
+    def get_or_register(self, scope_key: str, provider: str, model_name: str, system_text: str, context_text: str) -> Optional[ContextCacheHandle]:
+        """プレフィックスを登録（既存なら再利用）してハンドルを返す。キャッシュ対象外の場合は None。
+        プロバイダAPIを呼ぶ可能性があるため、非同期コードからは asyncio.to_thread 経由で呼ぶこと。"""
+        if len(system_text) + len(context_text) < self.min_prefix_chars:
+            return None
+
+        prefix_hash = hashlib.sha256(f"{system_text}\0{context_text}".encode("utf-8")).hexdigest()
+        key = (scope_key, provider, extract_model_name(model_name), prefix_hash)
+        expired: List[ContextCacheHandle] = []
+
+        # 同一キーの作成中は完了を待ち、作成済みハンドルを共有する（初回同時リクエストでの重複作成防止）
+        while True:
+            now = time.time()
+            with self._lock:
+                handle = self._entries.get(key)
+                if handle and handle.expires_at > now:
+                    handle.hits += 1
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return handle
+                in_flight = self._creating.get(key)
+                if in_flight is None:
+                    if handle:
+                        expired.append(self._entries.pop(key))
+                    self.misses += 1
+                    in_flight = threading.Event()
+                    self._creating[key] = in_flight
+                    break
+            if not in_flight.wait(timeout=self.creation_wait_seconds):
+                # 作成が長引いている場合は待たずにキャッシュなしで送信させる
+                return None
+
+        try:
+            for old in expired:
+                self._release(old)
+            return self._create_and_store(key, scope_key, provider, model_name, prefix_hash, system_text, context_text, now)
+        finally:
+            with self._lock:
+                self._creating.pop(key, None)
+            in_flight.set()
+
+    def _create_and_store(
+        self,
+        key: tuple,
+        scope_key: str,
+        provider: str,
+        model_name: str,
+        prefix_hash: str,
+        system_text: str,
+        context_text: str,
+        now: float,
+    ) -> ContextCacheHandle:
+        """プロバイダ側キャッシュを作成してレジストリに登録する（呼び出し元がキーの作成権を持つこと）"""
+        backend = self._backend_for(provider, model_name)
+        try:
+            cached_content_name = backend.create(provider, model_name, system_text, context_text, self.ttl_seconds)
+        except Exception as e:
+            print(f"[context_cache] Provider cache creation failed for {scope_key} ({provider}::{model_name}), using local handle: {e}")
+            cached_content_name = None
+
+        handle = ContextCacheHandle(
+            scope_key=scope_key,
+            provider=provider,
+            model_name=extract_model_name(model_name),
+            prefix_hash=prefix_hash,
+            cached_content_name=cached_content_name,
+            # プロバイダ側の期限切れ直前に使わないよう少し早めに失効させる
+            expires_at=now + max(self.ttl_seconds - 60, 1),
+        )
+
+        evicted: List[ContextCacheHandle] = []
+        with self._lock:
+            self._entries[key] = handle
+            for k in [k for k, h in self._entries.items() if h.expires_at <= now]:
+                evicted.append(self._entries.pop(k))
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for old in evicted:
+            self._release(old)
+        return handle
+
+    def invalidate(self, scope_key: str) -> None:
+        """スコープ（例: 論文）に紐づく全エントリを破棄する"""
+        with self._lock:
+            removed = [self._entries.pop(k) for k in [k for k in self._entries if k[0] == scope_key]]
+        for old in removed:
+            self._release(old)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
+
+
+_context_cache_instance: Optional[ContextCache] = None
+_context_cache_lock = threading.Lock()
+
+
+def get_context_cache() -> Optional[ContextCache]:
+    """設定に従ったプロセス共通の ContextCache を返す。backend: disabled の場合は None。"""
+    global _context_cache_instance
+    cfg = get_context_cache_config()
+    if cfg.get("backend") == "disabled":
+        return None
+    if _context_cache_instance is None:
+        with _context_cache_lock:
+            if _context_cache_instance is None:
+                remote_backend = GoogleGenAIContextCacheBackend() if cfg.get("backend") == "auto" else None
+                _context_cache_instance = ContextCache(
+                    remote_backend=remote_backend,
+                    ttl_seconds=int(cfg.get("ttl_seconds", 3600)),
+                    max_entries=int(cfg.get("max_entries", 128)),
+                    min_prefix_chars=int(cfg.get("min_prefix_chars", 8000)),
+                )
+    return _context_cache_instance
+
+
+async def ainvoke_with_context_cache(
+    llm,
+    provider: str,
+    model_name: str,
+    scope_key: str,
+    system_message: SystemMessage,
+    context_text: str,
+    messages: List[BaseMessage],
+    stream_channel: Optional[str] = None,
+    turn_context_text: Optional[str] = None,
+):
+    """長いプレフィックス（システムプロンプト + 論文コンテキスト）をキャッシュして LLM を呼び出す。
+
+    プロバイダ側キャッシュが使える場合は messages のみを送信し、使えない場合や失敗した場合は
+    [system_message, context, *messages] を従来通り送信する。
+    turn_context_text（質問ごとに変わる抜粋など）はキャッシュ対象に含めず、プレフィックスの直後に毎回送信する。
+    stream_channel を指定した場合は astream で実行し、トークンを stream_hub に publish する。
+    """
+    from routers.module.stream_hub import astream_and_publish
+
+    async def _run(runnable, input_messages):
+        if stream_channel:
+            return await astream_and_publish(runnable, input_messages, stream_channel)
+        return await runnable.ainvoke(input_messages)
+
+    turn_messages: List[BaseMessage] = [AIMessage(content=turn_context_text)] if turn_context_text else []
+    system_text = system_message.content if isinstance(system_message.content, str) else str(system_message.content)
+    cache = get_context_cache()
+    handle = None
+    if cache is not None:
+        try:
+            handle = await asyncio.to_thread(cache.get_or_register, scope_key, provider, model_name, system_text, context_text)
+        except Exception as e:
+            print(f"[context_cache] Cache registration error for {scope_key}: {e}")
+
+    if handle is not None and handle.is_remote:
+        try:
+            return await _run(llm.bind(cached_content=handle.cached_content_name), [*turn_messages, *messages])
+        except Exception as e:
+            print(f"[context_cache] Cached invocation failed for {scope_key}, retrying without cache: {e}")
+            cache.invalidate(scope_key)
+
+    return await _run(llm, [system_message, AIMessage(content=context_text), *turn_messages, *messages])
+
 ##############################################################################
 # エスケープ処理: { と } をすべて {{ と }} に
 ##############################################################################
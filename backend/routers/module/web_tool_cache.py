@@ -0,0 +1,285 @@
+# backend/routers/module/web_tool_cache.py
+"""
+Web 検索・抽出ツール（Tavily）の結果キャッシュ
+
+Simple RAG / DeepResearch / DeepRAG のエージェントは、同じ実行内や同じユーザーの別セッションで
+同一のクエリ検索や同一 URL の抽出を繰り返すことが多い。cached_web_tool でツールを包むと、
+正規化したクエリ・URL と引数をキーに結果を保持し、同じ呼び出しにはネットワークアクセスなしで応答する。
+
+- プロセス内は TTL 付きの LRU（max_entries 件を超えたら最も古く使われたものから破棄）
+- persist_to_db を有効にすると webtoolcache テーブルにも保存し、再起動後やインスタンス間で共有する
+- エラー応答・部分的に失敗した抽出結果はキャッシュしない
+- ツール名ごとのヒット率は get_web_tool_cache_metrics で取得できる
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import pathlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import yaml
+from langchain_core.tools import BaseTool
+from sqlalchemy import delete
+from sqlmodel import Session
+
+from db import engine
+from models import WebToolCache
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_web_tool_cache_config() -> dict:
+    """config.yaml から Web ツール結果キャッシュの設定を取得する"""
+    cfg_path = pathlib.Path(__file__).parent.parent.parent / "config.yaml"
+    cfg = yaml.safe_load(cfg_path.read_text(encoding="utf-8")) or {}
+    cache_cfg = cfg.get("web_tool_cache", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合のフォールバック）
+    defaults = {
+        "enabled": True,
+        "max_entries": 512,               # プロセス内に保持する結果の最大件数
+        "search_ttl_seconds": 21600,      # 検索結果の有効期間（6時間）
+        "extract_ttl_seconds": 86400,     # ページ抽出結果の有効期間（24時間）
+        "persist_to_db": False,           # webtoolcache テーブルにも保存する
+        "db_purge_interval_seconds": 3600,
+    }
+    return {**defaults, **cache_cfg}
+
+
+# キャッシュキーに含めるツール側の設定（同じクエリでも件数や検索深度が違えば別の結果になる）
+_TOOL_FINGERPRINT_ATTRS = (
+    "max_results", "topic", "search_depth", "include_answer", "include_raw_content",
+    "include_images", "time_range", "extract_depth", "format",
+)
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(str(query).split()).casefold()
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(str(url).strip())
+    path = parts.path.rstrip("/") if parts.path not in ("", "/") else ""
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def _normalize_value(key: str, value: Any) -> Any:
+    if key == "query" and isinstance(value, str):
+        return _normalize_query(value)
+    if key == "urls":
+        urls = [value] if isinstance(value, str) else list(value or [])
+        return sorted({_normalize_url(u) for u in urls})
+    if isinstance(value, (list, tuple, set)):
+        return sorted(str(v).strip().lower() for v in value)
+    return value
+
+
+def web_tool_cache_key(tool: BaseTool, tool_input: Dict[str, Any]) -> str:
+    fingerprint = {attr: getattr(tool, attr, None) for attr in _TOOL_FINGERPRINT_ATTRS if getattr(tool, attr, None) is not None}
+    normalized = {k: _normalize_value(k, v) for k, v in tool_input.items() if v is not None}
+    raw = json.dumps({"tool": tool.name, "config": fingerprint, "input": normalized}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _is_cacheable(result: Any) -> bool:
+    if not isinstance(result, dict) or "error" in result:
+        return False
+    if result.get("failed_results"):
+        return False
+    return bool(result.get("results"))
+
+
+# -----------------------------------------------------------------
+#                      キャッシュ本体
+# -----------------------------------------------------------------
+
+class WebToolResultCache:
+    """TTL 付き LRU（プロセス内）と、任意の DB 永続化"""
+
+    def __init__(self, max_entries: int, persist_to_db: bool, db_purge_interval_seconds: float):
+        self.max_entries = max_entries
+        self.persist_to_db = persist_to_db
+        self.db_purge_interval_seconds = db_purge_interval_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_db_purge = 0.0
+        self._metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, tool_name: str, name: str) -> None:
+        with self._lock:
+            self._metrics[tool_name][name] += 1
+
+    def get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put_memory(self, key: str, result: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl_seconds, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_db(self, key: str) -> Optional[Tuple[Any, float]]:
+        """DB から有効な結果を読む。(結果, 残りTTL秒) を返す"""
+        try:
+            with Session(engine) as db:
+                row = db.get(WebToolCache, key)
+                if row is None:
+                    return None
+                remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+                if remaining <= 0:
+                    return None
+                return json.loads(row.result_json), remaining
+        except Exception as e:
+            logger.warning("DB lookup failed: %s", e)
+            return None
+
+    def put_db(self, key: str, tool_name: str, result: Any, ttl_seconds: float) -> None:
+        try:
+            now = datetime.utcnow()
+            with Session(engine) as db:
+                db.merge(WebToolCache(
+                    cache_key=key,
+                    tool_name=tool_name,
+                    result_json=json.dumps(result, ensure_ascii=False, default=str),
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=ttl_seconds),
+                ))
+                if time.monotonic() - self._last_db_purge >= self.db_purge_interval_seconds:
+                    self._last_db_purge = time.monotonic()
+                    db.exec(delete(WebToolCache).where(WebToolCache.expires_at <= now))
+                db.commit()
+        except Exception as e:
+            logger.warning("DB store failed: %s", e)
+
+    def lookup(self, tool_name: str, key: str) -> Optional[Any]:
+        result = self.get_memory(key)
+        if result is not None:
+            self._count(tool_name, "hits")
+            return result
+        if self.persist_to_db:
+            found = self.get_db(key)
+            if found is not None:
+                result, remaining = found
+                self.put_memory(key, result, remaining)
+                self._count(tool_name, "db_hits")
+                return result
+        self._count(tool_name, "misses")
+        return None
+
+    def store(self, tool_name: str, key: str, result: Any, ttl_seconds: float) -> None:
+        if not _is_cacheable(result):
+            self._count(tool_name, "uncacheable")
+            return
+        self.put_memory(key, result, ttl_seconds)
+        if self.persist_to_db:
+            self.put_db(key, tool_name, result, ttl_seconds)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            snapshot = {tool: dict(counts) for tool, counts in self._metrics.items()}
+            entries = len(self._entries)
+        for counts in snapshot.values():
+            lookups = counts.get("hits", 0) + counts.get("db_hits", 0) + counts.get("misses", 0)
+            counts["hit_ratio"] = round((counts.get("hits", 0) + counts.get("db_hits", 0)) / lookups, 4) if lookups else 0.0
+        snapshot["_cache"] = {"entries": entries, "max_entries": self.max_entries}
+        return snapshot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._metrics.clear()
+
+
+_cache: Optional[WebToolResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_web_tool_cache() -> WebToolResultCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cfg = get_web_tool_cache_config()
+            _cache = WebToolResultCache(
+                max_entries=int(cfg["max_entries"]),
+                persist_to_db=bool(cfg["persist_to_db"]),
+                db_purge_interval_seconds=float(cfg["db_purge_interval_seconds"]),
+            )
+        return _cache
+
+
+def get_web_tool_cache_metrics() -> Dict[str, Dict[str, Any]]:
+    """ツール名ごとの {hits, db_hits, misses, uncacheable, hit_ratio} とキャッシュ件数を返す"""
+    return get_web_tool_cache().metrics()
+
+
+# -----------------------------------------------------------------
+#                      ツールのラッパー
+# -----------------------------------------------------------------
+
+class CachedWebTool(BaseTool):
+    """ツールの名前・説明・引数スキーマをそのまま引き継ぎ、結果をキャッシュする"""
+
+    inner: BaseTool
+    ttl_seconds: float
+
+    def _run(self, *args: Any, run_manager: Any = None, **kwargs: Any) -> Any:
+        cache = get_web_tool_cache()
+        key = web_tool_cache_key(self.inner, kwargs)
+        cached = cache.lookup(self.name, key)
+        if cached is not None:
+            return cached
+        callbacks = run_manager.get_child() if run_manager else None
+        result = self.inner.invoke(kwargs, config={"callbacks": callbacks})
+        cache.store(self.name, key, result, self.ttl_seconds)
+        return result
+
+    async def _arun(self, *args: Any, run_manager: Any = None, **kwargs: Any) -> Any:
+        cache = get_web_tool_cache()
+        key = web_tool_cache_key(self.inner, kwargs)
+        cached = await asyncio.to_thread(cache.lookup, self.name, key)
+        if cached is not None:
+            return cached
+        callbacks = run_manager.get_child() if run_manager else None
+        result = await self.inner.ainvoke(kwargs, config={"callbacks": callbacks})
+        await asyncio.to_thread(cache.store, self.name, key, result, self.ttl_seconds)
+        return result
+
+
+def cached_web_tool(tool: BaseTool, kind: str) -> BaseTool:
+    """Web ツールをキャッシュ付きで包む。無効化されている場合は元のツールを返す。
+
+    Args:
+        tool: TavilySearch / TavilyExtract などのツール
+        kind: "search" または "extract"（TTL の選択に使う）
+    """
+    cfg = get_web_tool_cache_config()
+    if not cfg["enabled"]:
+        return tool
+    return CachedWebTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        return_direct=tool.return_direct,
+        handle_tool_error=tool.handle_tool_error,
+        response_format=tool.response_format,
+        inner=tool,
+        ttl_seconds=float(cfg["extract_ttl_seconds"] if kind == "extract" else cfg["search_ttl_seconds"]),
+    )
@@ -8,7 +8,7 @@ from sqlalchemy import and_, or_, not_, exists, text
 from sqlalchemy.sql.expression import BooleanClauseList
 from pydantic import BaseModel # BaseModel をインポート
 
-from db import get_session, engine
+from db import get_session, engine, async_session_scope
 from schemas import (
     PaperResponse, UserPaperLinkUpdate, PaperImportResponse,
     PaperCreateAuto, HFImportRequest, ArxivMeta, FullTextResponse,
@@ -25,8 +25,10 @@ from schemas import (
     MultipleSummaryRequest, MultipleSummaryResponse, SummaryResult, TagsExistenceRequest, TagsExistenceResponse
 )
 import yaml, pathlib, functools
+import logging
 import re
-import arxiv
+from routers.module.lazy_import import lazy_attr, lazy_module, register_warmup
+arxiv = lazy_module("arxiv")
 import json
 import asyncio
 import time
@@ -41,7 +43,7 @@ from models import (
 )
 from auth_utils import get_current_active_user
 
-from .module.util import initialize_llm, CONFIG as GLOBAL_LLM_CONFIG
+from .module.util import initialize_llm, ainvoke_with_context_cache, CONFIG as GLOBAL_LLM_CONFIG
 from .module.prompt_manager import (
     get_paper_chat_system_prompt,
     get_paper_chat_system_prompt_with_character, # キャラクタープロンプト付き関数を追加
@@ -59,7 +61,12 @@ import os
 import numpy as np
 from typing import List, Optional, Dict, Any, Tuple, Union
 from routers.module.embeddings import EMBED
-from sklearn.metrics.pairwise import cosine_similarity
+from routers.module.paper_chunk_index import build_paper_chat_context
+from routers.module.stream_hub import stream_hub
+from routers.module.tracing import wrap_with_context
+cosine_similarity = lazy_attr("sklearn.metrics.pairwise", "cosine_similarity")
+
+logger = logging.getLogger(__name__)
 
 from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
 # BaseModel は pydantic から直接インポートするので、Field は不要なら削除
@@ -127,13 +134,20 @@ def get_specialized_llm_config(llm_type: str) -> dict:
 
 # チャット用LLM設定もconfig.yamlから読み込み
 _chat_config = get_specialized_llm_config("tag_generation")  # タグ生成と同じ設定を使用
-chat_llm = initialize_llm(
-    name=_chat_config["provider"],
-    model_name=_chat_config["model_name"],
-    temperature=0.0,
-    top_p=0.0,
-    llm_max_retries=3,
-)
+
+# VertexAI の場合は google.auth.default() を伴うため、import 時ではなく最初のチャットで生成する
+@functools.lru_cache(maxsize=1)
+def get_chat_llm():
+    return initialize_llm(
+        name=_chat_config["provider"],
+        model_name=_chat_config["model_name"],
+        temperature=0.0,
+        top_p=0.0,
+        llm_max_retries=3,
+    )
+
+
+register_warmup(get_chat_llm)
 
 
 # system_promptの動的取得関数
@@ -900,7 +914,7 @@ async def _execute_default_summary_generation(
         print(f"要約生成を開始します...")
         # デフォルト処理専用のSummarizerLLMを作成（force_default_prompt=True）
         default_summarizer = SummarizerLLM(llm_config=llm_config, db_session=session, user_id=user_id, force_default_prompt=True)
-        to_llm = f"Title:{paper_meta.title}\n\nAbstract:{paper_meta.abstract}\n\nBody:{paper_meta.full_text[:100000]}"
+        to_llm = f"Title:{paper_meta.title}\n\nAbstract:{paper_meta.abstract}\n\nBody:{paper_meta.full_text}"
         llm_abst_raw, llm_info = await default_summarizer.produce_summary(to_llm)
         llm_abst_generated = llm_abst_raw.replace("```markdown", "").replace("```", "").strip()
         one_point_generated = extract_summary_section(llm_abst_generated)
@@ -1206,7 +1220,7 @@ async def _execute_custom_summary_generation_new(
     print(f"[INFO] カスタムプロンプトでデュアル要約を生成中...")
     
     # 論文のテキストを準備
-    to_llm = f"Title:{paper_meta.title}\n\nAbstract:{paper_meta.abstract}\n\nBody:{paper_meta.full_text[:100000]}"
+    to_llm = f"Title:{paper_meta.title}\n\nAbstract:{paper_meta.abstract}\n\nBody:{paper_meta.full_text}"
     
     try:
         # 部分的重複を考慮した要約生成
@@ -1536,85 +1550,90 @@ async def _create_and_store_dual_summaries(
     summary_llm_provider = llm_config.get("llm_name", default_config["provider"])
     summary_llm_model_name = llm_config.get("llm_model_name", default_config["model_name"])
     
-    # 重複チェック: キャラクターなし要約
-    existing_summary_without_char = None
-    existing_summary_with_char = None
     force_generation = False  # タイムアウト後の強制生成フラグ
     
-    if system_prompt_id:
-        # カスタムプロンプトの場合
-        existing_summary_without_char = _check_summary_duplication_for_custom(
-            session, user_id, paper_meta.id, system_prompt_id,
-            summary_llm_provider, summary_llm_model_name, None, affinity_level
-        )
-        
-        # SummarizerLLMインスタンスを作成
-        summarizer = SummarizerLLM(
-            llm_config=llm_config, 
-            db_session=session, 
-            user_id=user_id, 
-            force_default_prompt=force_default_prompt,
-            system_prompt_id=system_prompt_id
-        )
-        
-        # ユーザーが選択したキャラクターを取得
+    def _load_existing_summaries():
+        # 既存要約の重複チェックとユーザーのキャラクター取得（同期 Session を使うためスレッドで実行する）
+        existing_summary_without_char = None
+        existing_summary_with_char = None
         character_role = None
-        try:
-            from models import User
-            from sqlmodel import select
-            user = session.exec(select(User).where(User.id == user_id)).first()
-            if user and user.selected_character:
-                character_role = user.selected_character
-                print(f"[INFO] ユーザー選択キャラクター: {character_role}")
-            else:
-                # 新規ユーザーの場合、デフォルトキャラクターを設定
-                character_role = "sakura"  # デフォルトキャラクター
-                print(f"[INFO] デフォルトキャラクターを使用: {character_role}")
-        except Exception as e:
-            print(f"[ERROR] ユーザーキャラクター取得エラー: {e}")
-            character_role = "sakura"  # エラー時もデフォルトキャラクター
-        
-        if character_role:
-            existing_summary_with_char = _check_summary_duplication_for_custom(
+        if system_prompt_id:
+            # カスタムプロンプトの場合
+            existing_summary_without_char = _check_summary_duplication_for_custom(
                 session, user_id, paper_meta.id, system_prompt_id,
-                summary_llm_provider, summary_llm_model_name, character_role, affinity_level
+                summary_llm_provider, summary_llm_model_name, None, affinity_level
             )
-    else:
-        # デフォルトプロンプトの場合
-        existing_summary_without_char = _check_summary_duplication_for_default(
-            session, paper_meta.id, summary_llm_provider, summary_llm_model_name, None, affinity_level
-        )
         
-        # SummarizerLLMインスタンスを作成
-        summarizer = SummarizerLLM(
-            llm_config=llm_config, 
-            db_session=session, 
-            user_id=user_id, 
-            force_default_prompt=force_default_prompt,
-            system_prompt_id=system_prompt_id
-        )
+            # SummarizerLLMインスタンスを作成
+            summarizer = SummarizerLLM(
+                llm_config=llm_config, 
+                db_session=session, 
+                user_id=user_id, 
+                force_default_prompt=force_default_prompt,
+                system_prompt_id=system_prompt_id
+            )
         
-        # ユーザーが選択したキャラクターを取得
-        character_role = None
-        try:
-            from models import User
-            from sqlmodel import select
-            user = session.exec(select(User).where(User.id == user_id)).first()
-            if user and user.selected_character:
-                character_role = user.selected_character
-                print(f"[INFO] ユーザー選択キャラクター: {character_role}")
-            else:
-                # 新規ユーザーの場合、デフォルトキャラクターを設定
-                character_role = "sakura"  # デフォルトキャラクター
-                print(f"[INFO] デフォルトキャラクターを使用: {character_role}")
-        except Exception as e:
-            print(f"[ERROR] ユーザーキャラクター取得エラー: {e}")
-            character_role = "sakura"  # エラー時もデフォルトキャラクター
+            # ユーザーが選択したキャラクターを取得
+            character_role = None
+            try:
+                from models import User
+                from sqlmodel import select
+                user = session.exec(select(User).where(User.id == user_id)).first()
+                if user and user.selected_character:
+                    character_role = user.selected_character
+                    print(f"[INFO] ユーザー選択キャラクター: {character_role}")
+                else:
+                    # 新規ユーザーの場合、デフォルトキャラクターを設定
+                    character_role = "sakura"  # デフォルトキャラクター
+                    print(f"[INFO] デフォルトキャラクターを使用: {character_role}")
+            except Exception as e:
+                print(f"[ERROR] ユーザーキャラクター取得エラー: {e}")
+                character_role = "sakura"  # エラー時もデフォルトキャラクター
         
-        if character_role:
-            existing_summary_with_char = _check_summary_duplication_for_default(
-                session, paper_meta.id, summary_llm_provider, summary_llm_model_name, character_role, affinity_level
+            if character_role:
+                existing_summary_with_char = _check_summary_duplication_for_custom(
+                    session, user_id, paper_meta.id, system_prompt_id,
+                    summary_llm_provider, summary_llm_model_name, character_role, affinity_level
+                )
+        else:
+            # デフォルトプロンプトの場合
+            existing_summary_without_char = _check_summary_duplication_for_default(
+                session, paper_meta.id, summary_llm_provider, summary_llm_model_name, None, affinity_level
             )
+        
+            # SummarizerLLMインスタンスを作成
+            summarizer = SummarizerLLM(
+                llm_config=llm_config, 
+                db_session=session, 
+                user_id=user_id, 
+                force_default_prompt=force_default_prompt,
+                system_prompt_id=system_prompt_id
+            )
+        
+            # ユーザーが選択したキャラクターを取得
+            character_role = None
+            try:
+                from models import User
+                from sqlmodel import select
+                user = session.exec(select(User).where(User.id == user_id)).first()
+                if user and user.selected_character:
+                    character_role = user.selected_character
+                    print(f"[INFO] ユーザー選択キャラクター: {character_role}")
+                else:
+                    # 新規ユーザーの場合、デフォルトキャラクターを設定
+                    character_role = "sakura"  # デフォルトキャラクター
+                    print(f"[INFO] デフォルトキャラクターを使用: {character_role}")
+            except Exception as e:
+                print(f"[ERROR] ユーザーキャラクター取得エラー: {e}")
+                character_role = "sakura"  # エラー時もデフォルトキャラクター
+        
+            if character_role:
+                existing_summary_with_char = _check_summary_duplication_for_default(
+                    session, paper_meta.id, summary_llm_provider, summary_llm_model_name, character_role, affinity_level
+                )
+        return summarizer, character_role, existing_summary_without_char, existing_summary_with_char
+
+    summarizer, character_role, existing_summary_without_char, existing_summary_with_char = await asyncio.to_thread(_load_existing_summaries)
     
     # 両方の要約が既に存在する場合の処理
     if existing_summary_without_char and existing_summary_with_char:
@@ -1882,7 +1901,7 @@ async def _create_and_store_dual_summaries(
             return existing_summary_without_char, None
     
     # 論文のテキストを準備
-    to_llm = f"Title:{paper_meta.title}\n\nAbstract:{paper_meta.abstract}\n\nBody:{paper_meta.full_text[:100000]}"
+    to_llm = f"Title:{paper_meta.title}\n\nAbstract:{paper_meta.abstract}\n\nBody:{paper_meta.full_text}"
     
     try:
         # 部分的重複を考慮した要約生成
@@ -2046,260 +2065,269 @@ async def _create_and_store_dual_summaries(
             print(f"[INFO] 全ての要約が既存のため、生成をスキップしました")
             return generated_summary, custom_summary
         
-        # キャラクターなしの要約を処理
-        if summary_without_char and need_without_char:
-            print(f"[INFO] キャラクターなし要約を保存中...")
-            llm_abst_generated = summary_without_char.replace("```markdown", "").replace("```", "").strip()
-            one_point_generated = extract_summary_section(llm_abst_generated)
+        def _store_generated_summaries():
+            # 生成した要約の保存（同期 Session を使うため、イベントループを止めないようスレッドで実行する）
+            nonlocal generated_summary, custom_summary
+            # キャラクターなしの要約を処理
+            if summary_without_char and need_without_char:
+                print(f"[INFO] キャラクターなし要約を保存中...")
+                llm_abst_generated = summary_without_char.replace("```markdown", "").replace("```", "").strip()
+                one_point_generated = extract_summary_section(llm_abst_generated)
             
-            # UPSERT処理
+                # UPSERT処理
             
-            current_time = datetime.utcnow()
+                current_time = datetime.utcnow()
             
-            if system_prompt_id:
-                # カスタムプロンプト使用時：CustomGeneratedSummaryテーブルに保存
-                # タイムアウト後の強制生成時は元のLLM情報を使用
-                if force_generation:
-                    llm_provider_to_use = summary_llm_provider
-                    llm_model_to_use = summary_llm_model_name
-                    char_role_for_query = None  # 元のNULL値を使用
-                    print(f"[DEBUG] 強制生成モード（カスタム）のため元のLLM情報を使用: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
-                else:
-                    llm_provider_to_use = llm_info_without["provider"]
-                    llm_model_to_use = llm_info_without["model_name"]
-                    char_role_for_query = None  # キャラクターなし
-                    print(f"[DEBUG] 通常モード（カスタム）のLLM情報: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
+                if system_prompt_id:
+                    # カスタムプロンプト使用時：CustomGeneratedSummaryテーブルに保存
+                    # タイムアウト後の強制生成時は元のLLM情報を使用
+                    if force_generation:
+                        llm_provider_to_use = summary_llm_provider
+                        llm_model_to_use = summary_llm_model_name
+                        char_role_for_query = None  # 元のNULL値を使用
+                        print(f"[DEBUG] 強制生成モード（カスタム）のため元のLLM情報を使用: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
+                    else:
+                        llm_provider_to_use = llm_info_without["provider"]
+                        llm_model_to_use = llm_info_without["model_name"]
+                        char_role_for_query = None  # キャラクターなし
+                        print(f"[DEBUG] 通常モード（カスタム）のLLM情報: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
                 
-                # まず既存レコードをチェック
-                existing_custom_record = session.exec(
-                    select(CustomGeneratedSummary).where(
-                        CustomGeneratedSummary.user_id == user_id,
-                        CustomGeneratedSummary.paper_metadata_id == paper_meta.id,
-                        CustomGeneratedSummary.system_prompt_id == system_prompt_id,
-                        CustomGeneratedSummary.llm_provider == llm_provider_to_use,
-                        CustomGeneratedSummary.llm_model_name == llm_model_to_use,
-                        CustomGeneratedSummary.character_role.is_(char_role_for_query),
-                        CustomGeneratedSummary.affinity_level == affinity_level
-                    )
-                ).first()
+                    # まず既存レコードをチェック
+                    existing_custom_record = session.exec(
+                        select(CustomGeneratedSummary).where(
+                            CustomGeneratedSummary.user_id == user_id,
+                            CustomGeneratedSummary.paper_metadata_id == paper_meta.id,
+                            CustomGeneratedSummary.system_prompt_id == system_prompt_id,
+                            CustomGeneratedSummary.llm_provider == llm_provider_to_use,
+                            CustomGeneratedSummary.llm_model_name == llm_model_to_use,
+                            CustomGeneratedSummary.character_role.is_(char_role_for_query),
+                            CustomGeneratedSummary.affinity_level == affinity_level
+                        )
+                    ).first()
                 
-                if existing_custom_record:
-                    # 既存レコードを更新
-                    existing_custom_record.llm_abst = remove_nul_chars(llm_abst_generated)
-                    existing_custom_record.one_point = remove_nul_chars(one_point_generated)
-                    existing_custom_record.updated_at = current_time
-                    session.add(existing_custom_record)
-                    session.flush()
-                    custom_summary_id = existing_custom_record.id
-                    print(f"[INFO] 既存のCustomGeneratedSummaryレコード（キャラクターなし）を更新しました（ID: {custom_summary_id}）")
-                else:
-                    # 新規レコードを挿入
-                    new_custom_record = CustomGeneratedSummary(
-                        user_id=user_id,
-                        paper_metadata_id=paper_meta.id,
-                        system_prompt_id=system_prompt_id,
-                        llm_provider=llm_provider_to_use,
-                        llm_model_name=llm_model_to_use,
-                        llm_abst=remove_nul_chars(llm_abst_generated),
-                        one_point=remove_nul_chars(one_point_generated),
-                        character_role=char_role_for_query,
-                        affinity_level=affinity_level,
-                        created_at=current_time,
-                        updated_at=current_time
-                    )
-                    session.add(new_custom_record)
-                    session.flush()
-                    custom_summary_id = new_custom_record.id
-                    print(f"[INFO] 新規CustomGeneratedSummaryレコード（キャラクターなし）を作成しました（ID: {custom_summary_id}）")
-            else:
-                # デフォルトプロンプト使用時：GeneratedSummaryテーブルに保存
-                # タイムアウト後の強制生成時は元のLLM情報を使用
-                if force_generation:
-                    llm_provider_to_use = summary_llm_provider
-                    llm_model_to_use = summary_llm_model_name
-                    char_role_for_query = None  # 元のNULL値を使用
-                    print(f"[DEBUG] 強制生成モードのため元のLLM情報を使用: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
+                    if existing_custom_record:
+                        # 既存レコードを更新
+                        existing_custom_record.llm_abst = remove_nul_chars(llm_abst_generated)
+                        existing_custom_record.one_point = remove_nul_chars(one_point_generated)
+                        existing_custom_record.updated_at = current_time
+                        session.add(existing_custom_record)
+                        session.flush()
+                        custom_summary_id = existing_custom_record.id
+                        print(f"[INFO] 既存のCustomGeneratedSummaryレコード（キャラクターなし）を更新しました（ID: {custom_summary_id}）")
+                    else:
+                        # 新規レコードを挿入
+                        new_custom_record = CustomGeneratedSummary(
+                            user_id=user_id,
+                            paper_metadata_id=paper_meta.id,
+                            system_prompt_id=system_prompt_id,
+                            llm_provider=llm_provider_to_use,
+                            llm_model_name=llm_model_to_use,
+                            llm_abst=remove_nul_chars(llm_abst_generated),
+                            one_point=remove_nul_chars(one_point_generated),
+                            character_role=char_role_for_query,
+                            affinity_level=affinity_level,
+                            created_at=current_time,
+                            updated_at=current_time
+                        )
+                        session.add(new_custom_record)
+                        session.flush()
+                        custom_summary_id = new_custom_record.id
+                        print(f"[INFO] 新規CustomGeneratedSummaryレコード（キャラクターなし）を作成しました（ID: {custom_summary_id}）")
                 else:
-                    llm_provider_to_use = llm_info_without["provider"]
-                    llm_model_to_use = llm_info_without["model_name"]
-                    char_role_for_query = None  # キャラクターなし
-                    print(f"[DEBUG] 通常モードのLLM情報: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
+                    # デフォルトプロンプト使用時：GeneratedSummaryテーブルに保存
+                    # タイムアウト後の強制生成時は元のLLM情報を使用
+                    if force_generation:
+                        llm_provider_to_use = summary_llm_provider
+                        llm_model_to_use = summary_llm_model_name
+                        char_role_for_query = None  # 元のNULL値を使用
+                        print(f"[DEBUG] 強制生成モードのため元のLLM情報を使用: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
+                    else:
+                        llm_provider_to_use = llm_info_without["provider"]
+                        llm_model_to_use = llm_info_without["model_name"]
+                        char_role_for_query = None  # キャラクターなし
+                        print(f"[DEBUG] 通常モードのLLM情報: provider='{llm_provider_to_use}', model='{llm_model_to_use}'")
                 
-                print(f"[DEBUG] その他の値: paper_id={paper_meta.id}, character_role=None, affinity={affinity_level}")
-                print(f"[DEBUG] 実際のUPSERT値: provider='{llm_provider_to_use}', model='{llm_model_to_use}', character_role=None, affinity={affinity_level}")
+                    print(f"[DEBUG] その他の値: paper_id={paper_meta.id}, character_role=None, affinity={affinity_level}")
+                    print(f"[DEBUG] 実際のUPSERT値: provider='{llm_provider_to_use}', model='{llm_model_to_use}', character_role=None, affinity={affinity_level}")
                 
-                # まず既存レコードをチェック
-                existing_record = session.exec(
-                    select(GeneratedSummary).where(
-                        GeneratedSummary.paper_metadata_id == paper_meta.id,
-                        GeneratedSummary.llm_provider == llm_provider_to_use,
-                        GeneratedSummary.llm_model_name == llm_model_to_use,
-                        GeneratedSummary.character_role.is_(char_role_for_query),
-                        GeneratedSummary.affinity_level == affinity_level
-                    )
-                ).first()
+                    # まず既存レコードをチェック
+                    existing_record = session.exec(
+                        select(GeneratedSummary).where(
+                            GeneratedSummary.paper_metadata_id == paper_meta.id,
+                            GeneratedSummary.llm_provider == llm_provider_to_use,
+                            GeneratedSummary.llm_model_name == llm_model_to_use,
+                            GeneratedSummary.character_role.is_(char_role_for_query),
+                            GeneratedSummary.affinity_level == affinity_level
+                        )
+                    ).first()
                 
-                if existing_record:
-                    # 既存レコードを更新
-                    existing_record.llm_abst = remove_nul_chars(llm_abst_generated)
-                    existing_record.one_point = remove_nul_chars(one_point_generated)
-                    existing_record.updated_at = current_time
-                    session.add(existing_record)
-                    session.flush()
-                    summary_id = existing_record.id
-                    print(f"[INFO] 既存のGeneratedSummaryレコード（キャラクターなし）を更新しました（ID: {summary_id}）")
-                else:
-                    # 新規レコードを挿入
-                    new_record = GeneratedSummary(
-                        paper_metadata_id=paper_meta.id,
-                        llm_provider=llm_provider_to_use,
-                        llm_model_name=llm_model_to_use,
-                        llm_abst=remove_nul_chars(llm_abst_generated),
-                        one_point=remove_nul_chars(one_point_generated),
-                        character_role=char_role_for_query,
-                        affinity_level=affinity_level,
-                        created_at=current_time,
-                        updated_at=current_time
-                    )
-                    session.add(new_record)
-                    session.flush()
-                    summary_id = new_record.id
-                    print(f"[INFO] 新規GeneratedSummaryレコード（キャラクターなし）を作成しました（ID: {summary_id}）")
+                    if existing_record:
+                        # 既存レコードを更新
+                        existing_record.llm_abst = remove_nul_chars(llm_abst_generated)
+                        existing_record.one_point = remove_nul_chars(one_point_generated)
+                        existing_record.updated_at = current_time
+                        session.add(existing_record)
+                        session.flush()
+                        summary_id = existing_record.id
+                        print(f"[INFO] 既存のGeneratedSummaryレコード（キャラクターなし）を更新しました（ID: {summary_id}）")
+                    else:
+                        # 新規レコードを挿入
+                        new_record = GeneratedSummary(
+                            paper_metadata_id=paper_meta.id,
+                            llm_provider=llm_provider_to_use,
+                            llm_model_name=llm_model_to_use,
+                            llm_abst=remove_nul_chars(llm_abst_generated),
+                            one_point=remove_nul_chars(one_point_generated),
+                            character_role=char_role_for_query,
+                            affinity_level=affinity_level,
+                            created_at=current_time,
+                            updated_at=current_time
+                        )
+                        session.add(new_record)
+                        session.flush()
+                        summary_id = new_record.id
+                        print(f"[INFO] 新規GeneratedSummaryレコード（キャラクターなし）を作成しました（ID: {summary_id}）")
                 
-                generated_summary = session.exec(
-                    select(GeneratedSummary).where(GeneratedSummary.id == summary_id)
-                ).first()
+                    generated_summary = session.exec(
+                        select(GeneratedSummary).where(GeneratedSummary.id == summary_id)
+                    ).first()
                 
-                print(f"[INFO] キャラクターなし要約保存完了（ID: {summary_id}）")
+                    print(f"[INFO] キャラクターなし要約保存完了（ID: {summary_id}）")
         
-        # キャラクターありの要約を処理
-        if summary_with_char and need_with_char:
-            print(f"[INFO] キャラクターあり要約を保存中...")
-            llm_abst_generated_char = summary_with_char.replace("```markdown", "").replace("```", "").strip()
-            one_point_generated_char = extract_summary_section(llm_abst_generated_char)
+            # キャラクターありの要約を処理
+            if summary_with_char and need_with_char:
+                print(f"[INFO] キャラクターあり要約を保存中...")
+                llm_abst_generated_char = summary_with_char.replace("```markdown", "").replace("```", "").strip()
+                one_point_generated_char = extract_summary_section(llm_abst_generated_char)
             
-            current_time = datetime.utcnow()
+                current_time = datetime.utcnow()
             
-            if system_prompt_id:
-                # カスタムプロンプト使用時：CustomGeneratedSummaryテーブルに保存
-                # タイムアウト後の強制生成時は元のLLM情報を使用
-                if force_generation:
-                    llm_provider_char = summary_llm_provider
-                    llm_model_char = summary_llm_model_name
-                    character_role_char = character_role
-                    print(f"[DEBUG] 強制生成モード（カスタム・キャラあり）のため元のLLM情報を使用: provider='{llm_provider_char}', model='{llm_model_char}', character='{character_role_char}'")
-                else:
-                    llm_provider_char = llm_info_with["provider"]
-                    llm_model_char = llm_info_with["model_name"]
-                    character_role_char = llm_info_with["character_role"]
-                    print(f"[DEBUG] 通常モード（カスタム・キャラあり）のLLM情報: provider='{llm_provider_char}', model='{llm_model_char}', character='{character_role_char}'")
+                if system_prompt_id:
+                    # カスタムプロンプト使用時：CustomGeneratedSummaryテーブルに保存
+                    # タイムアウト後の強制生成時は元のLLM情報を使用
+                    if force_generation:
+                        llm_provider_char = summary_llm_provider
+                        llm_model_char = summary_llm_model_name
+                        character_role_char = character_role
+                        print(f"[DEBUG] 強制生成モード（カスタム・キャラあり）のため元のLLM情報を使用: provider='{llm_provider_char}', model='{llm_model_char}', character='{character_role_char}'")
+                    else:
+                        llm_provider_char = llm_info_with["provider"]
+                        llm_model_char = llm_info_with["model_name"]
+                        character_role_char = llm_info_with["character_role"]
+                        print(f"[DEBUG] 通常モード（カスタム・キャラあり）のLLM情報: provider='{llm_provider_char}', model='{llm_model_char}', character='{character_role_char}'")
                 
-                # まず既存レコードをチェック
-                existing_custom_char_record = session.exec(
-                    select(CustomGeneratedSummary).where(
-                        CustomGeneratedSummary.user_id == user_id,
-                        CustomGeneratedSummary.paper_metadata_id == paper_meta.id,
-                        CustomGeneratedSummary.system_prompt_id == system_prompt_id,
-                        CustomGeneratedSummary.llm_provider == llm_provider_char,
-                        CustomGeneratedSummary.llm_model_name == llm_model_char,
-                        CustomGeneratedSummary.character_role == character_role_char,
-                        CustomGeneratedSummary.affinity_level == affinity_level
-                    )
-                ).first()
+                    # まず既存レコードをチェック
+                    existing_custom_char_record = session.exec(
+                        select(CustomGeneratedSummary).where(
+                            CustomGeneratedSummary.user_id == user_id,
+                            CustomGeneratedSummary.paper_metadata_id == paper_meta.id,
+                            CustomGeneratedSummary.system_prompt_id == system_prompt_id,
+                            CustomGeneratedSummary.llm_provider == llm_provider_char,
+                            CustomGeneratedSummary.llm_model_name == llm_model_char,
+                            CustomGeneratedSummary.character_role == character_role_char,
+                            CustomGeneratedSummary.affinity_level == affinity_level
+                        )
+                    ).first()
                 
-                if existing_custom_char_record:
-                    # 既存レコードを更新
-                    existing_custom_char_record.llm_abst = remove_nul_chars(llm_abst_generated_char)
-                    existing_custom_char_record.one_point = remove_nul_chars(one_point_generated_char)
-                    existing_custom_char_record.updated_at = current_time
-                    session.add(existing_custom_char_record)
-                    session.flush()
-                    custom_summary_id = existing_custom_char_record.id
-                    print(f"[INFO] 既存のCustomGeneratedSummaryレコード（キャラクターあり）を更新しました（ID: {custom_summary_id}）")
-                else:
-                    # 新規レコードを挿入
-                    new_custom_char_record = CustomGeneratedSummary(
-                        user_id=user_id,
-                        paper_metadata_id=paper_meta.id,
-                        system_prompt_id=system_prompt_id,
-                        llm_provider=llm_provider_char,
-                        llm_model_name=llm_model_char,
-                        llm_abst=remove_nul_chars(llm_abst_generated_char),
-                        one_point=remove_nul_chars(one_point_generated_char),
-                        character_role=character_role_char,
-                        affinity_level=affinity_level,
-                        created_at=current_time,
-                        updated_at=current_time
-                    )
-                    session.add(new_custom_char_record)
-                    session.flush()
-                    custom_summary_id = new_custom_char_record.id
-                    print(f"[INFO] 新規CustomGeneratedSummaryレコード（キャラクターあり）を作成しました（ID: {custom_summary_id}）")
+                    if existing_custom_char_record:
+                        # 既存レコードを更新
+                        existing_custom_char_record.llm_abst = remove_nul_chars(llm_abst_generated_char)
+                        existing_custom_char_record.one_point = remove_nul_chars(one_point_generated_char)
+                        existing_custom_char_record.updated_at = current_time
+                        session.add(existing_custom_char_record)
+                        session.flush()
+                        custom_summary_id = existing_custom_char_record.id
+                        print(f"[INFO] 既存のCustomGeneratedSummaryレコード（キャラクターあり）を更新しました（ID: {custom_summary_id}）")
+                    else:
+                        # 新規レコードを挿入
+                        new_custom_char_record = CustomGeneratedSummary(
+                            user_id=user_id,
+                            paper_metadata_id=paper_meta.id,
+                            system_prompt_id=system_prompt_id,
+                            llm_provider=llm_provider_char,
+                            llm_model_name=llm_model_char,
+                            llm_abst=remove_nul_chars(llm_abst_generated_char),
+                            one_point=remove_nul_chars(one_point_generated_char),
+                            character_role=character_role_char,
+                            affinity_level=affinity_level,
+                            created_at=current_time,
+                            updated_at=current_time
+                        )
+                        session.add(new_custom_char_record)
+                        session.flush()
+                        custom_summary_id = new_custom_char_record.id
+                        print(f"[INFO] 新規CustomGeneratedSummaryレコード（キャラクターあり）を作成しました（ID: {custom_summary_id}）")
                 
-                custom_summary = session.exec(
-                    select(CustomGeneratedSummary).where(CustomGeneratedSummary.id == custom_summary_id)
-                ).first()
+                    custom_summary = session.exec(
+                        select(CustomGeneratedSummary).where(CustomGeneratedSummary.id == custom_summary_id)
+                    ).first()
                 
-                print(f"[INFO] キャラクターありカスタム要約保存完了（ID: {custom_summary_id}）")
-            else:
-                # デフォルトプロンプト使用時：GeneratedSummaryテーブルに保存
-                # 強制生成時は元のキャラクター情報を使用
-                if force_generation:
-                    llm_provider_char = summary_llm_provider
-                    llm_model_char = summary_llm_model_name
-                    char_role_for_query_char = character_role
+                    print(f"[INFO] キャラクターありカスタム要約保存完了（ID: {custom_summary_id}）")
                 else:
-                    llm_provider_char = llm_info_with["provider"]
-                    llm_model_char = llm_info_with["model_name"]
-                    char_role_for_query_char = llm_info_with["character_role"]
+                    # デフォルトプロンプト使用時：GeneratedSummaryテーブルに保存
+                    # 強制生成時は元のキャラクター情報を使用
+                    if force_generation:
+                        llm_provider_char = summary_llm_provider
+                        llm_model_char = summary_llm_model_name
+                        char_role_for_query_char = character_role
+                    else:
+                        llm_provider_char = llm_info_with["provider"]
+                        llm_model_char = llm_info_with["model_name"]
+                        char_role_for_query_char = llm_info_with["character_role"]
                 
-                # まず既存レコードをチェック
-                existing_record_char = session.exec(
-                    select(GeneratedSummary).where(
-                        GeneratedSummary.paper_metadata_id == paper_meta.id,
-                        GeneratedSummary.llm_provider == llm_provider_char,
-                        GeneratedSummary.llm_model_name == llm_model_char,
-                        GeneratedSummary.character_role == char_role_for_query_char,
-                        GeneratedSummary.affinity_level == affinity_level
-                    )
-                ).first()
+                    # まず既存レコードをチェック
+                    existing_record_char = session.exec(
+                        select(GeneratedSummary).where(
+                            GeneratedSummary.paper_metadata_id == paper_meta.id,
+                            GeneratedSummary.llm_provider == llm_provider_char,
+                            GeneratedSummary.llm_model_name == llm_model_char,
+                            GeneratedSummary.character_role == char_role_for_query_char,
+                            GeneratedSummary.affinity_level == affinity_level
+                        )
+                    ).first()
                 
-                if existing_record_char:
-                    # 既存レコードを更新
-                    existing_record_char.llm_abst = remove_nul_chars(llm_abst_generated_char)
-                    existing_record_char.one_point = remove_nul_chars(one_point_generated_char)
-                    existing_record_char.updated_at = current_time
-                    session.add(existing_record_char)
-                    session.flush()
-                    summary_id = existing_record_char.id
-                    print(f"[INFO] 既存のGeneratedSummaryレコード（キャラクターあり）を更新しました（ID: {summary_id}）")
-                else:
-                    # 新規レコードを挿入
-                    new_record_char = GeneratedSummary(
-                        paper_metadata_id=paper_meta.id,
-                        llm_provider=llm_provider_char,
-                        llm_model_name=llm_model_char,
-                        llm_abst=remove_nul_chars(llm_abst_generated_char),
-                        one_point=remove_nul_chars(one_point_generated_char),
-                        character_role=char_role_for_query_char,
-                        affinity_level=affinity_level,
-                        created_at=current_time,
-                        updated_at=current_time
-                    )
-                    session.add(new_record_char)
-                    session.flush()
-                    summary_id = new_record_char.id
-                    print(f"[INFO] 新規GeneratedSummaryレコード（キャラクターあり）を作成しました（ID: {summary_id}）")
+                    if existing_record_char:
+                        # 既存レコードを更新
+                        existing_record_char.llm_abst = remove_nul_chars(llm_abst_generated_char)
+                        existing_record_char.one_point = remove_nul_chars(one_point_generated_char)
+                        existing_record_char.updated_at = current_time
+                        session.add(existing_record_char)
+                        session.flush()
+                        summary_id = existing_record_char.id
+                        print(f"[INFO] 既存のGeneratedSummaryレコード（キャラクターあり）を更新しました（ID: {summary_id}）")
+                    else:
+                        # 新規レコードを挿入
+                        new_record_char = GeneratedSummary(
+                            paper_metadata_id=paper_meta.id,
+                            llm_provider=llm_provider_char,
+                            llm_model_name=llm_model_char,
+                            llm_abst=remove_nul_chars(llm_abst_generated_char),
+                            one_point=remove_nul_chars(one_point_generated_char),
+                            character_role=char_role_for_query_char,
+                            affinity_level=affinity_level,
+                            created_at=current_time,
+                            updated_at=current_time
+                        )
+                        session.add(new_record_char)
+                        session.flush()
+                        summary_id = new_record_char.id
+                        print(f"[INFO] 新規GeneratedSummaryレコード（キャラクターあり）を作成しました（ID: {summary_id}）")
                 
-                # GeneratedSummaryオブジェクトを取得
-                generated_summary_char = session.exec(
-                    select(GeneratedSummary).where(GeneratedSummary.id == summary_id)
-                ).first()
+                    # GeneratedSummaryオブジェクトを取得
+                    generated_summary_char = session.exec(
+                        select(GeneratedSummary).where(GeneratedSummary.id == summary_id)
+                    ).first()
                 
-                print(f"[INFO] キャラクターありデフォルト要約保存完了（ID: {summary_id}）")
+                    print(f"[INFO] キャラクターありデフォルト要約保存完了（ID: {summary_id}）")
         
-        session.commit()
-        print(f"[INFO] 2種類の要約保存が完了しました")
+            session.commit()
+            # 呼び出し元がイベントループ上で期限切れ属性を再読込しないよう、ここで読み直しておく
+            for saved in (generated_summary, custom_summary):
+                if saved is not None and saved in session:
+                    session.refresh(saved)
+            print(f"[INFO] 2種類の要約保存が完了しました")
+
+        await asyncio.to_thread(_store_generated_summaries)
         
         return generated_summary, custom_summary
         
@@ -2383,15 +2411,156 @@ def _add_summary_to_vectorstore(
             manager_add_texts(texts=chunks, metadatas=metas)
 
 
+class _SummaryLookup:
+    """_prepare_paper_vector_data が参照する要約・編集済み要約の取得（1論文ずつ問い合わせる）"""
+
+    def __init__(self, session: Session, user_id: int):
+        self.session = session
+        self.user_id = user_id
+
+    def generated(self, summary_id: int) -> Optional[GeneratedSummary]:
+        return self.session.get(GeneratedSummary, summary_id)
+
+    def custom(self, summary_id: int) -> Optional[CustomGeneratedSummary]:
+        return self.session.get(CustomGeneratedSummary, summary_id)
+
+    def latest_default(self, paper_id: int) -> Optional[GeneratedSummary]:
+        """最新の有効なデフォルト要約（キャラクター中立のみ）"""
+        return self.session.exec(
+            select(GeneratedSummary)
+            .where(GeneratedSummary.paper_metadata_id == paper_id)
+            .where(GeneratedSummary.character_role.is_(None))  # キャラクター中立条件追加
+            .where(~GeneratedSummary.llm_abst.startswith("[PLACEHOLDER]"))
+            .where(~GeneratedSummary.llm_abst.startswith("[PROCESSING"))
+            .order_by(GeneratedSummary.created_at.desc())
+        ).first()
+
+    def latest_custom(self, paper_id: int) -> Optional[CustomGeneratedSummary]:
+        """ユーザーの最新のカスタム要約"""
+        return self.session.exec(
+            select(CustomGeneratedSummary)
+            .where(CustomGeneratedSummary.paper_metadata_id == paper_id)
+            .where(CustomGeneratedSummary.user_id == self.user_id)
+            .order_by(CustomGeneratedSummary.created_at.desc())
+        ).first()
+
+    def latest_custom_for_prompt(self, paper_id: int, system_prompt_id: int) -> Optional[CustomGeneratedSummary]:
+        """指定プロンプトによるユーザーの最新のカスタム要約（キャラクター中立のみ）"""
+        return self.session.exec(
+            select(CustomGeneratedSummary)
+            .where(CustomGeneratedSummary.paper_metadata_id == paper_id)
+            .where(CustomGeneratedSummary.user_id == self.user_id)
+            .where(CustomGeneratedSummary.system_prompt_id == system_prompt_id)
+            .where(CustomGeneratedSummary.character_role.is_(None))  # キャラクター中立条件追加
+            .order_by(CustomGeneratedSummary.created_at.desc())
+        ).first()
+
+    def edited_for_generated(self, summary_id: int) -> Optional[EditedSummary]:
+        return self.session.exec(
+            select(EditedSummary).where(
+                EditedSummary.user_id == self.user_id,
+                EditedSummary.generated_summary_id == summary_id
+            )
+        ).first()
+
+    def edited_for_custom(self, summary_id: int) -> Optional[EditedSummary]:
+        return self.session.exec(
+            select(EditedSummary).where(
+                EditedSummary.user_id == self.user_id,
+                EditedSummary.custom_generated_summary_id == summary_id
+            )
+        ).first()
+
+
+class _PreloadedSummaryLookup(_SummaryLookup):
+    """ユーザーのライブラリ全体の要約をまとめて読み込んでおく（ベクトル再構築用）。
+    論文ごとの問い合わせ（N+1）をやめ、論文数によらず一定回数のクエリで済ませる。"""
+
+    def __init__(self, session: Session, user_id: int):
+        super().__init__(session, user_id)
+        library_papers = select(UserPaperLink.paper_metadata_id).where(UserPaperLink.user_id == user_id)
+
+        # 選択中の要約（リンクの selected_* から参照されているもの）
+        self._generated: Dict[int, GeneratedSummary] = {s.id: s for s in session.exec(
+            select(GeneratedSummary)
+            .join(UserPaperLink, UserPaperLink.selected_generated_summary_id == GeneratedSummary.id)
+            .where(UserPaperLink.user_id == user_id)
+        ).all()}
+        self._custom: Dict[int, CustomGeneratedSummary] = {s.id: s for s in session.exec(
+            select(CustomGeneratedSummary)
+            .join(UserPaperLink, UserPaperLink.selected_custom_generated_summary_id == CustomGeneratedSummary.id)
+            .where(UserPaperLink.user_id == user_id)
+        ).all()}
+
+        # 論文ごとの最新（created_at の降順で先頭のものを採用）
+        self._latest_default: Dict[int, GeneratedSummary] = {}
+        for summary in session.exec(
+            select(GeneratedSummary)
+            .where(GeneratedSummary.paper_metadata_id.in_(library_papers))
+            .where(GeneratedSummary.character_role.is_(None))
+            .where(~GeneratedSummary.llm_abst.startswith("[PLACEHOLDER]"))
+            .where(~GeneratedSummary.llm_abst.startswith("[PROCESSING"))
+            .order_by(GeneratedSummary.created_at.desc())
+        ).all():
+            self._latest_default.setdefault(summary.paper_metadata_id, summary)
+
+        self._latest_custom: Dict[int, CustomGeneratedSummary] = {}
+        self._latest_custom_for_prompt: Dict[Tuple[int, int], CustomGeneratedSummary] = {}
+        for summary in session.exec(
+            select(CustomGeneratedSummary)
+            .where(CustomGeneratedSummary.user_id == user_id)
+            .order_by(CustomGeneratedSummary.created_at.desc())
+        ).all():
+            self._latest_custom.setdefault(summary.paper_metadata_id, summary)
+            if summary.character_role is None and summary.system_prompt_id is not None:
+                self._latest_custom_for_prompt.setdefault((summary.paper_metadata_id, summary.system_prompt_id), summary)
+
+        self._edited_generated: Dict[int, EditedSummary] = {}
+        self._edited_custom: Dict[int, EditedSummary] = {}
+        for edited in session.exec(
+            select(EditedSummary).where(EditedSummary.user_id == user_id).order_by(EditedSummary.id)
+        ).all():
+            if edited.generated_summary_id is not None:
+                self._edited_generated.setdefault(edited.generated_summary_id, edited)
+            if edited.custom_generated_summary_id is not None:
+                self._edited_custom.setdefault(edited.custom_generated_summary_id, edited)
+
+    def generated(self, summary_id: int) -> Optional[GeneratedSummary]:
+        return self._generated.get(summary_id) or super().generated(summary_id)
+
+    def custom(self, summary_id: int) -> Optional[CustomGeneratedSummary]:
+        return self._custom.get(summary_id) or super().custom(summary_id)
+
+    def latest_default(self, paper_id: int) -> Optional[GeneratedSummary]:
+        return self._latest_default.get(paper_id)
+
+    def latest_custom(self, paper_id: int) -> Optional[CustomGeneratedSummary]:
+        return self._latest_custom.get(paper_id)
+
+    def latest_custom_for_prompt(self, paper_id: int, system_prompt_id: int) -> Optional[CustomGeneratedSummary]:
+        return self._latest_custom_for_prompt.get((paper_id, system_prompt_id))
+
+    def edited_for_generated(self, summary_id: int) -> Optional[EditedSummary]:
+        return self._edited_generated.get(summary_id)
+
+    def edited_for_custom(self, summary_id: int) -> Optional[EditedSummary]:
+        return self._edited_custom.get(summary_id)
+
+
 def _prepare_paper_vector_data(
     paper_meta: PaperMetadata,
     user_id: int,
     user_paper_link_id: int,
     session: Session,
     preferred_summary_type: Optional[str] = None,
-    preferred_system_prompt_id: Optional[int] = None
+    preferred_system_prompt_id: Optional[int] = None,
+    summary_lookup: Optional[_SummaryLookup] = None
 ) -> Optional[dict]:
-    """論文のベクトルデータを準備する（1論文1ベクトルの統一設計、一括処理用）"""
+    """論文のベクトルデータを準備する（1論文1ベクトルの統一設計、一括処理用）
+
+    複数論文をまとめて処理する場合は summary_lookup に _PreloadedSummaryLookup を渡す。
+    """
+    lookup = summary_lookup or _SummaryLookup(session, user_id)
     
     # ユーザーが選択している要約を優先順位で取得 - セキュリティ強化
     link = session.get(UserPaperLink, user_paper_link_id)
@@ -2416,22 +2585,10 @@ def _prepare_paper_vector_data(
     # 再構築時のプリファレンスがある場合は、それを最優先で処理
     if preferred_summary_type == "default":
         # デフォルト要約を優先（キャラクター中立のみ）
-        latest_default = session.exec(
-            select(GeneratedSummary)
-            .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
-            .where(GeneratedSummary.character_role.is_(None))  # キャラクター中立条件追加
-            .where(~GeneratedSummary.llm_abst.startswith("[PLACEHOLDER]"))
-            .where(~GeneratedSummary.llm_abst.startswith("[PROCESSING"))
-            .order_by(GeneratedSummary.created_at.desc())
-        ).first()
+        latest_default = lookup.latest_default(paper_meta.id)
         if latest_default:
             # EditedSummaryがあるかチェック(おそらく再構成の時に利用する？）
-            edited_summary = session.exec(
-                select(EditedSummary).where(
-                    EditedSummary.user_id == user_id,
-                    EditedSummary.generated_summary_id == latest_default.id
-                )
-            ).first()
+            edited_summary = lookup.edited_for_generated(latest_default.id)
             text_to_embed = edited_summary.edited_llm_abst if edited_summary else latest_default.llm_abst
             llm_provider = latest_default.llm_provider
             llm_model_name = latest_default.llm_model_name
@@ -2440,22 +2597,10 @@ def _prepare_paper_vector_data(
     
     elif preferred_summary_type == "custom" and preferred_system_prompt_id:
         # 指定されたカスタムプロンプトIDの要約を優先
-        specific_custom = session.exec(
-            select(CustomGeneratedSummary)
-            .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
-            .where(CustomGeneratedSummary.user_id == user_id)
-            .where(CustomGeneratedSummary.system_prompt_id == preferred_system_prompt_id)
-            .where(CustomGeneratedSummary.character_role.is_(None))  # キャラクター中立条件追加
-            .order_by(CustomGeneratedSummary.created_at.desc())
-        ).first()
+        specific_custom = lookup.latest_custom_for_prompt(paper_meta.id, preferred_system_prompt_id)
         if specific_custom and specific_custom.llm_abst:
             # EditedSummaryがあるかチェック
-            edited_summary = session.exec(
-                select(EditedSummary).where(
-                    EditedSummary.user_id == user_id,
-                    EditedSummary.custom_generated_summary_id == specific_custom.id
-                )
-            ).first()
+            edited_summary = lookup.edited_for_custom(specific_custom.id)
             text_to_embed = edited_summary.edited_llm_abst if edited_summary else specific_custom.llm_abst
             llm_provider = specific_custom.llm_provider
             llm_model_name = specific_custom.llm_model_name
@@ -2465,15 +2610,10 @@ def _prepare_paper_vector_data(
     # プリファレンスに基づく検索が失敗した場合、通常の優先度ロジックにフォールバック
     # 優先度1: ユーザーが選択したカスタム要約
     if not text_to_embed and link.selected_custom_generated_summary_id:
-        custom_summary = session.get(CustomGeneratedSummary, link.selected_custom_generated_summary_id)
+        custom_summary = lookup.custom(link.selected_custom_generated_summary_id)
         if custom_summary and custom_summary.llm_abst:
             # EditedSummaryがあるかチェック
-            edited_summary = session.exec(
-                select(EditedSummary).where(
-                    EditedSummary.user_id == user_id,
-                    EditedSummary.custom_generated_summary_id == custom_summary.id
-                )
-            ).first()
+            edited_summary = lookup.edited_for_custom(custom_summary.id)
             text_to_embed = edited_summary.edited_llm_abst if edited_summary else custom_summary.llm_abst
             llm_provider = custom_summary.llm_provider
             llm_model_name = custom_summary.llm_model_name
@@ -2482,18 +2622,13 @@ def _prepare_paper_vector_data(
     
     # 優先度2: ユーザーが選択したデフォルト要約（キャラクター中立のみ）
     if not text_to_embed and link.selected_generated_summary_id:
-        default_summary = session.get(GeneratedSummary, link.selected_generated_summary_id)
+        default_summary = lookup.generated(link.selected_generated_summary_id)
         if (default_summary and default_summary.llm_abst and 
             default_summary.character_role is None and  # キャラクター中立条件追加
             not default_summary.llm_abst.startswith("[PLACEHOLDER]") and 
             not default_summary.llm_abst.startswith("[PROCESSING")):
             # EditedSummaryがあるかチェック
-            edited_summary = session.exec(
-                select(EditedSummary).where(
-                    EditedSummary.user_id == user_id,
-                    EditedSummary.generated_summary_id == default_summary.id
-                )
-            ).first()
+            edited_summary = lookup.edited_for_generated(default_summary.id)
             text_to_embed = edited_summary.edited_llm_abst if edited_summary else default_summary.llm_abst
             llm_provider = default_summary.llm_provider
             llm_model_name = default_summary.llm_model_name
@@ -2502,14 +2637,7 @@ def _prepare_paper_vector_data(
     
     # 優先度3: 最新の有効なデフォルト要約（キャラクター中立のみ）
     if not text_to_embed:
-        latest_summary = session.exec(
-            select(GeneratedSummary)
-            .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
-            .where(GeneratedSummary.character_role.is_(None))  # キャラクター中立条件追加
-            .where(~GeneratedSummary.llm_abst.startswith("[PLACEHOLDER]"))
-            .where(~GeneratedSummary.llm_abst.startswith("[PROCESSING"))
-            .order_by(GeneratedSummary.created_at.desc())
-        ).first()
+        latest_summary = lookup.latest_default(paper_meta.id)
         if latest_summary:
             text_to_embed = latest_summary.llm_abst
             llm_provider = latest_summary.llm_provider
@@ -2519,12 +2647,7 @@ def _prepare_paper_vector_data(
     
     # 優先度4: 最新の有効なカスタム要約
     if not text_to_embed:
-        latest_custom_summary = session.exec(
-            select(CustomGeneratedSummary)
-            .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
-            .where(CustomGeneratedSummary.user_id == user_id)
-            .order_by(CustomGeneratedSummary.created_at.desc())
-        ).first()
+        latest_custom_summary = lookup.latest_custom(paper_meta.id)
         if latest_custom_summary and latest_custom_summary.llm_abst:
             text_to_embed = latest_custom_summary.llm_abst
             llm_provider = latest_custom_summary.llm_provider
@@ -2581,7 +2704,9 @@ async def _add_paper_to_vectorstore_unified_async(
 ):
     """論文を1つのベクトルとしてベクトルストアに追加する（非同期版）"""
     
-    vector_data = _prepare_paper_vector_data(
+    # 要約の取得は同期 Session のため、イベントループを止めないようスレッドで実行する
+    vector_data = await asyncio.to_thread(
+        _prepare_paper_vector_data,
         paper_meta, user_id, user_paper_link_id, session,
         preferred_summary_type, preferred_system_prompt_id
     )
@@ -2614,7 +2739,7 @@ async def _add_paper_to_vectorstore_unified_async(
             )
     
     # 同期版のベクトル操作を非同期実行
-    await loop.run_in_executor(None, vector_operations)
+    await loop.run_in_executor(None, wrap_with_context(vector_operations))
 
 def _add_paper_to_vectorstore_unified(
     paper_meta: PaperMetadata,
@@ -2662,24 +2787,27 @@ def _display_recommendation_details(
     target_embeddings_list: List,
     fetched_user_paper_link_ids_for_scoring: List[int]
 ):
-    """推薦計算の詳細情報を見やすく表示する"""
-    print("\n" + "="*80)
-    print("📊 RECOMMENDATION CALCULATION DETAILS")
-    print("="*80)
+    """推薦計算の詳細情報を見やすく表示する（DEBUG ログが有効な場合のみ）"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    lines = []
+    lines.append("\n" + "="*80)
+    lines.append("📊 RECOMMENDATION CALCULATION DETAILS")
+    lines.append("="*80)
     
     # お気に入りベクトル情報
-    print(f"❤️  FAVORITE VECTOR ({vector_info['fav_count']} papers averaged):")
-    print(f"   First 10 dimensions: {[f'{x:.4f}' for x in vector_info['fav_vector_first_10']]}")
+    lines.append(f"❤️  FAVORITE VECTOR ({vector_info['fav_count']} papers averaged):")
+    lines.append(f"   First 10 dimensions: {[f'{x:.4f}' for x in vector_info['fav_vector_first_10']]}")
     
     # 興味なしベクトル情報
     if vector_info['dislike_vector_first_10']:
-        print(f"👎 DISLIKE VECTOR ({vector_info['dislike_count']} papers averaged):")
-        print(f"   First 10 dimensions: {[f'{x:.4f}' for x in vector_info['dislike_vector_first_10']]}")
+        lines.append(f"👎 DISLIKE VECTOR ({vector_info['dislike_count']} papers averaged):")
+        lines.append(f"   First 10 dimensions: {[f'{x:.4f}' for x in vector_info['dislike_vector_first_10']]}")
     else:
-        print("👎 DISLIKE VECTOR: None (no disliked papers)")
+        lines.append("👎 DISLIKE VECTOR: None (no disliked papers)")
     
     # 推薦されたトップ5のベクトルとスコア
-    print("\n🎯 TOP RECOMMENDED PAPERS:")
+    lines.append("\n🎯 TOP RECOMMENDED PAPERS:")
     top_5_scores = scores[:5]  # 最大5件
     
     # 推薦論文のベクトル情報を取得
@@ -2691,16 +2819,17 @@ def _display_recommendation_details(
                 paper_embedding = target_embeddings_list[j]
                 break
         
-        if paper_embedding:
-            print(f"   Paper #{i} (Link ID: {score_item['user_paper_link_id']}):")
-            print(f"     Score: {score_item['score']:.6f}")
-            print(f"     First 10 dimensions: {[f'{x:.4f}' for x in paper_embedding[:10]]}")
+        if paper_embedding is not None and len(paper_embedding) > 0:  # Chroma は numpy 配列で返す
+            lines.append(f"   Paper #{i} (Link ID: {score_item['user_paper_link_id']}):")
+            lines.append(f"     Score: {score_item['score']:.6f}")
+            lines.append(f"     First 10 dimensions: {[f'{x:.4f}' for x in paper_embedding[:10]]}")
         else:
-            print(f"   Paper #{i} (Link ID: {score_item['user_paper_link_id']}):")
-            print(f"     Score: {score_item['score']:.6f}")
-            print(f"     Vector: Not found in target embeddings")
+            lines.append(f"   Paper #{i} (Link ID: {score_item['user_paper_link_id']}):")
+            lines.append(f"     Score: {score_item['score']:.6f}")
+            lines.append(f"     Vector: Not found in target embeddings")
     
-    print("="*80 + "\n")
+    lines.append("="*80)
+    logger.debug("\n".join(lines))
 
 def _check_summary_duplications(
     session: Session,
@@ -2794,49 +2923,65 @@ async def run_paper_chat_async(
     payload: ChatMessageCreate,
     user_id: int
 ) -> None:
-    """バックグラウンドで実行される非同期チャット処理"""
+    """バックグラウンドで実行される非同期チャット処理
+
+    生成中のトークンは stream_hub の paper_chat チャンネルに publish され、
+    SSE エンドポイント (/papers/chat-sessions/{session_id}/stream) から購読できる。
+    """
+    stream_channel = paper_chat_stream_channel(session_id)
     try:
-        with Session(engine) as db_session:
+        async with async_session_scope() as db_session:
             # ステータス更新: 処理開始
-            chat_session = db_session.get(PaperChatSession, session_id)
+            chat_session = await db_session.get(PaperChatSession, session_id)
             if not chat_session:
                 return
             
             chat_session.processing_status = "processing"
             chat_session.last_updated = datetime.utcnow()
             db_session.add(chat_session)
-            db_session.commit()
+            await db_session.commit()
             
-            # UserPaperLinkとPaperMetadataを取得
-            link = db_session.get(UserPaperLink, user_paper_link_id)
-            if not link or not link.paper_metadata:
+            # UserPaperLinkとPaperMetadataを取得（AsyncSession では遅延ロードできないため明示的に取得する）
+            link = await db_session.get(UserPaperLink, user_paper_link_id)
+            paper_metadata = await db_session.get(PaperMetadata, link.paper_metadata_id) if link else None
+            if not paper_metadata:
                 raise Exception("Paper metadata not found")
             
             # セッション内の履歴を取得
-            history = db_session.exec(
+            history = (await db_session.exec(
                 select(ChatMessage)
                 .where(ChatMessage.paper_chat_session_id == session_id)
                 .order_by(ChatMessage.id)
-            ).all()
+            )).all()
             
-            # コンテキストテキストを準備
-            context_text_to_use = ""
-            if link.paper_metadata.full_text:
-                context_text_to_use = link.paper_metadata.full_text
-            else:
-                context_text_to_use = "この論文の全文テキスト情報が利用できません。タイトルと概要に基づいて回答します。\n"
-                context_text_to_use += f"Title: {link.paper_metadata.title}\n"
-                context_text_to_use += f"Abstract: {link.paper_metadata.abstract}"
+            # プロンプト取得（システムプロンプト + 論文コンテキストはキャッシュ対象のプレフィックス）
+            chat_system_message = await db_session.run_sync(
+                lambda s: get_system_prompt(s, user_id, payload.system_prompt_id, payload.use_character_prompt)
+            )
+            # コンテキスト構築・LLM 応答待ちの間は DB 接続をプールに返しておく
+            await db_session.commit()
             
-            # プロンプト取得
-            chat_history_for_llm = [get_system_prompt(db_session, user_id, payload.system_prompt_id, payload.use_character_prompt), AIMessage(content=context_text_to_use[:90000])]
+            # コンテキストテキストを準備（長い論文は質問に関連するチャンクのみ、短い論文は全文）
+            # （全文またはタイトル・概要はキャッシュ対象の固定部分、抜粋チャンクは質問ごとに別送する）
+            context_text_to_use, turn_context_text = await build_paper_chat_context(
+                paper_metadata_id=paper_metadata.id,
+                title=paper_metadata.title,
+                abstract=paper_metadata.abstract,
+                full_text=paper_metadata.full_text,
+                question=payload.content
+            )
+            chat_history_for_llm = []
             for m_hist in history:
                 cls = HumanMessage if m_hist.role == "user" else AIMessage
                 chat_history_for_llm.append(cls(content=m_hist.content))
             
             # LLM設定
-            llm_inst_for_chat = chat_llm
+            llm_inst_for_chat = get_chat_llm()
+            chat_llm_provider = _chat_config["provider"]
+            chat_llm_model_name = _chat_config["model_name"]
             if payload.model and payload.provider:
+                chat_llm_provider = payload.provider
+                chat_llm_model_name = payload.model
                 llm_inst_for_chat = initialize_llm(
                     name=payload.provider,
                     model_name=payload.model,
@@ -2850,7 +2995,17 @@ async def run_paper_chat_async(
             retry_count = 0
             while retry_count < 3:
                 try:
-                    response = await llm_inst_for_chat.ainvoke(chat_history_for_llm)
+                    response = await ainvoke_with_context_cache(
+                        llm_inst_for_chat,
+                        provider=chat_llm_provider,
+                        model_name=chat_llm_model_name,
+                        scope_key=f"paper:{paper_metadata.id}",
+                        system_message=chat_system_message,
+                        context_text=context_text_to_use,
+                        messages=chat_history_for_llm,
+                        stream_channel=stream_channel,
+                        turn_context_text=turn_context_text,
+                    )
                     assistant_resp_content = response.content
                     if assistant_resp_content:
                         break
@@ -2858,6 +3013,8 @@ async def run_paper_chat_async(
                     retry_count += 1
                     if retry_count >= 3:
                         raise e
+                    # 途中まで送信したトークンを破棄させる
+                    stream_hub.publish(stream_channel, "reset", {"attempt": retry_count + 1})
             
             # アシスタントメッセージを保存
             assistant_msg = ChatMessage(
@@ -2872,21 +3029,35 @@ async def run_paper_chat_async(
             chat_session.processing_status = "completed"
             chat_session.last_updated = datetime.utcnow()
             
-            db_session.commit()
+            db_session.add(chat_session)
+            await db_session.commit()
+            await db_session.refresh(assistant_msg)
+            stream_hub.publish(stream_channel, "done", {
+                "status": "completed",
+                "message": ChatMessageRead.model_validate(assistant_msg).model_dump(mode="json"),
+            })
             
     except Exception as e:
         # エラー処理
         try:
-            with Session(engine) as db_session:
-                chat_session = db_session.get(PaperChatSession, session_id)
+            async with async_session_scope() as db_session:
+                chat_session = await db_session.get(PaperChatSession, session_id)
                 if chat_session:
                     chat_session.processing_status = "failed"
                     chat_session.last_updated = datetime.utcnow()
                     db_session.add(chat_session)
-                    db_session.commit()
+                    await db_session.commit()
         except:
             pass
+        stream_hub.publish(stream_channel, "error", {"status": "failed", "detail": str(e)})
         print(f"Error in run_paper_chat_async: {e}")
+    finally:
+        stream_hub.close(stream_channel)
+
+
+def paper_chat_stream_channel(session_id: int) -> str:
+    """論文チャットセッションのストリームチャンネル名"""
+    return f"paper_chat:{session_id}"
 
 
 def _check_summary_duplication_for_default(
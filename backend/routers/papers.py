@@ -1,5 +1,6 @@
 # backend/routers/papers.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import NoResultFound
 from sqlmodel import Session, select, col, func, delete # delete をインポート
 from sqlalchemy.orm import selectinload
@@ -25,9 +26,12 @@ from schemas import (
     MultipleSummaryRequest, MultipleSummaryResponse, SummaryResult, TagsExistenceRequest, TagsExistenceResponse
 )
 import yaml, pathlib, functools
+import logging
 import re
-import arxiv
+from routers.module.lazy_import import lazy_attr, lazy_module
+arxiv = lazy_module("arxiv")
 import json
+import uuid
 import asyncio
 import time
 from datetime import datetime
@@ -42,6 +46,8 @@ from models import (
 from auth_utils import get_current_active_user
 
 from .module.util import initialize_llm, CONFIG as GLOBAL_LLM_CONFIG
+from .module.stream_hub import stream_hub, relay_channel_as_sse, current_stream_channel, SSE_HEADERS
+from .module.status_notifier import long_poll_status, paper_chat_status_key, MAX_LONG_POLL_SECONDS
 from .module.prompt_manager import (
     get_paper_chat_system_prompt,
     get_paper_chat_system_prompt_with_character, # キャラクタープロンプト付き関数を追加
@@ -59,7 +65,9 @@ import os
 import numpy as np
 from typing import List, Optional, Dict, Any, Tuple, Union, Literal
 from routers.module.embeddings import EMBED
-from sklearn.metrics.pairwise import cosine_similarity
+cosine_similarity = lazy_attr("sklearn.metrics.pairwise", "cosine_similarity")
+
+logger = logging.getLogger(__name__)
 
 from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
 # BaseModel は pydantic から直接インポートするので、Field は不要なら削除
@@ -88,7 +96,8 @@ from .paper_util import (
     _check_summary_duplication_for_default,
     _check_summary_duplication_for_custom,
     _ensure_empty_session_exists,
-    run_paper_chat_async
+    run_paper_chat_async,
+    paper_chat_stream_channel
         )
 
 def _generate_tags_if_needed(
@@ -333,7 +342,7 @@ def select_best_summary_by_priority(
             elif not user_selected_character:
                 base_score += 100  # ユーザーがキャラクター未選択の場合は従来通り
         
-        print(f"[DEBUG] スコア計算: ID={summary.id}, is_custom={is_custom}, character_role={character_role}, user_selected={user_selected_character}, score={base_score}")
+        logger.debug("スコア計算: ID=%s, is_custom=%s, character_role=%s, user_selected=%s, score=%s", summary.id, is_custom, character_role, user_selected_character, base_score)
         return base_score
     
     # 各要約の優先順位スコアを計算
@@ -386,16 +395,17 @@ def select_best_summary_by_priority(
     
     # 初期作成時 または add再生成時 または 詳細再生成でフォールバック
     # 全体の優先順位: カスタム+キャラ > カスタム > デフォルト+キャラ > デフォルト
-    print(f"[DEBUG] 全体から最優先要約を選択中 (selection_mode={selection_mode})")
-    for i, s in enumerate(scored_summaries):
-        summary = s['summary']
-        character_role = getattr(summary, 'character_role', None)
-        print(f"[DEBUG]   {i}: ID={summary.id}, is_custom={s['is_custom']}, character={character_role}, score={s['score']}, created={s['created_at']}")
+    logger.debug("全体から最優先要約を選択中 (selection_mode=%s)", selection_mode)
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, s in enumerate(scored_summaries):
+            summary = s['summary']
+            character_role = getattr(summary, 'character_role', None)
+            logger.debug("%s: ID=%s, is_custom=%s, character=%s, score=%s, created=%s", i, summary.id, s['is_custom'], character_role, s['score'], s['created_at'])
     
     scored_summaries.sort(key=lambda x: (-x['score'], -x['created_at'].timestamp()))
     best_summary = scored_summaries[0]
     
-    print(f"[DEBUG] 最優先要約決定: ID={best_summary['summary'].id}, is_custom={best_summary['is_custom']}, score={best_summary['score']}")
+    logger.debug("最優先要約決定: ID=%s, is_custom=%s, score=%s", best_summary['summary'].id, best_summary['is_custom'], best_summary['score'])
     
     if best_summary['is_custom']:
         return None, best_summary['summary']
@@ -1186,6 +1196,61 @@ ARXIV_ABS_RE = re.compile(r"https?://arxiv\.org/abs/(?P<id>\d{4}\.\d{5}(v\d)?)")
 
 from utils.fulltext import get_arxiv_fulltext, _extract_arxiv_id, get_arxiv_metadata_with_fulltext, get_arxiv_metadata_with_fulltext_async
 
+
+# --- 論文取り込み・要約生成エンドポイントの DB 処理 ---
+# これらのエンドポイントは async def のため、同期 Session を使う処理は asyncio.to_thread で実行し、
+# DB の待ち時間で同じワーカーの他のリクエストを止めないようにする。
+# コミット後はスレッド内で refresh しておき、イベントループ上で期限切れ属性の再読込が起きないようにする。
+
+def _find_paper_metadata(session: Session, arxiv_id: str) -> Optional[PaperMetadata]:
+    return session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id)).first()
+
+
+def _save_new_paper_metadata(session: Session, paper_meta: PaperMetadata, arxiv_id: str, log_prefix: str) -> PaperMetadata:
+    """新規の論文メタデータを保存する。同時に作成されて一意性制約に違反した場合は既存の行を返す"""
+    session.add(paper_meta)
+    try:
+        session.commit()
+        session.refresh(paper_meta)
+        print(f"{log_prefix} Created new paper metadata: {paper_meta.id}")
+        return paper_meta
+    except Exception as e:
+        session.rollback()
+        print(f"{log_prefix} Commit failed (likely due to race condition), fetching existing: {e}")
+        existing_paper_meta = _find_paper_metadata(session, arxiv_id)
+        if not existing_paper_meta:
+            raise HTTPException(status_code=500, detail="論文メタデータの取得に失敗しました。")
+        print(f"{log_prefix} Fetched existing paper_meta after race condition: {existing_paper_meta.id}")
+        return existing_paper_meta
+
+
+def _save_and_commit(session: Session, obj) -> None:
+    session.add(obj)
+    session.commit()
+    session.refresh(obj)
+
+
+def _get_or_create_user_paper_link(session: Session, user_id: int, paper_metadata_id: int, log_prefix: str) -> UserPaperLink:
+    user_paper_link = session.exec(
+        select(UserPaperLink)
+        .where(UserPaperLink.user_id == user_id)
+        .where(UserPaperLink.paper_metadata_id == paper_metadata_id)
+    ).first()
+    if user_paper_link:
+        print(f"{log_prefix} Found existing UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
+        return user_paper_link
+
+    print(f"{log_prefix} UserPaperLink not found, creating new one for user_id: {user_id}")
+    user_paper_link = UserPaperLink(
+        user_id=user_id,
+        paper_metadata_id=paper_metadata_id,
+        tags="",
+        memo=""
+    )
+    _save_and_commit(session, user_paper_link)
+    print(f"{log_prefix} Created new UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
+    return user_paper_link
+
 @router.post("/import_from_arxiv", response_model=PaperImportResponse, status_code=status.HTTP_201_CREATED)
 async def import_from_arxiv(
     payload: PaperCreateAuto,
@@ -1199,7 +1264,7 @@ async def import_from_arxiv(
         llm_config_to_use.update(payload.config_overrides)
     
     try:
-        arxiv_id_from_url, full_text_content = get_arxiv_fulltext(payload.url)
+        arxiv_id_from_url, full_text_content = await asyncio.to_thread(get_arxiv_fulltext, payload.url)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid arXiv URL: {e}")
     except Exception as e:
@@ -1207,50 +1272,56 @@ async def import_from_arxiv(
     
     
 
-    paper_meta = session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id_from_url)).first()
-    is_new_paper_metadata = False 
     is_new_user_paper_link = False 
 
-    if not paper_meta:
-        is_new_paper_metadata = True
-        try:
-            search = arxiv.Search(id_list=[arxiv_id_from_url])
-            result = next(arxiv.Client().results(search))
-        except StopIteration:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"arXiv ID {arxiv_id_from_url} not found on arXiv.")
-        
-        paper_meta = PaperMetadata(
-            arxiv_id=remove_nul_chars(arxiv_id_from_url),
-            arxiv_url=remove_nul_chars(f"https://arxiv.org/abs/{arxiv_id_from_url}"),
-            title=remove_nul_chars(result.title),
-            authors=remove_nul_chars(", ".join(a.name for a in result.authors)),
-            published_date=result.published.date() if result.published else None,
-            abstract=remove_nul_chars(result.summary.strip()),
-            full_text=remove_nul_chars(full_text_content)
-        )
-        session.add(paper_meta)
-        try:
+    # 論文メタデータの取得・作成（arXiv API と同期 Session を使うためスレッドで実行する）
+    def load_or_create_paper_meta():
+        paper_meta = session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id_from_url)).first()
+        is_new_paper_metadata = False 
+
+        if not paper_meta:
+            is_new_paper_metadata = True
+            try:
+                search = arxiv.Search(id_list=[arxiv_id_from_url])
+                result = next(arxiv.Client().results(search))
+            except StopIteration:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"arXiv ID {arxiv_id_from_url} not found on arXiv.")
+        
+            paper_meta = PaperMetadata(
+                arxiv_id=remove_nul_chars(arxiv_id_from_url),
+                arxiv_url=remove_nul_chars(f"https://arxiv.org/abs/{arxiv_id_from_url}"),
+                title=remove_nul_chars(result.title),
+                authors=remove_nul_chars(", ".join(a.name for a in result.authors)),
+                published_date=result.published.date() if result.published else None,
+                abstract=remove_nul_chars(result.summary.strip()),
+                full_text=remove_nul_chars(full_text_content)
+            )
+            session.add(paper_meta)
+            try:
+                session.commit()
+                session.refresh(paper_meta)
+                print(f"新しい論文メタデータを作成しました: {paper_meta.arxiv_id}")
+            except Exception as e:
+                # 重複エラーの場合、他のユーザーが既に作成している可能性
+                session.rollback()
+                print(f"論文メタデータ作成時にエラー（おそらく重複）: {e}")
+                # 再度DBから取得を試行
+                paper_meta = session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id_from_url)).first()
+                if not paper_meta:
+                    # それでも見つからない場合は他のエラー
+                    raise HTTPException(status_code=500, detail=f"論文メタデータの作成に失敗しました: {e}")
+                print(f"既存の論文メタデータを取得しました: {paper_meta.arxiv_id}")
+                is_new_paper_metadata = False
+        elif not paper_meta.full_text and full_text_content:
+            is_new_paper_metadata = True
+            paper_meta.full_text = remove_nul_chars(full_text_content)
+            paper_meta.updated_at = datetime.utcnow()
+            session.add(paper_meta)
             session.commit()
             session.refresh(paper_meta)
-            print(f"新しい論文メタデータを作成しました: {paper_meta.arxiv_id}")
-        except Exception as e:
-            # 重複エラーの場合、他のユーザーが既に作成している可能性
-            session.rollback()
-            print(f"論文メタデータ作成時にエラー（おそらく重複）: {e}")
-            # 再度DBから取得を試行
-            paper_meta = session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id_from_url)).first()
-            if not paper_meta:
-                # それでも見つからない場合は他のエラー
-                raise HTTPException(status_code=500, detail=f"論文メタデータの作成に失敗しました: {e}")
-            print(f"既存の論文メタデータを取得しました: {paper_meta.arxiv_id}")
-            is_new_paper_metadata = False
-    elif not paper_meta.full_text and full_text_content:
-        is_new_paper_metadata = True
-        paper_meta.full_text = remove_nul_chars(full_text_content)
-        paper_meta.updated_at = datetime.utcnow()
-        session.add(paper_meta)
-        session.commit()
-        session.refresh(paper_meta)
+        return paper_meta, is_new_paper_metadata
+
+    paper_meta, is_new_paper_metadata = await asyncio.to_thread(load_or_create_paper_meta)
 
     print(f"Paper id: {paper_meta.arxiv_id}")
     print(f"Paper title: {paper_meta.title}")
@@ -1317,44 +1388,49 @@ async def import_from_arxiv(
 
 
 
-    print(f"[import_from_arxiv] Searching UserPaperLink for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
-    user_paper_link = session.exec(
-        select(UserPaperLink)
-        .where(UserPaperLink.user_id == current_user.id)
-        .where(UserPaperLink.paper_metadata_id == paper_meta.id)
-    ).first()
+    # UserPaperLink の検索とタグ生成（同期の DB・LLM 呼び出しのためスレッドで実行する）
+    def find_link_and_generate_tags():
+        print(f"[import_from_arxiv] Searching UserPaperLink for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
+        user_paper_link = session.exec(
+            select(UserPaperLink)
+            .where(UserPaperLink.user_id == current_user.id)
+            .where(UserPaperLink.paper_metadata_id == paper_meta.id)
+        ).first()
     
-    if user_paper_link:
-        print(f"[import_from_arxiv] Found existing UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
-    else:
-        print(f"[import_from_arxiv] UserPaperLink not found for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
+        if user_paper_link:
+            print(f"[import_from_arxiv] Found existing UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
+        else:
+            print(f"[import_from_arxiv] UserPaperLink not found for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
+
+        selected_tags_csv = ""
+
+        # タグ生成処理（共通関数を使用）
+        if (not user_paper_link) or (not user_paper_link.tags):
+            print(f"[import_from_arxiv] Starting tag generation using common function for paper {paper_meta.id}, user {current_user.id}")
+            tag_generated = _generate_tags_if_needed(
+                paper_metadata_id=paper_meta.id,
+                user_id=current_user.id,
+                session=session,
+                current_user=current_user,
+                force_generation=False
+            )
+            if tag_generated:
+                print(f"[import_from_arxiv] Tag generation completed successfully")
+                # UserPaperLinkを再取得してタグ情報を更新
+                session.refresh(user_paper_link)
+                selected_tags_csv = user_paper_link.tags
+            else:
+                print(f"[import_from_arxiv] Tag generation failed or skipped")
+                selected_tags_csv = ""
+        else:
+            selected_tags_csv = user_paper_link.tags
+            print(f"[import_from_arxiv] Using existing tags: {selected_tags_csv}")
+        return user_paper_link, selected_tags_csv
 
-    selected_tags_csv = ""
+    user_paper_link, selected_tags_csv = await asyncio.to_thread(find_link_and_generate_tags)
     error_cnt = 0
     fallback_error_cnt = 0
     fallback_Flag = False   
-
-    # タグ生成処理（共通関数を使用）
-    if (not user_paper_link) or (not user_paper_link.tags):
-        print(f"[import_from_arxiv] Starting tag generation using common function for paper {paper_meta.id}, user {current_user.id}")
-        tag_generated = _generate_tags_if_needed(
-            paper_metadata_id=paper_meta.id,
-            user_id=current_user.id,
-            session=session,
-            current_user=current_user,
-            force_generation=False
-        )
-        if tag_generated:
-            print(f"[import_from_arxiv] Tag generation completed successfully")
-            # UserPaperLinkを再取得してタグ情報を更新
-            session.refresh(user_paper_link)
-            selected_tags_csv = user_paper_link.tags
-        else:
-            print(f"[import_from_arxiv] Tag generation failed or skipped")
-            selected_tags_csv = ""
-    else:
-        selected_tags_csv = user_paper_link.tags
-        print(f"[import_from_arxiv] Using existing tags: {selected_tags_csv}")
     
     # 古いタグ生成処理はここから削除済み（共通関数を使用）
 
@@ -1474,125 +1550,132 @@ async def import_from_arxiv(
     # UserPaperLinkの設定：新しい優先順位ロジックを使用した選択
     selected_summary_for_link = None
     selected_custom_summary_for_link = None
+
+    # 要約選択・UserPaperLink の更新とコミットは同期 Session を使うためスレッドで実行する
+    def store_user_paper_link():
+        nonlocal user_paper_link, is_new_user_paper_link
+        nonlocal selected_summary_for_link, selected_custom_summary_for_link
+    
+        # 今回の処理で新しく生成されたすべてのデフォルト要約を取得
+        # 今回の実行で生成された要約のみから優先度チェックを行う
+        # 既存の要約ではなく、今回生成された要約が確実に選択されるようにする
+        print(f"[DEBUG] 要約選択処理開始: generated_summary={generated_summary.id if generated_summary else None}, custom_summaries_count={len(custom_summaries)}")
+    
+        # 今回使用したプロンプト条件でDBから全要約を取得
+        # 今回生成された全要約（キャラクターなし+キャラクターあり）を対象とする
+        if payload.prompt_mode == "default" or any(p.type == "default" for p in payload.selected_prompts):
+            # デフォルトプロンプトが使用された場合
+            current_generated_summaries = session.exec(
+                select(GeneratedSummary)
+                .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
+                .order_by(GeneratedSummary.created_at.desc())
+            ).all()
+        else:
+            current_generated_summaries = []
+    
+        print(f"[DEBUG] 今回生成されたGeneratedSummary数: {len(current_generated_summaries)}")
+        for summary in current_generated_summaries:
+            print(f"[DEBUG]   - ID: {summary.id}, Character: {summary.character_role}, Created: {summary.created_at}")
+    
+        print(f"[DEBUG] 今回生成されたCustomGeneratedSummary数: {len(custom_summaries)}")
+        for summary in custom_summaries:
+            print(f"[DEBUG]   - ID: {summary.id}, Character: {summary.character_role}, Created: {summary.created_at}")
+    
+        # 今回生成された要約の中から優先順位ロジックを使用：カスタム+キャラ > カスタム > デフォルト+キャラ > デフォルト
+        selected_summary_for_link, selected_custom_summary_for_link = select_best_summary_by_priority(
+            generated_summaries=current_generated_summaries,
+            custom_summaries=custom_summaries,
+            selection_mode="initial",
+            user_selected_character=current_user.selected_character
+        )
     
-    # 今回の処理で新しく生成されたすべてのデフォルト要約を取得
-    # 今回の実行で生成された要約のみから優先度チェックを行う
-    # 既存の要約ではなく、今回生成された要約が確実に選択されるようにする
-    print(f"[DEBUG] 要約選択処理開始: generated_summary={generated_summary.id if generated_summary else None}, custom_summaries_count={len(custom_summaries)}")
-    
-    # 今回使用したプロンプト条件でDBから全要約を取得
-    # 今回生成された全要約（キャラクターなし+キャラクターあり）を対象とする
-    if payload.prompt_mode == "default" or any(p.type == "default" for p in payload.selected_prompts):
-        # デフォルトプロンプトが使用された場合
-        current_generated_summaries = session.exec(
-            select(GeneratedSummary)
-            .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
-            .order_by(GeneratedSummary.created_at.desc())
-        ).all()
-    else:
-        current_generated_summaries = []
-    
-    print(f"[DEBUG] 今回生成されたGeneratedSummary数: {len(current_generated_summaries)}")
-    for summary in current_generated_summaries:
-        print(f"[DEBUG]   - ID: {summary.id}, Character: {summary.character_role}, Created: {summary.created_at}")
-    
-    print(f"[DEBUG] 今回生成されたCustomGeneratedSummary数: {len(custom_summaries)}")
-    for summary in custom_summaries:
-        print(f"[DEBUG]   - ID: {summary.id}, Character: {summary.character_role}, Created: {summary.created_at}")
-    
-    # 今回生成された要約の中から優先順位ロジックを使用：カスタム+キャラ > カスタム > デフォルト+キャラ > デフォルト
-    selected_summary_for_link, selected_custom_summary_for_link = select_best_summary_by_priority(
-        generated_summaries=current_generated_summaries,
-        custom_summaries=custom_summaries,
-        selection_mode="initial",
-        user_selected_character=current_user.selected_character
-    )
-    
-    print(f"[DEBUG] 優先順位選択結果:")
-    print(f"[DEBUG]   - selected_summary_for_link: {selected_summary_for_link.id if selected_summary_for_link else None}")
-    print(f"[DEBUG]   - selected_custom_summary_for_link: {selected_custom_summary_for_link.id if selected_custom_summary_for_link else None}")
+        print(f"[DEBUG] 優先順位選択結果:")
+        print(f"[DEBUG]   - selected_summary_for_link: {selected_summary_for_link.id if selected_summary_for_link else None}")
+        print(f"[DEBUG]   - selected_custom_summary_for_link: {selected_custom_summary_for_link.id if selected_custom_summary_for_link else None}")
     
-    if user_paper_link:
-        is_new_user_paper_link = False
-        user_paper_link.updated_at = datetime.utcnow()
-        user_paper_link.last_accessed_at = datetime.utcnow()
-        
-        # 要約選択を強制的に更新（他のエンドポイントによる事前作成に対応）
-        print(f"[DEBUG] 既存UserPaperLink更新: 現在の選択 default={user_paper_link.selected_generated_summary_id}, custom={user_paper_link.selected_custom_generated_summary_id}")
-        
-        if selected_custom_summary_for_link:
-            user_paper_link.selected_custom_generated_summary_id = selected_custom_summary_for_link.id
-            user_paper_link.selected_generated_summary_id = None  # カスタム選択時はデフォルトをクリア
-            print(f"[DEBUG] カスタム要約に更新: {selected_custom_summary_for_link.id}")
-        elif selected_summary_for_link:
-            user_paper_link.selected_generated_summary_id = selected_summary_for_link.id
-            user_paper_link.selected_custom_generated_summary_id = None  # デフォルト選択時はカスタムをクリア
-            print(f"[DEBUG] デフォルト要約に更新: {selected_summary_for_link.id}")
-        
-        session.add(user_paper_link)  # 明示的にセッションに追加して更新を確実にする
-    else:
-        is_new_user_paper_link = True
-        print(f"[import_from_arxiv] Creating new UserPaperLink for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
-        if selected_custom_summary_for_link:
-            # カスタム要約を選択した場合
-            user_paper_link = UserPaperLink(
-                user_id=current_user.id,
-                paper_metadata_id=paper_meta.id,
-                tags=selected_tags_csv,
-                selected_custom_generated_summary_id=selected_custom_summary_for_link.id
-            )
-            print(f"[import_from_arxiv] Created UserPaperLink with custom summary for user_id: {current_user.id}")
-        elif selected_summary_for_link:
-            # デフォルト要約を選択した場合
-            user_paper_link = UserPaperLink(
-                user_id=current_user.id,
-                paper_metadata_id=paper_meta.id,
-                tags=selected_tags_csv,
-                selected_generated_summary_id=selected_summary_for_link.id 
-            )
-            print(f"[import_from_arxiv] Created UserPaperLink with default summary for user_id: {current_user.id}")
+        if user_paper_link:
+            is_new_user_paper_link = False
+            user_paper_link.updated_at = datetime.utcnow()
+            user_paper_link.last_accessed_at = datetime.utcnow()
+        
+            # 要約選択を強制的に更新（他のエンドポイントによる事前作成に対応）
+            print(f"[DEBUG] 既存UserPaperLink更新: 現在の選択 default={user_paper_link.selected_generated_summary_id}, custom={user_paper_link.selected_custom_generated_summary_id}")
+        
+            if selected_custom_summary_for_link:
+                user_paper_link.selected_custom_generated_summary_id = selected_custom_summary_for_link.id
+                user_paper_link.selected_generated_summary_id = None  # カスタム選択時はデフォルトをクリア
+                print(f"[DEBUG] カスタム要約に更新: {selected_custom_summary_for_link.id}")
+            elif selected_summary_for_link:
+                user_paper_link.selected_generated_summary_id = selected_summary_for_link.id
+                user_paper_link.selected_custom_generated_summary_id = None  # デフォルト選択時はカスタムをクリア
+                print(f"[DEBUG] デフォルト要約に更新: {selected_summary_for_link.id}")
+        
+            session.add(user_paper_link)  # 明示的にセッションに追加して更新を確実にする
         else:
-            # 要約がない場合（エラー状態）
-            user_paper_link = UserPaperLink(
-                user_id=current_user.id,
-                paper_metadata_id=paper_meta.id,
-                tags=selected_tags_csv
-            )
-            print(f"[import_from_arxiv] Created UserPaperLink without summary for user_id: {current_user.id}")
-        session.add(user_paper_link)
+            is_new_user_paper_link = True
+            print(f"[import_from_arxiv] Creating new UserPaperLink for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
+            if selected_custom_summary_for_link:
+                # カスタム要約を選択した場合
+                user_paper_link = UserPaperLink(
+                    user_id=current_user.id,
+                    paper_metadata_id=paper_meta.id,
+                    tags=selected_tags_csv,
+                    selected_custom_generated_summary_id=selected_custom_summary_for_link.id
+                )
+                print(f"[import_from_arxiv] Created UserPaperLink with custom summary for user_id: {current_user.id}")
+            elif selected_summary_for_link:
+                # デフォルト要約を選択した場合
+                user_paper_link = UserPaperLink(
+                    user_id=current_user.id,
+                    paper_metadata_id=paper_meta.id,
+                    tags=selected_tags_csv,
+                    selected_generated_summary_id=selected_summary_for_link.id 
+                )
+                print(f"[import_from_arxiv] Created UserPaperLink with default summary for user_id: {current_user.id}")
+            else:
+                # 要約がない場合（エラー状態）
+                user_paper_link = UserPaperLink(
+                    user_id=current_user.id,
+                    paper_metadata_id=paper_meta.id,
+                    tags=selected_tags_csv
+                )
+                print(f"[import_from_arxiv] Created UserPaperLink without summary for user_id: {current_user.id}")
+            session.add(user_paper_link)
     
-    if not user_paper_link.tags and selected_tags_csv:
-        user_paper_link.tags = selected_tags_csv
+        if not user_paper_link.tags and selected_tags_csv:
+            user_paper_link.tags = selected_tags_csv
 
-    # コミット前の最終確認
-    print(f"[import_from_arxiv] コミット前最終確認:")
-    print(f"[import_from_arxiv]   UserPaperLink ID: {user_paper_link.id}")
-    print(f"[import_from_arxiv]   user_id: {user_paper_link.user_id}")
-    print(f"[import_from_arxiv]   paper_metadata_id: {user_paper_link.paper_metadata_id}")
-    print(f"[import_from_arxiv]   selected_generated_summary_id: {user_paper_link.selected_generated_summary_id}")
-    print(f"[import_from_arxiv]   selected_custom_generated_summary_id: {user_paper_link.selected_custom_generated_summary_id}")
-    print(f"[import_from_arxiv]   current_user.id: {current_user.id}")
+        # コミット前の最終確認
+        print(f"[import_from_arxiv] コミット前最終確認:")
+        print(f"[import_from_arxiv]   UserPaperLink ID: {user_paper_link.id}")
+        print(f"[import_from_arxiv]   user_id: {user_paper_link.user_id}")
+        print(f"[import_from_arxiv]   paper_metadata_id: {user_paper_link.paper_metadata_id}")
+        print(f"[import_from_arxiv]   selected_generated_summary_id: {user_paper_link.selected_generated_summary_id}")
+        print(f"[import_from_arxiv]   selected_custom_generated_summary_id: {user_paper_link.selected_custom_generated_summary_id}")
+        print(f"[import_from_arxiv]   current_user.id: {current_user.id}")
 
-    session.commit()
-    session.refresh(user_paper_link)
-    
-    # コミット後の最終確認
-    print(f"[import_from_arxiv] コミット後最終確認:")
-    print(f"[import_from_arxiv]   UserPaperLink ID: {user_paper_link.id}")
-    print(f"[import_from_arxiv]   user_id: {user_paper_link.user_id}")
-    print(f"[import_from_arxiv]   paper_metadata_id: {user_paper_link.paper_metadata_id}")
-    print(f"[import_from_arxiv]   current_user.id: {current_user.id}")
-    session.refresh(paper_meta)
-    if generated_summary:
-        session.refresh(generated_summary)
-    if edit_generate_summary:
-        session.refresh(edit_generate_summary)
-    for custom_summary in custom_summaries:
-        session.refresh(custom_summary)
+        session.commit()
+        session.refresh(user_paper_link)
+    
+        # コミット後の最終確認
+        print(f"[import_from_arxiv] コミット後最終確認:")
+        print(f"[import_from_arxiv]   UserPaperLink ID: {user_paper_link.id}")
+        print(f"[import_from_arxiv]   user_id: {user_paper_link.user_id}")
+        print(f"[import_from_arxiv]   paper_metadata_id: {user_paper_link.paper_metadata_id}")
+        print(f"[import_from_arxiv]   current_user.id: {current_user.id}")
+        session.refresh(paper_meta)
+        if generated_summary:
+            session.refresh(generated_summary)
+        if edit_generate_summary:
+            session.refresh(edit_generate_summary)
+        for custom_summary in custom_summaries:
+            session.refresh(custom_summary)
+
+    await asyncio.to_thread(store_user_paper_link)
 
     # 埋め込みベクトル作成処理（create_embeddingsフラグで制御）- 統一設計
     if payload.create_embeddings:
-        vector_exists = vector_exists_for_user_paper(str(current_user.id), str(paper_meta.id))
+        vector_exists = await asyncio.to_thread(vector_exists_for_user_paper, str(current_user.id), str(paper_meta.id))
         print(f"Vector exists for user {current_user.id} and paper {paper_meta.arxiv_id}: {vector_exists}")
         
         # 1論文1ベクトル設計のため、既存ベクトルがあっても新しく作成（優先度が変更された可能性があるため）
@@ -1835,7 +1918,7 @@ def recommend_papers(
     current_user: User = Depends(get_current_active_user)
 ):
     deploy_env = os.getenv("DEPLOY", "cloud") 
-    print(f"Recommendation process started for user {current_user.id} (using {deploy_env} mode)...")
+    logger.info("Recommendation process started for user %s (using %s mode)...", current_user.id, deploy_env)
 
     fav_links = session.exec(
         select(UserPaperLink)
@@ -1852,7 +1935,7 @@ def recommend_papers(
         .limit(10)
     ).all()
 
-    print(f"User {current_user.id}: Found {len(fav_links)} favorite links and {len(dislike_links)} disliked links.")
+    logger.debug("User %s: Found %s favorite links and %s disliked links.", current_user.id, len(fav_links), len(dislike_links))
 
     fav_metadata_conditions = []
     for link in fav_links:
@@ -1878,14 +1961,14 @@ def recommend_papers(
         else:
              raise HTTPException(status_code=400, detail="推薦に必要な「お気に入り」論文がありません。")
 
-    print(f"User {current_user.id}: Found {len(fav_metadata_conditions)} favorite metadata conditions and {len(dislike_metadata_conditions)} disliked metadata conditions.")
-    print(f"[DEBUG] Sample favorite metadata condition: {fav_metadata_conditions[0] if fav_metadata_conditions else 'None'}")
-    print(f"[DEBUG] Sample dislike metadata condition: {dislike_metadata_conditions[0] if dislike_metadata_conditions else 'None'}")
+    logger.debug("User %s: Found %s favorite metadata conditions and %s disliked metadata conditions.", current_user.id, len(fav_metadata_conditions), len(dislike_metadata_conditions))
+    logger.debug("Sample favorite metadata condition: %s", fav_metadata_conditions[0] if fav_metadata_conditions else 'None')
+    logger.debug("Sample dislike metadata condition: %s", dislike_metadata_conditions[0] if dislike_metadata_conditions else 'None')
     
     fav_embedding_results = get_embeddings_by_metadata_filter(fav_metadata_conditions)
     dislike_embedding_results = get_embeddings_by_metadata_filter(dislike_metadata_conditions)
     
-    print(f"[DEBUG] Retrieved {len(fav_embedding_results)} favorite embeddings and {len(dislike_embedding_results)} dislike embeddings")
+    logger.debug("Retrieved %s favorite embeddings and %s dislike embeddings", len(fav_embedding_results), len(dislike_embedding_results))
 
     fav_embeddings = [emb for _, emb in fav_embedding_results]
     dislike_embeddings = [emb for _, emb in dislike_embedding_results]
@@ -1918,7 +2001,7 @@ def recommend_papers(
     target_links = session.exec(target_links_query).all()
 
     if not target_links:
-        print(f"User {current_user.id}: No target papers found for recommendation.")
+        logger.info("User %s: No target papers found for recommendation.", current_user.id)
         return []
 
     target_metadata_conditions_for_fetch = []
@@ -1935,7 +2018,7 @@ def recommend_papers(
             })
     
     if not target_metadata_conditions_for_fetch:
-        print(f"User {current_user.id}: No valid metadata conditions for target papers.")
+        logger.info("User %s: No valid metadata conditions for target papers.", current_user.id)
         return []
 
     target_embedding_results = get_embeddings_by_metadata_filter(target_metadata_conditions_for_fetch)
@@ -1950,10 +2033,10 @@ def recommend_papers(
             target_embeddings_list.append(embedding)
             fetched_user_paper_link_ids_for_scoring.append(user_paper_link_id)
         else:
-            print(f"Warning: Could not map fetched embedding with condition {original_cond} back to a user_paper_link_id.")
+            logger.warning("Warning: Could not map fetched embedding with condition %s back to a user_paper_link_id.", original_cond)
 
     if not target_embeddings_list:
-        print(f"User {current_user.id}: Could not fetch embeddings for target papers.")
+        logger.info("User %s: Could not fetch embeddings for target papers.", current_user.id)
         return []
 
     scores = []
@@ -1965,13 +2048,12 @@ def recommend_papers(
         dislike_similarities = cosine_similarity(dislike_vector.reshape(1, -1), target_vectors_np_array)[0]
 
     
-    print(f"target_vectors_np_array.shape: {target_vectors_np_array.shape}")
-    print(f"fav_similarities.shape: {fav_similarities.shape}")
-    print(f"fav_similarities: {len(fav_similarities)}")
-    print(f"dislike_similarities: {len(dislike_similarities)}")
+    logger.debug(
+        "target_vectors_np_array.shape: %s, fav_similarities: %d, dislike_similarities: %d",
+        target_vectors_np_array.shape, len(fav_similarities), len(dislike_similarities),
+    )
 
     for i, user_paper_link_id_for_score in enumerate(fetched_user_paper_link_ids_for_scoring):
-        print(f"User {current_user.id}: Scoring paper link ID {user_paper_link_id_for_score} with index {i}.")
         score = fav_similarities[i] - dislike_similarities[i]
         scores.append({"user_paper_link_id": user_paper_link_id_for_score, "score": score})
 
@@ -2005,7 +2087,7 @@ def recommend_papers(
     if papers_updated_count > 0:
         session.commit()
     
-    # 推薦計算の詳細情報を表示
+    # 推薦計算の詳細情報を表示（DEBUG ログが有効な場合のみ出力される）
     _display_recommendation_details(
         vector_info=vector_info,
         scores=scores,
@@ -2649,7 +2731,8 @@ def post_chat_message_async(
     if was_empty_session:
         _ensure_empty_session_exists(session, user_paper_link_id)
     
-    # バックグラウンドタスクを開始
+    # 前回処理のストリームイベントを破棄してからバックグラウンドタスクを開始
+    stream_hub.reset(paper_chat_stream_channel(target_session_id))
     background_tasks.add_task(
         run_paper_chat_async,
         user_paper_link_id,
@@ -2665,33 +2748,95 @@ def post_chat_message_async(
 
 
 @router.get("/chat-sessions/{session_id}/status", response_model=PaperChatSessionStatus)
-def get_chat_session_status(
+async def get_chat_session_status(
+    session_id: int,
+    since_id: Optional[int] = Query(None, description="このメッセージIDより後のメッセージのみ返す（増分取得）"),
+    wait: float = Query(0, ge=0, le=MAX_LONG_POLL_SECONDS, description="変化がない場合に待機する最大秒数（ロングポーリング）"),
+    known_status: Optional[str] = Query(None, description="クライアントが最後に受け取ったステータス"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """チャットセッションのステータスとメッセージを取得
+
+    since_id を指定するとそれ以降のメッセージのみを返す。wait を指定すると、新しいメッセージや
+    ステータス変化がない場合に最大 wait 秒待機してから応答する（ロングポーリング）。
+    """
+    def load_snapshot() -> PaperChatSessionStatus:
+        # 待機中にリクエストスコープの接続を保持しないよう、取得ごとにセッションを開く
+        with Session(engine) as session:
+            chat_session = session.get(PaperChatSession, session_id)
+            if not chat_session:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found")
+            
+            # 権限チェック
+            link = session.get(UserPaperLink, chat_session.user_paper_link_id)
+            if not link or link.user_id != current_user.id:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+            
+            # セッション内のメッセージを取得（since_id 指定時は増分のみ）
+            messages_stmt = select(ChatMessage).where(ChatMessage.paper_chat_session_id == session_id)
+            if since_id is not None:
+                messages_stmt = messages_stmt.where(ChatMessage.id > since_id)
+            messages = session.exec(messages_stmt.order_by(ChatMessage.id)).all()
+            
+            return PaperChatSessionStatus(
+                session_id=session_id,
+                status=chat_session.processing_status,
+                messages=[ChatMessageRead.model_validate(m) for m in messages],
+                last_updated=chat_session.last_updated,
+                last_message_id=messages[-1].id if messages else since_id
+            )
+    
+    return await long_poll_status(
+        paper_chat_status_key(session_id), load_snapshot, wait_seconds=wait, known_status=known_status
+    )
+
+
+@router.get("/chat-sessions/{session_id}/stream")
+def stream_chat_session(
     session_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
-    """チャットセッションのステータスとメッセージを取得"""
+    """チャット応答のトークンを Server-Sent Events で配信する
+
+    イベント: token（{"text"}）/ reset（リトライにより途中までのトークンを破棄）/
+    done（{"status", "message"}）/ error（{"status", "detail"}）
+    """
     chat_session = session.get(PaperChatSession, session_id)
     if not chat_session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found")
-    
-    # 権限チェック
+
     link = session.get(UserPaperLink, chat_session.user_paper_link_id)
     if not link or link.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
-    
-    # セッション内のメッセージを取得
-    messages = session.exec(
-        select(ChatMessage)
-        .where(ChatMessage.paper_chat_session_id == session_id)
-        .order_by(ChatMessage.id)
-    ).all()
-    
-    return PaperChatSessionStatus(
-        session_id=session_id,
-        status=chat_session.processing_status,
-        messages=[ChatMessageRead.model_validate(m) for m in messages],
-        last_updated=chat_session.last_updated
+
+    def load_terminal_event() -> Optional[Dict[str, Any]]:
+        # StreamingResponse の本体はリクエストスコープのセッション解放後に実行されるため独自にセッションを開く
+        with Session(engine) as db_session:
+            current = db_session.get(PaperChatSession, session_id)
+            if current is None:
+                return {"event": "error", "data": {"status": "failed", "detail": "Chat session not found"}}
+            if current.processing_status in ("pending", "processing"):
+                return None
+            if current.processing_status == "failed":
+                return {"event": "error", "data": {"status": "failed", "detail": "Chat processing failed"}}
+            last_assistant = db_session.exec(
+                select(ChatMessage)
+                .where(ChatMessage.paper_chat_session_id == session_id, ChatMessage.role == "assistant")
+                .order_by(ChatMessage.id.desc())
+            ).first()
+            return {
+                "event": "done",
+                "data": {
+                    "status": current.processing_status,
+                    "message": ChatMessageRead.model_validate(last_assistant).model_dump(mode="json") if last_assistant else None
+                }
+            }
+
+    return StreamingResponse(
+        relay_channel_as_sse(paper_chat_stream_channel(session_id), load_terminal_event),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
     )
 
 
@@ -2729,10 +2874,8 @@ async def generate_single_summary(
             raise HTTPException(status_code=400, detail="有効なarXiv URLではありません")
         
         # ★★★ ここから修正 ★★★
-        # 既存の論文をチェック
-        paper_meta = session.exec(
-            select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id)
-        ).first()
+        # 既存の論文をチェック（同期 Session の処理はイベントループを止めないようスレッドで実行する）
+        paper_meta = await asyncio.to_thread(_find_paper_metadata, session, arxiv_id)
         
         if not paper_meta:
             # 新規論文の場合、arXivから情報取得
@@ -2740,7 +2883,7 @@ async def generate_single_summary(
             # --- 失敗時に 2 回だけリトライ ---
             for _attempt in range(3):
                 try:
-                    full_text_dict = get_arxiv_metadata_with_fulltext(payload.url)
+                    full_text_dict = await asyncio.to_thread(get_arxiv_metadata_with_fulltext, payload.url)
                     break                  # 成功したら脱出
                 except Exception as fetch_e:
                     if _attempt < 2:      # 1-2 回目の失敗だけメッセージを出してリトライ
@@ -2759,22 +2902,10 @@ async def generate_single_summary(
                 abstract=remove_nul_chars(full_text_dict["abstract"]),
                 full_text=remove_nul_chars(full_text_dict.get("full_text", ""))
             )
-            session.add(paper_meta)
-            try:
-                session.commit()
-                session.refresh(paper_meta)
-                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Created new paper metadata: {paper_meta.id}")
-            except Exception as e:
-                # 一意性制約違反などでコミットに失敗した場合
-                session.rollback()
-                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Commit failed (likely due to race condition): {e}")
-                # もう一度DBから取得を試行
-                paper_meta = session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id)).first()
-                if not paper_meta:
-                    # それでも見つからない場合は他の致命的なエラー
-                    print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} CRITICAL: Failed to get paper_meta after race condition for arxiv_id: {arxiv_id}")
-                    raise HTTPException(status_code=500, detail="論文メタデータの取得に失敗しました。")
-                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Fetched existing paper_meta after race condition: {paper_meta.id}")
+            # 一意性制約違反などでコミットに失敗した場合は既存の行を取得し直す
+            paper_meta = await asyncio.to_thread(
+                _save_new_paper_metadata, session, paper_meta, arxiv_id, f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id}"
+            )
         # ★★★ ここまで修正 ★★★
         else:
             # 既存論文でfull_textが空の場合は更新
@@ -2784,7 +2915,7 @@ async def generate_single_summary(
                     # --- 失敗時に 2 回だけリトライ ---
                     for _attempt in range(3):
                         try:
-                            full_text_dict = get_arxiv_metadata_with_fulltext(payload.url)
+                            full_text_dict = await asyncio.to_thread(get_arxiv_metadata_with_fulltext, payload.url)
                             break                  # 成功したら脱出
                         except Exception as fetch_e:
                             if _attempt < 2:      # 1-2 回目の失敗だけメッセージを出してリトライ
@@ -2793,40 +2924,22 @@ async def generate_single_summary(
                             else:
                                 raise              # 3 回目も失敗したら従来どおり例外を伝搬
                     paper_meta.full_text = remove_nul_chars(full_text_dict.get("full_text", ""))
-                    session.add(paper_meta)
-                    session.commit()
+                    await asyncio.to_thread(_save_and_commit, session, paper_meta)
                     print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Updated full_text for existing paper: {paper_meta.id}")
                 except Exception as e:
                     print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Failed to update full_text: {e}")
         
         # ステップ2: UserPaperLinkの取得・作成
         print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Searching UserPaperLink for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
-        user_paper_link = session.exec(
-            select(UserPaperLink)
-            .where(UserPaperLink.user_id == current_user.id)
-            .where(UserPaperLink.paper_metadata_id == paper_meta.id)
-        ).first()
-        
-        if not user_paper_link:
-            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} UserPaperLink not found, creating new one for user_id: {current_user.id}")
-            user_paper_link = UserPaperLink(
-                user_id=current_user.id,
-                paper_metadata_id=paper_meta.id,
-                tags="",
-                memo=""
-            )
-            session.add(user_paper_link)
-            session.commit()
-            session.refresh(user_paper_link)
-            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Created new UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
-        else:
-            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Found existing UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
+        user_paper_link = await asyncio.to_thread(
+            _get_or_create_user_paper_link, session, current_user.id, paper_meta.id, f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id}"
+        )
         
         # ステップ2.5: タグ生成・埋め込みベクトル作成フラグの設定
         # 1. 最初のデフォルト要約時は必ず実行
         # 2. 2回目以降では、タグまたはベクトルが存在しない場合のみ実行
         has_tags = bool(user_paper_link.tags)
-        has_vector = vector_exists_for_user_paper(current_user.id, str(paper_meta.id))
+        has_vector = await asyncio.to_thread(vector_exists_for_user_paper, current_user.id, str(paper_meta.id))
 
         create_vector_flag = payload.create_embedding and (payload.is_first_summary_for_paper or not has_vector)
         print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} create_vector_flag: {create_vector_flag}, has_tags: {has_tags}, has_vector: {has_vector}")
@@ -2845,13 +2958,13 @@ async def generate_single_summary(
         
         # カスタムプロンプトの場合はプロンプト名を取得
         if payload.system_prompt_id:
-            system_prompt = session.get(SystemPrompt, payload.system_prompt_id)
+            system_prompt = await asyncio.to_thread(session.get, SystemPrompt, payload.system_prompt_id)
             if system_prompt:
                 prompt_name = system_prompt.name
             else:
                 prompt_name = f"カスタムプロンプト (ID: {payload.system_prompt_id})"
         
-        # 既存要約チェック
+        # 既存要約チェック（同期 Session のクエリはスレッドで実行する）
         generated_summary = None
         custom_summary = None
         using_existing_summaries = False
@@ -2860,28 +2973,36 @@ async def generate_single_summary(
         
         # デフォルトプロンプトの場合
         if payload.system_prompt_id is None:
-            # キャラクター無し要約をチェック
-            existing_character_neutral = session.exec(
-                select(GeneratedSummary)
-                .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
-                .where(GeneratedSummary.llm_provider == llm_config_to_use.get("llm_name", "Unknown"))
-                .where(GeneratedSummary.llm_model_name == llm_config_to_use.get("llm_model_name", "Unknown"))
-                .where(GeneratedSummary.character_role.is_(None))  # キャラクター中立のみ
-                .where(not_(GeneratedSummary.llm_abst.like("[PROCESSING%")))  # PROCESSING状態は除外
-            ).first()
-            
-            # キャラクター付き要約をチェック
             user_character = current_user.selected_character
-            if user_character:
-                existing_character_summary = session.exec(
+            
+            def find_existing_default_summaries():
+                # キャラクター無し要約をチェック
+                existing_character_neutral = session.exec(
                     select(GeneratedSummary)
                     .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
                     .where(GeneratedSummary.llm_provider == llm_config_to_use.get("llm_name", "Unknown"))
                     .where(GeneratedSummary.llm_model_name == llm_config_to_use.get("llm_model_name", "Unknown"))
-                    .where(GeneratedSummary.character_role == user_character)
+                    .where(GeneratedSummary.character_role.is_(None))  # キャラクター中立のみ
                     .where(not_(GeneratedSummary.llm_abst.like("[PROCESSING%")))  # PROCESSING状態は除外
                 ).first()
             
+                # キャラクター付き要約をチェック
+                existing_character_summary = None
+                if user_character:
+                    existing_character_summary = session.exec(
+                        select(GeneratedSummary)
+                        .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
+                        .where(GeneratedSummary.llm_provider == llm_config_to_use.get("llm_name", "Unknown"))
+                        .where(GeneratedSummary.llm_model_name == llm_config_to_use.get("llm_model_name", "Unknown"))
+                        .where(GeneratedSummary.character_role == user_character)
+                        .where(not_(GeneratedSummary.llm_abst.like("[PROCESSING%")))  # PROCESSING状態は除外
+                    ).first()
+                return existing_character_neutral, existing_character_summary
+            
+            existing_character_neutral, existing_character_summary = await asyncio.to_thread(
+                find_existing_default_summaries
+            )
+            
             # 両方存在する場合は既存要約を使用
             if existing_character_neutral and (not user_character or existing_character_summary):
                 print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Using existing default summaries - neutral: {existing_character_neutral.id}, character: {existing_character_summary.id if existing_character_summary else 'None'}")
@@ -2901,30 +3022,38 @@ async def generate_single_summary(
                 
         else:
             # カスタムプロンプトの場合
-            # キャラクター無しカスタム要約をチェック
-            existing_custom_neutral = session.exec(
-                select(CustomGeneratedSummary)
-                .where(CustomGeneratedSummary.user_id == current_user.id)
-                .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
-                .where(CustomGeneratedSummary.system_prompt_id == payload.system_prompt_id)
-                .where(CustomGeneratedSummary.llm_provider == llm_config_to_use.get("llm_name", "Unknown"))
-                .where(CustomGeneratedSummary.llm_model_name == llm_config_to_use.get("llm_model_name", "Unknown"))
-                .where(CustomGeneratedSummary.character_role.is_(None))
-            ).first()
-            
-            # キャラクター付きカスタム要約をチェック
             user_character = current_user.selected_character
-            if user_character:
-                existing_custom_character = session.exec(
+            
+            def find_existing_custom_summaries():
+                # キャラクター無しカスタム要約をチェック
+                existing_custom_neutral = session.exec(
                     select(CustomGeneratedSummary)
                     .where(CustomGeneratedSummary.user_id == current_user.id)
                     .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
                     .where(CustomGeneratedSummary.system_prompt_id == payload.system_prompt_id)
                     .where(CustomGeneratedSummary.llm_provider == llm_config_to_use.get("llm_name", "Unknown"))
                     .where(CustomGeneratedSummary.llm_model_name == llm_config_to_use.get("llm_model_name", "Unknown"))
-                    .where(CustomGeneratedSummary.character_role == user_character)
+                    .where(CustomGeneratedSummary.character_role.is_(None))
                 ).first()
             
+                # キャラクター付きカスタム要約をチェック
+                existing_custom_character = None
+                if user_character:
+                    existing_custom_character = session.exec(
+                        select(CustomGeneratedSummary)
+                        .where(CustomGeneratedSummary.user_id == current_user.id)
+                        .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
+                        .where(CustomGeneratedSummary.system_prompt_id == payload.system_prompt_id)
+                        .where(CustomGeneratedSummary.llm_provider == llm_config_to_use.get("llm_name", "Unknown"))
+                        .where(CustomGeneratedSummary.llm_model_name == llm_config_to_use.get("llm_model_name", "Unknown"))
+                        .where(CustomGeneratedSummary.character_role == user_character)
+                    ).first()
+                return existing_custom_neutral, existing_custom_character
+            
+            existing_custom_neutral, existing_custom_character = await asyncio.to_thread(
+                find_existing_custom_summaries
+            )
+            
             # 両方存在する場合は既存要約を使用
             if existing_custom_neutral and (not user_character or existing_custom_character):
                 print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Using existing custom summaries - neutral: {existing_custom_neutral.id}, character: {existing_custom_character.id if existing_custom_character else 'None'}")
@@ -2944,77 +3073,84 @@ async def generate_single_summary(
         
         
         # UserPaperLinkの選択状態を更新（キャラクター要約を優先選択）
-        # セッションキャッシュをクリアして最新状態を取得
-        session.expire_all()
-        
-        # 既存要約を使用している場合は直接キャラクター要約を設定
-        if using_existing_summaries:
-            if payload.system_prompt_id is None:
-                # デフォルトプロンプト：キャラクター要約を優先
-                selected_default = existing_character_summary if existing_character_summary else generated_summary
-                selected_custom = None
-                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Using existing summaries - selected default: {selected_default.id if selected_default else None}")
-            else:
-                # カスタムプロンプト：キャラクター要約を優先
-                selected_default = None
-                selected_custom = existing_custom_character if existing_custom_character else custom_summary
-                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Using existing summaries - selected custom: {selected_custom.id if selected_custom else None}")
-        else:
-            # 新しく生成した場合は今回使用したプロンプト条件でDBから全要約を取得
-            # 今回生成された全要約（キャラクターなし+キャラクターあり）を対象とする
-            if payload.system_prompt_id:
-                # カスタムプロンプトの場合
-                current_custom_summaries = session.exec(
-                    select(CustomGeneratedSummary)
-                    .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
-                    .where(CustomGeneratedSummary.system_prompt_id == payload.system_prompt_id)
-                    .order_by(CustomGeneratedSummary.created_at.desc())
-                ).all()
-                current_generated_summaries = []
+        # 選択クエリとコミットは同期 Session を使うためスレッドで実行する
+        def update_user_paper_link_selection():
+            user_paper_link_to_update = user_paper_link
+            # セッションキャッシュをクリアして最新状態を取得
+            session.expire_all()
+        
+            # 既存要約を使用している場合は直接キャラクター要約を設定
+            if using_existing_summaries:
+                if payload.system_prompt_id is None:
+                    # デフォルトプロンプト：キャラクター要約を優先
+                    selected_default = existing_character_summary if existing_character_summary else generated_summary
+                    selected_custom = None
+                    print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Using existing summaries - selected default: {selected_default.id if selected_default else None}")
+                else:
+                    # カスタムプロンプト：キャラクター要約を優先
+                    selected_default = None
+                    selected_custom = existing_custom_character if existing_custom_character else custom_summary
+                    print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Using existing summaries - selected custom: {selected_custom.id if selected_custom else None}")
             else:
-                # デフォルトプロンプトの場合
-                current_generated_summaries = session.exec(
-                    select(GeneratedSummary)
-                    .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
-                    .order_by(GeneratedSummary.created_at.desc())
-                ).all()
-                current_custom_summaries = []
+                # 新しく生成した場合は今回使用したプロンプト条件でDBから全要約を取得
+                # 今回生成された全要約（キャラクターなし+キャラクターあり）を対象とする
+                if payload.system_prompt_id:
+                    # カスタムプロンプトの場合
+                    current_custom_summaries = session.exec(
+                        select(CustomGeneratedSummary)
+                        .where(CustomGeneratedSummary.paper_metadata_id == paper_meta.id)
+                        .where(CustomGeneratedSummary.system_prompt_id == payload.system_prompt_id)
+                        .order_by(CustomGeneratedSummary.created_at.desc())
+                    ).all()
+                    current_generated_summaries = []
+                else:
+                    # デフォルトプロンプトの場合
+                    current_generated_summaries = session.exec(
+                        select(GeneratedSummary)
+                        .where(GeneratedSummary.paper_metadata_id == paper_meta.id)
+                        .order_by(GeneratedSummary.created_at.desc())
+                    ).all()
+                    current_custom_summaries = []
             
-            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Current generated summaries: {len(current_generated_summaries)}, current custom summaries: {len(current_custom_summaries)}")
+                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Current generated summaries: {len(current_generated_summaries)}, current custom summaries: {len(current_custom_summaries)}")
             
-            # 今回使用したプロンプト条件の全要約からキャラクター要約を優先して選択
-            selected_default, selected_custom = select_best_summary_by_priority(
-                current_generated_summaries, current_custom_summaries, selection_mode="initial",
-                user_selected_character=current_user.selected_character
-            )
-        
-        # UserPaperLinkに選択結果を設定 - セキュリティ強化
-        # session.expire_all()後にuser_paper_linkオブジェクトが正しいレコードを参照しているか確認
-        print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} SECURITY CHECK: user_paper_link.user_id={user_paper_link.user_id}, current_user.id={current_user.id}")
+                # 今回使用したプロンプト条件の全要約からキャラクター要約を優先して選択
+                selected_default, selected_custom = select_best_summary_by_priority(
+                    current_generated_summaries, current_custom_summaries, selection_mode="initial",
+                    user_selected_character=current_user.selected_character
+                )
         
-        # セキュリティチェック：user_idが一致しない場合は再取得
-        if user_paper_link.user_id != current_user.id:
-            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} SECURITY ALERT: UserPaperLink user_id mismatch! Re-fetching correct record...")
-            user_paper_link = session.exec(
-                select(UserPaperLink)
-                .where(UserPaperLink.user_id == current_user.id)
-                .where(UserPaperLink.paper_metadata_id == paper_meta.id)
-            ).first()
+            # UserPaperLinkに選択結果を設定 - セキュリティ強化
+            # session.expire_all()後にuser_paper_linkオブジェクトが正しいレコードを参照しているか確認
+            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} SECURITY CHECK: user_paper_link.user_id={user_paper_link_to_update.user_id}, current_user.id={current_user.id}")
+        
+            # セキュリティチェック：user_idが一致しない場合は再取得
+            if user_paper_link_to_update.user_id != current_user.id:
+                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} SECURITY ALERT: UserPaperLink user_id mismatch! Re-fetching correct record...")
+                user_paper_link_to_update = session.exec(
+                    select(UserPaperLink)
+                    .where(UserPaperLink.user_id == current_user.id)
+                    .where(UserPaperLink.paper_metadata_id == paper_meta.id)
+                ).first()
             
-            if not user_paper_link:
-                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} CRITICAL ERROR: UserPaperLink not found after security check!")
-                raise HTTPException(status_code=500, detail="UserPaperLink security check failed")
+                if not user_paper_link_to_update:
+                    print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} CRITICAL ERROR: UserPaperLink not found after security check!")
+                    raise HTTPException(status_code=500, detail="UserPaperLink security check failed")
             
-            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} SECURITY RECOVERED: Correct UserPaperLink {user_paper_link.id} for user_id {user_paper_link.user_id}")
+                print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} SECURITY RECOVERED: Correct UserPaperLink {user_paper_link_to_update.id} for user_id {user_paper_link_to_update.user_id}")
         
-        user_paper_link.selected_generated_summary_id = selected_default.id if selected_default else None
-        user_paper_link.selected_custom_generated_summary_id = selected_custom.id if selected_custom else None
+            user_paper_link_to_update.selected_generated_summary_id = selected_default.id if selected_default else None
+            user_paper_link_to_update.selected_custom_generated_summary_id = selected_custom.id if selected_custom else None
         
-        print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Selected summary - default: {user_paper_link.selected_generated_summary_id}, custom: {user_paper_link.selected_custom_generated_summary_id}")
-        print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Final confirmation: UserPaperLink {user_paper_link.id} belongs to user_id {user_paper_link.user_id}")
+            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Selected summary - default: {user_paper_link_to_update.selected_generated_summary_id}, custom: {user_paper_link_to_update.selected_custom_generated_summary_id}")
+            print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Final confirmation: UserPaperLink {user_paper_link_to_update.id} belongs to user_id {user_paper_link_to_update.user_id}")
         
-        session.add(user_paper_link)
-        session.commit()
+            session.add(user_paper_link_to_update)
+            session.commit()
+            session.refresh(user_paper_link_to_update)
+            return user_paper_link_to_update
+        
+        user_paper_link = await asyncio.to_thread(update_user_paper_link_selection)
         
         # ステップ4: ベクトル作成（必要な場合のみ）
         # ベクトル化にはキャラクターなしの要約（generated_summary）を常に使用
@@ -3041,7 +3177,9 @@ async def generate_single_summary(
         # ステップ5: タグ生成（共通関数を使用）
         if needs_tag_generation and paper_meta.id is not None:
             print(f"[generate_single_summary]{arxiv_id}:{payload.system_prompt_id} Starting tag generation using common function")
-            tag_generated = _generate_tags_if_needed(
+            # タグ生成は同期の DB・LLM 呼び出しのため、スレッドで実行する
+            tag_generated = await asyncio.to_thread(
+                _generate_tags_if_needed,
                 paper_metadata_id=paper_meta.id,
                 user_id=current_user.id,
                 session=session,
@@ -3084,6 +3222,56 @@ async def generate_single_summary(
         )
 
 
+# 実行中のストリーミング要約生成タスク（ガベージコレクションで中断されないよう参照を保持する）
+_generation_tasks: set = set()
+
+
+@router.post("/generate_single_summary/stream")
+async def generate_single_summary_stream(
+    payload: SingleSummaryRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """単一要約生成のトークンを Server-Sent Events で配信する
+
+    処理内容は /generate_single_summary と同じ。要約LLMの出力を token イベント
+    （{"variant": "default" | "character", "text"}）として逐次送信し、
+    完了時に done（SingleSummaryResponse）、失敗時に error（{"status", "detail"}）を送る。
+    """
+    channel = f"single_summary:{uuid.uuid4().hex}"
+    stream_hub.reset(channel)
+
+    async def run_generation():
+        current_stream_channel.set(channel)
+        try:
+            # リクエストスコープのセッションはレスポンス開始時に閉じられるため独自に開く
+            with Session(engine) as db_session:
+                result = await generate_single_summary(payload, db_session, current_user)
+            stream_hub.publish(channel, "done", result.model_dump(mode="json"))
+        except HTTPException as e:
+            stream_hub.publish(channel, "error", {"status": "failed", "detail": e.detail})
+        except Exception as e:
+            print(f"[generate_single_summary_stream] Error: {e}")
+            stream_hub.publish(channel, "error", {"status": "failed", "detail": str(e)})
+        finally:
+            stream_hub.close(channel)
+
+    # クライアント切断でジェネレータが止まっても要約生成は最後まで実行して保存する
+    generation_task = asyncio.create_task(run_generation())
+    _generation_tasks.add(generation_task)
+    generation_task.add_done_callback(_generation_tasks.discard)
+
+    def load_terminal_event() -> Optional[Dict[str, Any]]:
+        if generation_task.done() and not stream_hub.has_channel(channel):
+            return {"event": "error", "data": {"status": "failed", "detail": "Stream expired"}}
+        return None
+
+    return StreamingResponse(
+        relay_channel_as_sse(channel, load_terminal_event),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
 @router.post("/generate_multiple_summaries_parallel", response_model=MultipleSummaryResponse)
 async def generate_multiple_summaries_parallel(
     payload: MultipleSummaryRequest,
@@ -3117,9 +3305,8 @@ async def generate_multiple_summaries_parallel(
     
     try:
         # ステップ1: 論文メタデータの取得・保存（単一要約と同じロジック）
-        paper_meta = session.exec(
-            select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id)
-        ).first()
+        # 同期 Session の処理はイベントループを止めないようスレッドで実行する
+        paper_meta = await asyncio.to_thread(_find_paper_metadata, session, arxiv_id)
         
         if not paper_meta:
             # 新規論文の場合、arXivから情報取得
@@ -3145,17 +3332,9 @@ async def generate_multiple_summaries_parallel(
                 abstract=remove_nul_chars(full_text_dict["abstract"]),
                 full_text=remove_nul_chars(full_text_dict.get("full_text", ""))
             )
-            session.add(paper_meta)
-            try:
-                session.commit()
-                session.refresh(paper_meta)
-                print(f"[generate_multiple_summaries_parallel] Created new paper metadata: {paper_meta.id}")
-            except Exception as e:
-                session.rollback()
-                print(f"[generate_multiple_summaries_parallel] Commit failed, fetching existing: {e}")
-                paper_meta = session.exec(select(PaperMetadata).where(PaperMetadata.arxiv_id == arxiv_id)).first()
-                if not paper_meta:
-                    raise HTTPException(status_code=500, detail="論文メタデータの取得に失敗しました。")
+            paper_meta = await asyncio.to_thread(
+                _save_new_paper_metadata, session, paper_meta, arxiv_id, "[generate_multiple_summaries_parallel]"
+            )
         else:
             # 既存論文でfull_textが空の場合は更新
             if not paper_meta.full_text:
@@ -3172,37 +3351,16 @@ async def generate_multiple_summaries_parallel(
                             else:
                                 raise
                     paper_meta.full_text = remove_nul_chars(full_text_dict.get("full_text", ""))
-                    session.add(paper_meta)
-                    session.commit()
+                    await asyncio.to_thread(_save_and_commit, session, paper_meta)
                     print(f"[generate_multiple_summaries_parallel] Updated full_text for existing paper: {paper_meta.id}")
                 except Exception as e:
                     print(f"[generate_multiple_summaries_parallel] Failed to update full_text: {e}")
         
         # ステップ2: UserPaperLinkの取得・作成
         print(f"[generate_multiple_summaries_parallel] Searching UserPaperLink for user_id: {current_user.id}, paper_metadata_id: {paper_meta.id}")
-        user_paper_link = session.exec(
-            select(UserPaperLink).where(
-                and_(
-                    UserPaperLink.user_id == current_user.id,
-                    UserPaperLink.paper_metadata_id == paper_meta.id
-                )
-            )
-        ).first()
-        
-        if not user_paper_link:
-            print(f"[generate_multiple_summaries_parallel] UserPaperLink not found, creating new one for user_id: {current_user.id}")
-            user_paper_link = UserPaperLink(
-                user_id=current_user.id,
-                paper_metadata_id=paper_meta.id,
-                tags="",
-                memo=""
-            )
-            session.add(user_paper_link)
-            session.commit()
-            session.refresh(user_paper_link)
-            print(f"[generate_multiple_summaries_parallel] Created new UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
-        else:
-            print(f"[generate_multiple_summaries_parallel] Found existing UserPaperLink: {user_paper_link.id} for user_id: {user_paper_link.user_id}")
+        user_paper_link = await asyncio.to_thread(
+            _get_or_create_user_paper_link, session, current_user.id, paper_meta.id, "[generate_multiple_summaries_parallel]"
+        )
         
         # タグ・ベクトル存在チェック
         has_tags = bool(user_paper_link.tags and user_paper_link.tags.strip())
@@ -3241,7 +3399,7 @@ async def generate_multiple_summaries_parallel(
                             if "prepared state" in error_message or "commit" in error_message or "rollback" in error_message:
                                 if attempt < max_retries - 1:
                                     await asyncio.sleep(1)  # 1秒待機してからリトライ
-                                    task_session.rollback()  # セッションをクリーンアップ
+                                    await asyncio.to_thread(task_session.rollback)  # セッションをクリーンアップ
                                     continue
                             raise  # リトライ対象外またはリトライ回数上限の場合は例外を再発生
                     
@@ -3266,7 +3424,7 @@ async def generate_multiple_summaries_parallel(
                         # カスタムプロンプト名を取得
                         if system_prompt_id:
                             try:
-                                system_prompt = task_session.get(SystemPrompt, system_prompt_id)
+                                system_prompt = await asyncio.to_thread(task_session.get, SystemPrompt, system_prompt_id)
                                 if system_prompt:
                                     prompt_name = system_prompt.name
                                 else:
@@ -3328,7 +3486,7 @@ async def generate_multiple_summaries_parallel(
         print(f"[generate_multiple_summaries_parallel] Parallel execution completed: {len(successful_results)} success, {len(failed_results)} failed")
         
         # ステップ4: UserPaperLinkの選択要約設定（新規作成要約から選択）
-        if successful_results:
+        def select_summaries_for_link():
             # セッションキャッシュをクリアして最新状態を取得
             session.expire_all()
             
@@ -3373,6 +3531,10 @@ async def generate_multiple_summaries_parallel(
             
             session.add(user_paper_link)
             session.commit()
+            session.refresh(user_paper_link)
+
+        if successful_results:
+            await asyncio.to_thread(select_summaries_for_link)
         
         # ステップ5: ベクトル作成（embedding_targetに基づいて）
         vector_created = False
@@ -3415,7 +3577,9 @@ async def generate_multiple_summaries_parallel(
         tags_created = False
         if not has_tags and paper_meta.id is not None:
             print(f"[generate_multiple_summaries_parallel] Starting tag generation using common function")
-            tags_created = _generate_tags_if_needed(
+            # タグ生成は同期の DB・LLM 呼び出しのため、スレッドで実行する
+            tags_created = await asyncio.to_thread(
+                _generate_tags_if_needed,
                 paper_metadata_id=paper_meta.id,
                 user_id=current_user.id,
                 session=session,
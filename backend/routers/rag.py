@@ -1,5 +1,6 @@
 # backend/routers/rag.py
-from fastapi import APIRouter, Depends, HTTPException, status, Request, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Request, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, delete, col
 from datetime import datetime
 from typing import List, Optional, Dict, Any, Union
@@ -12,17 +13,23 @@ from schemas import (
 from models import (
     RagSession, RagMessage, UserPaperLink, PaperMetadata, GeneratedSummary, User
 )
-from db import get_session, engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db import get_session, get_async_session, async_session_scope, engine
 from routers.module.util import initialize_llm
+from routers.module.stream_hub import stream_hub, relay_channel_as_sse, chunk_text, SSE_HEADERS
+from routers.module.status_notifier import long_poll_status, rag_session_status_key, MAX_LONG_POLL_SECONDS
+from routers.module.graph_registry import get_compiled_graph
+from routers.module.llm_retry import ainvoke_with_retry
+from routers.module.rag_history import load_rag_history_async, schedule_history_summary_refresh
 from auth_utils import get_current_active_user
 
 from langchain_core.tools import Tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, HumanMessagePromptTemplate
-from langchain_core.messages import AIMessage, HumanMessage, AnyMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, AnyMessage, SystemMessage, ToolMessage
 from langgraph.types import Command
 from langgraph.prebuilt import ToolNode
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
 
 import operator
 import time
@@ -60,7 +67,8 @@ class GraphState(TypedDict):
     tags: str
     user_id: int
 
-def create_langgraph(chain, tools_for_graph: List[Tool]):
+def _build_simple_rag_graph():
+    # チェーンとツールはリクエストごとに異なるため config["configurable"] から受け取る（simple_rag_configurable を参照）
 
     def should_continue(state: GraphState):
         messages = state["messages"]
@@ -71,40 +79,49 @@ def create_langgraph(chain, tools_for_graph: List[Tool]):
             return "tools"
         return END
 
-    async def call_llm(state: GraphState):
-        error_cnt = 0
+    async def call_llm(state: GraphState, config: RunnableConfig):
+        chain = config["configurable"]["rag_chain"]
         print("====Calling LLM in call_llm====")
         print(f"LLM call state: {state}")
-        while True:
-            try:
-                response = await chain.ainvoke(
-                    {"messages":state["messages"], "query": state["query"], "tags": state["tags"], "user_id": state["user_id"]})
-                break
-            except Exception as e:
-                if error_cnt >= 3:
-                    raise e
-                print(f"LLM call failed: {e}")
-                time.sleep(61)
-                error_cnt += 1
+        # タイムアウト・指数バックオフ（Retry-After 優先）・サーキットブレーカー付きで実行
+        response = await ainvoke_with_retry(
+            chain, {"messages":state["messages"], "query": state["query"], "tags": state["tags"], "user_id": state["user_id"]})
 
         print("====LLM response in call_llm====")
         print(response)
         print(f"state for LLM call: {state}")
         return {"messages": [response]}
 
-    tool_node = ToolNode(tools_for_graph)
+    async def call_tools(state: GraphState, config: RunnableConfig):
+        return await config["configurable"]["rag_tool_node"].ainvoke(state, config)
 
     workflow = StateGraph(GraphState)
     workflow.add_node("agent", call_llm)
-    workflow.add_node("tools", tool_node)
+    workflow.add_node("tools", call_tools)
 
     workflow.add_edge(START, "agent")
     workflow.add_conditional_edges("agent", should_continue)
     workflow.add_edge("tools", "agent")
 
-    memory = MemorySaver()
-    graph = workflow.compile(checkpointer=memory)
-    return graph
+    # 1回の ainvoke/astream で完結するためチェックポインタは不要
+    # （共有グラフに MemorySaver を持たせると同一 thread_id の履歴が実行をまたいで蓄積される）
+    return workflow.compile()
+
+
+def get_simple_rag_graph():
+    """Simple RAG のコンパイル済みグラフを返す（プロセス内で一度だけコンパイル）"""
+    return get_compiled_graph("simple_rag", _build_simple_rag_graph)
+
+
+def _local_rag_search_in_new_session(query: str, user_id: int, tags: str) -> List[Dict[str, Any]]:
+    """ローカル RAG 検索ツールの実体（ツールはスレッドプールで実行されるため、呼び出しごとに同期セッションを開く）"""
+    with Session(engine) as tool_db_session:
+        return AVAILABLE_TOOL_IMPLEMENTATIONS["local_rag_search_tool"](query=query, user_id=user_id, db_session=tool_db_session, tags=tags)
+
+
+def simple_rag_configurable(chain, tools_for_graph: List[Tool]) -> Dict[str, Any]:
+    """Simple RAG グラフの1回の実行に必要なチェーンとツールノードを configurable 用にまとめる"""
+    return {"rag_chain": chain, "rag_tool_node": ToolNode(tools_for_graph)}
 
 @router.get("/config/models")
 def get_rag_model_config():
@@ -170,7 +187,7 @@ def list_rag_messages(
 async def rag_query(
     payload: RagQuery,
     request: Request,
-    db_session: Session = Depends(get_session),
+    db_session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     
@@ -189,7 +206,10 @@ async def rag_query(
     base_url_origin: str = request.headers.get("origin", "")
 
     try:
-        tool_prompt_parts_json = get_rag_tool_prompt_parts(db_session, current_user.id, base_url_origin=base_url_origin)
+        # 同期 Session を受け取るプロンプト取得は AsyncSession.run_sync でイベントループを止めずに実行する
+        tool_prompt_parts_json = await db_session.run_sync(
+            lambda s: get_rag_tool_prompt_parts(s, current_user.id, base_url_origin=base_url_origin)
+        )
         tool_prompt_parts = json_module.loads(tool_prompt_parts_json)
     except Exception as e:
         logger.error(f"ツールプロンプト部品の取得に失敗しました（ユーザーID: {current_user.id}）: {e}")
@@ -197,11 +217,9 @@ async def rag_query(
         tool_prompt_parts = TOOL_PROMPT_PARTS
 
     if "local_rag_search_tool" in selected_tool_names:
-        local_rag_impl = AVAILABLE_TOOL_IMPLEMENTATIONS["local_rag_search_tool"]
-        
         bound_local_rag_search_tool = Tool(
             name="local_rag_search_tool",
-            func=lambda query, tags=",".join(payload.tags or []): local_rag_impl(query=query, user_id=current_user.id, db_session=db_session, tags=tags),
+            func=lambda query, tags=",".join(payload.tags or []): _local_rag_search_in_new_session(query=query, user_id=current_user.id, tags=tags),
             description="""ユーザーの知識ベース（登録された論文の要約）内を検索します。ユーザーの質問に基づいて、関連する論文情報を取得します。""",
         )
         active_tools.append(bound_local_rag_search_tool)
@@ -232,10 +250,14 @@ async def rag_query(
         try:
             print(f"system_prompt_id: {payload.selected_prompts[0].system_prompt_id}")
             if payload.use_character_prompt:
-                system_prompt_content = get_rag_no_tool_system_prompt_with_character(db_session, current_user.id,system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                system_prompt_content = await db_session.run_sync(
+                    lambda s: get_rag_no_tool_system_prompt_with_character(s, current_user.id, system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                )
                 logger.info(f"RAGノーツールシステムプロンプト（キャラクター付き）を動的取得しました（ユーザーID: {current_user.id}）")
             else:
-                system_prompt_content = get_rag_no_tool_system_prompt(db_session, current_user.id,system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                system_prompt_content = await db_session.run_sync(
+                    lambda s: get_rag_no_tool_system_prompt(s, current_user.id, system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                )
                 logger.info(f"RAGノーツールシステムプロンプト（キャラクターなし）を動的取得しました（ユーザーID: {current_user.id}）")
         except Exception as e:
             logger.error(f"RAGノーツールシステムプロンプトの取得に失敗しました（ユーザーID: {current_user.id}）: {e}")
@@ -244,10 +266,14 @@ async def rag_query(
     else:
         try:
             if payload.use_character_prompt:
-                system_prompt_template = get_rag_base_system_prompt_with_character(db_session, current_user.id, system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                system_prompt_template = await db_session.run_sync(
+                    lambda s: get_rag_base_system_prompt_with_character(s, current_user.id, system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                )
                 prompt_type_desc = "キャラクター付き"
             else:
-                system_prompt_template = get_rag_base_system_prompt(db_session, current_user.id, system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                system_prompt_template = await db_session.run_sync(
+                    lambda s: get_rag_base_system_prompt(s, current_user.id, system_prompt_id=payload.selected_prompts[0].system_prompt_id)
+                )
                 prompt_type_desc = "キャラクターなし"
             
             system_prompt_content = system_prompt_template.format(
@@ -266,13 +292,15 @@ async def rag_query(
     
     rag_sess_obj: Optional[RagSession] = None
     if payload.session_id:
-        rag_sess_obj = db_session.get(RagSession, payload.session_id)
+        rag_sess_obj = await db_session.get(RagSession, payload.session_id)
         if not rag_sess_obj or rag_sess_obj.user_id != current_user.id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG session not found or not authorized")
     else:
         rag_sess_obj = RagSession(user_id=current_user.id)
         try:
-            prompt_title_new = get_rag_title_generation_prompt(db_session, current_user.id, query=payload.query)
+            prompt_title_new = await db_session.run_sync(
+                lambda s: get_rag_title_generation_prompt(s, current_user.id, query=payload.query)
+            )
             logger.info(f"RAGタイトル生成プロンプトを動的取得しました（ユーザーID: {current_user.id}）")
         except Exception as e:
             logger.error(f"RAGタイトル生成プロンプトの取得に失敗しました（ユーザーID: {current_user.id}）: {e}")
@@ -292,15 +320,17 @@ async def rag_query(
         rag_sess_obj.title = title_gen_new
         
         db_session.add(rag_sess_obj)
-        db_session.commit()
-        db_session.refresh(rag_sess_obj)
+        await db_session.commit()
+        await db_session.refresh(rag_sess_obj)
         payload.session_id = rag_sess_obj.id 
         graph_config["configurable"]["thread_id"] = f"user_{current_user.id}_rag_{rag_sess_obj.id}"
 
 
     if not rag_sess_obj.title:
         try:
-            prompt_title_existing = get_rag_title_generation_prompt(db_session, current_user.id, query=payload.query)
+            prompt_title_existing = await db_session.run_sync(
+                lambda s: get_rag_title_generation_prompt(s, current_user.id, query=payload.query)
+            )
             logger.info(f"RAGタイトル生成プロンプトを動的取得しました（既存セッション、ユーザーID: {current_user.id}）")
         except Exception as e:
             logger.error(f"RAGタイトル生成プロンプトの取得に失敗しました（既存セッション、ユーザーID: {current_user.id}）: {e}")
@@ -319,13 +349,13 @@ async def rag_query(
             title_gen_existing = payload.query[0:15]
         rag_sess_obj.title = title_gen_existing
         db_session.add(rag_sess_obj)
-        db_session.commit()
+        await db_session.commit()
 
     user_msg_db = RagMessage(
         session_id=rag_sess_obj.id, role="user", content=payload.query
     )
     db_session.add(user_msg_db)
-    db_session.commit()
+    await db_session.commit()
 
     llm_for_rag = initialize_llm(
         name=payload.provider,
@@ -345,29 +375,13 @@ async def rag_query(
 
     chain_rag = prompt_rag | llm_for_rag.with_config({"run_name": "RAG_LLM_Chain"}).bind_tools(active_tools)
 
-    agent_rag = create_langgraph(
-        chain=chain_rag,
-        tools_for_graph=active_tools,
-    )
-
-    db_msgs_rag = db_session.exec(
-        select(RagMessage).where(RagMessage.session_id == rag_sess_obj.id).order_by(RagMessage.id)
-    ).all()
-    history_rag: list[AnyMessage] = []
-    for m_hist in db_msgs_rag:
-        if m_hist.role == "user": history_rag.append(HumanMessage(content=m_hist.content))
-        elif m_hist.role == "assistant": 
-            history_rag.append(AIMessage(content=m_hist.content))
-        elif m_hist.role == "tool":
-            if m_hist.metadata_json:
-                try:
-                    tool_meta = json.loads(m_hist.metadata_json)
-                    history_rag.append(ToolMessage(content=m_hist.content, tool_call_id=tool_meta.get("tool_call_id", "")))
-                except:
-                    history_rag.append(ToolMessage(content=m_hist.content, tool_call_id="unknown"))
-            else:
-                history_rag.append(ToolMessage(content=m_hist.content, tool_call_id="unknown"))
+    agent_rag = get_simple_rag_graph()
+    graph_config["configurable"].update(simple_rag_configurable(chain_rag, active_tools))
 
+    # 要約 + トークン予算内の直近履歴のみを読み込む
+    history_rag: list[AnyMessage] = await load_rag_history_async(db_session, rag_sess_obj.id)
+    # グラフ実行中（LLM 待ち）は DB 接続を保持しない
+    await db_session.commit()
 
     initial_graph_state = GraphState(
         messages=history_rag,
@@ -458,7 +472,9 @@ async def rag_query(
         ai_msg_db.metadata_json = json.dumps({"references": refs_for_db_serializable})
 
     db_session.add(ai_msg_db)
-    db_session.commit()
+    await db_session.commit()
+    # 予算外になった古い履歴の要約は応答後にバックグラウンドで更新する
+    schedule_history_summary_refresh(rag_sess_obj.id)
     
     print(f"Constructed refs for response: {refs_response}")
     return RagAnswer(
@@ -499,25 +515,48 @@ def delete_rag_message(
     session.delete(msg_to_del)
     session.commit()
 
+def simple_rag_stream_channel(session_id: int) -> str:
+    """SimpleRAGセッションのトークン配信チャンネル名"""
+    return f"simple_rag:{session_id}"
+
+
+def _load_simple_rag_refs(messages: List[RagMessage]) -> Optional[List[Union[RagAnswerRef, WebSearchResultRef]]]:
+    """最新のアシスタントメッセージに保存された参照情報を復元する"""
+    for msg in reversed(messages):
+        if msg.role == "assistant" and msg.metadata_json:
+            try:
+                metadata = json.loads(msg.metadata_json)
+                if "references" in metadata:
+                    refs = []
+                    for ref_item in metadata["references"]:
+                        if ref_item.get("type") == "paper":
+                            refs.append(RagAnswerRef.model_validate(ref_item))
+                        elif ref_item.get("type") == "web":
+                            refs.append(WebSearchResultRef.model_validate(ref_item))
+                    return refs
+                return None
+            except:
+                continue
+    return None
+
+
 async def run_simple_rag_async(
     payload: SimpleRagStartRequest,
     user_id: int,
     session_id: int,
     base_url_origin: str = ""
 ) -> None:
-    from sqlmodel import Session
-    from db import engine
-    
+    stream_channel = simple_rag_stream_channel(session_id)
     try:
-        with Session(engine) as db_session:
-            rag_sess = db_session.get(RagSession, session_id)
+        async with async_session_scope() as db_session:
+            rag_sess = await db_session.get(RagSession, session_id)
             if not rag_sess:
                 logger.error(f"Session {session_id} not found for async processing")
                 return
                 
             rag_sess.processing_status = "processing"
             db_session.add(rag_sess)
-            db_session.commit()
+            await db_session.commit()
             
             selected_tool_names = payload.selected_tools
             active_tools: List[Tool] = []
@@ -525,17 +564,18 @@ async def run_simple_rag_async(
             citation_instructions_for_prompt = []
             
             try:
-                tool_prompt_parts_json = get_rag_tool_prompt_parts(db_session, user_id, base_url_origin=base_url_origin)
+                tool_prompt_parts_json = await db_session.run_sync(
+                    lambda s: get_rag_tool_prompt_parts(s, user_id, base_url_origin=base_url_origin)
+                )
                 tool_prompt_parts = json_module.loads(tool_prompt_parts_json)
             except Exception as e:
                 logger.error(f"ツールプロンプト部品の取得に失敗しました（ユーザーID: {user_id}）: {e}")
                 tool_prompt_parts = TOOL_PROMPT_PARTS
             
             if "local_rag_search_tool" in selected_tool_names:
-                local_rag_impl = AVAILABLE_TOOL_IMPLEMENTATIONS["local_rag_search_tool"]
                 bound_local_rag_search_tool = Tool(
                     name="local_rag_search_tool",
-                    func=lambda query, tags=",".join(payload.tags or []): local_rag_impl(query=query, user_id=user_id, db_session=db_session, tags=tags),
+                    func=lambda query, tags=",".join(payload.tags or []): _local_rag_search_in_new_session(query=query, user_id=user_id, tags=tags),
                     description="""ユーザーの知識ベース（登録された論文の要約）内を検索します。ユーザーの質問に基づいて、関連する論文情報を取得します。""",
                 )
                 active_tools.append(bound_local_rag_search_tool)
@@ -557,18 +597,26 @@ async def run_simple_rag_async(
             if not active_tools:
                 try:
                     if payload.use_character_prompt:
-                        system_prompt_content = get_rag_no_tool_system_prompt_with_character(db_session, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        system_prompt_content = await db_session.run_sync(
+                            lambda s: get_rag_no_tool_system_prompt_with_character(s, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        )
                     else:
-                        system_prompt_content = get_rag_no_tool_system_prompt(db_session, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        system_prompt_content = await db_session.run_sync(
+                            lambda s: get_rag_no_tool_system_prompt(s, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        )
                 except Exception as e:
                     logger.error(f"RAGノーツールシステムプロンプトの取得に失敗: {e}")
                     system_prompt_content = NO_TOOL_SYSTEM_PROMPT_TEMPLATE
             else:
                 try:
                     if payload.use_character_prompt:
-                        system_prompt_template = get_rag_base_system_prompt_with_character(db_session, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        system_prompt_template = await db_session.run_sync(
+                            lambda s: get_rag_base_system_prompt_with_character(s, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        )
                     else:
-                        system_prompt_template = get_rag_base_system_prompt(db_session, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        system_prompt_template = await db_session.run_sync(
+                            lambda s: get_rag_base_system_prompt(s, user_id, system_prompt_id=payload.selected_prompts[0].system_prompt_id if payload.selected_prompts else None)
+                        )
                     
                     system_prompt_content = system_prompt_template.format(
                         tool_descriptions_section="\n".join(tool_descriptions_for_prompt),
@@ -597,28 +645,17 @@ async def run_simple_rag_async(
             
             chain_rag = prompt_rag | llm_for_rag.with_config({"run_name": "SimpleRAG_Async_Chain"}).bind_tools(active_tools)
             
-            agent_rag = create_langgraph(chain=chain_rag, tools_for_graph=active_tools)
+            agent_rag = get_simple_rag_graph()
             
-            db_msgs_rag = db_session.exec(
-                select(RagMessage).where(RagMessage.session_id == session_id).order_by(RagMessage.id)
-            ).all()
-            history_rag: list[AnyMessage] = []
-            for m_hist in db_msgs_rag:
-                if m_hist.role == "user": 
-                    history_rag.append(HumanMessage(content=m_hist.content))
-                elif m_hist.role == "assistant": 
-                    history_rag.append(AIMessage(content=m_hist.content))
-                elif m_hist.role == "tool":
-                    if m_hist.metadata_json:
-                        try:
-                            tool_meta = json.loads(m_hist.metadata_json)
-                            history_rag.append(ToolMessage(content=m_hist.content, tool_call_id=tool_meta.get("tool_call_id", "")))
-                        except:
-                            history_rag.append(ToolMessage(content=m_hist.content, tool_call_id="unknown"))
-                    else:
-                        history_rag.append(ToolMessage(content=m_hist.content, tool_call_id="unknown"))
+            # 要約 + トークン予算内の直近履歴のみを読み込む
+            history_rag: list[AnyMessage] = await load_rag_history_async(db_session, session_id)
+            # グラフ実行中（LLM 待ち）は DB 接続をプールに返しておく
+            await db_session.commit()
             
-            graph_config = {"recursion_limit": 20000, "configurable": {"thread_id": f"user_{user_id}_simple_rag_{session_id}"}}
+            graph_config = {"recursion_limit": 20000, "configurable": {
+                "thread_id": f"user_{user_id}_simple_rag_{session_id}",
+                **simple_rag_configurable(chain_rag, active_tools)
+            }}
             initial_graph_state = GraphState(
                 messages=history_rag,
                 query=payload.query,
@@ -628,7 +665,22 @@ async def run_simple_rag_async(
             
             logger.info(f"SimpleRAG非同期処理開始: session_id={session_id}, user_id={user_id}")
             
-            result_rag = await agent_rag.ainvoke(initial_graph_state, graph_config)
+            # agent ノードのトークンを SSE 用チャンネルに publish しながらグラフを実行する
+            result_rag: Dict[str, Any] = {}
+            async for stream_mode, chunk in agent_rag.astream(
+                initial_graph_state, graph_config, stream_mode=["messages", "values"]
+            ):
+                if stream_mode == "values":
+                    result_rag = chunk
+                    continue
+                message_chunk, chunk_metadata = chunk
+                if chunk_metadata.get("langgraph_node") == "agent" and isinstance(message_chunk, AIMessageChunk):
+                    text = chunk_text(message_chunk.content)
+                    if text:
+                        stream_hub.publish(stream_channel, "token", {"text": text})
+                elif isinstance(message_chunk, ToolMessage):
+                    # ツール呼び出し前の途中出力は最終回答ではないため破棄させる
+                    stream_hub.publish(stream_channel, "reset", {"tool": message_chunk.name})
             
             final_answer_str: str = "回答を生成できませんでした。"
             raw_final_ai_content: Any = None
@@ -707,22 +759,33 @@ async def run_simple_rag_async(
             rag_sess.processing_status = "completed"
             rag_sess.last_updated = datetime.utcnow()
             db_session.add(rag_sess)
-            db_session.commit()
+            await db_session.commit()
+            await db_session.refresh(ai_msg_db)
             
+            stream_hub.publish(stream_channel, "done", {
+                "status": "completed",
+                "message": RagMessageRead.model_validate(ai_msg_db).model_dump(mode="json"),
+                "refs": [ref.model_dump(mode="json") for ref in refs_response] or None
+            })
             logger.info(f"SimpleRAG非同期処理完了: session_id={session_id}")
+            # 予算外になった古い履歴の要約は応答後にバックグラウンドで更新する
+            schedule_history_summary_refresh(session_id)
             
     except Exception as e:
         logger.error(f"SimpleRAG非同期処理エラー: session_id={session_id}, error={e}")
+        stream_hub.publish(stream_channel, "error", {"status": "failed", "detail": str(e)})
         try:
-            with Session(engine) as error_db_session:
-                rag_sess = error_db_session.get(RagSession, session_id)
+            async with async_session_scope() as error_db_session:
+                rag_sess = await error_db_session.get(RagSession, session_id)
                 if rag_sess:
                     rag_sess.processing_status = "failed"
                     rag_sess.last_updated = datetime.utcnow()
                     error_db_session.add(rag_sess)
-                    error_db_session.commit()
+                    await error_db_session.commit()
         except:
             pass
+    finally:
+        stream_hub.close(stream_channel)
 
 @router.post("/start_async", response_model=SimpleRagStartResponse, status_code=status.HTTP_202_ACCEPTED)
 async def start_simple_rag_async(
@@ -779,6 +842,7 @@ async def start_simple_rag_async(
     db_session.add(user_msg_db)
     db_session.commit()
     
+    stream_hub.reset(simple_rag_stream_channel(rag_session.id))
     background_tasks.add_task(
         run_simple_rag_async,
         payload,
@@ -793,40 +857,81 @@ async def start_simple_rag_async(
     )
 
 @router.get("/sessions/{session_id}/status", response_model=SimpleRagStatusResponse)
-def get_simple_rag_status(
+async def get_simple_rag_status(
+    session_id: int,
+    since_id: Optional[int] = Query(None, description="このメッセージIDより後のメッセージのみ返す（増分取得）"),
+    wait: float = Query(0, ge=0, le=MAX_LONG_POLL_SECONDS, description="変化がない場合に待機する最大秒数（ロングポーリング）"),
+    known_status: Optional[str] = Query(None, description="クライアントが最後に受け取ったステータス"),
+    current_user: User = Depends(get_current_active_user)
+):
+    def load_snapshot() -> SimpleRagStatusResponse:
+        # 待機中にリクエストスコープの接続を保持しないよう、取得ごとにセッションを開く
+        with Session(engine) as db_session:
+            rag_session = db_session.get(RagSession, session_id)
+            if not rag_session or rag_session.user_id != current_user.id:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG session not found or not authorized")
+            
+            messages_stmt = select(RagMessage).where(RagMessage.session_id == session_id)
+            if since_id is not None:
+                messages_stmt = messages_stmt.where(RagMessage.id > since_id)
+            messages = db_session.exec(messages_stmt.order_by(RagMessage.id)).all()
+            
+            refs = _load_simple_rag_refs(messages)
+            
+            return SimpleRagStatusResponse(
+                session_id=session_id,
+                status=rag_session.processing_status,
+                messages=[RagMessageRead.model_validate(m) for m in messages],
+                last_updated=rag_session.last_updated,
+                refs=refs,
+                last_message_id=messages[-1].id if messages else since_id
+            )
+    
+    return await long_poll_status(
+        rag_session_status_key(session_id), load_snapshot, wait_seconds=wait, known_status=known_status
+    )
+
+@router.get("/sessions/{session_id}/stream")
+def stream_simple_rag(
     session_id: int,
     db_session: Session = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
+    """SimpleRAGの回答トークンを Server-Sent Events で配信する
+
+    イベント: token（{"text"}）/ reset（ツール呼び出しにより途中出力を破棄）/
+    done（{"status", "message", "refs"}）/ error（{"status", "detail"}）
+    """
     rag_session = db_session.get(RagSession, session_id)
     if not rag_session or rag_session.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RAG session not found or not authorized")
-    
-    messages = db_session.exec(
-        select(RagMessage).where(RagMessage.session_id == session_id).order_by(RagMessage.id)
-    ).all()
-    
-    refs = None
-    for msg in reversed(messages):
-        if msg.role == "assistant" and msg.metadata_json:
-            try:
-                metadata = json.loads(msg.metadata_json)
-                if "references" in metadata:
-                    refs_data = metadata["references"]
-                    refs = []
-                    for ref_item in refs_data:
-                        if ref_item.get("type") == "paper":
-                            refs.append(RagAnswerRef.model_validate(ref_item))
-                        elif ref_item.get("type") == "web":
-                            refs.append(WebSearchResultRef.model_validate(ref_item))
-                break
-            except:
-                pass
-    
-    return SimpleRagStatusResponse(
-        session_id=session_id,
-        status=rag_session.processing_status,
-        messages=[RagMessageRead.model_validate(m) for m in messages],
-        last_updated=rag_session.last_updated,
-        refs=refs
+
+    def load_terminal_event() -> Optional[Dict[str, Any]]:
+        # StreamingResponse の本体はリクエストスコープのセッション解放後に実行されるため独自にセッションを開く
+        with Session(engine) as terminal_db_session:
+            current = terminal_db_session.get(RagSession, session_id)
+            if current is None:
+                return {"event": "error", "data": {"status": "failed", "detail": "RAG session not found"}}
+            if current.processing_status in ("pending", "processing"):
+                return None
+            if current.processing_status == "failed":
+                return {"event": "error", "data": {"status": "failed", "detail": "Simple RAG processing failed"}}
+            messages = terminal_db_session.exec(
+                select(RagMessage).where(RagMessage.session_id == session_id).order_by(RagMessage.id)
+            ).all()
+            last_assistant = next((m for m in reversed(messages) if m.role == "assistant"), None)
+            refs = _load_simple_rag_refs(messages)
+            return {
+                "event": "done",
+                "data": {
+                    "status": current.processing_status,
+                    "message": RagMessageRead.model_validate(last_assistant).model_dump(mode="json") if last_assistant else None,
+                    "refs": [ref.model_dump(mode="json") for ref in refs] if refs else None
+                }
+            }
+
+    return StreamingResponse(
+        relay_channel_as_sse(simple_rag_stream_channel(session_id), load_terminal_event),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
     )
\ No newline at end of file
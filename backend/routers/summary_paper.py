@@ -1,9 +1,10 @@
 import os
 import re
 import io
-import arxiv
+from routers.module.lazy_import import lazy_module
+arxiv = lazy_module("arxiv")
 import glob
-import PyPDF2
+PyPDF2 = lazy_module("PyPDF2")
 import requests
 import concurrent.futures
 from bs4 import BeautifulSoup
@@ -28,6 +29,8 @@ from langchain_core.language_models.chat_models import BaseChatModel
 # こちらは別ファイル「util.py」などから読み込む想定
 # （CONFIG, initialize_llm, escape_curly_braces は実装済みとする）
 from .module.util import CONFIG, initialize_llm, escape_curly_braces
+from .module.stream_hub import current_stream_channel, stream_hub, astream_and_publish
+from .module.tracing import wrap_with_context
 
 # ★ 設定読み込み関数（config.yamlから特定用途のLLM設定を取得）
 @functools.lru_cache(maxsize=1)
@@ -69,6 +72,28 @@ def get_summary_specialized_llm_config(llm_type: str) -> dict:
     # デフォルト値とマージ
     default_config = defaults.get(llm_type, defaults["summary_fallback"])
     return {**default_config, **llm_config}
+
+def get_summary_map_reduce_config() -> dict:
+    """config.yamlから長文論文向け map-reduce 要約の設定を取得する
+
+    Returns:
+        dict: map-reduce設定辞書（map_llm はネストした辞書）
+    """
+    cfg = _load_summary_cfg()
+    mr_config = cfg.get("summary_map_reduce", {}) or {}
+
+    # デフォルト値設定（config.yamlに設定がない場合は従来通りの切り詰め動作）
+    defaults = {
+        "enabled": False,
+        "token_threshold": 30000,
+        "chars_per_token": 3,
+        "direct_max_chars": 100000,
+        "map_chunk_chars": 24000,
+        "max_concurrency": 8,
+        "map_llm": {},
+    }
+    return {**defaults, **mr_config}
+
 from .module.prompt_manager import (
     get_paper_summary_initial_prompt, 
     get_paper_summary_refinement_prompt, 
@@ -88,9 +113,25 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 import time
+import asyncio
 
 TRY_SECOND = False
 
+# map-reduce 要約の map 段階で使用するプロンプト
+MAP_SUMMARY_SYSTEM_PROMPT = """あなたは学術論文の一部分（セクション）を読み、後段で論文全体の詳細な要約を作成するための抽出メモを作成するアシスタントです。
+以下のルールに従ってください。
+・与えられた部分に含まれる主張、提案手法、数式、実験設定、数値結果、比較対象、限界・議論を漏れなく箇条書きで抽出してください。
+・数式は省略せず、$ または $$ で囲んだ LaTeX 形式のまま残してください。
+・表や実験結果の数値は可能な限りそのまま残してください。
+・論文中に書かれていない内容を推測で補わないでください。
+・出力は日本語で、前置きや結びの文は不要です。"""
+
+MAP_SUMMARY_USER_PROMPT = """# 論文の一部分（{index}/{total}）
+{chunk}
+
+# 指示
+上記部分の抽出メモを作成してください。"""
+
 
 ###############################################################################
 # パスやURL等の共通設定
@@ -345,7 +386,11 @@ class SummarizerLLM:
         self.fail_threshold = current_config.get("llm_initial_fail_threshold", 3)
         # フォールバック後のリトライ回数
         self.fallback_max_retries = current_config.get("llm_fallback_max_retries", 3)
-        
+
+        # ★ 長文論文向け map-reduce 要約設定（map用LLMは初回使用時に初期化）
+        self.map_reduce_config = get_summary_map_reduce_config()
+        self._map_llm_instance = None
+
         # プロンプト管理用のDB接続情報を保存
         self.db_session = db_session
         self.user_id = user_id
@@ -584,6 +629,139 @@ $$
             return chain1 # 2段階目を使わない場合は、最初のチェーンだけを返す
         return summary_chain
 
+    def _estimate_tokens(self, text: str) -> int:
+        """文字数から推定トークン数を求める（プロバイダ非依存の概算）。"""
+        chars_per_token = max(float(self.map_reduce_config.get("chars_per_token", 3)), 1.0)
+        return int(len(text) / chars_per_token)
+
+    def _get_map_llm(self) -> BaseChatModel:
+        """map段階で使う小型・高速LLMを返す。設定がない場合はプライマリLLMを使う。"""
+        if self._map_llm_instance is not None:
+            return self._map_llm_instance
+
+        map_llm_config = self.map_reduce_config.get("map_llm") or {}
+        if map_llm_config.get("provider") and map_llm_config.get("model_name"):
+            try:
+                self._map_llm_instance = initialize_llm(
+                    name=map_llm_config["provider"],
+                    model_name=map_llm_config["model_name"],
+                    temperature=map_llm_config.get("temperature", 0.1),
+                    top_p=map_llm_config.get("top_p", 1.0),
+                    llm_max_retries=map_llm_config.get("max_retries", 2)
+                )
+            except Exception as e:
+                logger.error(f"map要約用LLMの初期化に失敗したため、プライマリLLMを使用します: {e}")
+                self._map_llm_instance = self.llm_instance
+        else:
+            self._map_llm_instance = self.llm_instance
+        return self._map_llm_instance
+
+    async def _summarize_map_chunk(self, chunk: str, index: int, total: int, semaphore: asyncio.Semaphore) -> str:
+        """1チャンク分の抽出メモを生成する。失敗時はチャンク先頭を原文のまま返す。"""
+        map_prompt = ChatPromptTemplate.from_messages([
+            ("system", MAP_SUMMARY_SYSTEM_PROMPT),
+            ("user", MAP_SUMMARY_USER_PROMPT),
+        ])
+        map_chain = map_prompt | self._get_map_llm() | StrOutputParser()
+
+        async with semaphore:
+            for attempt in range(2):
+                try:
+                    result = await map_chain.ainvoke({"index": index, "total": total, "chunk": chunk})
+                    if result and len(result.strip()) >= 10:
+                        return result.strip()
+                    raise ValueError("map要約結果が空または短すぎます。")
+                except Exception as e:
+                    print(f"[WARN] map要約 {index}/{total} でエラー発生 (attempt {attempt + 1}/2): {e}")
+                    if attempt == 0:
+                        await asyncio.sleep(2)
+
+        # 情報が完全に欠落しないよう、原文の先頭部分で代替する
+        return chunk[:4000]
+
+    async def prepare_text_for_summary(self, text_to_summarize: str) -> str:
+        """要約テンプレートに渡すテキストを準備する。
+
+        推定トークン数が閾値以下、または map-reduce が無効な場合は従来通り
+        direct_max_chars で切り詰めたテキストを返す。閾値を超える場合は本文を
+        TEXT_SPLITTER で分割し、チャンクごとの抽出メモを並列生成して結合したテキストを返す。
+
+        Args:
+            text_to_summarize (str): "Title:...Abstract:...Body:..." 形式の論文テキスト（未エスケープ）
+
+        Returns:
+            str: 要約テンプレートに渡すテキスト（未エスケープ）
+        """
+        mr_cfg = self.map_reduce_config
+        direct_max_chars = int(mr_cfg.get("direct_max_chars", 100000))
+        estimated_tokens = self._estimate_tokens(text_to_summarize)
+
+        if not mr_cfg.get("enabled", False) or estimated_tokens <= int(mr_cfg.get("token_threshold", 30000)):
+            return text_to_summarize[:direct_max_chars]
+
+        from .module.embeddings import TEXT_SPLITTER
+
+        # タイトル・概要部分はそのまま残し、本文のみを map 対象にする
+        body_marker_idx = text_to_summarize.find("Body:")
+        if body_marker_idx >= 0:
+            head_text = text_to_summarize[:body_marker_idx][:10000]
+            body_text = text_to_summarize[body_marker_idx + len("Body:"):]
+        else:
+            head_text = ""
+            body_text = text_to_summarize
+
+        # TEXT_SPLITTER の分割結果を map_chunk_chars 単位にまとめ、LLM呼び出し回数を抑える
+        map_chunk_chars = int(mr_cfg.get("map_chunk_chars", 24000))
+        sections: List[str] = []
+        current_parts: List[str] = []
+        current_len = 0
+        for piece in TEXT_SPLITTER.split_text(body_text):
+            if current_parts and current_len + len(piece) > map_chunk_chars:
+                sections.append("\n".join(current_parts))
+                current_parts, current_len = [], 0
+            current_parts.append(piece)
+            current_len += len(piece)
+        if current_parts:
+            sections.append("\n".join(current_parts))
+
+        total = len(sections)
+        print(f"[INFO] map-reduce要約を使用します: 推定 {estimated_tokens} トークン, {total} パートに分割")
+        map_start = time.time()
+        semaphore = asyncio.Semaphore(max(int(mr_cfg.get("max_concurrency", 8)), 1))
+        partial_summaries = await asyncio.gather(*[
+            self._summarize_map_chunk(section, i, total, semaphore)
+            for i, section in enumerate(sections, start=1)
+        ])
+        print(f"[INFO] map段階完了: {total} パート, {time.time() - map_start:.1f} 秒")
+
+        reduced_parts = [
+            f"## 本文パート {i}/{total}\n{partial}"
+            for i, partial in enumerate(partial_summaries, start=1)
+        ]
+        reduced_text = (
+            f"{head_text}"
+            f"Body（長文のため、論文本文を {total} パートに分割して抽出したメモ）:\n\n"
+            + "\n\n".join(reduced_parts)
+        )
+        print(f"[INFO] reduce入力テキスト長: {len(reduced_text)} 文字 (元: {len(text_to_summarize)} 文字)")
+        return reduced_text[:direct_max_chars]
+
+    async def _invoke_summary_chain(self, chain, safe_text: str, variant: str = "default", is_retry: bool = False):
+        """要約チェーンを実行する。SSE配信中（current_stream_channel が設定済み）の場合はトークンを publish する
+
+        Args:
+            chain: _build_summary_chain で作成したチェーン
+            safe_text: エスケープ済みのテキスト
+            variant: token イベントに付与する要約種別（"default" / "character"）
+            is_retry: リトライ時は True（配信済みトークンを破棄するよう reset を送る）
+        """
+        channel = current_stream_channel.get()
+        if channel is None:
+            return await chain.ainvoke({"documents": safe_text})
+        if is_retry:
+            stream_hub.publish(channel, "reset", {"variant": variant})
+        return await astream_and_publish(chain, {"documents": safe_text}, channel, variant=variant)
+
     async def _execute_llm_with_retry(
         self, 
         safe_text: str, 
@@ -613,6 +791,8 @@ $$
             character_override=character_override, affinity_level=affinity_level
         )
         
+        # SSE配信時の token イベント種別（キャラクターなし要約は "default"）
+        stream_variant = "default" if character_override == "" else "character"
         print(f"[INFO] プライマリLLM ({self.primary_llm_model}) で要約処理開始...")
 
         while primary_failed_count < self.fail_threshold:
@@ -621,11 +801,11 @@ $$
                 if primary_failed_count > 0:
                     print(f"[INFO] プライマリLLM要約処理再試行中... (attempt {primary_failed_count + 1}/{self.fail_threshold})")
                     # エラー時はエラーハンドリング用のチェーンを使用
-                    response = await error_primary_chain.ainvoke({"documents": safe_text})
+                    response = await self._invoke_summary_chain(error_primary_chain, safe_text, stream_variant, is_retry=True)
                 else:
                     # 最初の試行は通常のチェーンを使用
                     print(f"[INFO] プライマリLLM要約処理中... (attempt {primary_failed_count + 1}/{self.fail_threshold})")
-                    response = await primary_chain.ainvoke({"documents": safe_text})
+                    response = await self._invoke_summary_chain(primary_chain, safe_text, stream_variant)
                 
                 print(f"[INFO] 出力結果: {len(response.content)} 文字")
                 if not response or len(response.content) < 10:
@@ -672,7 +852,7 @@ $$
         while fallback_attempt < self.fallback_max_retries:
             try:
                 print(f"[INFO] フォールバックLLM要約処理中... (attempt {fallback_attempt + 1}/{self.fallback_max_retries})")
-                response = await fallback_chain.ainvoke({"documents": safe_text})
+                response = await self._invoke_summary_chain(fallback_chain, safe_text, stream_variant, is_retry=True)
                 
                 if not response or len(response.content) < 10:
                     print(f"[WARN] フォールバック要約結果が空または短すぎます。再試行します。{response}")
@@ -734,7 +914,8 @@ $$
             tuple[str, dict]: (要約テキスト, 使用されたLLM情報)
             LLM情報は以下の形式: {"provider": str, "model_name": str, "used_fallback": bool}
         """
-        safe_text = escape_curly_braces(text_to_summarize)
+        prepared_text = await self.prepare_text_for_summary(text_to_summarize)
+        safe_text = escape_curly_braces(prepared_text)
         print(f"[INFO] 要約対象のテキスト長: {len(safe_text)} 文字")
         primary_failed_count = 0
 
@@ -749,11 +930,11 @@ $$
                 if primary_failed_count > 0:
                     print(f"[INFO] プライマリLLM要約処理再試行中0.7... (attempt {primary_failed_count + 1}/{self.fail_threshold})")
                     # エラー時はエラーハンドリング用のチェーンを使用
-                    response = await error_primaly_chain.ainvoke({"documents": safe_text})
+                    response = await self._invoke_summary_chain(error_primaly_chain, safe_text, is_retry=True)
                 else:
                     # 最初の試行は通常のチェーンを使用
                     print(f"[INFO] プライマリLLM要約処理中... (attempt {primary_failed_count + 1}/{self.fail_threshold})")
-                    response = await primary_chain.ainvoke({"documents": safe_text})
+                    response = await self._invoke_summary_chain(primary_chain, safe_text)
                 print(f"[INFO] TRY SECOND = {TRY_SECOND}")
                 print(f"[INFO] 出力結果: {len(response.content)} 文字")
                 if not response or len(response.content) < 10:
@@ -784,7 +965,7 @@ $$
         while fallback_attempt < self.fallback_max_retries:
             try:
                 print(f"[INFO] フォールバックLLM要約処理中... (attempt {fallback_attempt + 1}/{self.fallback_max_retries})")
-                response = await fallback_chain.ainvoke({"documents": safe_text})
+                response = await self._invoke_summary_chain(fallback_chain, safe_text, is_retry=True)
                 print(f"[INFO] フォールバックLLM要約処理成功 (attempt {fallback_attempt + 1}/{self.fallback_max_retries})")
                 # フォールバックLLM成功時の情報を返す
                 llm_info = {
@@ -825,9 +1006,9 @@ $$
             tuple[tuple[str, dict], tuple[str, dict]]: 
                 ((キャラクターなし要約, LLM情報), (キャラクターあり要約, LLM情報))
         """
-        import asyncio
-        
-        safe_text = escape_curly_braces(text_to_summarize)
+        # map-reduce を使う場合も、抽出メモの生成は2種類の要約で共有する
+        prepared_text = await self.prepare_text_for_summary(text_to_summarize)
+        safe_text = escape_curly_braces(prepared_text)
         print(f"[INFO] 2種類の要約を並列生成開始: テキスト長 {len(safe_text)} 文字, 好感度レベル {affinity_level}")
         
         # ユーザーが選択したキャラクターを取得
@@ -888,7 +1069,8 @@ $$
         Returns:
             tuple[str, dict]: (要約テキスト, LLM情報)
         """
-        safe_text = escape_curly_braces(text_to_summarize)
+        prepared_text = await self.prepare_text_for_summary(text_to_summarize)
+        safe_text = escape_curly_braces(prepared_text)
         print(f"[INFO] キャラクターなし要約生成開始: テキスト長 {len(safe_text)} 文字")
         
         # 共通のリトライロジック関数を使用（キャラクターを明示的に空文字列に設定）
@@ -904,7 +1086,8 @@ $$
         Returns:
             tuple[str, dict]: (要約テキスト, LLM情報)
         """
-        safe_text = escape_curly_braces(text_to_summarize)
+        prepared_text = await self.prepare_text_for_summary(text_to_summarize)
+        safe_text = escape_curly_braces(prepared_text)
         print(f"[INFO] キャラクターあり要約生成開始: テキスト長 {len(safe_text)} 文字, 好感度レベル {affinity_level}")
         
         # ユーザーが選択したキャラクターを取得
@@ -964,7 +1147,7 @@ class SummariesOrchestrator:
         paper_objects = []
         with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
             jobs = {
-                executor.submit(self._retrieve_and_summarize, arxiv_id, i): arxiv_id
+                executor.submit(wrap_with_context(self._retrieve_and_summarize), arxiv_id, i): arxiv_id
                 for i, arxiv_id in enumerate(list_of_arxiv_ids, start=1)
             }
             for future in concurrent.futures.as_completed(jobs):
@@ -982,13 +1165,14 @@ class SummariesOrchestrator:
         print(f"({index}) ID={arxiv_id} のデータ取得開始...")
         info_obj = self.retriever.get_paper_data(arxiv_id)
 
-        # 先頭2000文字を1つの文字列にまとめて LLM要約を呼び出す
+        # タイトル・概要・本文を1つの文字列にまとめて LLM要約を呼び出す
         combined_data = (
             f"Title: {info_obj.title}\n\n"
             f"Abstract: {info_obj.abstract}\n\n"
-            f"Body: {info_obj.full_text[:100000]}\n"
+            f"Body: {info_obj.full_text}\n"
         )
-        summary_result, llm_info = self.summarizer.produce_summary(combined_data)
+        # 本文の切り詰め / map-reduce の切り替えは SummarizerLLM 側で行う
+        summary_result, llm_info = asyncio.run(self.summarizer.produce_summary(combined_data))
         info_obj.generated_summary = summary_result
         return info_obj
 
@@ -20,6 +20,7 @@ from schemas import (
     SystemPromptGroupListResponse
 )
 from auth_utils import get_current_active_user
+from routers.module.prompt_cache import bump_prompt_cache_version
 
 logger = logging.getLogger(__name__)
 
@@ -200,6 +201,7 @@ def create_system_prompt_group(
         
         db.add(new_group)
         db.commit()
+        bump_prompt_cache_version(current_user.id)
         db.refresh(new_group)
         
         logger.info(f"プロンプトグループを作成しました（名前: {group_data.name}, ユーザー: {current_user.id}）")
@@ -302,6 +304,7 @@ def update_system_prompt_group(
         
         db.add(group)
         db.commit()
+        bump_prompt_cache_version(current_user.id)
         db.refresh(group)
         
         logger.info(f"プロンプトグループを更新しました（ID: {group_id}, ユーザー: {current_user.id}）")
@@ -353,6 +356,7 @@ def delete_system_prompt_group(
         # 物理削除
         db.delete(group)
         db.commit()
+        bump_prompt_cache_version(current_user.id)
         
         logger.info(f"プロンプトグループを物理削除しました（ID: {group_id}, ユーザー: {current_user.id}）")
         
@@ -16,6 +16,7 @@ import logging
 from db import get_session
 from models import SystemPrompt, User, CustomGeneratedSummary
 from auth_utils import get_current_active_user
+from routers.module.prompt_cache import bump_prompt_cache_version
 from schemas import (
     SystemPromptCreate, SystemPromptUpdate, SystemPromptRead,
     SystemPromptListResponse, PromptTypeInfo, PromptTypesResponse
@@ -469,6 +470,7 @@ async def create_multiple_custom_prompt(
     
     db.add(custom_prompt)
     db.commit()
+    bump_prompt_cache_version(current_user.id)
     db.refresh(custom_prompt)
     
     return SystemPromptRead.model_validate(custom_prompt)
@@ -633,6 +635,7 @@ async def update_custom_prompt_by_id(
     
     db.add(existing)
     db.commit()
+    bump_prompt_cache_version(current_user.id)
     db.refresh(existing)
     
     return SystemPromptRead.model_validate(existing)
@@ -745,6 +748,7 @@ async def delete_custom_prompt_by_id(
     # カスタムプロンプトを削除
     db.delete(existing)
     db.commit()
+    bump_prompt_cache_version(current_user.id)
     
     deleted_summaries_count = len(related_summaries)
     if deleted_summaries_count > 0:
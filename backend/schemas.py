@@ -225,11 +225,17 @@ class DeepResearchStartResponse(BaseModel):
     session_id: int
     message: str
 
+class DeepResearchCancelResponse(BaseModel):
+    session_id: int
+    status: str  # cancelled（実行待ちを即時中断）/ cancelling（実行中、次のステップで中断）
+    message: str
+
 class DeepResearchStatusResponse(BaseModel):
     session_id: int
     status: Optional[str]
     messages: List[RagMessageRead]
     last_updated: datetime
+    last_message_id: Optional[int] = None  # 次回リクエストの since_id に指定するカーソル
 
 # Simple RAG バックグラウンド処理用スキーマ
 class SimpleRagStartRequest(BaseModel):
@@ -255,6 +261,7 @@ class SimpleRagStatusResponse(BaseModel):
     messages: List[RagMessageRead]
     last_updated: datetime
     refs: Optional[List[Union[RagAnswerRef, WebSearchResultRef]]] = None
+    last_message_id: Optional[int] = None  # 次回リクエストの since_id に指定するカーソル
 
 class PaperChatSessionBase(BaseModel):
     title: str
@@ -275,6 +282,7 @@ class PaperChatSessionStatus(BaseModel):
     status: Optional[str] = None
     messages: List["ChatMessageRead"] = []
     last_updated: datetime
+    last_message_id: Optional[int] = None  # 次回リクエストの since_id に指定するカーソル
 
 class PaperChatStartResponse(BaseModel):
     session_id: int
@@ -0,0 +1,309 @@
+# backend/scripts/check_web_tool_cache.py
+"""
+Web ツール結果キャッシュ（routers/module/web_tool_cache.py）の動作を確認する
+
+TavilySearch / TavilyExtract を継承した偽ツール（ネットワークアクセスなし、呼び出し回数を記録）を
+cached_web_tool で包み、キャッシュのヒット・ミスを呼び出し回数で確認する。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/check_web_tool_cache.py
+    python scripts/check_web_tool_cache.py --verbose
+
+チェック内容（いずれかに失敗したら終了コード1）:
+- 同じ呼び出しはキャッシュから応答し、引数が異なる呼び出しはミスになる（同期・非同期）
+- エラー応答・部分的に失敗した抽出結果・空の結果はキャッシュしない
+- TTL を過ぎた結果は再取得する
+- max_entries を超えたら最も古く使われたものから破棄する
+- クエリの空白・大文字小文字、URL の末尾スラッシュ・フラグメント・順序の違いは同じキーになる
+- persist_to_db 有効時は DB に保存され、プロセス内キャッシュが空でも（再起動後を想定）DB から応答する
+"""
+import argparse
+import asyncio
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def fake_tools():
+    """呼び出し回数を記録し、responses に設定した結果を返す TavilySearch / TavilyExtract"""
+    from langchain_tavily import TavilyExtract, TavilySearch
+
+    class FakeTavilySearch(TavilySearch):
+        calls: List[Dict[str, Any]] = []
+        responses: Dict[str, Any] = {}
+
+        def _run(self, query: str, run_manager: Any = None, **kwargs: Any) -> Dict[str, Any]:
+            self.calls.append({"query": query, **kwargs})
+            return self.responses.get(query, {"query": query, "results": [{"url": f"https://example.com/{len(self.calls)}", "content": query}]})
+
+        async def _arun(self, query: str, run_manager: Any = None, **kwargs: Any) -> Dict[str, Any]:
+            return self._run(query, **kwargs)
+
+    class FakeTavilyExtract(TavilyExtract):
+        calls: List[Dict[str, Any]] = []
+        responses: Dict[str, Any] = {}
+
+        def _run(self, urls: List[str], run_manager: Any = None, **kwargs: Any) -> Dict[str, Any]:
+            self.calls.append({"urls": urls, **kwargs})
+            key = ",".join(urls)
+            return self.responses.get(key, {"results": [{"url": u, "raw_content": f"content of {u}"} for u in urls], "failed_results": []})
+
+        async def _arun(self, urls: List[str], run_manager: Any = None, **kwargs: Any) -> Dict[str, Any]:
+            return self._run(urls, **kwargs)
+
+    search = FakeTavilySearch(max_results=5)
+    extract = FakeTavilyExtract()
+    # 呼び出し記録はインスタンスごとに持つ
+    search.calls, search.responses = [], {}
+    extract.calls, extract.responses = [], {}
+    return search, extract
+
+
+def reset_cache(max_entries: int = 512, persist_to_db: bool = False):
+    """プロセス共通のキャッシュを指定の設定で作り直す"""
+    from routers.module import web_tool_cache
+
+    web_tool_cache._cache = web_tool_cache.WebToolResultCache(
+        max_entries=max_entries,
+        persist_to_db=persist_to_db,
+        db_purge_interval_seconds=3600,
+    )
+    return web_tool_cache._cache
+
+
+def wrap(tool, kind: str, ttl_seconds: float = 3600):
+    from routers.module.web_tool_cache import CachedWebTool, cached_web_tool
+
+    cached = cached_web_tool(tool, kind=kind)
+    assert isinstance(cached, CachedWebTool), "web_tool_cache.enabled が false になっている"
+    cached.ttl_seconds = ttl_seconds
+    return cached
+
+
+# -----------------------------------------------------------------
+#                      チェック
+# -----------------------------------------------------------------
+
+def check_hit_and_miss() -> List[str]:
+    problems = []
+    cache = reset_cache()
+    search, extract = fake_tools()
+    cached_search, cached_extract = wrap(search, "search"), wrap(extract, "extract")
+
+    first = cached_search.invoke({"query": "graph neural networks"})
+    second = cached_search.invoke({"query": "graph neural networks"})
+    if len(search.calls) != 1:
+        problems.append(f"同じ検索で {len(search.calls)} 回ツールが呼ばれた（期待値 1）")
+    if first != second:
+        problems.append("キャッシュ応答が初回の結果と一致しない")
+
+    cached_search.invoke({"query": "graph neural networks", "topic": "news"})
+    cached_search.invoke({"query": "diffusion models"})
+    if len(search.calls) != 3:
+        problems.append(f"引数の異なる検索がキャッシュから応答された（ツール呼び出し {len(search.calls)} 回、期待値 3）")
+
+    asyncio.run(cached_extract.ainvoke({"urls": ["https://arxiv.org/abs/1706.03762"]}))
+    asyncio.run(cached_extract.ainvoke({"urls": ["https://arxiv.org/abs/1706.03762"]}))
+    if len(extract.calls) != 1:
+        problems.append(f"同じ抽出（非同期）で {len(extract.calls)} 回ツールが呼ばれた（期待値 1）")
+
+    metrics = cache.metrics()
+    if metrics.get(cached_search.name, {}).get("hits") != 1 or metrics.get(cached_search.name, {}).get("misses") != 3:
+        problems.append(f"検索のメトリクスが想定と異なる: {metrics.get(cached_search.name)}")
+    return problems
+
+
+def check_uncacheable_results() -> List[str]:
+    problems = []
+    cache = reset_cache()
+    search, extract = fake_tools()
+    cached_search, cached_extract = wrap(search, "search"), wrap(extract, "extract")
+
+    search.responses["rate limited"] = {"error": "429 Too Many Requests"}
+    search.responses["nothing"] = {"query": "nothing", "results": []}
+    extract.responses["https://a.example.com,https://b.example.com"] = {
+        "results": [{"url": "https://a.example.com", "raw_content": "a"}],
+        "failed_results": [{"url": "https://b.example.com", "error": "timeout"}],
+    }
+
+    for _ in range(2):
+        cached_search.invoke({"query": "rate limited"})
+        cached_search.invoke({"query": "nothing"})
+        cached_extract.invoke({"urls": ["https://a.example.com", "https://b.example.com"]})
+    if len(search.calls) != 4:
+        problems.append(f"エラー応答・空の結果がキャッシュされた（検索ツール呼び出し {len(search.calls)} 回、期待値 4）")
+    if len(extract.calls) != 2:
+        problems.append(f"部分的に失敗した抽出結果がキャッシュされた（抽出ツール呼び出し {len(extract.calls)} 回、期待値 2）")
+    if cache.metrics()["_cache"]["entries"] != 0:
+        problems.append(f"キャッシュ対象外の結果が保持されている: {cache.metrics()['_cache']}")
+    return problems
+
+
+def check_ttl_expiry() -> List[str]:
+    problems = []
+    reset_cache()
+    search, _ = fake_tools()
+    cached_search = wrap(search, "search", ttl_seconds=0.2)
+
+    cached_search.invoke({"query": "ttl"})
+    cached_search.invoke({"query": "ttl"})
+    if len(search.calls) != 1:
+        problems.append(f"TTL 内の再検索でツールが呼ばれた（{len(search.calls)} 回、期待値 1）")
+    time.sleep(0.3)
+    cached_search.invoke({"query": "ttl"})
+    if len(search.calls) != 2:
+        problems.append(f"TTL を過ぎた結果がキャッシュから返された（{len(search.calls)} 回、期待値 2）")
+    return problems
+
+
+def check_lru_eviction() -> List[str]:
+    problems = []
+    cache = reset_cache(max_entries=2)
+    search, _ = fake_tools()
+    cached_search = wrap(search, "search")
+
+    cached_search.invoke({"query": "a"})
+    cached_search.invoke({"query": "b"})
+    cached_search.invoke({"query": "a"})  # a を最近使ったものにする
+    cached_search.invoke({"query": "c"})  # 最も古く使われた b が破棄される
+    calls_before = len(search.calls)
+    cached_search.invoke({"query": "a"})
+    cached_search.invoke({"query": "c"})
+    if len(search.calls) != calls_before:
+        problems.append("最近使った結果が破棄された")
+    cached_search.invoke({"query": "b"})
+    if len(search.calls) != calls_before + 1:
+        problems.append("最も古く使われた結果が破棄されていない")
+    if cache.metrics()["_cache"]["entries"] != 2:
+        problems.append(f"max_entries を超えて保持している: {cache.metrics()['_cache']}")
+    return problems
+
+
+def check_normalization() -> List[str]:
+    problems = []
+    reset_cache()
+    search, extract = fake_tools()
+    cached_search, cached_extract = wrap(search, "search"), wrap(extract, "extract")
+
+    cached_search.invoke({"query": "Large Language Models"})
+    cached_search.invoke({"query": "  large   language models "})
+    if len(search.calls) != 1:
+        problems.append("空白・大文字小文字だけが異なるクエリが別のキーになった")
+
+    cached_extract.invoke({"urls": ["https://Example.com/paper/", "https://example.com/other"]})
+    cached_extract.invoke({"urls": ["https://example.com/other#section-2", "HTTPS://EXAMPLE.COM/paper"]})
+    if len(extract.calls) != 1:
+        problems.append("末尾スラッシュ・フラグメント・順序だけが異なる URL が別のキーになった")
+
+    cached_extract.invoke({"urls": ["https://example.com/paper?page=2"]})
+    if len(extract.calls) != 2:
+        problems.append("クエリ文字列の異なる URL が同じキーになった")
+
+    # ツール側の設定（件数）が異なれば別のキーにする
+    other_search, _ = fake_tools()
+    other_search.max_results = 20
+    wrap(other_search, "search").invoke({"query": "large language models"})
+    if len(other_search.calls) != 1:
+        problems.append("max_results の異なるツールの結果がキャッシュから返された")
+    return problems
+
+
+def check_db_persistence() -> List[str]:
+    from sqlmodel import Session
+
+    from db import engine
+    from models import WebToolCache
+    from routers.module.web_tool_cache import web_tool_cache_key
+
+    problems = []
+    reset_cache(persist_to_db=True)
+    search, _ = fake_tools()
+    cached_search = wrap(search, "search")
+    first = cached_search.invoke({"query": "persisted query"})
+
+    key = web_tool_cache_key(search, {"query": "persisted query"})
+    with Session(engine) as db:
+        row = db.get(WebToolCache, key)
+    if row is None:
+        return ["persist_to_db 有効時に webtoolcache テーブルへ保存されていない"]
+
+    # プロセス内キャッシュが空の状態（再起動・別インスタンス）から DB で応答する
+    cache = reset_cache(persist_to_db=True)
+    restored = cached_search.invoke({"query": "persisted query"})
+    if len(search.calls) != 1:
+        problems.append("DB に保存済みの結果があるのにツールが呼ばれた")
+    if restored != first:
+        problems.append("DB から復元した結果が初回の結果と一致しない")
+    if cache.metrics().get(cached_search.name, {}).get("db_hits") != 1:
+        problems.append(f"DB ヒットが記録されていない: {cache.metrics().get(cached_search.name)}")
+
+    # 期限切れの行は使わない
+    reset_cache(persist_to_db=True)
+    expired_search, _ = fake_tools()
+    cached_expired = wrap(expired_search, "search", ttl_seconds=0.2)
+    cached_expired.invoke({"query": "expired query"})
+    time.sleep(0.3)
+    reset_cache(persist_to_db=True)
+    cached_expired.invoke({"query": "expired query"})
+    if len(expired_search.calls) != 2:
+        problems.append("期限切れの DB 行から応答した")
+    return problems
+
+
+CHECKS: List[Tuple[str, Callable[[], List[str]]]] = [
+    ("hit / miss", check_hit_and_miss),
+    ("uncacheable results", check_uncacheable_results),
+    ("ttl expiry", check_ttl_expiry),
+    ("lru eviction", check_lru_eviction),
+    ("query / url normalization", check_normalization),
+    ("db persistence", check_db_persistence),
+]
+
+
+def run_checks(verbose: bool) -> int:
+    failures = 0
+    for name, check in CHECKS:
+        try:
+            problems = check()
+        except Exception as e:
+            problems = [f"例外が発生した: {e!r}"]
+        failures += bool(problems)
+        print(f"{name:32} {'OK' if not problems else 'NG'}")
+        for problem in problems:
+            print(f"  x {problem}")
+        if verbose and not problems:
+            from routers.module.web_tool_cache import get_web_tool_cache_metrics
+
+            print(f"    | {get_web_tool_cache_metrics()}")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="各チェック後のキャッシュのメトリクスを表示する")
+    args = parser.parse_args()
+
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="kp-web-tool-cache-"))
+    try:
+        from benchmarks.environment import configure_environment
+
+        configure_environment(workdir)
+        from db import engine, init_db
+
+        init_db()
+        failures = run_checks(args.verbose)
+        engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"\n{failures} check(s) failed" if failures else "\nAll web tool cache checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
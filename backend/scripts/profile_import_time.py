@@ -0,0 +1,117 @@
+# backend/scripts/profile_import_time.py
+"""
+main.py の import 時間を `python -X importtime` で計測し、コールドスタートの回帰を検出する
+
+使い方（backend ディレクトリで実行）:
+    python scripts/profile_import_time.py                 # 上位30件を表示し、予算を超えたら終了コード1
+    python scripts/profile_import_time.py --top 50 --budget 2.5
+    python scripts/profile_import_time.py --raw importtime.log   # 生のレポートも保存する
+
+チェック内容:
+- main の累積 import 時間が cold_start.import_time_budget_seconds 以下であること
+- 遅延読み込みにしたライブラリ（--forbid）が main の import 時に読み込まれていないこと
+"""
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+
+import yaml
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+# 遅延読み込みにしたライブラリ（main の import 時に読み込まれたら回帰）
+DEFAULT_FORBIDDEN = [
+    "chromadb",
+    "langchain_chroma",
+    "langchain_google_community",
+    "google.cloud.bigquery",
+    "sklearn",
+    "PyPDF2",
+    "arxiv",
+    "langchain_google_genai",
+    "routers.deepresearch_core",
+    "routers.deeprag_core",
+]
+
+
+def load_budget() -> float:
+    cfg = yaml.safe_load((BACKEND_DIR / "config.yaml").read_text(encoding="utf-8")) or {}
+    return float((cfg.get("cold_start") or {}).get("import_time_budget_seconds", 3.0))
+
+
+def run_importtime(module: str, deploy: str) -> str:
+    env = {**os.environ, "DEPLOY": deploy, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-4000:], file=sys.stderr)
+        raise SystemExit(f"import {module} failed (exit code {proc.returncode})")
+    return proc.stderr
+
+
+def parse_importtime(report: str):
+    """[(モジュール名, self秒, 累積秒, 階層)] を返す"""
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # 形式: "import time:       123 |       4567 |     package.module"（名前のインデントが階層）
+        parts = line[len("import time:"):].split("|", 2)
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        name = name[1:] if name.startswith(" ") else name
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--deploy", default=os.getenv("DEPLOY", "local"), help="DEPLOY 環境変数（既定: local）")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--budget", type=float, default=None, help="累積 import 時間の上限秒数（既定: config.yaml）")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN)
+    parser.add_argument("--raw", type=pathlib.Path, default=None, help="-X importtime の生レポートの保存先")
+    args = parser.parse_args()
+
+    report = run_importtime(args.module, args.deploy)
+    if args.raw:
+        args.raw.write_text(report, encoding="utf-8")
+    rows = parse_importtime(report)
+    if not rows:
+        raise SystemExit("importtime report is empty")
+
+    budget = args.budget if args.budget is not None else load_budget()
+    total = next((cumulative for name, _, cumulative, _ in rows if name == args.module), max(r[2] for r in rows))
+
+    print(f"{'cumulative[s]':>13} {'self[s]':>8}  module")
+    for name, self_s, cumulative_s, depth in sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]:
+        print(f"{cumulative_s:13.3f} {self_s:8.3f}  {name}")
+
+    imported = {name for name, _, _, _ in rows}
+    eager = [m for m in args.forbid if m in imported]
+    print(f"\nimport {args.module}: {total:.3f}s (budget {budget:.3f}s)")
+
+    failed = False
+    if total > budget:
+        print(f"NG: import time exceeds the budget by {total - budget:.3f}s")
+        failed = True
+    if eager:
+        print(f"NG: lazily-loaded modules were imported eagerly: {', '.join(eager)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
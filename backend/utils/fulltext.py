@@ -1,12 +1,15 @@
 import re, tempfile, requests, html2text
 from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
-import arxiv
+from routers.module.lazy_import import lazy_attr, lazy_module
+PdfReader = lazy_attr("PyPDF2", "PdfReader")
+arxiv = lazy_module("arxiv")
 import asyncio
 import httpx
+from routers.module.tracing import traced, wrap_with_context
 
 ARXIV_ID_RE = re.compile(r"https?://arxiv\.org/abs/(?P<id>\d{4}\.\d{5}(v\d+)?)")
 
+@traced("fulltext.extract_text_from_html", record_args=("arxiv_id",))
 def extract_text_from_html(arxiv_id: str) -> str | None:
     url = f"https://arxiv.org/html/{arxiv_id}"
     r = requests.get(url, timeout=20, allow_redirects=True)
@@ -23,6 +26,7 @@ def extract_text_from_html(arxiv_id: str) -> str | None:
     md = html2text.html2text(str(body))
     return md.strip()
 
+@traced("fulltext.extract_text_from_pdf", record_args=("arxiv_id",))
 def extract_text_from_pdf(arxiv_id: str) -> str:
     pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
     r = requests.get(pdf_url, timeout=30, allow_redirects=True)
@@ -59,6 +63,7 @@ def get_arxiv_fulltext(abs_url: str) -> tuple[str, str]:
     # HTML が無い場合は PDF へフォールバック
     return arxiv_id, extract_text_from_pdf(arxiv_id)
 
+@traced("fulltext.extract_text_from_html_async", record_args=("arxiv_id",))
 async def extract_text_from_html_async(arxiv_id: str) -> str | None:
     """非同期版のHTML テキスト抽出"""
     url = f"https://arxiv.org/html/{arxiv_id}"
@@ -81,6 +86,7 @@ async def extract_text_from_html_async(arxiv_id: str) -> str | None:
         except Exception:
             return None
 
+@traced("fulltext.extract_text_from_pdf_async", record_args=("arxiv_id",))
 async def extract_text_from_pdf_async(arxiv_id: str) -> str:
     """非同期版のPDF テキスト抽出"""
     pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
@@ -96,6 +102,7 @@ async def extract_text_from_pdf_async(arxiv_id: str) -> str:
             pages = [page.extract_text() or "" for page in reader.pages]
         return "\n".join(pages).strip()
 
+@traced("fulltext.get_arxiv_metadata_with_fulltext_async", record_args=("abs_url",))
 async def get_arxiv_metadata_with_fulltext_async(abs_url: str) -> dict[str, str]:
     """
     非同期版：arXiv URLから論文の詳細情報を取得する
@@ -108,13 +115,14 @@ async def get_arxiv_metadata_with_fulltext_async(abs_url: str) -> dict[str, str]
     # arXiv APIから論文メタデータを取得（同期部分はrun_in_executorで非同期化）
     loop = asyncio.get_event_loop()
     
+    @traced("fulltext.arxiv_metadata")
     def get_arxiv_metadata():
         search = arxiv.Search(id_list=[arxiv_id])
         result = next(arxiv.Client().results(search))
         return result
     
     try:
-        result = await loop.run_in_executor(None, get_arxiv_metadata)
+        result = await loop.run_in_executor(None, wrap_with_context(get_arxiv_metadata))
     except StopIteration:
         raise ValueError(f"arXiv ID {arxiv_id} not found on arXiv.")
     
@@ -132,6 +140,7 @@ async def get_arxiv_metadata_with_fulltext_async(abs_url: str) -> dict[str, str]
         "full_text": text
     }
 
+@traced("fulltext.get_arxiv_metadata_with_fulltext", record_args=("abs_url",))
 def get_arxiv_metadata_with_fulltext(abs_url: str) -> dict[str, str]:
     """
     arXiv URLから論文の詳細情報を取得する（同期版：既存コードとの互換性維持）
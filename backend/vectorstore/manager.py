@@ -1,21 +1,28 @@
 # knowledgepaper/backend/vectorstore/manager.py
 # vectorstore/manager.py
 from pathlib import Path
+import logging
 import threading
 import yaml
 import os
 import shutil
-import chromadb
-from chromadb.config import Settings
 import time
 from typing import List, Dict, Tuple, Union # Union をインポート
 
-from langchain_chroma import Chroma
-from langchain_google_community import BigQueryVectorStore
-from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_core.vectorstores import VectorStore # VectorStore をインポート
 from routers.module.embeddings import EMBED
-from google.cloud import bigquery
+from routers.module.lazy_import import lazy_attr, lazy_module
+from routers.module.perf_metrics import observe_vector_store
+
+# chromadb / BigQuery のクライアントライブラリは import に時間がかかるため、最初の利用時に読み込む
+chromadb = lazy_module("chromadb")
+Settings = lazy_attr("chromadb.config", "Settings")
+Chroma = lazy_attr("langchain_chroma", "Chroma")
+BigQueryVectorStore = lazy_attr("langchain_google_community", "BigQueryVectorStore")
+DistanceStrategy = lazy_attr("langchain_community.vectorstores.utils", "DistanceStrategy")
+bigquery = lazy_module("google.cloud.bigquery")
+
+logger = logging.getLogger(__name__)
 
 _vector_store_instance = None
 _lock = threading.Lock()
@@ -44,6 +51,10 @@ def load_vector_cfg():
                     raise ValueError(f"Vector store config for DEPLOY='{deploy_env}' not found.")
     return _cfg
 
+def _vector_backend() -> str:
+    """メトリクスのラベル用（chroma / bigquery_vector_search）"""
+    return load_vector_cfg().get("type", "unknown")
+
 def _reset_global_instance_state():
     global _vector_store_instance, _vector_store_init_failed_permanently
     _vector_store_instance = None
@@ -58,7 +69,7 @@ def _init_vectordb() -> VectorStore: # 返り値の型を VectorStore に変更
     if store_type == "chroma":
         try:
             cfg_dir = Path(__file__).parent.parent
-            raw_dir = cfg.get("persist_dir", "./database/vector_db")
+            raw_dir = os.getenv("LOCAL_VECTOR_STORE_DIR") or cfg.get("persist_dir", "./database/vector_db")
             persist_path_str = str((cfg_dir / raw_dir).resolve())
 
             Path(persist_path_str).mkdir(parents=True, exist_ok=True)
@@ -160,12 +171,15 @@ def reset_vector_store_for_testing():
         _cfg = None
         print("Vector store instance and config cache have been reset for testing/re-init.")
 
+@observe_vector_store("add_texts", backend=_vector_backend)
 def add_texts(*, texts, metadatas=None, ids=None, batch_size=100):
     vs = get_vector_store()
     cfg = load_vector_cfg()
     store_type = cfg.get("type")
 
-    print(f"Adding {len(texts)} texts to vector store of type '{store_type}' with IDs: {ids}")
+    logger.info("Adding %d texts to vector store of type '%s'", len(texts), store_type)
+    if ids and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("IDs: %s", ids)
     num_batches = (len(texts) + batch_size - 1) // batch_size
 
     if store_type == "chroma":
@@ -178,11 +192,14 @@ def add_texts(*, texts, metadatas=None, ids=None, batch_size=100):
                 end_idx = min((i + 1) * batch_size, len(texts))
                 batch_texts = texts[start_idx:end_idx]
                 batch_metadatas = metadatas[start_idx:end_idx] if metadatas else None
+                if batch_metadatas:
+                    # Chroma はメタデータの値に None を許容しないため、None のキーは落とす
+                    batch_metadatas = [{k: v for k, v in (m or {}).items() if v is not None} for m in batch_metadatas]
                 batch_ids = ids[start_idx:end_idx] if ids else None
 
-                print(f"Adding batch {i + 1}/{num_batches} with {len(batch_texts)} texts.")
+                logger.debug("Adding batch %d/%d with %d texts.", i + 1, num_batches, len(batch_texts))
                 vs.add_texts(texts=batch_texts, metadatas=batch_metadatas, ids=batch_ids)
-            print(f"All {len(texts)} texts added to ChromaDB in {num_batches} batches.")
+            logger.info("All %d texts added to ChromaDB in %d batches.", len(texts), num_batches)
         return vs
     elif store_type == "bigquery_vector_search":
         if not isinstance(vs, BigQueryVectorStore):
@@ -195,13 +212,14 @@ def add_texts(*, texts, metadatas=None, ids=None, batch_size=100):
                 batch_texts = texts[start_idx:end_idx]
                 batch_metadatas = metadatas[start_idx:end_idx] if metadatas else None
 
-                print(f"Adding batch {i + 1}/{num_batches} with {len(batch_texts)} texts.")
+                logger.debug("Adding batch %d/%d with %d texts.", i + 1, num_batches, len(batch_texts))
                 vs.add_texts(texts=batch_texts, metadatas=batch_metadatas)
-            print(f"All {len(texts)} texts added to BigQuery in {num_batches} batches.")
+            logger.info("All %d texts added to BigQuery in %d batches.", len(texts), num_batches)
         return vs
     else:
         raise ValueError(f"add_texts not implemented for store type: {store_type}")
 
+@observe_vector_store("search_by_vector", backend=_vector_backend)
 def search_by_vector(*, embedding, k=5, filter_param=None):
     vs = get_vector_store()
     cfg = load_vector_cfg()
@@ -211,7 +229,7 @@ def search_by_vector(*, embedding, k=5, filter_param=None):
         if not isinstance(vs, Chroma):
             raise TypeError("Vector store is not a Chroma instance for similarity_search_by_vector_with_relevance_scores.")
         if filter_param and not isinstance(filter_param, dict):
-             print(f"Warning: Chroma filter_param is not a dict: {filter_param}.")
+             logger.warning("Chroma filter_param is not a dict: %s.", filter_param)
         return vs.similarity_search_by_vector_with_relevance_scores(
             embedding=embedding, k=k, filter=filter_param,
         )
@@ -224,6 +242,7 @@ def search_by_vector(*, embedding, k=5, filter_param=None):
     else:
         raise ValueError(f"search_by_vector not implemented for store type: {store_type}")
 
+@observe_vector_store("delete_all_vectors", backend=_vector_backend)
 def delete_all_vectors():
     cfg = load_vector_cfg()
     store_type = cfg.get("type")
@@ -307,6 +326,7 @@ def delete_all_vectors():
     else:
         raise ValueError(f"delete_all_vectors not implemented for store type: {store_type}")
 
+@observe_vector_store("delete_vectors_by_metadata", backend=_vector_backend)
 def delete_vectors_by_metadata(metadata_filter: dict):
     cfg = load_vector_cfg()
     store_type = cfg.get("type")
@@ -317,10 +337,10 @@ def delete_vectors_by_metadata(metadata_filter: dict):
             raise TypeError("Vector store is not a Chroma instance for delete with where.")
 
         try:
-            print(f"Attempting to delete from ChromaDB with original filter: {metadata_filter}")
+            logger.debug("Attempting to delete from ChromaDB with original filter: %s", metadata_filter)
             
             if not metadata_filter:
-                print("Metadata filter is empty. No vectors will be deleted from ChromaDB.")
+                logger.warning("Metadata filter is empty. No vectors will be deleted from ChromaDB.")
                 return
 
             chroma_filter_conditions = []
@@ -328,7 +348,7 @@ def delete_vectors_by_metadata(metadata_filter: dict):
                 chroma_filter_conditions.append({key: value})
             
             if not chroma_filter_conditions: #ありえないはずだが念のため
-                print("No conditions derived from metadata_filter. Skipping delete.")
+                logger.warning("No conditions derived from metadata_filter. Skipping delete.")
                 return
 
             if len(chroma_filter_conditions) == 1:
@@ -338,14 +358,17 @@ def delete_vectors_by_metadata(metadata_filter: dict):
                 # 条件が複数の場合は、$and で結合
                 chroma_where_clause = {"$and": chroma_filter_conditions}
                 
-            print(f"Formatted ChromaDB where clause for delete: {chroma_where_clause}")
+            logger.debug("Formatted ChromaDB where clause for delete: %s", chroma_where_clause)
             vs.delete(where=chroma_where_clause) # 修正されたフィルタを使用
             # deleteメソッドは通常、削除されたIDのリストなどを返すが、ここでは件数などは返さない
-            print(f"ChromaDB delete call executed for filter: {metadata_filter}")
+            logger.debug("ChromaDB delete call executed for filter: %s", metadata_filter)
 
         except Exception as e:
             # エラーメッセージに元のフィルタと整形後のフィルタ両方を含めるとデバッグしやすい
-            print(f"Error deleting vectors from ChromaDB. Original filter: {metadata_filter}, Formatted where: {chroma_where_clause if 'chroma_where_clause' in locals() else 'N/A'}. Error: {e}")
+            logger.error(
+                "Error deleting vectors from ChromaDB. Original filter: %s, Formatted where: %s. Error: %s",
+                metadata_filter, chroma_where_clause if 'chroma_where_clause' in locals() else 'N/A', e,
+            )
     elif store_type == "bigquery_vector_search":
         table_id = cfg.get("table_name")
         if not table_id:
@@ -395,15 +418,11 @@ def delete_vectors_by_metadata(metadata_filter: dict):
             job = client.query(query, job_config=job_cfg)
             job.result()
 
-            print(
-                    f"BigQuery delete executed: {job.num_dml_affected_rows} rows "
-                    f"removed for filter {metadata_filter}"
-                )
+            logger.debug("BigQuery delete executed: %s rows removed for filter %s", job.num_dml_affected_rows, metadata_filter)
         except Exception as e:
-            print(
-                f"Error deleting vectors from BigQuery with filter {metadata_filter}: {e}"
-            )
+            logger.error("Error deleting vectors from BigQuery with filter %s: %s", metadata_filter, e)
 
+@observe_vector_store("batch_check_vector_existence", backend=_vector_backend)
 def batch_check_vector_existence(user_id: str, paper_metadata_ids: List[str]) -> Dict[str, bool]:
     """
     指定されたユーザーと論文IDリストに対して、ベクトルの存在を一括チェックする。
@@ -449,7 +468,7 @@ def batch_check_vector_existence(user_id: str, paper_metadata_ids: List[str]) ->
                 result[paper_metadata_id] = len(results.get('ids', [])) > 0
                 
         except Exception as e:
-            print(f"Error in batch check vector existence in ChromaDB: {e}")
+            logger.error("Error in batch check vector existence in ChromaDB: %s", e)
             # エラー時はすべてFalseで初期化
             for paper_metadata_id in paper_metadata_ids:
                 result[paper_metadata_id] = False
@@ -491,7 +510,7 @@ def batch_check_vector_existence(user_id: str, paper_metadata_ids: List[str]) ->
                 result[paper_metadata_id] = paper_metadata_id in existing_papers
                 
         except Exception as e:
-            print(f"Error in batch check vector existence in BigQuery: {e}")
+            logger.error("Error in batch check vector existence in BigQuery: %s", e)
             # エラー時はすべてFalseで初期化
             for paper_metadata_id in paper_metadata_ids:
                 result[paper_metadata_id] = False
@@ -502,6 +521,7 @@ def batch_check_vector_existence(user_id: str, paper_metadata_ids: List[str]) ->
     return result
 
 
+@observe_vector_store("vector_exists_for_user_paper", backend=_vector_backend)
 def vector_exists_for_user_paper(user_id: str, paper_metadata_id: str) -> bool:
     """
     指定されたユーザーと論文の組み合わせでベクトルが既に存在するかを確認する。
@@ -544,7 +564,7 @@ def vector_exists_for_user_paper(user_id: str, paper_metadata_id: str) -> bool:
             return len(results.get('ids', [])) > 0
             
         except Exception as e:
-            print(f"Error checking vector existence in ChromaDB: {e}")
+            logger.error("Error checking vector existence in ChromaDB: %s", e)
             return False
     
     elif store_type == "bigquery_vector_search":
@@ -575,13 +595,14 @@ def vector_exists_for_user_paper(user_id: str, paper_metadata_id: str) -> bool:
             return results[0].count > 0 if results else False
             
         except Exception as e:
-            print(f"Error checking vector existence in BigQuery: {e}")
+            logger.error("Error checking vector existence in BigQuery: %s", e)
             return False
     
     else:
         raise ValueError(f"vector_exists_for_user_paper not implemented for store type: {store_type}")
 
 
+@observe_vector_store("get_embeddings_by_metadata_filter", backend=_vector_backend)
 def get_embeddings_by_metadata_filter(
     metadata_conditions_list: List[Dict[str, str]]
 ) -> List[Tuple[Dict[str, str], List[float]]]:
@@ -632,7 +653,7 @@ def get_embeddings_by_metadata_filter(
                         if original_cond is not None and embedding is not None:
                             all_results.append((original_cond, embedding))
             except Exception as e:
-                print(f"Error fetching embeddings from ChromaDB by IDs: {e}")
+                logger.error("Error fetching embeddings from ChromaDB by IDs: %s", e)
 
     elif store_type == "bigquery_vector_search":
         if not isinstance(vs, BigQueryVectorStore):
@@ -675,59 +696,43 @@ def get_embeddings_by_metadata_filter(
                 WHERE {' OR '.join(or_conditions_sql)}
             """
             try:
-                print(f"Executing BigQuery get_embeddings_by_metadata_filter query: {query_str}")
+                logger.debug("Executing BigQuery get_embeddings_by_metadata_filter query: %s", query_str)
                 query_job = bq_client.query(query_str)
                 row_count = 0
                 for row in query_job:
                     row_count += 1
                     retrieved_uid = row[user_id_col]
                     embedding_vector = list(row[embedding_column_name])
-                    
-                    print(f"[DEBUG] Processing row: user_id={retrieved_uid}, paper_metadata_id={row.get('paper_metadata_id')}, embedding_length={len(embedding_vector)}")
-                    
+                    row_keys = row.keys()
+
                     # 新しい設計と旧設計の両方に対応したマッチング
                     original_cond_found = None
                     for oc in metadata_conditions_list:
-                        print(f"[DEBUG] Checking condition: {oc}")
-                        if oc.get("user_id") == retrieved_uid:
-                            print(f"[DEBUG] User ID matched: {retrieved_uid}")
-                            print(f"[DEBUG] Row keys: {list(row.keys())}")
-                            print(f"[DEBUG] oc.get('paper_metadata_id'): {oc.get('paper_metadata_id')}")
-                            print(f"[DEBUG] 'paper_metadata_id' in row: {'paper_metadata_id' in row}")
-                            
-                            # 新しい設計: paper_metadata_id でマッチング（BigQuery Row対応）
-                            if oc.get("paper_metadata_id") and "paper_metadata_id" in row.keys():
-                                retrieved_paper_meta_id = row["paper_metadata_id"]
-                                print(f"[DEBUG] Comparing paper_metadata_id: '{oc.get('paper_metadata_id')}' vs '{retrieved_paper_meta_id}'")
-                                if str(oc.get("paper_metadata_id")) == str(retrieved_paper_meta_id):
-                                    print(f"[DEBUG] Paper metadata ID matched!")
-                                    original_cond_found = oc
-                                    break
-                                else:
-                                    print(f"[DEBUG] Paper metadata ID did not match")
-                            # 旧設計: generated_summary_id でマッチング（BigQuery Row対応）
-                            elif oc.get("generated_summary_id") and "generated_summary_id" in row.keys():
-                                retrieved_sid = row["generated_summary_id"]
-                                print(f"[DEBUG] Comparing generated_summary_id: '{oc.get('generated_summary_id')}' vs '{retrieved_sid}'")
-                                if str(oc.get("generated_summary_id")) == str(retrieved_sid):
-                                    print(f"[DEBUG] Generated summary ID matched!")
-                                    original_cond_found = oc
-                                    break
-                                else:
-                                    print(f"[DEBUG] Generated summary ID did not match")
-                            else:
-                                print(f"[DEBUG] Neither paper_metadata_id nor generated_summary_id condition met")
-                    
+                        if oc.get("user_id") != retrieved_uid:
+                            continue
+                        # 新しい設計: paper_metadata_id でマッチング（BigQuery Row対応）
+                        if oc.get("paper_metadata_id") and "paper_metadata_id" in row_keys:
+                            if str(oc.get("paper_metadata_id")) == str(row["paper_metadata_id"]):
+                                original_cond_found = oc
+                                break
+                        # 旧設計: generated_summary_id でマッチング（BigQuery Row対応）
+                        elif oc.get("generated_summary_id") and "generated_summary_id" in row_keys:
+                            if str(oc.get("generated_summary_id")) == str(row["generated_summary_id"]):
+                                original_cond_found = oc
+                                break
+
                     if original_cond_found:
-                        print(f"[DEBUG] Adding result for condition: {original_cond_found}")
                         all_results.append((original_cond_found, embedding_vector))
                     else:
-                        print(f"[DEBUG] No matching condition found for this row")
-                
-                print(f"[DEBUG] BigQuery returned {row_count} rows for metadata filter query")
-                
-                # デバッグ: 結果が0件の場合、テーブルのサンプルデータを確認
-                if row_count == 0:
+                        logger.debug(
+                            "No matching condition found for row: user_id=%s, paper_metadata_id=%s",
+                            retrieved_uid, row.get("paper_metadata_id"),
+                        )
+
+                logger.debug("BigQuery returned %d rows for metadata filter query", row_count)
+
+                # デバッグ: 結果が0件の場合、テーブルのサンプルデータを確認（DEBUG 有効時のみ追加クエリを発行する）
+                if row_count == 0 and logger.isEnabledFor(logging.DEBUG):
                     debug_query = f"""
                         SELECT user_id, paper_metadata_id, COUNT(*) as count
                         FROM `{vector_table_full_id}`
@@ -735,13 +740,11 @@ def get_embeddings_by_metadata_filter(
                         GROUP BY user_id, paper_metadata_id
                         LIMIT 10
                     """
-                    print(f"[DEBUG] Checking table contents: {debug_query}")
-                    debug_job = bq_client.query(debug_query)
-                    debug_rows = list(debug_job)
-                    print(f"[DEBUG] Sample table data for user: {debug_rows}")
-                    
+                    debug_rows = list(bq_client.query(debug_query))
+                    logger.debug("Sample table data for user: %s", debug_rows)
+
             except Exception as e:
-                print(f"Error fetching embeddings from BigQuery by metadata filter: {e}")
+                logger.error("Error fetching embeddings from BigQuery by metadata filter: %s", e)
     else:
         raise ValueError(f"get_embeddings_by_metadata_filter not implemented for store type: {store_type}")
         
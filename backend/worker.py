@@ -0,0 +1,22 @@
+# backend/worker.py
+# DeepResearch / DeepRAG の実行ワーカー（APIとは別プロセスで起動してスケールさせる）
+#   python worker.py
+# API 側は config.yaml の research_worker.mode を external（または環境変数 RESEARCH_WORKER_MODE=external）にする。
+# 同時実行数は research_worker.max_concurrent_runs（環境変数 RESEARCH_WORKER_CONCURRENCY で上書き可）。
+
+from routers.module.logging_config import configure_logging
+configure_logging()
+
+from db import engine, init_db
+from routers.module.query_stats import instrument_engine_query_stats
+from routers.module.research_worker import run_research_worker_forever
+from routers.module.tracing import setup_tracing, shutdown_tracing
+
+if __name__ == "__main__":
+    init_db()
+    setup_tracing(engine, service_name="knowledgepaper-research-worker")
+    instrument_engine_query_stats(engine)   # 遅いクエリのログ
+    try:
+        run_research_worker_forever()
+    finally:
+        shutdown_tracing()